@@ -1,6 +1,6 @@
 from django.utils import timezone
 
-from core.models import AiUsageMonthly
+from .ai_usage import get_ai_replies_used
 from .plan_limits import get_org_plan_limits
 
 
@@ -20,13 +20,7 @@ def can_use_ai(org, needed_replies=1):
     limit = int(limits.get("ai_replies_per_month") or 0)
     if not limit:
         return {"allowed": True, "reason": "", "used": 0, "limit": 0}
-    period = get_period_yyyymm()
-    usage = AiUsageMonthly.objects.filter(
-        organization=org,
-        product_slug="ai-chatbot",
-        period_yyyymm=period,
-    ).first()
-    used = int(usage.ai_replies_used or 0) if usage else 0
+    used = get_ai_replies_used(org, get_period_yyyymm())
     allowed = (used + int(needed_replies or 0)) <= limit
     return {
         "allowed": allowed,
@@ -1,14 +1,49 @@
-from decimal import Decimal
+"""
+AI usage accounting.
 
-from django.db import transaction
-from django.utils import timezone
+Limit checks read a live per-org monthly reply counter kept in the shared cache
+(atomic INCR), seeded from AiUsageMonthly when it is missing. Without a shared
+cache each worker would only count its own replies, so the check reads
+AiUsageMonthly plus this process's buffered calls instead. Recorded calls go to
+a per-process buffer; a flush bulk-inserts the AiUsageEvent rows and adds the
+buffered totals to AiUsageMonthly with one multi-row UPSERT, so no request locks
+the monthly row. A background thread flushes every AI_USAGE_FLUSH_SECONDS, so
+idle workers do not sit on billed calls.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
 
 from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
 
+from core.cache_utils import cache_is_shared
+from core.flush_utils import PeriodicFlusher
 from core.models import AiUsageMonthly, AiUsageEvent
 from .openai_pricing import get_pricing_config
 
 
+logger = logging.getLogger(__name__)
+
+PRODUCT_SLUG = "ai-chatbot"
+COUNTER_TTL_SECONDS = 40 * 24 * 3600
+STATEMENT_ROWS = 1000
+
+
+def _flush_interval_seconds():
+    return float(getattr(settings, "AI_USAGE_FLUSH_SECONDS", 10))
+
+
+def _flush_max_events():
+    return int(getattr(settings, "AI_USAGE_FLUSH_MAX_EVENTS", 100))
+
+
 def _period_yyyymm(now=None):
     return (now or timezone.now()).strftime("%Y%m")
 
@@ -26,49 +61,176 @@ def calculate_cost_inr(prompt_tokens, completion_tokens, pricing_cfg=None):
     return cost
 
 
+class _UsageBuffer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.last_flush = time.monotonic()
+
+    def append(self, event):
+        with self.lock:
+            self.events.append(event)
+            return len(self.events)
+
+    def pending_replies(self, org_id, period):
+        with self.lock:
+            return sum(1 for event in self.events if event.organization_id == org_id and event.period_yyyymm == period)
+
+    def drain(self):
+        with self.lock:
+            events, self.events = self.events, []
+            self.last_flush = time.monotonic()
+        return events
+
+    def restore(self, events):
+        with self.lock:
+            self.events[:0] = events
+
+
+_buffer = _UsageBuffer()
+
+
+def _counter_key(org_id, period):
+    return f"ai_usage:replies:{org_id}:{period}"
+
+
+def _stored_replies(org_id, period):
+    stored = (
+        AiUsageMonthly.objects
+        .filter(organization_id=org_id, product_slug=PRODUCT_SLUG, period_yyyymm=period)
+        .values_list("ai_replies_used", flat=True)
+        .first()
+    ) or 0
+    return int(stored) + _buffer.pending_replies(org_id, period)
+
+
+def _seed_counter(org_id, period):
+    used = _stored_replies(org_id, period)
+    if not cache.add(_counter_key(org_id, period), used, COUNTER_TTL_SECONDS):
+        used = cache.get(_counter_key(org_id, period), used)
+    return int(used)
+
+
+def get_ai_replies_used(org, period=None):
+    """Live AI replies used by `org` this month, including calls not flushed yet."""
+    org_id = getattr(org, "id", org)
+    period = period or _period_yyyymm()
+    if not cache_is_shared():
+        return _stored_replies(org_id, period)
+    used = cache.get(_counter_key(org_id, period))
+    if used is None:
+        return _seed_counter(org_id, period)
+    return int(used)
+
+
 def record_ai_usage(organization, model, usage, conversation_id=None, message_id=None, meta=None):
-    if not organization:
+    """Account one AI call; returns the org's live reply count for the month."""
+    org_id = getattr(organization, "id", None)
+    if not org_id:
         return None
     prompt_tokens = int(usage.get("prompt_tokens") or 0)
     completion_tokens = int(usage.get("completion_tokens") or 0)
     total_tokens = int(usage.get("total_tokens") or (prompt_tokens + completion_tokens))
-    cost_inr = calculate_cost_inr(prompt_tokens, completion_tokens)
     period = _period_yyyymm()
-    with transaction.atomic():
-        row = (
-            AiUsageMonthly.objects
-            .select_for_update()
-            .filter(organization=organization, product_slug="ai-chatbot", period_yyyymm=period)
-            .first()
-        )
-        if row:
-            row.ai_replies_used += 1
-            row.tokens_total += total_tokens
-            row.cost_inr_total += cost_inr
-            row.request_count += 1
-            row.save(update_fields=["ai_replies_used", "tokens_total", "cost_inr_total", "request_count", "updated_at"])
-        else:
-            row = AiUsageMonthly.objects.create(
-                organization=organization,
-                product_slug="ai-chatbot",
-                period_yyyymm=period,
-                ai_replies_used=1,
-                tokens_total=total_tokens,
-                cost_inr_total=cost_inr,
-                request_count=1,
-            )
-        if getattr(settings, "AI_USAGE_EVENT_ENABLED", True) and getattr(organization, "id", None):
-            AiUsageEvent.objects.create(
-                organization=organization,
-                product_slug="ai-chatbot",
-                period_yyyymm=period,
-                model=model or "",
-                prompt_tokens=prompt_tokens,
-                completion_tokens=completion_tokens,
-                total_tokens=total_tokens,
-                cost_inr=cost_inr,
-                conversation_id=conversation_id,
-                message_id=message_id,
-                meta=meta or {},
+    size = _buffer.append(AiUsageEvent(
+        organization_id=org_id,
+        product_slug=PRODUCT_SLUG,
+        period_yyyymm=period,
+        model=(model or "")[:80],
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=total_tokens,
+        cost_inr=calculate_cost_inr(prompt_tokens, completion_tokens),
+        conversation_id=conversation_id,
+        message_id=message_id,
+        meta=meta or {},
+    ))
+    _flusher.ensure_started()
+    if size >= _flush_max_events() or (
+        not _flusher.running and time.monotonic() - _buffer.last_flush >= _flush_interval_seconds()
+    ):
+        if not connection.in_atomic_block:
+            flush_ai_usage()
+    if not cache_is_shared():
+        return _stored_replies(org_id, period)
+    try:
+        return cache.incr(_counter_key(org_id, period))
+    except ValueError:
+        # No live counter yet: seeding counts the buffered event just added.
+        return _seed_counter(org_id, period)
+
+
+def _upsert_monthly(events):
+    totals = defaultdict(lambda: [0, 0, Decimal("0")])
+    for event in events:
+        row = totals[(event.organization_id, event.product_slug, event.period_yyyymm)]
+        row[0] += 1
+        row[1] += event.total_tokens
+        row[2] += event.cost_inr
+    table = AiUsageMonthly._meta.db_table
+    keys = sorted(totals)
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        for start in range(0, len(keys), STATEMENT_ROWS):
+            chunk = keys[start:start + STATEMENT_ROWS]
+            params = []
+            for key in chunk:
+                calls, tokens, cost = totals[key]
+                params.extend([*key, calls, tokens, 0, cost, calls, now])
+            cursor.execute(
+                f"INSERT INTO {table} "
+                f"(organization_id, product_slug, period_yyyymm, ai_replies_used, tokens_total, "
+                f"cost_usd_total, cost_inr_total, request_count, updated_at) "
+                f"VALUES {', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s, %s)'] * len(chunk))} "
+                f"ON CONFLICT (organization_id, product_slug, period_yyyymm) DO UPDATE SET "
+                f"ai_replies_used = {table}.ai_replies_used + EXCLUDED.ai_replies_used, "
+                f"tokens_total = {table}.tokens_total + EXCLUDED.tokens_total, "
+                f"cost_inr_total = {table}.cost_inr_total + EXCLUDED.cost_inr_total, "
+                f"request_count = {table}.request_count + EXCLUDED.request_count, "
+                f"updated_at = EXCLUDED.updated_at",
+                params,
             )
-    return row
+
+
+def _write_usage(events):
+    with transaction.atomic():
+        if getattr(settings, "AI_USAGE_EVENT_ENABLED", True):
+            AiUsageEvent.objects.bulk_create(events, batch_size=500)
+        _upsert_monthly(events)
+
+
+def flush_ai_usage():
+    """Write buffered usage events and monthly totals; on failure the events stay buffered."""
+    events = _buffer.drain()
+    if not events:
+        return 0
+    try:
+        try:
+            _write_usage(events)
+        except IntegrityError:
+            # A conversation or message was deleted while its events were buffered.
+            for event in events:
+                event.pk = None
+                event.conversation_id = None
+                event.message_id = None
+            _write_usage(events)
+    except Exception:
+        logger.exception("AI usage flush failed; keeping %s events buffered", len(events))
+        for event in events:
+            event.pk = None
+        _buffer.restore(events)
+        return 0
+    return len(events)
+
+
+_flusher = PeriodicFlusher("ai-usage-flush", flush_ai_usage, _flush_interval_seconds)
+
+
+def _flush_at_exit():
+    try:
+        flush_ai_usage()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
@@ -0,0 +1,275 @@
+"""
+Per-org retrieval index over chatbot knowledge (FAQs, extra text and imported
+website pages).
+
+Passages are scored with BM25 over a sparse term matrix kept as numpy arrays:
+rows (passage -> term counts) are persisted on AiKnowledgeIndex so a change
+only re-tokenizes the sources whose content hash moved, and a per-process copy
+is re-laid out by term for querying. FAQ/library saves schedule a refresh in
+the background once their transaction commits; it stamps a new version on the
+stored row. Queries compare that version with their per-process copy (one
+indexed lookup), so every worker picks up the change and none rebuilds on a
+visitor's request. Only an org that has never been indexed is built inline.
+"""
+
+import hashlib
+import io
+import re
+import threading
+import uuid
+from collections import Counter, OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from core.models import AiFaq, AiKnowledgeIndex, AiMediaLibraryItem, AiWebsiteImportJob
+
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+PASSAGE_WORDS = 120
+# Share of query and question terms that must overlap to answer straight from an FAQ.
+FAQ_MATCH_THRESHOLD = 0.8
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in is it its me my "
+    "of on or our so that the their them there this to us was we what when where which who "
+    "why will with you your".split()
+)
+
+
+def _top_k():
+    return int(getattr(settings, "AI_CHATBOT_KNOWLEDGE_TOP_K", 4))
+
+
+def _max_cached_orgs():
+    return int(getattr(settings, "AI_CHATBOT_KNOWLEDGE_CACHE_SIZE", 256))
+
+
+def _stem(token):
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [
+        _stem(token)
+        for token in _TOKEN_RE.findall(str(text or "").lower())
+        if len(token) > 1 and token not in _STOPWORDS
+    ]
+
+
+def _chunk_words(text, size=PASSAGE_WORDS):
+    words = str(text or "").split()
+    return [" ".join(words[start:start + size]) for start in range(0, len(words), size)]
+
+
+def _collect_sources(org_id):
+    """Current knowledge of the org: source key -> list of passages ({kind, ref, title, text})."""
+    sources = {}
+    for faq_id, question, answer in AiFaq.objects.filter(organization_id=org_id).values_list("id", "question", "answer"):
+        sources[f"faq:{faq_id}"] = [{"kind": "faq", "ref": faq_id, "title": question.strip(), "text": answer.strip()}]
+    text_items = (
+        AiMediaLibraryItem.objects
+        .filter(organization_id=org_id)
+        .exclude(text_content="")
+        .values_list("id", "name", "text_content")
+    )
+    for item_id, name, content in text_items:
+        sources[f"text:{item_id}"] = [
+            {"kind": "text", "ref": item_id, "title": name, "text": chunk}
+            for chunk in _chunk_words(content)
+        ]
+    website_job = (
+        AiWebsiteImportJob.objects
+        .filter(organization_id=org_id, status=AiWebsiteImportJob.STATUS_COMPLETED, item__isnull=False)
+        .order_by("-created_at", "-id")
+        .values("item_id", "pages")
+        .first()
+    )
+    for page in (website_job or {}).get("pages") or []:
+        text = " ".join(entry_text for _, entry_text in page.get("entries") or [])
+        sources[f"page:{website_job['item_id']}:{page.get('url')}"] = [
+            {"kind": "website", "ref": page.get("url"), "title": page.get("title") or "", "text": chunk}
+            for chunk in _chunk_words(text)
+        ]
+    return sources
+
+
+def _source_hash(passages):
+    digest = hashlib.sha1()
+    for passage in passages:
+        digest.update(f"{passage['title']}\x1f{passage['text']}\x1e".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _load_rows(record):
+    if not record.postings:
+        empty = np.zeros(0, dtype=np.int32)
+        return np.zeros(1, dtype=np.int64), empty, empty
+    with np.load(io.BytesIO(bytes(record.postings))) as arrays:
+        return arrays["row_ptr"], arrays["cols"], arrays["tfs"]
+
+
+def _dump_rows(row_ptr, cols, tfs):
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, row_ptr=row_ptr, cols=cols, tfs=tfs)
+    return buffer.getvalue()
+
+
+def refresh_knowledge_index(org_id):
+    """Bring the persisted index in line with the org's knowledge, re-tokenizing only changed sources."""
+    record, _ = AiKnowledgeIndex.objects.get_or_create(organization_id=org_id)
+    sources = _collect_sources(org_id)
+    hashes = {key: _source_hash(passages) for key, passages in sources.items()}
+    if hashes == (record.sources or {}) and record.version:
+        return record
+
+    unchanged = {key for key, digest in hashes.items() if (record.sources or {}).get(key) == digest}
+    row_ptr, cols, tfs = _load_rows(record)
+    old_passages = record.passages or []
+    keep_rows = np.array([passage["source"] in unchanged for passage in old_passages], dtype=bool)
+    row_lengths = np.diff(row_ptr)
+    keep_cells = np.repeat(keep_rows, row_lengths)
+    passages = [passage for passage, keep in zip(old_passages, keep_rows) if keep]
+    lengths = [row_lengths[keep_rows]]
+    new_cols = [cols[keep_cells]]
+    new_tfs = [tfs[keep_cells]]
+
+    vocabulary = list(record.vocabulary or [])
+    term_ids = {term: index for index, term in enumerate(vocabulary)}
+    for key in sorted(set(sources) - unchanged):
+        for passage in sources[key]:
+            counts = Counter(tokenize(f"{passage['title']} {passage['text']}"))
+            if not counts:
+                continue
+            row_cols = []
+            for term in counts:
+                if term not in term_ids:
+                    term_ids[term] = len(vocabulary)
+                    vocabulary.append(term)
+                row_cols.append(term_ids[term])
+            passages.append({"source": key, **passage})
+            lengths.append(np.array([len(counts)], dtype=np.int64))
+            new_cols.append(np.array(row_cols, dtype=np.int32))
+            new_tfs.append(np.fromiter(counts.values(), dtype=np.int32, count=len(counts)))
+
+    cols = np.concatenate(new_cols).astype(np.int32)
+    tfs = np.concatenate(new_tfs).astype(np.int32)
+    row_ptr = np.concatenate([[0], np.cumsum(np.concatenate(lengths))]).astype(np.int64)
+    # Drop terms no passage uses any more.
+    used_terms, cols = np.unique(cols, return_inverse=True)
+    record.vocabulary = [vocabulary[index] for index in used_terms]
+    record.passages = passages
+    record.sources = hashes
+    record.postings = _dump_rows(row_ptr, cols.astype(np.int32), tfs)
+    record.version = uuid.uuid4().hex
+    record.save()
+    return record
+
+
+class KnowledgeIndex:
+    def __init__(self, vocabulary, passages, row_ptr, cols, tfs):
+        self.terms = {term: index for index, term in enumerate(vocabulary)}
+        self.passages = passages
+        count = len(passages)
+        rows = np.repeat(np.arange(count, dtype=np.int32), np.diff(row_ptr))
+        self.doc_lengths = np.bincount(rows, weights=tfs, minlength=count).astype(np.float32)
+        self.avg_length = float(self.doc_lengths.mean()) if count else 1.0
+        order = np.argsort(cols, kind="stable")
+        self.posting_docs = rows[order]
+        self.posting_tfs = tfs[order].astype(np.float32)
+        self.term_ptr = np.concatenate([[0], np.cumsum(np.bincount(cols, minlength=len(vocabulary)))])
+        doc_freq = np.diff(self.term_ptr).astype(np.float32)
+        self.idf = np.log1p((count - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    @classmethod
+    def from_record(cls, record):
+        row_ptr, cols, tfs = _load_rows(record)
+        return cls(record.vocabulary or [], record.passages or [], row_ptr, cols, tfs)
+
+    def search(self, query, k=None):
+        """Top `k` passages for `query` by BM25, best first, each with a "score"."""
+        k = k or _top_k()
+        term_ids = {self.terms[term] for term in tokenize(query) if term in self.terms}
+        if not term_ids or not self.passages:
+            return []
+        scores = np.zeros(len(self.passages), dtype=np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths / (self.avg_length or 1.0))
+        for term_id in term_ids:
+            start, end = self.term_ptr[term_id], self.term_ptr[term_id + 1]
+            docs = self.posting_docs[start:end]
+            tf = self.posting_tfs[start:end]
+            scores[docs] += self.idf[term_id] * tf * (BM25_K1 + 1) / (tf + norm[docs])
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [dict(self.passages[index], score=float(scores[index])) for index in top if scores[index] > 0]
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _start_refresh(org_id):
+    from core.tasks import refresh_knowledge_index_task
+
+    broker_url = getattr(settings, "CELERY_BROKER_URL", "") or ""
+    if broker_url.startswith("memory://"):
+        threading.Thread(target=refresh_knowledge_index_task, args=(org_id,), daemon=True).start()
+        return
+    refresh_knowledge_index_task.delay(org_id)
+
+
+def invalidate_knowledge_index(org_id):
+    """Refresh the org's stored index in the background once the current transaction commits."""
+    if org_id:
+        transaction.on_commit(lambda: _start_refresh(org_id))
+
+
+def get_knowledge_index(org):
+    org_id = getattr(org, "id", org)
+    version = AiKnowledgeIndex.objects.filter(organization_id=org_id).values_list("version", flat=True).first()
+    with _indexes_lock:
+        cached = _indexes.get(org_id)
+        if cached and version and cached[0] == version:
+            _indexes.move_to_end(org_id)
+            return cached[1]
+    record = AiKnowledgeIndex.objects.filter(organization_id=org_id).first() if version else None
+    if record is None or not record.version:
+        # Never indexed: there is nothing to serve meanwhile, so build it here once.
+        record = refresh_knowledge_index(org_id)
+    index = KnowledgeIndex.from_record(record)
+    with _indexes_lock:
+        _indexes[org_id] = (record.version, index)
+        _indexes.move_to_end(org_id)
+        while len(_indexes) > _max_cached_orgs():
+            _indexes.popitem(last=False)
+    return index
+
+
+def search_knowledge(org, query, k=None):
+    """Top-k knowledge passages for `query`; what a reply prompt should carry instead of the whole library."""
+    return get_knowledge_index(org).search(query, k=k)
+
+
+def match_faq(org, message):
+    """The FAQ passage `message` asks for (near-identical question terms), or None."""
+    query_terms = set(tokenize(message))
+    if not query_terms:
+        return None
+    for passage in search_knowledge(org, message, k=3):
+        if passage["kind"] != "faq":
+            continue
+        question_terms = set(tokenize(passage["title"]))
+        if not question_terms:
+            continue
+        overlap = len(query_terms & question_terms) / len(query_terms | question_terms)
+        if overlap >= FAQ_MATCH_THRESHOLD:
+            return passage
+    return None
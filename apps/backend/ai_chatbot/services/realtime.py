@@ -0,0 +1,242 @@
+"""
+Realtime fan-out for chatbot widgets and the agent inbox.
+
+Writes publish small JSON events to channels (one per widget visitor, one per
+org inbox). Server-sent event streams subscribe to those channels, so open
+widgets and inbox tabs learn about new messages without polling the database.
+Redis pub/sub carries events between processes when CHAT_REALTIME_REDIS_URL is
+set; otherwise an in-process broker is used (single process only, and tests).
+
+Every publish also bumps an opaque cursor per channel in the cache. Polling
+clients send the cursor they last saw as `since` and get a 304 while it is
+unchanged, without the views touching the database. That shortcut needs a
+cache shared by all workers: with a per-process cache a publish from another
+worker never reaches this worker's cursor, so polls always read the database.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.cache_utils import cache_is_shared
+
+
+logger = logging.getLogger(__name__)
+
+CURSOR_TTL_SECONDS = 24 * 3600
+
+
+def _stream_seconds():
+    return int(getattr(settings, "CHAT_REALTIME_STREAM_SECONDS", 300))
+
+
+def _heartbeat_seconds():
+    return int(getattr(settings, "CHAT_REALTIME_HEARTBEAT_SECONDS", 20))
+
+
+def visitor_channel(widget_key, visitor_id):
+    return f"ai_chatbot:visitor:{widget_key}:{visitor_id}"
+
+
+def inbox_channel(org_id):
+    return f"ai_chatbot:inbox:{org_id}"
+
+
+def _cursor_key(channel):
+    return f"{channel}:cursor"
+
+
+def get_cursor(channel):
+    return cache.get(_cursor_key(channel))
+
+
+def ensure_cursor(channel):
+    """Current cursor for `channel`; read it before loading data so later writes change it."""
+    cursor = cache.get(_cursor_key(channel))
+    if cursor is None:
+        cursor = uuid.uuid4().hex
+        if not cache.add(_cursor_key(channel), cursor, CURSOR_TTL_SECONDS):
+            cursor = cache.get(_cursor_key(channel)) or cursor
+    return cursor
+
+
+def cursor_unchanged(cursor, since):
+    """True when a poll that last saw `since` can be answered with a 304."""
+    return bool(since) and since == cursor and cache_is_shared()
+
+
+class _InMemorySubscription:
+    def __init__(self, broker, channels):
+        self.broker = broker
+        self.channels = list(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    def deliver(self, channel, payload):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, (channel, payload))
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InMemoryBroker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = {}
+
+    def publish(self, channel, payload):
+        with self.lock:
+            targets = list(self.subscribers.get(channel, ()))
+        for subscription in targets:
+            try:
+                subscription.deliver(channel, payload)
+            except RuntimeError:
+                # Subscriber's event loop is gone; it will be dropped on close.
+                pass
+
+    async def subscribe(self, channels):
+        subscription = _InMemorySubscription(self, channels)
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                listeners = self.subscribers.get(channel)
+                if listeners:
+                    listeners.discard(subscription)
+                    if not listeners:
+                        self.subscribers.pop(channel, None)
+
+
+class _RedisSubscription:
+    def __init__(self, client, pubsub):
+        self.client = client
+        self.pubsub = pubsub
+
+    async def get(self, timeout):
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if not message:
+            return None
+        channel = message["channel"]
+        if isinstance(channel, bytes):
+            channel = channel.decode("utf-8")
+        return channel, message["data"]
+
+    async def close(self):
+        try:
+            await self.pubsub.close()
+        finally:
+            await self.client.close()
+
+
+class RedisBroker:
+    def __init__(self, url):
+        import redis
+
+        self.url = url
+        self.client = redis.Redis.from_url(url)
+
+    def publish(self, channel, payload):
+        self.client.publish(channel, payload)
+
+    async def subscribe(self, channels):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(*channels)
+        return _RedisSubscription(client, pubsub)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                url = str(getattr(settings, "CHAT_REALTIME_REDIS_URL", "") or "").strip()
+                broker = None
+                if url:
+                    try:
+                        broker = RedisBroker(url)
+                    except Exception:
+                        logger.warning("Chat realtime Redis unavailable; falling back to in-process broker")
+                _broker = broker or InMemoryBroker()
+    return _broker
+
+
+def _publish_now(channels, event):
+    payload = json.dumps(event, default=str)
+    broker = get_broker()
+    for channel in channels:
+        cache.set(_cursor_key(channel), uuid.uuid4().hex, CURSOR_TTL_SECONDS)
+        try:
+            broker.publish(channel, payload)
+        except Exception:
+            logger.exception("Chat realtime publish failed channel=%s", channel)
+
+
+def publish_chat_event(channels, event):
+    """Publish once the surrounding transaction commits, so subscribers never see rolled-back rows."""
+    channels = [channel for channel in channels if channel]
+    if channels:
+        transaction.on_commit(lambda: _publish_now(channels, event))
+
+
+def _sse_frame(event_name, payload):
+    lines = [f"event: {event_name}"]
+    lines.extend(f"data: {line}" for line in str(payload).splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
+
+
+async def stream_events(channels, accept=None):
+    """
+    Async SSE body: relays events from `channels` until the stream lifetime ends;
+    the browser's EventSource reconnects on its own. `accept(event)` may drop
+    events or return a redacted copy.
+    """
+    subscription = await get_broker().subscribe(channels)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + _stream_seconds()
+    try:
+        yield f"retry: 3000\n{_sse_frame('ready', json.dumps({'channels': len(channels)}))}"
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            item = await subscription.get(min(_heartbeat_seconds(), remaining))
+            if item is None:
+                yield ": keep-alive\n\n"
+                continue
+            _channel, payload = item
+            if isinstance(payload, bytes):
+                payload = payload.decode("utf-8")
+            try:
+                event = json.loads(payload)
+            except ValueError:
+                continue
+            if accept is not None:
+                event = accept(event)
+                if event is None:
+                    continue
+            yield _sse_frame(event.get("type") or "message", json.dumps(event))
+    finally:
+        await subscription.close()
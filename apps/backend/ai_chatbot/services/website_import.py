@@ -0,0 +1,580 @@
+"""
+Crawling and content extraction for chatbot website imports.
+
+`WebsiteCrawler` fetches pages of one site over a shared keep-alive session with
+a bounded worker pool. It only follows the site's own host (and its www/sub
+domains), obeys robots.txt, limits how many requests run against a host at once
+and sends ETag / Last-Modified validators so unchanged pages come back as 304.
+
+`extract_page` tokenizes a document once and feeds every collector the import
+needs (title and meta tags, main/article text, text density, body text, menu
+links and the plain-text fallback) from that single pass.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+
+USER_AGENT = "WorkZillaBot/1.0 (+https://workzilla.local)"
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+MAX_PAGE_BYTES = 3 * 1024 * 1024
+MAX_CRAWL_DELAY_SECONDS = 5.0
+EXCLUDED_CONTENT_TAGS = {"header", "footer", "nav", "script", "style", "aside", "form"}
+
+
+def _concurrency():
+    return max(1, int(getattr(settings, "AI_CHATBOT_WEBSITE_IMPORT_CONCURRENCY", 8)))
+
+
+def _per_host_limit():
+    return max(1, int(getattr(settings, "AI_CHATBOT_WEBSITE_IMPORT_PER_HOST", 4)))
+
+
+def _host_delay_seconds():
+    return max(0.0, float(getattr(settings, "AI_CHATBOT_WEBSITE_IMPORT_HOST_DELAY_MS", 100)) / 1000.0)
+
+
+def _timeout_seconds():
+    return float(getattr(settings, "AI_CHATBOT_WEBSITE_IMPORT_TIMEOUT_SECONDS", 12))
+
+
+def is_same_domain(base_netloc, candidate_netloc):
+    if not base_netloc or not candidate_netloc:
+        return False
+    base = base_netloc.lower()
+    cand = candidate_netloc.lower()
+    if cand == base:
+        return True
+    if cand == f"www.{base}":
+        return True
+    if base == f"www.{cand}":
+        return True
+    return cand.endswith(f".{base}")
+
+
+class WebsiteFetchError(Exception):
+    """
+    Fetch failure with a machine reason: http_error (see status_code),
+    unreachable, unsupported_content_type, robots_disallowed or off_site.
+    """
+
+    def __init__(self, reason, status_code=0):
+        super().__init__(reason if not status_code else f"{reason}:{status_code}")
+        self.reason = reason
+        self.status_code = status_code
+
+
+class _HostGate:
+    """Caps concurrent requests per host and spaces their start times."""
+
+    def __init__(self, limit, interval):
+        self.semaphore = threading.BoundedSemaphore(limit)
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.next_start = 0.0
+
+    @contextmanager
+    def slot(self):
+        with self.semaphore:
+            with self.lock:
+                now = time.monotonic()
+                wait = self.next_start - now
+                self.next_start = max(now, self.next_start) + self.interval
+            if wait > 0:
+                time.sleep(wait)
+            yield
+
+
+class WebsiteCrawler:
+    def __init__(self, start_url, *, concurrency=None, per_host=None, host_delay=None, timeout=None):
+        self.origin_netloc = urlparse(start_url).netloc
+        self.concurrency = concurrency or _concurrency()
+        self.per_host = per_host or _per_host_limit()
+        self.host_delay = _host_delay_seconds() if host_delay is None else host_delay
+        self.timeout = timeout or _timeout_seconds()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.concurrency, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "User-Agent": USER_AGENT,
+            "Accept": "text/html,application/xhtml+xml",
+        })
+        self._lock = threading.Lock()
+        self._robots = {}
+        self._gates = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def _robots_for(self, parsed):
+        root = f"{parsed.scheme}://{parsed.netloc}"
+        with self._lock:
+            if root not in self._robots:
+                self._robots[root] = self._load_robots(root)
+            return self._robots[root]
+
+    def _load_robots(self, root):
+        try:
+            response = self.session.get(f"{root}/robots.txt", timeout=self.timeout)
+        except requests.RequestException:
+            return None
+        with response:
+            # Missing or broken robots.txt means no restrictions.
+            if response.status_code != 200:
+                return None
+            parser = RobotFileParser()
+            parser.parse(response.text.splitlines())
+        parser.modified()
+        return parser
+
+    def _gate(self, netloc, robots):
+        with self._lock:
+            gate = self._gates.get(netloc)
+            if gate is None:
+                interval = self.host_delay
+                crawl_delay = robots.crawl_delay(USER_AGENT) if robots else None
+                if crawl_delay:
+                    interval = max(interval, min(float(crawl_delay), MAX_CRAWL_DELAY_SECONDS))
+                gate = _HostGate(self.per_host, interval)
+                self._gates[netloc] = gate
+            return gate
+
+    def fetch(self, url, validators=None):
+        """
+        Fetch one page. Returns {"url", "html", "etag", "last_modified",
+        "not_modified"}; raises WebsiteFetchError.
+        """
+        parsed = urlparse(url)
+        if not is_same_domain(self.origin_netloc, parsed.netloc):
+            raise WebsiteFetchError("off_site")
+        robots = self._robots_for(parsed)
+        if robots is not None and not robots.can_fetch(USER_AGENT, url):
+            raise WebsiteFetchError("robots_disallowed")
+        headers = {}
+        if validators:
+            if validators.get("etag"):
+                headers["If-None-Match"] = validators["etag"]
+            if validators.get("last_modified"):
+                headers["If-Modified-Since"] = validators["last_modified"]
+        with self._gate(parsed.netloc, robots).slot():
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+            except requests.RequestException as exc:
+                raise WebsiteFetchError("unreachable") from exc
+            with response:
+                result = {
+                    "url": url,
+                    "html": "",
+                    "etag": response.headers.get("ETag", ""),
+                    "last_modified": response.headers.get("Last-Modified", ""),
+                    "not_modified": False,
+                }
+                if response.status_code == 304 and headers:
+                    result["etag"] = result["etag"] or validators.get("etag", "")
+                    result["last_modified"] = result["last_modified"] or validators.get("last_modified", "")
+                    result["not_modified"] = True
+                    return result
+                if response.status_code >= 400:
+                    raise WebsiteFetchError("http_error", response.status_code)
+                if not is_same_domain(self.origin_netloc, urlparse(response.url).netloc):
+                    raise WebsiteFetchError("off_site")
+                content_type = response.headers.get("Content-Type", "")
+                if not any(kind in content_type for kind in HTML_CONTENT_TYPES):
+                    raise WebsiteFetchError("unsupported_content_type")
+                try:
+                    raw = _read_limited(response, MAX_PAGE_BYTES)
+                except requests.RequestException as exc:
+                    raise WebsiteFetchError("unreachable") from exc
+        encoding = response.encoding if "charset=" in content_type.lower() else "utf-8"
+        try:
+            result["html"] = raw.decode(encoding or "utf-8", errors="replace")
+        except LookupError:
+            result["html"] = raw.decode("utf-8", errors="replace")
+        return result
+
+    def fetch_many(self, urls, validators=None):
+        """
+        Fetch `urls` concurrently. Returns one (url, result, error) tuple per
+        url, in input order; exactly one of result/error is set.
+        """
+        validators = validators or {}
+        urls = list(urls)
+        if not urls:
+            return []
+
+        def run(url):
+            try:
+                return url, self.fetch(url, validators.get(url)), None
+            except WebsiteFetchError as exc:
+                return url, None, exc
+
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(urls))) as pool:
+            return list(pool.map(run, urls))
+
+
+def _read_limited(response, limit):
+    chunks = []
+    size = 0
+    for chunk in response.iter_content(chunk_size=64 * 1024):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= limit:
+            break
+    return b"".join(chunks)[:limit]
+
+
+class _TagTextCollector:
+    BLOCK_TAGS = {"p", "div", "section", "article", "li"}
+    HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+
+    def __init__(self, include_tags=None, exclude_tags=None):
+        self.include_tags = set(include_tags or [])
+        self.exclude_tags = set(exclude_tags or [])
+        self.title = ""
+        self._current_tag = ""
+        self._ignore_depth = 0
+        self._include_depth = 0
+        self._text_chunks = []
+        self._entries = []
+
+    def start(self, tag, attrs):
+        if tag == "title":
+            self._current_tag = "title"
+            return
+        if tag in self.exclude_tags:
+            self._ignore_depth += 1
+            return
+        if self._ignore_depth:
+            return
+        if self.include_tags:
+            if tag in self.include_tags:
+                self._include_depth += 1
+            if self._include_depth == 0:
+                return
+        if tag in self.BLOCK_TAGS or tag in self.HEADING_TAGS:
+            self._flush_text()
+            self._current_tag = tag
+
+    def end(self, tag):
+        if tag == "title":
+            self._current_tag = ""
+            return
+        if tag in self.exclude_tags and self._ignore_depth:
+            self._ignore_depth -= 1
+            return
+        if self._ignore_depth:
+            return
+        if self.include_tags and tag in self.include_tags and self._include_depth:
+            self._include_depth -= 1
+        if tag in self.BLOCK_TAGS or tag in self.HEADING_TAGS:
+            self._flush_text()
+            self._current_tag = ""
+
+    def data(self, data):
+        if self._ignore_depth:
+            return
+        if self.include_tags and self._include_depth == 0:
+            return
+        text = (data or "").strip()
+        if not text:
+            return
+        if self._current_tag == "title" and not self.title:
+            self.title = text
+            return
+        self._text_chunks.append(text)
+
+    def _flush_text(self):
+        if not self._text_chunks:
+            return
+        text = " ".join(self._text_chunks).strip()
+        self._text_chunks = []
+        if not text:
+            return
+        self._entries.append((self._current_tag or "p", text))
+
+    def extract(self):
+        self._flush_text()
+        return self.title, self._entries
+
+
+class _DensityCollector:
+    CONTAINER_TAGS = {"div", "section", "article", "main"}
+
+    def __init__(self):
+        self._ignore_depth = 0
+        self._containers = {}
+        self._stack = []
+        self._link_depth = 0
+        self._counter = 0
+
+    def start(self, tag, attrs):
+        if tag in EXCLUDED_CONTENT_TAGS:
+            self._ignore_depth += 1
+            return
+        if self._ignore_depth:
+            return
+        if tag in self.CONTAINER_TAGS:
+            self._counter += 1
+            container_id = self._counter
+            self._containers[container_id] = {"text_len": 0, "link_text_len": 0, "chunks": []}
+            self._stack.append(container_id)
+        if tag == "a":
+            self._link_depth += 1
+
+    def end(self, tag):
+        if tag in EXCLUDED_CONTENT_TAGS and self._ignore_depth:
+            self._ignore_depth -= 1
+            return
+        if self._ignore_depth:
+            return
+        if tag in self.CONTAINER_TAGS and self._stack:
+            self._stack.pop()
+        if tag == "a" and self._link_depth:
+            self._link_depth -= 1
+
+    def data(self, data):
+        if self._ignore_depth:
+            return
+        text = (data or "").strip()
+        if not text or not self._stack:
+            return
+        text_len = len(text)
+        for container_id in self._stack:
+            container = self._containers[container_id]
+            container["text_len"] += text_len
+            container["chunks"].append(text)
+            if self._link_depth:
+                container["link_text_len"] += text_len
+
+    def best_text(self):
+        best_score = 0
+        best_text = ""
+        for container in self._containers.values():
+            text_len = container["text_len"]
+            if text_len <= 0:
+                continue
+            score = text_len - (container["link_text_len"] * 0.7)
+            if score > best_score:
+                best_score = score
+                best_text = " ".join(container["chunks"]).strip()
+        return best_text
+
+
+class _MetaCollector:
+    def __init__(self):
+        self.title = ""
+        self._in_title = False
+        self.meta = {}
+
+    def start(self, tag, attrs):
+        if tag == "title":
+            self._in_title = True
+            return
+        if tag != "meta":
+            return
+        attrs_dict = {key.lower(): value for key, value in attrs if key and value}
+        name = (attrs_dict.get("name") or attrs_dict.get("property") or "").lower()
+        content = attrs_dict.get("content") or ""
+        if name and content:
+            self.meta[name] = content.strip()
+
+    def end(self, tag):
+        if tag == "title":
+            self._in_title = False
+
+    def data(self, data):
+        if self._in_title and not self.title:
+            text = (data or "").strip()
+            if text:
+                self.title = text
+
+
+class _MenuLinkCollector:
+    def __init__(self):
+        self.links = []
+        self._include_depth = 0
+        self._tag_stack = []
+        self._current_href = ""
+        self._current_text = []
+
+    def start(self, tag, attrs):
+        attrs_dict = {key.lower(): value for key, value in attrs if key}
+        class_hint = (attrs_dict.get("class") or "").lower()
+        id_hint = (attrs_dict.get("id") or "").lower()
+        if tag in {"nav", "header"} or "menu" in class_hint or "nav" in class_hint or "menu" in id_hint or "nav" in id_hint:
+            self._include_depth += 1
+        self._tag_stack.append(tag)
+        if tag == "a" and self._include_depth:
+            self._current_href = attrs_dict.get("href") or ""
+            self._current_text = []
+
+    def end(self, tag):
+        if tag == "a" and self._include_depth and self._current_href:
+            text = " ".join(self._current_text).strip()
+            self.links.append({"href": self._current_href, "text": text})
+            self._current_href = ""
+            self._current_text = []
+        if self._tag_stack:
+            self._tag_stack.pop()
+        if tag in {"nav", "header"} or (self._include_depth and not self._tag_stack):
+            self._include_depth = max(0, self._include_depth - 1)
+
+    def data(self, data):
+        if self._current_href:
+            text = (data or "").strip()
+            if text:
+                self._current_text.append(text)
+
+
+class _FallbackCollector:
+    IGNORE_TAGS = {"script", "style", "noscript"}
+
+    def __init__(self):
+        self._ignore_depth = 0
+        self._chunks = []
+
+    def start(self, tag, attrs):
+        if tag in self.IGNORE_TAGS:
+            self._ignore_depth += 1
+
+    def end(self, tag):
+        if self._ignore_depth and tag in self.IGNORE_TAGS:
+            self._ignore_depth -= 1
+
+    def data(self, data):
+        if self._ignore_depth:
+            return
+        text = (data or "").strip()
+        if text:
+            self._chunks.append(text)
+
+    def text(self):
+        return " ".join(self._chunks).strip()
+
+
+class _SinglePassParser(HTMLParser):
+    def __init__(self, collectors):
+        super().__init__()
+        self.collectors = collectors
+
+    def handle_starttag(self, tag, attrs):
+        for collector in self.collectors:
+            collector.start(tag, attrs)
+
+    def handle_endtag(self, tag):
+        for collector in self.collectors:
+            collector.end(tag)
+
+    def handle_data(self, data):
+        for collector in self.collectors:
+            collector.data(data)
+
+
+def count_words(entries):
+    return sum(len(text.split()) for _, text in entries if text)
+
+
+def extract_page(html):
+    """
+    Parse `html` once. Returns a dict with the best readable "title",
+    "entries" ([(tag, text)]) and "word_count", plus "meta_title", "meta",
+    "menu_links" and "fallback_text".
+    """
+    meta = _MetaCollector()
+    main_text = _TagTextCollector(include_tags={"main", "article", "section"}, exclude_tags=EXCLUDED_CONTENT_TAGS)
+    density = _DensityCollector()
+    body_text = _TagTextCollector(include_tags={"body"}, exclude_tags=EXCLUDED_CONTENT_TAGS)
+    menu = _MenuLinkCollector()
+    fallback = _FallbackCollector()
+    _SinglePassParser([meta, main_text, density, body_text, menu, fallback]).feed(html or "")
+
+    best_entries = []
+    best_title = meta.title
+    best_words = 0
+
+    title, entries = main_text.extract()
+    words = count_words(entries)
+    if words > best_words:
+        best_entries, best_words, best_title = entries, words, title or best_title
+
+    dense_text = density.best_text()
+    if dense_text:
+        entries = [("p", dense_text)]
+        words = count_words(entries)
+        if words > best_words:
+            best_entries, best_words = entries, words
+
+    title, entries = body_text.extract()
+    words = count_words(entries)
+    if words > best_words:
+        best_entries, best_words, best_title = entries, words, title or best_title
+
+    return {
+        "title": best_title,
+        "entries": best_entries,
+        "word_count": best_words,
+        "meta_title": meta.title,
+        "meta": meta.meta,
+        "menu_links": menu.links,
+        "fallback_text": fallback.text(),
+    }
+
+
+def limit_entries_by_words(entries, max_words=1800):
+    words_used = 0
+    limited = []
+    for tag, text in entries:
+        if not text:
+            continue
+        words = text.split()
+        if not words:
+            continue
+        if words_used >= max_words:
+            break
+        remaining = max_words - words_used
+        if len(words) > remaining:
+            limited.append((tag, " ".join(words[:remaining])))
+            break
+        limited.append((tag, text))
+        words_used += len(words)
+    return limited
+
+
+def page_content(extracted, max_words=1800):
+    """Importable (title, entries, word_count) for a page, falling back to plain text and meta description."""
+    title = extracted["title"]
+    entries = extracted["entries"]
+    word_count = extracted["word_count"]
+    if not entries and extracted["fallback_text"]:
+        entries = [("p", extracted["fallback_text"])]
+        word_count = count_words(entries)
+    if not entries or word_count < 40:
+        meta = extracted["meta"]
+        description = (
+            meta.get("description")
+            or meta.get("og:description")
+            or meta.get("twitter:description")
+            or ""
+        ).strip()
+        if extracted["meta_title"] and not title:
+            title = extracted["meta_title"]
+        if description:
+            entries = entries + [("p", description)]
+    limited = limit_entries_by_words(entries, max_words=max_words)
+    return title, limited, count_words(limited)
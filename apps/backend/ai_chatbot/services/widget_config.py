@@ -0,0 +1,178 @@
+"""
+Public widget bootstrap config served from a snapshot.
+
+The first request for a widget key builds its config payload, ETag and compiled
+allowed-domain set, and keeps them in the cache. The snapshot is stamped with
+the org's widget version, and "unknown key" answers with the global key
+version. Widget and organization settings saves bump those versions. A warm
+request, including a 304, touches only the cache.
+
+The version bumps only reach every worker through a shared cache. With the
+per-process fallback a snapshot lives for AI_CHATBOT_WIDGET_CONFIG_LOCAL_CACHE_SECONDS
+(30 seconds by default), so a deactivated widget or a narrowed allow-list takes
+effect in the other workers within that time.
+"""
+
+import hashlib
+import json
+import uuid
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import quote_etag
+
+from core.cache_utils import cache_is_shared
+from core.models import ChatWidget, OrganizationSettings
+
+
+VERSION_TTL_SECONDS = 7 * 24 * 3600
+KEYS_VERSION_KEY = "ai_chatbot:widget_config:keys_version"
+# Referers from our own hosted chat page are always allowed.
+HOSTED_CHAT_PATH_PREFIX = "/ai-chatbox/"
+
+
+def _snapshot_ttl_seconds():
+    if not cache_is_shared():
+        return int(getattr(settings, "AI_CHATBOT_WIDGET_CONFIG_LOCAL_CACHE_SECONDS", 30))
+    return int(getattr(settings, "AI_CHATBOT_WIDGET_CONFIG_CACHE_SECONDS", 3600))
+
+
+def widget_config_cache_control():
+    max_age = int(getattr(settings, "AI_CHATBOT_WIDGET_CONFIG_MAX_AGE", 300))
+    stale = int(getattr(settings, "AI_CHATBOT_WIDGET_CONFIG_STALE_SECONDS", 3600))
+    # Private: whether the config is served depends on the embedding page's origin.
+    return f"private, max-age={max_age}, stale-while-revalidate={stale}"
+
+
+def _current_version(key):
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(key, version, VERSION_TTL_SECONDS):
+            version = cache.get(key) or version
+    return version
+
+
+def _org_version_key(org_id):
+    return f"ai_chatbot:widget_config:version:{org_id}"
+
+
+def _snapshot_key(widget_key):
+    digest = hashlib.sha1(widget_key.encode("utf-8")).hexdigest()
+    return f"ai_chatbot:widget_config:{digest}"
+
+
+def invalidate_widget_configs(org_id, keys_changed=False):
+    """Drop every cached widget config of the org; `keys_changed` also expires cached "not found" answers."""
+    if org_id:
+        cache.set(_org_version_key(org_id), uuid.uuid4().hex, VERSION_TTL_SECONDS)
+    if keys_changed:
+        cache.set(KEYS_VERSION_KEY, uuid.uuid4().hex, VERSION_TTL_SECONDS)
+
+
+def split_allowed_domains(raw_value):
+    if not raw_value:
+        return []
+    if isinstance(raw_value, (list, tuple)):
+        items = [str(item).strip() for item in raw_value if str(item).strip()]
+    else:
+        cleaned = raw_value.replace(",", "\n")
+        items = [item.strip() for item in cleaned.splitlines() if item.strip()]
+    normalized = []
+    for item in items:
+        value = item.lower()
+        if "://" in value:
+            try:
+                parsed = urlparse(value)
+                if parsed.hostname:
+                    value = parsed.hostname.lower()
+            except ValueError:
+                pass
+        normalized.append(value)
+    return normalized
+
+
+def _request_host(request):
+    for value in (request.META.get("HTTP_ORIGIN", ""), request.META.get("HTTP_REFERER", "")):
+        if not value:
+            continue
+        try:
+            parsed = urlparse(value)
+        except ValueError:
+            continue
+        if parsed.hostname:
+            return parsed.hostname.lower()
+    return ""
+
+
+def is_origin_allowed(snapshot, request):
+    """Match the request against the snapshot's compiled domain set: one set lookup per host label."""
+    allowed = snapshot["allowed_hosts"]
+    if not allowed:
+        return True
+    referer = request.META.get("HTTP_REFERER", "")
+    if referer:
+        try:
+            if urlparse(referer).path.startswith(HOSTED_CHAT_PATH_PREFIX):
+                return True
+        except ValueError:
+            pass
+    host = _request_host(request)
+    if not host:
+        return False
+    labels = host.split(".")
+    # "a.b.example.com" matches an entry for itself or any parent domain.
+    return any(".".join(labels[index:]) in allowed for index in range(len(labels)))
+
+
+def _build_snapshot(widget_key):
+    widget = ChatWidget.objects.filter(widget_key=widget_key, is_active=True).first()
+    if not widget:
+        return None
+    attachments_enabled = (
+        OrganizationSettings.objects
+        .filter(organization_id=widget.organization_id)
+        .values_list("ai_chatbot_user_attachments_enabled", flat=True)
+        .first()
+    )
+    allowed_domains = split_allowed_domains(widget.allowed_domains)
+    payload = {
+        "id": widget.id,
+        "name": widget.name,
+        "widget_key": widget.widget_key,
+        "theme": {
+            "preset": widget.theme_preset,
+            "primary": widget.theme_primary,
+            "accent": widget.theme_accent,
+            "background": widget.theme_background,
+        },
+        "allowed_domains": allowed_domains,
+        "is_active": widget.is_active,
+        "allow_visitor_attachments": bool(attachments_enabled),
+    }
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return {
+        "org_id": widget.organization_id,
+        "public_chat_code": widget.public_chat_code,
+        "allowed_hosts": frozenset(allowed_domains),
+        "payload": payload,
+        "etag": quote_etag(hashlib.sha1(body.encode("utf-8")).hexdigest()),
+    }
+
+
+def get_widget_config_snapshot(widget_key):
+    """Config snapshot for an active widget key, or None; rebuilt after a version bump or when it expires."""
+    cache_key = _snapshot_key(widget_key)
+    entry = cache.get(cache_key)
+    if entry is not None:
+        snapshot = entry["snapshot"]
+        version_key = _org_version_key(snapshot["org_id"]) if snapshot else KEYS_VERSION_KEY
+        if entry["version"] == _current_version(version_key):
+            return snapshot
+    # Read before the lookup so a widget created meanwhile is not hidden behind a "not found" entry.
+    keys_version = _current_version(KEYS_VERSION_KEY)
+    snapshot = _build_snapshot(widget_key)
+    version = _current_version(_org_version_key(snapshot["org_id"])) if snapshot else keys_version
+    cache.set(cache_key, {"version": version, "snapshot": snapshot}, _snapshot_ttl_seconds())
+    return snapshot
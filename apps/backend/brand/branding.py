@@ -1,60 +1,128 @@
 import hashlib
 import json
+import threading
+import time
+import uuid
 
-from django.db import connection
-from django.db.models import Q
+from django.core.cache import cache
 
+from core.cache_utils import local_snapshot_max_age
 from core.models import ThemeSettings
 
-from .models import Product, ProductAlias, ProductRouteMapping
+from .models import Product, ProductAlias, ProductRouteMapping, SiteBrandSettings
 
 
 DEFAULT_ALIAS_KEYS = {
     "ui": ["monitorLabel"],
 }
 
+SNAPSHOT_VERSION_KEY = "brand:snapshot:version"
+VERSION_TTL_SECONDS = 7 * 24 * 3600
+
 
 def _normalize_slug(value):
     return str(value or "").strip("/").strip()
 
 
-def _build_aliases(product):
+class BrandingSnapshot:
+    """
+    Site brand, theme, products, aliases and route mappings loaded in one pass and
+    shared per process. Without a shared cache it is rebuilt after
+    BRANDING_SNAPSHOT_LOCAL_SECONDS, since edits saved in another worker never bump
+    this worker's version.
+    """
+
+    def __init__(self, version):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.site = SiteBrandSettings.get_active()
+        self.theme = ThemeSettings.get_active()
+        # Model orderings are kept so lookups pick the same row `.first()` did.
+        self.products = list(Product.objects.all())
+        self.routes = list(ProductRouteMapping.objects.select_related("product"))
+        self.routes_by_slug = {route.public_slug: route for route in self.routes}
+        self.aliases = {}
+        for alias in ProductAlias.objects.filter(is_active=True):
+            self.aliases.setdefault(alias.product_id, []).append(alias)
+        active = sorted((product for product in self.products if product.is_active), key=lambda row: row.id)
+        self.default_product = active[0] if active else Product.get_default()
+
+    def legacy_route(self, slug, redirect_enabled=None):
+        for route in self.routes:
+            if redirect_enabled is not None and route.redirect_enabled != redirect_enabled:
+                continue
+            if slug in (route.legacy_slugs or []):
+                return route
+        return None
+
+    def active_product(self, slugs):
+        for product in self.products:
+            if product.is_active and (product.key in slugs or product.internal_code_name in slugs):
+                return product
+        return None
+
+    def product_route(self, product):
+        product_id = getattr(product, "id", None)
+        return next((route for route in self.routes if route.product_id == product_id), None)
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def _current_version():
+    version = cache.get(SNAPSHOT_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(SNAPSHOT_VERSION_KEY, version, VERSION_TTL_SECONDS):
+            version = cache.get(SNAPSHOT_VERSION_KEY) or version
+    return version
+
+
+def _is_current(snapshot, version, max_age):
+    if snapshot is None or snapshot.version != version:
+        return False
+    return max_age is None or time.monotonic() - snapshot.built_at < max_age
+
+
+def get_branding_snapshot():
+    global _snapshot
+    version = _current_version()
+    max_age = local_snapshot_max_age("BRANDING_SNAPSHOT_LOCAL_SECONDS")
+    snapshot = _snapshot
+    if _is_current(snapshot, version, max_age):
+        return snapshot
+    with _snapshot_lock:
+        if not _is_current(_snapshot, version, max_age):
+            _snapshot = BrandingSnapshot(version)
+        return _snapshot
+
+
+def invalidate_branding_snapshot():
+    """Bump the version so processes sharing the cache rebuild their snapshot on the next render."""
+    cache.set(SNAPSHOT_VERSION_KEY, uuid.uuid4().hex, VERSION_TTL_SECONDS)
+
+
+def _build_aliases(product, snapshot=None):
     aliases = {"ui": {}, "marketing": {}, "email": {}}
     if not product or not getattr(product, "id", None):
         return aliases
-    for alias in ProductAlias.objects.filter(product=product, is_active=True):
+    snapshot = snapshot or get_branding_snapshot()
+    for alias in snapshot.aliases.get(product.id, ()):
         aliases.setdefault(alias.context, {})[alias.alias_key] = alias.alias_text
     if product.key in ("monitor", "worksuite"):
         aliases["ui"].setdefault("monitorLabel", product.display_name)
     return aliases
 
 
-def resolve_product(product_key):
+def resolve_product(product_key, snapshot=None):
+    snapshot = snapshot or get_branding_snapshot()
     slug = _normalize_slug(product_key)
     route = None
     product = None
 
     if slug:
-        route = (
-            ProductRouteMapping.objects.select_related("product")
-            .filter(public_slug=slug)
-            .first()
-        )
-        if not route:
-            if connection.vendor == "sqlite":
-                for candidate in (
-                    ProductRouteMapping.objects.select_related("product")
-                ):
-                    legacy = candidate.legacy_slugs or []
-                    if slug in legacy:
-                        route = candidate
-                        break
-            else:
-                route = (
-                    ProductRouteMapping.objects.select_related("product")
-                    .filter(legacy_slugs__contains=[slug])
-                    .first()
-                )
+        route = snapshot.routes_by_slug.get(slug) or snapshot.legacy_route(slug)
         if route:
             product = route.product
 
@@ -62,28 +130,19 @@ def resolve_product(product_key):
         lookup_slugs = [slug]
         if slug == "worksuite":
             lookup_slugs.append("monitor")
-        product = (
-            Product.objects.filter(
-                Q(key__in=lookup_slugs) | Q(internal_code_name__in=lookup_slugs)
-            )
-            .filter(is_active=True)
-            .first()
-        )
+        product = snapshot.active_product(lookup_slugs)
 
     if not product:
-        product = Product.get_default()
-        route = (
-            ProductRouteMapping.objects.select_related("product")
-            .filter(product=product)
-            .first()
-        )
+        product = snapshot.default_product
+        route = snapshot.product_route(product)
 
     return product, route
 
 
 def build_branding_payload(product_key, request=None):
-    product, route = resolve_product(product_key)
-    global_theme = ThemeSettings.get_active()
+    snapshot = get_branding_snapshot()
+    product, route = resolve_product(product_key, snapshot=snapshot)
+    global_theme = snapshot.theme
     logo_url = ""
     if product and product.logo:
         logo_url = product.logo.url
@@ -106,7 +165,7 @@ def build_branding_payload(product_key, request=None):
         "themeSecondary": (global_theme.secondary_color or "").strip() or "#f59e0b",
         "publicSlug": public_slug,
         "legacySlugs": legacy_slugs,
-        "aliases": _build_aliases(product),
+        "aliases": _build_aliases(product, snapshot=snapshot),
     }
 
     return payload
@@ -1,9 +1,8 @@
-from .models import SiteBrandSettings
-from .branding import build_branding_payload
+from .branding import build_branding_payload, get_branding_snapshot
 
 
 def brand_defaults(request):
-    brand = SiteBrandSettings.get_active()
+    brand = get_branding_snapshot().site
     og_image_url = ""
     if brand.og_image:
         og_image_url = brand.og_image.url
@@ -0,0 +1,26 @@
+from django.db.models.signals import post_delete, post_save
+
+from core.models import ThemeSettings
+
+from .branding import invalidate_branding_snapshot
+from .models import Product, ProductAlias, ProductRouteMapping, SiteBrandSettings
+
+
+SNAPSHOT_MODELS = (SiteBrandSettings, ThemeSettings, Product, ProductAlias, ProductRouteMapping)
+
+
+def _invalidate_snapshot(sender, **kwargs):
+    invalidate_branding_snapshot()
+
+
+for _model in SNAPSHOT_MODELS:
+    post_save.connect(
+        _invalidate_snapshot,
+        sender=_model,
+        dispatch_uid=f"brand.snapshot.invalidate_on_save.{_model._meta.label_lower}",
+    )
+    post_delete.connect(
+        _invalidate_snapshot,
+        sender=_model,
+        dispatch_uid=f"brand.snapshot.invalidate_on_delete.{_model._meta.label_lower}",
+    )
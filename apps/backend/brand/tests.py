@@ -1,6 +1,7 @@
-from django.test import TestCase
+from django.test import RequestFactory, TestCase
 
-from apps.backend.brand.models import Product, ProductAlias, ProductRouteMapping
+from apps.backend.brand.context_processors import brand_defaults, product_branding
+from apps.backend.brand.models import Product, ProductAlias, ProductRouteMapping, SiteBrandSettings
 
 
 class BrandingApiTests(TestCase):
@@ -66,3 +67,55 @@ class BrandingRedirectTests(TestCase):
         response = self.client.get("/products/monitor-old/")
         self.assertEqual(response.status_code, 301)
         self.assertEqual(response["Location"], "/products/worksuite/")
+
+
+class BrandingSnapshotTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            key="worksuite",
+            internal_code_name="monitor",
+            display_name="Work Suite",
+            is_active=True,
+        )
+        ProductRouteMapping.objects.create(
+            product=self.product,
+            public_slug="work-suite",
+            legacy_slugs=["worksuite-old"],
+        )
+        self.factory = RequestFactory()
+
+    def _render_context(self, path):
+        request = self.factory.get(path)
+        return brand_defaults(request), product_branding(request)
+
+    def test_context_processors_do_no_queries_once_warm(self):
+        self._render_context("/products/work-suite/")
+        with self.assertNumQueries(0):
+            defaults, branding = self._render_context("/products/worksuite-old/")
+        self.assertEqual(defaults["brand_site_name"], "Work Zilla")
+        self.assertEqual(branding["branding"]["display_name"], "Work Suite")
+        self.assertEqual(branding["branding"]["public_slug"], "work-suite")
+
+    def test_model_saves_refresh_the_snapshot(self):
+        self._render_context("/")
+        brand = SiteBrandSettings.get_active()
+        brand.site_name = "Zilla Cloud"
+        brand.save()
+        ProductAlias.objects.create(
+            product=self.product,
+            alias_key="monitorLabel",
+            alias_text="Monitor Pro",
+            context=ProductAlias.CONTEXT_UI,
+        )
+        defaults, branding = self._render_context("/products/work-suite/")
+        self.assertEqual(defaults["brand_site_name"], "Zilla Cloud")
+        self.assertEqual(branding["branding"]["aliases"]["ui"]["monitorLabel"], "Monitor Pro")
+
+    def test_snapshot_expires_without_a_shared_cache(self):
+        self._render_context("/")
+        # Renamed through another worker: the version bump stays in that worker's cache.
+        SiteBrandSettings.objects.filter(id=SiteBrandSettings.get_active().id).update(site_name="Elsewhere")
+        with self.settings(BRANDING_SNAPSHOT_LOCAL_SECONDS=60):
+            self.assertNotEqual(self._render_context("/")[0]["brand_site_name"], "Elsewhere")
+        with self.settings(BRANDING_SNAPSHOT_LOCAL_SECONDS=0):
+            self.assertEqual(self._render_context("/")[0]["brand_site_name"], "Elsewhere")
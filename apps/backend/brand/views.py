@@ -2,13 +2,12 @@ from django.conf import settings
 from django.core.cache import cache
 from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
 
-from .models import SiteBrandSettings
-from .branding import compute_etag
+from .branding import compute_etag, get_branding_snapshot
 from .serializers import serialize_branding
 
 
 def theme_css(request):
-    theme = SiteBrandSettings.get_active()
+    theme = get_branding_snapshot().site
     primary = theme.primary_color or "#1f6f8b"
     secondary = theme.secondary_color or "#0f172a"
     primary_button = theme.primary_button_color or primary
@@ -38,7 +37,7 @@ def theme_css(request):
 
 def public_branding(request):
     product_key = request.GET.get("product", "").strip()
-    cache_key = f"branding:public:{product_key or 'default'}"
+    cache_key = f"branding:public:{get_branding_snapshot().version}:{product_key or 'default'}"
     cached = cache.get(cache_key)
     if cached:
         payload, etag = cached
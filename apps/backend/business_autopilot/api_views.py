@@ -22,7 +22,7 @@ from django.core.files.storage import default_storage
 from django.core.signing import BadSignature, SignatureExpired, TimestampSigner
 from django.views.decorators.http import require_http_methods
 from django.db import DatabaseError, IntegrityError, OperationalError, transaction
-from django.db.models import Q, Min, Max
+from django.db.models import F, Q, Min, Max
 from django.shortcuts import render
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
@@ -47,9 +47,9 @@ from apps.backend.hrm.services.face_recognition_service import (
     FaceRecognitionValidationError,
     compress_uploaded_photo,
     encrypt_embeddings,
-    generate_embedding,
-    verify_employee_face,
+    generate_embeddings,
 )
+from apps.backend.hrm.services.face_index import identify_face, verify_enrolled_face
 from .site_admin_ai import (
     build_site_admin_instruction_context,
     get_site_admin_enabled_modules,
@@ -4100,6 +4100,7 @@ def _serialize_salary_structure(row):
         "professionalTax": _decimal_to_string(row.professional_tax),
         "otherDeduction": _decimal_to_string(row.other_deduction),
         "notes": row.notes or "",
+        "rowVersion": row.row_version,
         "createdAt": row.created_at.isoformat() if row.created_at else "",
         "updatedAt": row.updated_at.isoformat() if row.updated_at else "",
     }
@@ -4121,13 +4122,18 @@ def _serialize_salary_history(row):
         "incrementAmount": _decimal_to_string(row.increment_amount),
         "newSalary": _decimal_to_string(row.new_salary),
         "notes": row.notes or "",
+        "rowVersion": row.row_version,
         "createdAt": row.created_at.isoformat() if row.created_at else "",
         "updatedAt": row.updated_at.isoformat() if row.updated_at else "",
     }
 
 
-def _ensure_standard_salary_template(org: Organization):
-    row, _ = SalaryStructure.objects.get_or_create(
+def _ensure_standard_salary_template(org: Organization, touched=None):
+    """
+    Keep the standard template in place and default unless the org picked
+    another default; ids of the structures written are added to `touched`.
+    """
+    row, created = SalaryStructure.objects.get_or_create(
         organization=org,
         name="Standard Template",
         defaults={
@@ -4140,8 +4146,9 @@ def _ensure_standard_salary_template(org: Organization):
             "apply_esi": True,
         },
     )
+    other_defaults = SalaryStructure.objects.filter(organization=org, is_default=True).exclude(id=row.id)
     updates = []
-    if not row.is_default:
+    if not row.is_default and not other_defaults.exists():
         row.is_default = True
         updates.append("is_default")
     if row.basic_salary_percent != Decimal("40"):
@@ -4157,8 +4164,17 @@ def _ensure_standard_salary_template(org: Organization):
         row.auto_special_allowance = True
         updates.append("auto_special_allowance")
     if updates:
-        row.save(update_fields=updates)
-    SalaryStructure.objects.filter(organization=org).exclude(id=row.id).filter(is_default=True).update(is_default=False)
+        row.row_version += 1
+        row.save(update_fields=[*updates, "row_version", "updated_at"])
+    undefaulted_ids = list(other_defaults.values_list("id", flat=True)) if row.is_default else []
+    if undefaulted_ids:
+        SalaryStructure.objects.filter(id__in=undefaulted_ids).update(
+            is_default=False, row_version=F("row_version") + 1, updated_at=timezone.now()
+        )
+    if touched is not None:
+        touched.update(undefaulted_ids)
+        if created or updates:
+            touched.add(row.id)
     return row
 
 
@@ -4184,6 +4200,7 @@ def _serialize_payroll_entry(row):
         "earnings": row.earnings if isinstance(row.earnings, dict) else {},
         "deductions": row.deductions if isinstance(row.deductions, dict) else {},
         "status": row.status or "processed",
+        "rowVersion": row.row_version,
         "processedAt": row.processed_at.isoformat() if row.processed_at else "",
         "updatedAt": row.updated_at.isoformat() if row.updated_at else "",
         "slipNumber": row.payslip.slip_number if hasattr(row, "payslip") and row.payslip else "",
@@ -4199,6 +4216,7 @@ def _serialize_payslip(row):
         "employeeName": row.employee_name,
         "sourceUserId": row.source_user_id,
         "currency": row.currency or "INR",
+        "rowVersion": row.row_version,
         "generatedAt": row.generated_at.isoformat() if row.generated_at else "",
         "updatedAt": row.updated_at.isoformat() if row.updated_at else "",
     }
@@ -7864,8 +7882,366 @@ def org_department_detail(request, department_id: int):
     )
 
 
-@require_http_methods(["GET", "PUT"])
+PAYROLL_ROW_TYPES = ("salary_structure", "salary_history", "payroll_entry", "payslip")
+PAYROLL_ROW_COLLECTIONS = {
+    "salary_structure": "salary_structures",
+    "salary_history": "salary_history",
+    "payroll_entry": "payroll_entries",
+    "payslip": "payslips",
+}
+PAYROLL_WRITE_BATCH_SIZE = 500
+
+
+class PayrollSyncConflict(Exception):
+    def __init__(self, conflicts):
+        super().__init__("payroll_conflict")
+        self.conflicts = conflicts
+
+
+def _payroll_row_model(row_type):
+    return {
+        "salary_structure": SalaryStructure,
+        "salary_history": EmployeeSalaryHistory,
+        "payroll_entry": PayrollEntry,
+        "payslip": Payslip,
+    }[row_type]
+
+
+def _resolve_payroll_ref(refs, row_type, value):
+    """Real id for a client row id: a temporary id created earlier in the same save, or a numeric id."""
+    return refs[row_type].get(str(value or ""), _coerce_int(value))
+
+
+def _salary_structure_values(item, org, refs):
+    return {
+        "name": str(item.get("name") or "").strip() or f"Structure {timezone.now().strftime('%H%M%S')}",
+        "is_default": _to_bool(item.get("isDefault"), False),
+        "basic_salary_percent": _to_decimal(item.get("basicSalaryPercent") or "40"),
+        "hra_percent": _to_decimal(item.get("hraPercent") or "20"),
+        "conveyance_fixed": _to_decimal(item.get("conveyanceFixed") or item.get("conveyance") or "1600"),
+        "auto_special_allowance": _to_bool(item.get("autoSpecialAllowance"), True),
+        "basic_salary": _to_decimal(item.get("basicSalary")),
+        "hra": _to_decimal(item.get("hra")),
+        "conveyance": _to_decimal(item.get("conveyance")),
+        "special_allowance": _to_decimal(item.get("specialAllowance")),
+        "bonus": _to_decimal(item.get("bonus")),
+        "other_allowances": _to_decimal(item.get("otherAllowances")),
+        "apply_pf": _to_bool(item.get("applyPf"), True),
+        "apply_esi": _to_bool(item.get("applyEsi"), True),
+        "professional_tax": _to_decimal(item.get("professionalTax")),
+        "other_deduction": _to_decimal(item.get("otherDeduction")),
+        "notes": str(item.get("notes") or "").strip(),
+    }
+
+
+def _salary_history_values(item, org, refs):
+    increment_type = str(item.get("incrementType") or "percentage").strip().lower() or "percentage"
+    try:
+        effective_from = parse_date(str(item.get("effectiveFrom") or "").strip()[:10])
+    except ValueError:
+        effective_from = None
+    return {
+        "employee_name": str(item.get("employeeName") or "").strip(),
+        "source_user_id": _coerce_int(item.get("sourceUserId")),
+        "salary_structure_id": _resolve_payroll_ref(refs, "salary_structure", item.get("salaryStructureId")),
+        "current_salary": _to_decimal(item.get("currentSalary") or item.get("monthlySalaryAmount")),
+        "monthly_salary_amount": _to_decimal(item.get("monthlySalaryAmount")),
+        "increment_type": increment_type if increment_type in {"percentage", "fixed"} else "percentage",
+        "increment_value": _to_decimal(item.get("incrementValue")),
+        "effective_from": effective_from or timezone.localdate(),
+        "increment_amount": _to_decimal(item.get("incrementAmount")),
+        "new_salary": _to_decimal(item.get("newSalary") or item.get("monthlySalaryAmount")),
+        "notes": str(item.get("notes") or "").strip(),
+    }
+
+
+def _payroll_entry_values(item, org, refs):
+    return {
+        "employee_name": str(item.get("employeeName") or "").strip(),
+        "source_user_id": _coerce_int(item.get("sourceUserId")),
+        "payroll_month": _normalize_payroll_month(item.get("month")),
+        "currency": str(item.get("currency") or org.currency or "INR").strip().upper()[:10] or "INR",
+        "salary_structure_id": _resolve_payroll_ref(refs, "salary_structure", item.get("salaryStructureId")),
+        "salary_history_id": _resolve_payroll_ref(refs, "salary_history", item.get("salaryHistoryId")),
+        "gross_salary": _to_decimal(item.get("grossSalary")),
+        "pf_employee_amount": _to_decimal(item.get("pfEmployeeAmount")),
+        "pf_employer_amount": _to_decimal(item.get("pfEmployerAmount")),
+        "esi_employee_amount": _to_decimal(item.get("esiEmployeeAmount")),
+        "esi_employer_amount": _to_decimal(item.get("esiEmployerAmount")),
+        "professional_tax_amount": _to_decimal(item.get("professionalTaxAmount")),
+        "other_deduction_amount": _to_decimal(item.get("otherDeductionAmount")),
+        "total_deductions": _to_decimal(item.get("totalDeductions")),
+        "net_salary": _to_decimal(item.get("netSalary")),
+        "earnings": item.get("earnings") if isinstance(item.get("earnings"), dict) else {},
+        "deductions": item.get("deductions") if isinstance(item.get("deductions"), dict) else {},
+        "status": str(item.get("status") or "processed").strip().lower() or "processed",
+    }
+
+
+def _payslip_values(item, org, refs):
+    entry_id = _resolve_payroll_ref(refs, "payroll_entry", item.get("payrollEntryId"))
+    if not entry_id:
+        return None
+    return {
+        "payroll_entry_id": entry_id,
+        "slip_number": str(item.get("slipNumber") or f"SLIP-{entry_id}").strip(),
+        "generated_for_month": _normalize_payroll_month(item.get("generatedForMonth") or item.get("month")),
+        "employee_name": str(item.get("employeeName") or "").strip(),
+        "source_user_id": _coerce_int(item.get("sourceUserId")),
+        "currency": str(item.get("currency") or org.currency or "INR").strip().upper()[:10] or "INR",
+    }
+
+
+PAYROLL_ROW_VALUES = {
+    "salary_structure": _salary_structure_values,
+    "salary_history": _salary_history_values,
+    "payroll_entry": _payroll_entry_values,
+    "payslip": _payslip_values,
+}
+
+
+def _write_payroll_rows(org, row_type, items, existing, refs, now):
+    """
+    Upsert `items` (client rows) against `existing` rows by id: new rows are
+    bulk-created, rows whose values changed are bulk-updated with a bumped
+    row_version, and unchanged rows are not written. Client ids are recorded in
+    `refs` so later row types can point at rows created here. Returns the ids
+    of every row the items map to and the ids that were written.
+    """
+    model = _payroll_row_model(row_type)
+    values_for = PAYROLL_ROW_VALUES[row_type]
+    created, updated, changed_fields = [], [], set()
+    kept_ids = set()
+    for item in items:
+        values = values_for(item, org, refs)
+        if values is None:
+            continue
+        row = existing.get(_coerce_int(item.get("id")))
+        if row is None:
+            row = model(organization=org, **values)
+            created.append((str(item.get("id") or ""), row))
+            continue
+        changed = [field for field, value in values.items() if getattr(row, field) != value]
+        if changed:
+            for field in changed:
+                setattr(row, field, values[field])
+            row.row_version += 1
+            row.updated_at = now
+            changed_fields.update(changed)
+            updated.append(row)
+        kept_ids.add(row.id)
+        refs[row_type][str(item.get("id") or "")] = row.id
+    model.objects.bulk_create([row for _, row in created], batch_size=PAYROLL_WRITE_BATCH_SIZE)
+    for client_id, row in created:
+        kept_ids.add(row.id)
+        refs[row_type][client_id] = row.id
+    if updated:
+        model.objects.bulk_update(
+            updated, [*sorted(changed_fields), "row_version", "updated_at"], batch_size=PAYROLL_WRITE_BATCH_SIZE
+        )
+    return kept_ids, {row.id for _, row in created} | {row.id for row in updated}
+
+
+def _apply_payroll_profile(org, settings_obj, payroll_settings, org_profile, payroll_payload, user):
+    org.name = str((org_profile or {}).get("organizationName") or org.name).strip() or org.name
+    org.country = str((org_profile or {}).get("country") or org.country or "India").strip() or "India"
+    org.currency = str((org_profile or {}).get("currency") or org.currency or "INR").strip().upper()[:10] or "INR"
+    org.save(update_fields=["name", "country", "currency"])
+
+    settings_obj.org_timezone = str((org_profile or {}).get("timezone") or settings_obj.org_timezone or "UTC").strip() or "UTC"
+    settings_obj.save(update_fields=["org_timezone"])
+
+    payroll_settings.enable_pf = _to_bool((payroll_payload or {}).get("enablePf"), True)
+    payroll_settings.enable_esi = _to_bool((payroll_payload or {}).get("enableEsi"), True)
+    payroll_settings.pf_employee_percent = _to_decimal((payroll_payload or {}).get("pfEmployeePercent") or "12")
+    payroll_settings.pf_employer_percent = _to_decimal((payroll_payload or {}).get("pfEmployerPercent") or "12")
+    payroll_settings.esi_employee_percent = _to_decimal((payroll_payload or {}).get("esiEmployeePercent") or "0.75")
+    payroll_settings.esi_employer_percent = _to_decimal((payroll_payload or {}).get("esiEmployerPercent") or "3.25")
+    payroll_settings.updated_by = user
+    payroll_settings.save()
+
+
+def _settle_default_salary_structure(org, preferred_id=None):
+    """Keep exactly one default structure, falling back to the standard template; returns the ids it wrote."""
+    touched = set()
+    defaults = SalaryStructure.objects.filter(organization=org, is_default=True)
+    if preferred_id:
+        defaults = defaults.filter(id=preferred_id)
+    default_id = defaults.order_by("name", "id").values_list("id", flat=True).first()
+    if not default_id:
+        _ensure_standard_salary_template(org, touched=touched)
+        return touched
+    other_defaults = SalaryStructure.objects.filter(organization=org, is_default=True).exclude(id=default_id)
+    touched.update(other_defaults.values_list("id", flat=True))
+    SalaryStructure.objects.filter(id__in=touched).update(
+        is_default=False, row_version=F("row_version") + 1, updated_at=timezone.now()
+    )
+    return touched
+
+
+# Rows that point at a row type through a SET_NULL foreign key: (row type, field).
+PAYROLL_ROW_DEPENDENTS = {
+    "salary_structure": (("salary_history", "salary_structure"), ("payroll_entry", "salary_structure")),
+    "salary_history": (("payroll_entry", "salary_history"),),
+}
+
+
+def _delete_payroll_rows(org, row_type, ids, now):
+    """
+    Delete rows of one type along with what the delete changes elsewhere: rows
+    pointing at them are detached with a bumped row_version, and the payslips
+    of deleted payroll entries go with them. Returns the ids written and the
+    ids deleted, by row type.
+    """
+    touched = {kind: set() for kind in PAYROLL_ROW_TYPES}
+    deleted = {kind: [] for kind in PAYROLL_ROW_TYPES}
+    if not ids:
+        return touched, deleted
+    for dependent_type, field in PAYROLL_ROW_DEPENDENTS.get(row_type, ()):
+        model = _payroll_row_model(dependent_type)
+        dependent_ids = set(
+            model.objects.select_for_update()
+            .filter(organization=org, **{f"{field}_id__in": ids})
+            .values_list("id", flat=True)
+        )
+        if dependent_ids:
+            model.objects.filter(id__in=dependent_ids).update(
+                **{field: None}, row_version=F("row_version") + 1, updated_at=now
+            )
+        touched[dependent_type] |= dependent_ids
+    if row_type == "payroll_entry":
+        deleted["payslip"] = list(
+            Payslip.objects.filter(organization=org, payroll_entry_id__in=ids).values_list("id", flat=True)
+        )
+    _payroll_row_model(row_type).objects.filter(organization=org, id__in=ids).delete()
+    deleted[row_type] = list(ids)
+    return touched, deleted
+
+
+def _replace_payroll_workspace(org, payload, can_view_salary_history, now):
+    """Full-workspace save: rows missing from the payload are deleted, only changed rows are written."""
+    refs = {row_type: {} for row_type in PAYROLL_ROW_TYPES}
+
+    def items_of(key):
+        items = payload.get(key) if isinstance(payload, dict) else []
+        return [item for item in items if isinstance(item, dict)] if isinstance(items, list) else []
+
+    def replace_rows(row_type, key):
+        existing = {row.id: row for row in _payroll_row_model(row_type).objects.filter(organization=org)}
+        keep_ids, _ = _write_payroll_rows(org, row_type, items_of(key), existing, refs, now)
+        _delete_payroll_rows(org, row_type, [row_id for row_id in existing if row_id not in keep_ids], now)
+
+    replace_rows("salary_structure", "salary_structures")
+    if can_view_salary_history:
+        replace_rows("salary_history", "salary_history")
+    _settle_default_salary_structure(org)
+    replace_rows("payroll_entry", "payroll_entries")
+    replace_rows("payslip", "payslips")
+
+
+def _parse_payroll_ops(ops, can_view_salary_history):
+    """Validate delta ops; returns (ops grouped by row type, error response or None)."""
+    grouped = {row_type: [] for row_type in PAYROLL_ROW_TYPES}
+    if not isinstance(ops, list):
+        return grouped, JsonResponse({"detail": "ops_required"}, status=400)
+    for op in ops:
+        if not isinstance(op, dict) or op.get("type") not in grouped or op.get("op") not in {"upsert", "delete"}:
+            return grouped, JsonResponse({"detail": "invalid_op"}, status=400)
+        if op["op"] == "upsert" and not isinstance(op.get("data"), dict):
+            return grouped, JsonResponse({"detail": "invalid_op"}, status=400)
+        if _coerce_int(op.get("id")) and _coerce_int(op.get("version")) is None:
+            return grouped, JsonResponse({"detail": "version_required"}, status=400)
+        if op["type"] == "salary_history" and not can_view_salary_history:
+            return grouped, JsonResponse({"detail": "forbidden"}, status=403)
+        grouped[op["type"]].append(op)
+    return grouped, None
+
+
+def _apply_payroll_ops(org, grouped, now):
+    """
+    Apply per-row upsert/delete ops. Every op on an existing row carries the
+    row_version the client last saw; the touched rows are locked and checked
+    first, and any mismatch raises PayrollSyncConflict before anything is written.
+    Returns the id mapping, the ids written (including rows detached by a delete
+    or un-defaulted) and the ids deleted (including cascaded payslips).
+    """
+    locked = {}
+    conflicts = []
+    for row_type in PAYROLL_ROW_TYPES:
+        ids = {_coerce_int(op.get("id")) for op in grouped[row_type]} - {None}
+        model = _payroll_row_model(row_type)
+        locked[row_type] = {row.id: row for row in model.objects.select_for_update().filter(organization=org, id__in=ids)}
+        for op in grouped[row_type]:
+            row_id = _coerce_int(op.get("id"))
+            if row_id is None:
+                continue
+            row = locked[row_type].get(row_id)
+            if row is None or row.row_version != _coerce_int(op.get("version")):
+                conflicts.append({"type": row_type, "id": row_id, "version": row.row_version if row else None})
+    if conflicts:
+        raise PayrollSyncConflict(conflicts)
+
+    refs = {row_type: {} for row_type in PAYROLL_ROW_TYPES}
+    written = {row_type: set() for row_type in PAYROLL_ROW_TYPES}
+    deleted = {row_type: set() for row_type in PAYROLL_ROW_TYPES}
+    for row_type in PAYROLL_ROW_TYPES:
+        upserts = [{**op["data"], "id": op.get("id")} for op in grouped[row_type] if op["op"] == "upsert"]
+        delete_ids = [_coerce_int(op.get("id")) for op in grouped[row_type] if op["op"] == "delete"]
+        delete_ids = [row_id for row_id in delete_ids if row_id]
+        touched, removed = _delete_payroll_rows(org, row_type, delete_ids, now)
+        for kind in PAYROLL_ROW_TYPES:
+            written[kind] |= touched[kind]
+            deleted[kind].update(removed[kind])
+        _, upserted = _write_payroll_rows(org, row_type, upserts, locked[row_type], refs, now)
+        written[row_type] |= upserted
+        if row_type == "salary_structure" and (upserts or delete_ids):
+            preferred = next(
+                (refs[row_type].get(str(item.get("id") or "")) for item in upserts if _to_bool(item.get("isDefault"), False)),
+                None,
+            )
+            written[row_type] |= _settle_default_salary_structure(org, preferred_id=preferred)
+    return refs, written, {row_type: sorted(ids) for row_type, ids in deleted.items()}
+
+
+def _payroll_rows_payload(org, written):
+    structures = SalaryStructure.objects.filter(organization=org, id__in=written["salary_structure"])
+    history = EmployeeSalaryHistory.objects.filter(organization=org, id__in=written["salary_history"]).select_related("salary_structure")
+    entries = PayrollEntry.objects.filter(organization=org, id__in=written["payroll_entry"]).select_related("salary_structure", "salary_history", "payslip")
+    payslips = Payslip.objects.filter(organization=org, id__in=written["payslip"])
+    return {
+        "salary_structures": [_serialize_salary_structure(row) for row in structures],
+        "salary_history": [_serialize_salary_history(row) for row in history],
+        "payroll_entries": [_serialize_payroll_entry(row) for row in entries],
+        "payslips": [_serialize_payslip(row) for row in payslips],
+    }
+
+
+def _payroll_month_page(request, entries_qs):
+    """Months of payroll shown by a paged GET (?month=YYYY-MM&months=N), newest first, and the next month."""
+    months = list(entries_qs.order_by("-payroll_month").values_list("payroll_month", flat=True).distinct())
+    start_month = str(request.GET.get("month") or "").strip()
+    try:
+        page_size = max(1, min(int(request.GET.get("months") or 1), 24))
+    except ValueError:
+        page_size = 1
+    start = next((index for index, month in enumerate(months) if not start_month or month <= start_month), len(months))
+    return months, months[start:start + page_size], (months[start + page_size] if start + page_size < len(months) else None)
+
+
+@require_http_methods(["GET", "PUT", "PATCH"])
 def payroll_workspace(request):
+    """
+    GET returns the workspace; with ?month=YYYY-MM and/or ?months=N the payroll
+    entries and payslips are limited to that page of months. PUT replaces the
+    whole workspace. PATCH applies a delta:
+
+        {"organization_profile": {...}, "payroll_settings": {...},   (optional)
+         "ops": [{"type": "payroll_entry", "op": "upsert" | "delete",
+                  "id": 42 | "tmp_payroll_1", "version": 3, "data": {...}}]}
+
+    Ops on existing rows must carry the rowVersion the client last saw; stale
+    ones get a 409 with the current versions and nothing is applied.
+    """
     if not request.user.is_authenticated:
         return JsonResponse({"authenticated": False}, status=401)
     org = _resolve_org(request.user, request)
@@ -7898,174 +8274,63 @@ def payroll_workspace(request):
     can_view_salary_history = _can_view_salary_history(request.user, org)
     settings_obj, _ = OrganizationSettings.objects.get_or_create(organization=org)
     payroll_settings = _get_or_create_payroll_settings(org)
-    standard_template = _ensure_standard_salary_template(org)
+    standard_touched = set()
+    standard_template = _ensure_standard_salary_template(org, touched=standard_touched)
 
-    if request.method == "PUT":
+    if request.method in ("PUT", "PATCH"):
         if not can_manage_payroll:
             return JsonResponse({"detail": "forbidden"}, status=403)
         try:
             payload = json.loads(request.body.decode("utf-8") or "{}")
         except json.JSONDecodeError:
             return JsonResponse({"detail": "invalid_json"}, status=400)
-
-        org_profile = payload.get("organization_profile") if isinstance(payload, dict) else {}
-        payroll_payload = payload.get("payroll_settings") if isinstance(payload, dict) else {}
-        structure_payloads = payload.get("salary_structures") if isinstance(payload, dict) else []
-        history_payloads = payload.get("salary_history") if isinstance(payload, dict) else []
-        entry_payloads = payload.get("payroll_entries") if isinstance(payload, dict) else []
-        payslip_payloads = payload.get("payslips") if isinstance(payload, dict) else []
+        if not isinstance(payload, dict):
+            payload = {}
+        now = timezone.now()
+
+        if request.method == "PATCH":
+            grouped, error = _parse_payroll_ops(payload.get("ops"), can_view_salary_history)
+            if error is not None:
+                return error
+            try:
+                with transaction.atomic():
+                    if "organization_profile" in payload or "payroll_settings" in payload:
+                        _apply_payroll_profile(
+                            org,
+                            settings_obj,
+                            payroll_settings,
+                            payload.get("organization_profile") or _serialize_org_payroll_profile(org),
+                            payload.get("payroll_settings") or _serialize_payroll_settings(payroll_settings),
+                            request.user,
+                        )
+                    refs, written, deleted = _apply_payroll_ops(org, grouped, now)
+                    written["salary_structure"] |= standard_touched
+            except PayrollSyncConflict as exc:
+                return JsonResponse(
+                    {"detail": "Payroll data was changed by someone else. Reload and try again.", "conflicts": exc.conflicts},
+                    status=409,
+                )
+            return JsonResponse(
+                {
+                    "authenticated": True,
+                    "organization_profile": _serialize_org_payroll_profile(org),
+                    "payroll_settings": _serialize_payroll_settings(payroll_settings),
+                    "rows": _payroll_rows_payload(org, written),
+                    "refs": refs,
+                    "deleted": {PAYROLL_ROW_COLLECTIONS[row_type]: ids for row_type, ids in deleted.items()},
+                }
+            )
 
         with transaction.atomic():
-            org.name = str((org_profile or {}).get("organizationName") or org.name).strip() or org.name
-            org.country = str((org_profile or {}).get("country") or org.country or "India").strip() or "India"
-            org.currency = str((org_profile or {}).get("currency") or org.currency or "INR").strip().upper()[:10] or "INR"
-            org.save(update_fields=["name", "country", "currency"])
-
-            settings_obj.org_timezone = str((org_profile or {}).get("timezone") or settings_obj.org_timezone or "UTC").strip() or "UTC"
-            settings_obj.save(update_fields=["org_timezone"])
-
-            payroll_settings.enable_pf = _to_bool((payroll_payload or {}).get("enablePf"), True)
-            payroll_settings.enable_esi = _to_bool((payroll_payload or {}).get("enableEsi"), True)
-            payroll_settings.pf_employee_percent = _to_decimal((payroll_payload or {}).get("pfEmployeePercent") or "12")
-            payroll_settings.pf_employer_percent = _to_decimal((payroll_payload or {}).get("pfEmployerPercent") or "12")
-            payroll_settings.esi_employee_percent = _to_decimal((payroll_payload or {}).get("esiEmployeePercent") or "0.75")
-            payroll_settings.esi_employer_percent = _to_decimal((payroll_payload or {}).get("esiEmployerPercent") or "3.25")
-            payroll_settings.updated_by = request.user
-            payroll_settings.save()
-
-            existing_structures = {row.id: row for row in SalaryStructure.objects.filter(organization=org)}
-            keep_structure_ids = set()
-            structure_id_map = {}
-            for item in structure_payloads if isinstance(structure_payloads, list) else []:
-                if not isinstance(item, dict):
-                    continue
-                structure_id = _coerce_int(item.get("id"))
-                row = existing_structures.get(structure_id) if structure_id else None
-                if not row:
-                    row = SalaryStructure(organization=org)
-                row.name = str(item.get("name") or "").strip() or f"Structure {timezone.now().strftime('%H%M%S')}"
-                row.is_default = _to_bool(item.get("isDefault"), False)
-                row.basic_salary_percent = _to_decimal(item.get("basicSalaryPercent") or "40")
-                row.hra_percent = _to_decimal(item.get("hraPercent") or "20")
-                row.conveyance_fixed = _to_decimal(item.get("conveyanceFixed") or item.get("conveyance") or "1600")
-                row.auto_special_allowance = _to_bool(item.get("autoSpecialAllowance"), True)
-                row.basic_salary = _to_decimal(item.get("basicSalary"))
-                row.hra = _to_decimal(item.get("hra"))
-                row.conveyance = _to_decimal(item.get("conveyance"))
-                row.special_allowance = _to_decimal(item.get("specialAllowance"))
-                row.bonus = _to_decimal(item.get("bonus"))
-                row.other_allowances = _to_decimal(item.get("otherAllowances"))
-                row.apply_pf = _to_bool(item.get("applyPf"), True)
-                row.apply_esi = _to_bool(item.get("applyEsi"), True)
-                row.professional_tax = _to_decimal(item.get("professionalTax"))
-                row.other_deduction = _to_decimal(item.get("otherDeduction"))
-                row.notes = str(item.get("notes") or "").strip()
-                row.save()
-                keep_structure_ids.add(row.id)
-                structure_id_map[str(item.get("id") or "")] = row.id
-            SalaryStructure.objects.filter(organization=org).exclude(id__in=keep_structure_ids).delete()
-
-            keep_history_ids = set()
-            history_id_map = {}
-            if can_view_salary_history:
-                existing_history = {row.id: row for row in EmployeeSalaryHistory.objects.filter(organization=org)}
-                for item in history_payloads if isinstance(history_payloads, list) else []:
-                    if not isinstance(item, dict):
-                        continue
-                    history_id = _coerce_int(item.get("id"))
-                    row = existing_history.get(history_id) if history_id else None
-                    if not row:
-                        row = EmployeeSalaryHistory(organization=org)
-                    resolved_structure_id = _coerce_int(item.get("salaryStructureId"))
-                    resolved_structure_id = structure_id_map.get(str(item.get("salaryStructureId")), resolved_structure_id)
-                    row.employee_name = str(item.get("employeeName") or "").strip()
-                    row.source_user_id = _coerce_int(item.get("sourceUserId"))
-                    row.salary_structure_id = resolved_structure_id if resolved_structure_id in keep_structure_ids else resolved_structure_id
-                    row.current_salary = _to_decimal(item.get("currentSalary") or item.get("monthlySalaryAmount"))
-                    row.monthly_salary_amount = _to_decimal(item.get("monthlySalaryAmount"))
-                    row.increment_type = str(item.get("incrementType") or "percentage").strip().lower() or "percentage"
-                    if row.increment_type not in {"percentage", "fixed"}:
-                        row.increment_type = "percentage"
-                    row.increment_value = _to_decimal(item.get("incrementValue"))
-                    effective_from = str(item.get("effectiveFrom") or "").strip()
-                    row.effective_from = effective_from or timezone.localdate().isoformat()
-                    row.increment_amount = _to_decimal(item.get("incrementAmount"))
-                    row.new_salary = _to_decimal(item.get("newSalary") or item.get("monthlySalaryAmount"))
-                    row.notes = str(item.get("notes") or "").strip()
-                    row.save()
-                    keep_history_ids.add(row.id)
-                    history_id_map[str(item.get("id") or "")] = row.id
-                EmployeeSalaryHistory.objects.filter(organization=org).exclude(id__in=keep_history_ids).delete()
-            default_structure_id = next((row_id for row_id in keep_structure_ids if existing_structures.get(row_id) and existing_structures[row_id].is_default), None)
-            explicit_default_ids = []
-            for row in SalaryStructure.objects.filter(organization=org, id__in=keep_structure_ids):
-                if row.is_default:
-                    explicit_default_ids.append(row.id)
-            if explicit_default_ids:
-                SalaryStructure.objects.filter(organization=org).exclude(id=explicit_default_ids[0]).update(is_default=False)
-            else:
-                standard_template = _ensure_standard_salary_template(org)
-                keep_structure_ids.add(standard_template.id)
-
-            existing_entries = {row.id: row for row in PayrollEntry.objects.filter(organization=org)}
-            keep_entry_ids = set()
-            entry_id_map = {}
-            for item in entry_payloads if isinstance(entry_payloads, list) else []:
-                if not isinstance(item, dict):
-                    continue
-                entry_id = _coerce_int(item.get("id"))
-                row = existing_entries.get(entry_id) if entry_id else None
-                if not row:
-                    row = PayrollEntry(organization=org)
-                resolved_structure_id = _coerce_int(item.get("salaryStructureId"))
-                resolved_structure_id = structure_id_map.get(str(item.get("salaryStructureId")), resolved_structure_id)
-                resolved_history_id = _coerce_int(item.get("salaryHistoryId"))
-                resolved_history_id = history_id_map.get(str(item.get("salaryHistoryId")), resolved_history_id)
-                row.employee_name = str(item.get("employeeName") or "").strip()
-                row.source_user_id = _coerce_int(item.get("sourceUserId"))
-                row.payroll_month = _normalize_payroll_month(item.get("month"))
-                row.currency = str(item.get("currency") or org.currency or "INR").strip().upper()[:10] or "INR"
-                row.salary_structure_id = resolved_structure_id
-                row.salary_history_id = resolved_history_id
-                row.gross_salary = _to_decimal(item.get("grossSalary"))
-                row.pf_employee_amount = _to_decimal(item.get("pfEmployeeAmount"))
-                row.pf_employer_amount = _to_decimal(item.get("pfEmployerAmount"))
-                row.esi_employee_amount = _to_decimal(item.get("esiEmployeeAmount"))
-                row.esi_employer_amount = _to_decimal(item.get("esiEmployerAmount"))
-                row.professional_tax_amount = _to_decimal(item.get("professionalTaxAmount"))
-                row.other_deduction_amount = _to_decimal(item.get("otherDeductionAmount"))
-                row.total_deductions = _to_decimal(item.get("totalDeductions"))
-                row.net_salary = _to_decimal(item.get("netSalary"))
-                row.earnings = item.get("earnings") if isinstance(item.get("earnings"), dict) else {}
-                row.deductions = item.get("deductions") if isinstance(item.get("deductions"), dict) else {}
-                row.status = str(item.get("status") or "processed").strip().lower() or "processed"
-                row.save()
-                keep_entry_ids.add(row.id)
-                entry_id_map[str(item.get("id") or "")] = row.id
-            PayrollEntry.objects.filter(organization=org).exclude(id__in=keep_entry_ids).delete()
-
-            existing_payslips = {row.id: row for row in Payslip.objects.filter(organization=org)}
-            keep_payslip_ids = set()
-            for item in payslip_payloads if isinstance(payslip_payloads, list) else []:
-                if not isinstance(item, dict):
-                    continue
-                payslip_id = _coerce_int(item.get("id"))
-                row = existing_payslips.get(payslip_id) if payslip_id else None
-                if not row:
-                    row = Payslip(organization=org)
-                resolved_entry_id = _coerce_int(item.get("payrollEntryId"))
-                resolved_entry_id = entry_id_map.get(str(item.get("payrollEntryId")), resolved_entry_id)
-                if not resolved_entry_id:
-                    continue
-                row.payroll_entry_id = resolved_entry_id
-                row.slip_number = str(item.get("slipNumber") or f"SLIP-{resolved_entry_id}").strip()
-                row.generated_for_month = _normalize_payroll_month(item.get("generatedForMonth") or item.get("month"))
-                row.employee_name = str(item.get("employeeName") or "").strip()
-                row.source_user_id = _coerce_int(item.get("sourceUserId"))
-                row.currency = str(item.get("currency") or org.currency or "INR").strip().upper()[:10] or "INR"
-                row.save()
-                keep_payslip_ids.add(row.id)
-            Payslip.objects.filter(organization=org).exclude(id__in=keep_payslip_ids).delete()
+            _apply_payroll_profile(
+                org,
+                settings_obj,
+                payroll_settings,
+                payload.get("organization_profile"),
+                payload.get("payroll_settings"),
+                request.user,
+            )
+            _replace_payroll_workspace(org, payload, can_view_salary_history, now)
 
     salary_structures = list(
         SalaryStructure.objects.filter(organization=org).order_by("name", "id")
@@ -8081,31 +8346,40 @@ def payroll_workspace(request):
         payslips_qs = payslips_qs.filter(source_user_id=request.user.id)
         salary_history = [row for row in salary_history if row.source_user_id == request.user.id]
 
+    page = None
+    if request.method == "GET" and ("month" in request.GET or "months" in request.GET):
+        all_months, page_months, next_month = _payroll_month_page(request, payroll_entries_qs)
+        payroll_entries_qs = payroll_entries_qs.filter(payroll_month__in=page_months)
+        payslips_qs = payslips_qs.filter(generated_for_month__in=page_months)
+        page = {"months": page_months, "next_month": next_month, "payroll_months": all_months}
+
     payroll_entries = list(payroll_entries_qs.order_by("-payroll_month", "employee_name", "-id"))
     payslips = list(payslips_qs.order_by("-generated_at", "-id"))
 
-    return JsonResponse(
-        {
-            "authenticated": True,
-            "organization": {
-                "id": org.id,
-                "name": org.name,
-                "company_key": org.company_key,
-            },
-            "organization_profile": _serialize_org_payroll_profile(org),
-            "payroll_settings": _serialize_payroll_settings(payroll_settings),
-            "salary_structures": [_serialize_salary_structure(row) for row in salary_structures],
-            "salary_history": [_serialize_salary_history(row) for row in salary_history],
-            "payroll_entries": [_serialize_payroll_entry(row) for row in payroll_entries],
-            "payslips": [_serialize_payslip(row) for row in payslips],
-            "employee_directory": _serialize_org_users(org),
-            "permissions": {
-                "can_manage_payroll": can_manage_payroll,
-                "can_view_all_payroll": can_manage_payroll,
-                "can_view_salary_history": can_view_salary_history,
-            },
-        }
-    )
+    response = {
+        "authenticated": True,
+        "organization": {
+            "id": org.id,
+            "name": org.name,
+            "company_key": org.company_key,
+        },
+        "organization_profile": _serialize_org_payroll_profile(org),
+        "payroll_settings": _serialize_payroll_settings(payroll_settings),
+        "salary_structures": [_serialize_salary_structure(row) for row in salary_structures],
+        "salary_history": [_serialize_salary_history(row) for row in salary_history],
+        "payroll_entries": [_serialize_payroll_entry(row) for row in payroll_entries],
+        "payslips": [_serialize_payslip(row) for row in payslips],
+        "employee_directory": _serialize_org_users(org),
+        "permissions": {
+            "can_manage_payroll": can_manage_payroll,
+            "can_view_all_payroll": can_manage_payroll,
+            "can_view_salary_history": can_view_salary_history,
+        },
+    }
+    if page is not None:
+        response["page"] = page
+    return JsonResponse(response)
+
 
 
 @require_http_methods(["GET"])
@@ -8440,10 +8714,8 @@ def hrm_face_enrollment_capture(request):
     if len(images) < 3 or len(images) > 5:
         return JsonResponse({"detail": "enrollment_images_3_to_5_required"}, status=400)
 
-    embeddings = []
     try:
-        for image in images:
-            embeddings.append(generate_embedding(image))
+        embeddings = generate_embeddings(images)
     except FaceRecognitionUnavailable as exc:
         return JsonResponse({"detail": "face_library_unavailable", "message": str(exc)}, status=503)
     except FaceRecognitionValidationError as exc:
@@ -8500,16 +8772,25 @@ def hrm_attendance_checkin_face(request):
     org = _resolve_org(request.user, request)
     if not org:
         return JsonResponse({"detail": "organization_not_found"}, status=404)
-    membership = _get_org_membership(request.user, org)
-    if not membership or _normalize_membership_status(membership) != OrganizationUser.STATUS_ACTIVE:
-        return JsonResponse({"detail": "employee_not_found"}, status=403)
+    # Kiosk mode: a shared device signed in by an attendance admin; the face picks the employee.
+    kiosk = _to_bool(request.POST.get("kiosk"))
+    if kiosk:
+        if not _can_manage_attendance_geo_settings(request.user, org):
+            return JsonResponse({"detail": "forbidden"}, status=403)
+        membership = None
+    else:
+        membership = _get_org_membership(request.user, org)
+        if not membership or _normalize_membership_status(membership) != OrganizationUser.STATUS_ACTIVE:
+            return JsonResponse({"detail": "employee_not_found"}, status=403)
 
     face_setting = _get_face_setting(org)
     if not face_setting.enabled:
         return JsonResponse({"detail": "face_recognition_not_enabled"}, status=400)
-    face_profile = EmployeeFaceProfile.objects.filter(organization=org, employee=membership, is_active=True).first()
-    if not face_profile or not membership.face_enrolled:
-        return JsonResponse({"detail": "face_enrollment_required"}, status=400)
+    face_profile = None
+    if not kiosk:
+        face_profile = EmployeeFaceProfile.objects.filter(organization=org, employee=membership, is_active=True).first()
+        if not face_profile or not membership.face_enrolled:
+            return JsonResponse({"detail": "face_enrollment_required"}, status=400)
 
     try:
         uploaded = _face_upload_file(request)
@@ -8540,18 +8821,30 @@ def hrm_attendance_checkin_face(request):
         return JsonResponse({"detail": "face_verification_not_required"}, status=400)
 
     try:
-        verification = verify_employee_face(face_profile, uploaded, min_score=float(face_setting.min_match_score))
+        if kiosk:
+            verification = identify_face(org, uploaded, min_score=float(face_setting.min_match_score))
+        else:
+            verification = verify_enrolled_face(org, face_profile, uploaded, min_score=float(face_setting.min_match_score))
     except FaceRecognitionUnavailable as exc:
         return JsonResponse({"detail": "face_library_unavailable", "message": str(exc)}, status=503)
     except FaceRecognitionValidationError as exc:
         return JsonResponse({"detail": "face_verification_failed", "message": str(exc)}, status=400)
     if not verification.matched:
         return JsonResponse({"detail": "face_mismatch", "score": verification.score, "threshold": verification.threshold}, status=400)
+    if kiosk:
+        membership = (
+            OrganizationUser.objects
+            .filter(organization=org, id=verification.employee_id)
+            .select_related("user")
+            .first()
+        )
+        if not membership or _normalize_membership_status(membership) != OrganizationUser.STATUS_ACTIVE:
+            return JsonResponse({"detail": "employee_not_found"}, status=403)
 
     compressed = compress_uploaded_photo(uploaded)
     now = timezone.now()
     today = timezone.localdate()
-    employee_name = _get_org_user_display_name(request.user)
+    employee_name = _get_org_user_display_name(membership.user if kiosk else request.user)
     device_info = str(request.META.get("HTTP_USER_AGENT") or "").strip()[:1000]
     retention_days = int(face_setting.photo_retention_days or 60)
 
@@ -6,3 +6,6 @@ class BusinessAutopilotConfig(AppConfig):
     name = "apps.backend.business_autopilot"
     label = "business_autopilot"
     verbose_name = "Business Autopilot"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,58 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from apps.backend.hrm.services.face_index import FaceIndex
+from apps.backend.hrm.services.face_recognition_service import compare_embeddings, decrypt_embeddings, encrypt_embeddings
+
+
+class Command(BaseCommand):
+    help = "Compare 1:N face identification through the numpy index with per-employee decrypt-and-compare (no DB access)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--employees", type=int, default=5000, help="Number of synthetic enrolled employees.")
+        parser.add_argument("--samples", type=int, default=3, help="Enrollment samples per employee.")
+        parser.add_argument("--dim", type=int, default=512, help="Embedding dimension.")
+        parser.add_argument("--queries", type=int, default=200, help="Number of check-in embeddings to identify.")
+        parser.add_argument("--linear-queries", type=int, default=3, help="Queries timed on the linear path (it is slow).")
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options["seed"])
+        employees, dim = options["employees"], options["dim"]
+        centers = rng.standard_normal((employees, dim)).astype(np.float32)
+        samples = centers[:, None, :] + 0.3 * rng.standard_normal((employees, options["samples"], dim)).astype(np.float32)
+        samples /= np.linalg.norm(samples, axis=2, keepdims=True)
+        payloads = [encrypt_embeddings(rows.tolist()) for rows in samples]
+
+        targets = rng.integers(0, employees, options["queries"])
+        queries = centers[targets] + 0.3 * rng.standard_normal((len(targets), dim)).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        started = time.perf_counter()
+        index = FaceIndex.from_samples((employee_id, decrypt_embeddings(payload)) for employee_id, payload in enumerate(payloads))
+        build_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        indexed = [index.identify(query)[0] for query in queries]
+        indexed_s = time.perf_counter() - started
+
+        linear_count = max(1, min(options["linear_queries"], len(queries)))
+        started = time.perf_counter()
+        linear = []
+        for query in queries[:linear_count]:
+            scores = [compare_embeddings(decrypt_embeddings(payload), query.tolist()) for payload in payloads]
+            linear.append(int(np.argmax(scores)))
+        linear_s = time.perf_counter() - started
+
+        indexed_ms = indexed_s * 1000 / len(queries)
+        linear_ms = linear_s * 1000 / linear_count
+        correct = sum(1 for found, target in zip(indexed, targets) if found == target)
+        mismatches = sum(1 for left, right in zip(indexed, linear) if left != right)
+        self.stdout.write(
+            f"{employees} employees x {dim}d: index build {build_s * 1000:.0f} ms, "
+            f"indexed {indexed_ms:.3f} ms/check-in, linear {linear_ms:.1f} ms/check-in, "
+            f"speedup {linear_ms / max(indexed_ms, 1e-9):.0f}x, "
+            f"identified {correct}/{len(queries)}, mismatches {mismatches}"
+        )
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.backend.hrm.services.face_inference import FaceInferenceServer, parse_address
+from apps.backend.hrm.services.face_recognition_service import FaceRecognitionUnavailable
+
+
+class Command(BaseCommand):
+    help = "Serve face detection/embedding for web workers from a pool of warmed onnxruntime workers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--address", default="", help="host:port or unix socket path (default FACE_INFERENCE_ADDRESS).")
+        parser.add_argument("--workers", type=int, default=None, help="Worker processes, one session set each.")
+        parser.add_argument("--intra-op-threads", type=int, default=None, help="onnxruntime intra-op threads per session.")
+        parser.add_argument("--batch-size", type=int, default=None, help="Max frames per micro-batch.")
+        parser.add_argument("--batch-window-ms", type=int, default=None, help="How long a batch waits for more frames.")
+
+    def handle(self, *args, **options):
+        address = options["address"] or getattr(settings, "FACE_INFERENCE_ADDRESS", "")
+        if not address:
+            raise CommandError("Set FACE_INFERENCE_ADDRESS or pass --address.")
+        server = FaceInferenceServer(
+            parse_address(address),
+            workers=options["workers"],
+            intra_op_threads=options["intra_op_threads"],
+            batch_size=options["batch_size"],
+            batch_window_ms=options["batch_window_ms"],
+        )
+        try:
+            server.start()
+        except FaceRecognitionUnavailable as exc:
+            raise CommandError(str(exc)) from exc
+        self.stdout.write(self.style.SUCCESS(
+            f"Face inference serving on {address} with {server.workers} warmed worker(s), "
+            f"{server.intra_op_threads or 'default'} intra-op thread(s) each."
+        ))
+        try:
+            while not server.stopped.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stop()
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.10 on 2026-10-19 05:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business_autopilot', '0044_quickestimate_estimate_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employeesalaryhistory',
+            name='row_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='payrollentry',
+            name='row_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='payslip',
+            name='row_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='salarystructure',
+            name='row_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddIndex(
+            model_name='payrollentry',
+            index=models.Index(fields=['organization', 'payroll_month'], name='business_au_organiz_d313bf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payslip',
+            index=models.Index(fields=['organization', 'generated_for_month'], name='business_au_organiz_5a766d_idx'),
+        ),
+    ]
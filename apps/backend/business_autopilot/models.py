@@ -529,6 +529,7 @@ class SalaryStructure(models.Model):
     professional_tax = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     other_deduction = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     notes = models.CharField(max_length=255, blank=True, default="")
+    row_version = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -568,6 +569,7 @@ class EmployeeSalaryHistory(models.Model):
     increment_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     new_salary = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     notes = models.CharField(max_length=255, blank=True, default="")
+    row_version = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -833,11 +835,15 @@ class PayrollEntry(models.Model):
     earnings = models.JSONField(default=dict, blank=True)
     deductions = models.JSONField(default=dict, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="processed")
+    row_version = models.PositiveIntegerField(default=1)
     processed_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ("-payroll_month", "employee_name", "-id")
+        indexes = [
+            models.Index(fields=["organization", "payroll_month"]),
+        ]
 
     def __str__(self):
         return f"{self.organization_id} - {self.employee_name} ({self.payroll_month})"
@@ -859,11 +865,15 @@ class Payslip(models.Model):
     employee_name = models.CharField(max_length=160)
     source_user_id = models.PositiveIntegerField(null=True, blank=True)
     currency = models.CharField(max_length=10, default="INR")
+    row_version = models.PositiveIntegerField(default=1)
     generated_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ("-generated_at", "-id")
+        indexes = [
+            models.Index(fields=["organization", "generated_for_month"]),
+        ]
         unique_together = ("organization", "slip_number")
 
     def __str__(self):
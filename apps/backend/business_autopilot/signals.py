@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.backend.hrm.services.face_index import invalidate_face_index
+from .models import EmployeeFaceProfile, OrganizationUser
+
+
+@receiver(post_save, sender=EmployeeFaceProfile, dispatch_uid="ba.face_profile.invalidate_face_index_on_save")
+@receiver(post_delete, sender=EmployeeFaceProfile, dispatch_uid="ba.face_profile.invalidate_face_index_on_delete")
+def invalidate_face_profile_index(sender, instance, **kwargs):
+    invalidate_face_index(instance.organization_id)
+
+
+@receiver(post_save, sender=OrganizationUser, dispatch_uid="ba.org_user.invalidate_face_index_on_save")
+@receiver(post_delete, sender=OrganizationUser, dispatch_uid="ba.org_user.invalidate_face_index_on_delete")
+def invalidate_member_face_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or "face_enrolled" in update_fields:
+        invalidate_face_index(instance.organization_id)
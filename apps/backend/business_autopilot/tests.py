@@ -1,12 +1,23 @@
 import base64
+import io
+import os
+import tempfile
+import threading
+from multiprocessing.pool import ThreadPool
+from unittest import mock
+
+import numpy as np
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
 from django.utils import timezone
+from PIL import Image
 import json
 
 from apps.backend.business_autopilot.models import (
     AccountsWorkspace,
+    AttendanceEntry,
     CrmContact,
     CrmDeal,
     CrmLead,
@@ -16,10 +27,15 @@ from apps.backend.business_autopilot.models import (
     QuickEstimate,
     QuickEstimateHistory,
     CrmSalesOrder,
+    EmployeeFaceProfile,
+    FaceRecognitionSetting,
     OrganizationDepartment,
     OrganizationUser,
+    SalaryStructure,
     SiteAdminChatState,
 )
+from apps.backend.hrm.services import face_index, face_inference
+from apps.backend.hrm.services.face_recognition_service import FaceRecognitionUnavailable, compare_embeddings, encrypt_embeddings
 from apps.backend.business_autopilot.site_admin_ai import build_site_admin_instruction_context, get_site_admin_module
 from apps.backend.products.models import Product
 from core.models import Organization, OrganizationProduct, OrganizationSettings, Plan, Subscription, UserProductAccess, UserProfile
@@ -3654,3 +3670,269 @@ class BusinessAutopilotSiteAdminQuickEstimateTests(TestCase):
         payload = response.json()
         self.assertEqual(payload["detail"], "duplicate_customer")
         self.assertEqual(payload["duplicate_fields"], ["email"])
+
+
+class FaceIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username="kiosk@workzilla.test", email="kiosk@workzilla.test", password="pw123456")
+        self.org = Organization.objects.create(name="Kiosk Corp", company_key="KIOSKKEY", owner=self.admin)
+        UserProfile.objects.create(user=self.admin, organization=self.org, role="company_admin")
+        OrganizationUser.objects.create(organization=self.org, user=self.admin, role="company_admin")
+        FaceRecognitionSetting.objects.create(organization=self.org, enabled=True, min_match_score="0.90")
+        rng = np.random.default_rng(3)
+        self.centers = rng.standard_normal((4, 512)).astype(np.float32)
+        self.members = []
+        for index, center in enumerate(self.centers):
+            user = User.objects.create_user(username=f"emp{index}@workzilla.test", email=f"emp{index}@workzilla.test", password="pw123456")
+            member = OrganizationUser.objects.create(organization=self.org, user=user, face_enrolled=True)
+            samples = center + 0.2 * rng.standard_normal((3, 512)).astype(np.float32)
+            EmployeeFaceProfile.objects.create(
+                organization=self.org, employee=member, face_embedding=encrypt_embeddings(samples.tolist()),
+            )
+            self.members.append(member)
+
+    def test_identify_matches_pairwise_compare_and_rebuilds_after_enrollment(self):
+        index = face_index.get_face_index(self.org)
+        self.assertEqual(len(index), 4)
+        self.assertIs(face_index.get_face_index(self.org), index)
+        for member, center in zip(self.members, self.centers):
+            employee_id, score = index.identify(center)
+            self.assertEqual(employee_id, member.id)
+            stored = face_index.decrypt_embeddings(member.face_profile.face_embedding)
+            self.assertAlmostEqual(score, compare_embeddings(stored, center.tolist()), places=5)
+            self.assertAlmostEqual(index.score(member.id, center), score, places=6)
+        self.assertEqual(index.identify(np.zeros(128)), (None, 0.0))
+
+        profile = self.members[0].face_profile
+        profile.face_embedding = encrypt_embeddings([self.centers[1].tolist()])
+        with mock.patch.object(face_index, "decrypt_embeddings", wraps=face_index.decrypt_embeddings) as decrypt:
+            rebuilt = face_index.get_face_index(self.org)
+            self.assertIs(rebuilt, index)
+            profile.save()
+            rebuilt = face_index.get_face_index(self.org)
+        # Only the re-enrolled employee is decrypted again.
+        self.assertEqual(decrypt.call_count, 1)
+        self.assertAlmostEqual(rebuilt.score(self.members[0].id, self.centers[1]), 1.0, places=5)
+
+        self.members[2].face_enrolled = False
+        self.members[2].save(update_fields=["face_enrolled", "updated_at"])
+        self.assertIsNone(face_index.get_face_index(self.org).score(self.members[2].id, self.centers[2]))
+
+    def test_changes_saved_by_another_worker_are_not_scored_against_a_stale_index(self):
+        face_index.get_face_index(self.org)
+        image = io.BytesIO(b"frame")
+        # Written with update(): no version bump reaches this process's index.
+        EmployeeFaceProfile.objects.filter(employee=self.members[1]).update(
+            face_embedding=encrypt_embeddings([self.centers[2].tolist()]), updated_at=timezone.now()
+        )
+        EmployeeFaceProfile.objects.filter(employee=self.members[3]).update(is_active=False)
+        with mock.patch.object(face_index, "generate_embedding", return_value=self.centers[3].tolist()):
+            self.assertFalse(face_index.identify_face(self.org, image).matched)
+        profile = EmployeeFaceProfile.objects.get(employee=self.members[1])
+        with mock.patch.object(face_index, "generate_embedding", return_value=self.centers[1].tolist()):
+            self.assertFalse(face_index.verify_enrolled_face(self.org, profile, image).matched)
+        with mock.patch.object(face_index, "generate_embedding", return_value=self.centers[2].tolist()):
+            self.assertTrue(face_index.verify_enrolled_face(self.org, profile, image).matched)
+
+        with self.settings(HRM_FACE_INDEX_LOCAL_SECONDS=0):
+            self.assertNotIn(self.members[3].id, face_index.get_face_index(self.org).rows)
+
+    def test_kiosk_checkin_identifies_the_employee(self):
+        self.client.force_login(self.admin)
+        image = io.BytesIO()
+        Image.new("RGB", (32, 32), "white").save(image, format="JPEG")
+
+        def post(**data):
+            upload = SimpleUploadedFile("face.jpg", image.getvalue(), content_type="image/jpeg")
+            return self.client.post("/api/hrm/attendance/checkin-face/", {"image": upload, **data})
+
+        with mock.patch.object(face_index, "generate_embedding", return_value=self.centers[3].tolist()):
+            response = post(kiosk="1")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTrue(AttendanceEntry.objects.filter(organization=self.org, employee_membership=self.members[3]).exists())
+
+        with mock.patch.object(face_index, "generate_embedding", return_value=(-self.centers[3]).tolist()):
+            response = post(kiosk="1")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["detail"], "face_mismatch")
+
+        self.client.force_login(self.members[0].user)
+        response = post(kiosk="1")
+        self.assertEqual(response.status_code, 403)
+
+
+class FaceInferenceServerTests(TestCase):
+    def test_concurrent_requests_are_micro_batched_and_routed_back(self):
+        batches = []
+
+        def fake_embed(frames):
+            batches.append(len(frames))
+            return [{"face_count": 1, "embedding": [float(frame[0, 0, 0])]} for frame in frames]
+
+        address = os.path.join(tempfile.mkdtemp(), "face.sock")
+        server = face_inference.FaceInferenceServer(address, workers=1, batch_size=8, batch_window_ms=200, pool=ThreadPool(1))
+        results = {}
+
+        def check_in(value):
+            frame = np.full((4, 4, 3), value, dtype=np.uint8)
+            results[value] = face_inference.embed_frames_remote([frame, frame])
+
+        with self.settings(FACE_INFERENCE_ADDRESS=address), \
+                mock.patch.object(face_inference, "_embed_in_worker", side_effect=fake_embed):
+            server.start()
+            try:
+                threads = [threading.Thread(target=check_in, args=(value,)) for value in (1, 2, 3)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join(10)
+            finally:
+                server.stop()
+                face_inference._drop_connection()
+        self.assertEqual(batches, [6])
+        for value in (1, 2, 3):
+            self.assertEqual([result["embedding"] for result in results[value]], [[float(value)], [float(value)]])
+
+
+    def test_batch_lost_with_its_worker_fails_and_frees_the_slot(self):
+        class LosesFirstBatchPool:
+            calls = 0
+
+            def apply_async(self, func, args, callback, error_callback):
+                self.calls += 1
+                if self.calls > 1:
+                    callback([{"face_count": 1, "embedding": [1.0]} for _ in args[0]])
+
+            def terminate(self):
+                pass
+
+        address = os.path.join(tempfile.mkdtemp(), "face.sock")
+        server = face_inference.FaceInferenceServer(
+            address, workers=1, batch_window_ms=0, pool=LosesFirstBatchPool(), batch_timeout=0.2
+        )
+        frame = np.zeros((4, 4, 3), dtype=np.uint8)
+        with self.settings(FACE_INFERENCE_ADDRESS=address):
+            server.start()
+            try:
+                with self.assertRaisesMessage(FaceRecognitionUnavailable, "face_inference_worker_lost"):
+                    face_inference.embed_frames_remote([frame])
+                self.assertEqual(face_inference.embed_frames_remote([frame]), [{"face_count": 1, "embedding": [1.0]}])
+            finally:
+                server.stop()
+                face_inference._drop_connection()
+
+class PayrollWorkspaceSyncTests(TestCase):
+    url = "/api/business-autopilot/payroll/workspace"
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username="payroll@workzilla.test", email="payroll@workzilla.test", password="pw123456")
+        self.org = Organization.objects.create(name="Payroll Co", company_key="PAYKEY", owner=self.admin)
+        UserProfile.objects.create(user=self.admin, organization=self.org, role="company_admin")
+        product, _ = Product.objects.get_or_create(slug="business-autopilot-erp", defaults={"name": "Business Autopilot"})
+        Subscription.objects.create(user=self.admin, organization=self.org, plan=Plan.objects.create(name="ERP", product=product), status="active")
+        OrganizationProduct.objects.create(organization=self.org, product=product, subscription_status="active")
+        self.client.force_login(self.admin)
+
+    def _send(self, method, payload):
+        return getattr(self.client, method)(self.url, data=json.dumps(payload), content_type="application/json")
+
+    def _entry(self, entry_id, month, name):
+        return {"id": entry_id, "employeeName": name, "month": month, "grossSalary": "1000.00", "netSalary": "1000.00"}
+
+    def test_full_save_writes_only_changed_rows(self):
+        response = self._send("put", {
+            "payroll_entries": [self._entry("tmp_payroll_1", "2026-05", "Asha"), self._entry("tmp_payroll_2", "2026-05", "Ravi")],
+            "payslips": [{"id": "tmp_payslip_1", "payrollEntryId": "tmp_payroll_1", "slipNumber": "SLIP-1", "generatedForMonth": "2026-05"}],
+        })
+        self.assertEqual(response.status_code, 200)
+        workspace = response.json()
+        self.assertEqual(len(workspace["payroll_entries"]), 2)
+        self.assertEqual(workspace["payslips"][0]["payrollEntryId"], PayrollEntry.objects.get(employee_name="Asha").id)
+        stamps = dict(PayrollEntry.objects.values_list("id", "updated_at"))
+
+        workspace["payroll_entries"][0]["netSalary"] = "900.00"
+        response = self._send("put", workspace)
+        self.assertEqual(response.status_code, 200)
+        changed_id = workspace["payroll_entries"][0]["id"]
+        self.assertEqual(
+            {row.id: (row.row_version, row.updated_at == stamps[row.id]) for row in PayrollEntry.objects.all()},
+            {row_id: ((2, False) if row_id == changed_id else (1, True)) for row_id in stamps},
+        )
+
+    def test_delta_ops_apply_with_versions_and_reject_stale_rows(self):
+        workspace = self._send("put", {"payroll_entries": [self._entry("tmp_payroll_1", "2026-05", "Asha")]}).json()
+        entry = workspace["payroll_entries"][0]
+        ops = [
+            {"type": "payroll_entry", "op": "upsert", "id": entry["id"], "version": entry["rowVersion"], "data": {**entry, "netSalary": "800.00"}},
+            {"type": "payroll_entry", "op": "upsert", "id": "tmp_payroll_2", "data": self._entry("tmp_payroll_2", "2026-06", "Ravi")},
+            {"type": "payslip", "op": "upsert", "id": "tmp_payslip_2", "data": {"payrollEntryId": "tmp_payroll_2", "slipNumber": "SLIP-2", "generatedForMonth": "2026-06"}},
+        ]
+        response = self._send("patch", {"ops": ops})
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        new_entry_id = result["refs"]["payroll_entry"]["tmp_payroll_2"]
+        self.assertEqual(Payslip.objects.get(slip_number="SLIP-2").payroll_entry_id, new_entry_id)
+        self.assertEqual({row["id"]: row["rowVersion"] for row in result["rows"]["payroll_entries"]}, {entry["id"]: 2, new_entry_id: 1})
+
+        # The first op's version is now stale: nothing in the request is applied.
+        stale = [ops[0], {"type": "payroll_entry", "op": "delete", "id": new_entry_id, "version": 1}]
+        response = self._send("patch", {"ops": stale})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["conflicts"], [{"type": "payroll_entry", "id": entry["id"], "version": 2}])
+        self.assertTrue(PayrollEntry.objects.filter(id=new_entry_id).exists())
+
+        payslip_id = Payslip.objects.get(slip_number="SLIP-2").id
+        response = self._send("patch", {"ops": stale[1:]})
+        self.assertEqual(response.json()["deleted"]["payroll_entries"], [new_entry_id])
+        self.assertEqual(response.json()["deleted"]["payslips"], [payslip_id])
+        self.assertFalse(Payslip.objects.filter(slip_number="SLIP-2").exists())
+
+    def test_delta_response_carries_rows_changed_as_a_side_effect(self):
+        template = self.client.get(self.url).json()["salary_structures"][0]
+        response = self._send("patch", {"ops": [
+            {"type": "salary_structure", "op": "upsert", "id": "tmp_structure_1", "data": {"name": "Senior", "isDefault": True}},
+            {"type": "payroll_entry", "op": "upsert", "id": "tmp_payroll_1", "data": {**self._entry("tmp_payroll_1", "2026-05", "Asha"), "salaryStructureId": "tmp_structure_1"}},
+        ]})
+        result = response.json()
+        senior_id = result["refs"]["salary_structure"]["tmp_structure_1"]
+        entry_id = result["refs"]["payroll_entry"]["tmp_payroll_1"]
+        structures = {row["id"]: row for row in result["rows"]["salary_structures"]}
+        self.assertFalse(structures[template["id"]]["isDefault"])
+        self.assertEqual(structures[template["id"]]["rowVersion"], template["rowVersion"] + 1)
+
+        senior_version = SalaryStructure.objects.get(id=senior_id).row_version
+        response = self._send("patch", {"ops": [
+            {"type": "salary_structure", "op": "delete", "id": senior_id, "version": senior_version},
+        ]})
+        result = response.json()
+        self.assertEqual(result["deleted"]["salary_structures"], [senior_id])
+        entry = result["rows"]["payroll_entries"][0]
+        self.assertEqual((entry["id"], entry["salaryStructureId"], entry["rowVersion"]), (entry_id, None, 2))
+        # With Senior gone the standard template takes the default back.
+        self.assertTrue({row["id"]: row for row in result["rows"]["salary_structures"]}[template["id"]]["isDefault"])
+
+        response = self._send("patch", {"ops": [
+            {"type": "payroll_entry", "op": "upsert", "id": entry_id, "version": entry["rowVersion"], "data": {**entry, "netSalary": "700.00"}},
+        ]})
+        self.assertEqual(response.status_code, 200)
+
+    def test_get_pages_payroll_by_month(self):
+        self._send("put", {"payroll_entries": [
+            self._entry(f"tmp_payroll_{month}", f"2026-0{month}", "Asha") for month in (3, 4, 5)
+        ]})
+        payload = self.client.get(self.url, {"months": 1}).json()
+        self.assertEqual([row["month"] for row in payload["payroll_entries"]], ["2026-05"])
+        self.assertEqual(payload["page"]["next_month"], "2026-04")
+        payload = self.client.get(self.url, {"month": "2026-04", "months": 2}).json()
+        self.assertEqual([row["month"] for row in payload["payroll_entries"]], ["2026-04", "2026-03"])
+        self.assertIsNone(payload["page"]["next_month"])
+        self.assertEqual(len(self.client.get(self.url).json()["payroll_entries"]), 3)
+
+    def test_salary_history_without_rows_names_the_employee(self):
+        employee = User.objects.create_user(username="asha@workzilla.test", password="pw123456", first_name="Asha", last_name="Rao")
+        OrganizationUser.objects.create(organization=self.org, user=employee, role="org_user", is_active=True)
+        response = self.client.get(f"/api/hr/employee/{employee.id}/salary-history/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["employee_name"], "Asha Rao")
+        self.assertEqual(response.json()["history"], [])
@@ -1,16 +1,22 @@
 import logging
 import os
 import re
+import threading
 from collections.abc import Iterable
 
 import requests
 from django.conf import settings
+from requests.adapters import HTTPAdapter
 
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_GRAPH_API_VERSION = "v21.0"
+DEFAULT_GRAPH_API_BASE_URL = "https://graph.facebook.com"
 DEFAULT_TIMEOUT_SECONDS = 15
+DEFAULT_HTTP_POOL_SIZE = 16
+
+_http_local = threading.local()
 
 
 def _db_whatsapp_cloud_settings():
@@ -22,8 +28,9 @@ def _db_whatsapp_cloud_settings():
         return None
 
 
-def _get_setting(name: str, default: str = "") -> str:
-    db_settings = _db_whatsapp_cloud_settings()
+def _get_setting(name: str, default: str = "", db_settings=None) -> str:
+    if db_settings is None:
+        db_settings = _db_whatsapp_cloud_settings()
     db_map = {
         "WHATSAPP_ACCESS_TOKEN": "access_token",
         "WHATSAPP_PHONE_NUMBER_ID": "phone_number_id",
@@ -80,8 +87,9 @@ def _safe_int(value: str, default: int) -> int:
         return default
 
 
-def _get_timeout_seconds(default: int = DEFAULT_TIMEOUT_SECONDS) -> int:
-    db_settings = _db_whatsapp_cloud_settings()
+def _get_timeout_seconds(default: int = DEFAULT_TIMEOUT_SECONDS, db_settings=None) -> int:
+    if db_settings is None:
+        db_settings = _db_whatsapp_cloud_settings()
     if db_settings and getattr(db_settings, "is_active", False):
         try:
             timeout_seconds = int(getattr(db_settings, "timeout_seconds", default) or default)
@@ -89,76 +97,116 @@ def _get_timeout_seconds(default: int = DEFAULT_TIMEOUT_SECONDS) -> int:
                 return timeout_seconds
         except (TypeError, ValueError):
             pass
-    return _safe_int(_get_setting("WHATSAPP_HTTP_TIMEOUT_SECONDS", str(default)), default)
-
+    return _safe_int(_get_setting("WHATSAPP_HTTP_TIMEOUT_SECONDS", str(default), db_settings), default)
 
-def send_whatsapp_message(to, template_name, variables):
-    """
-    Send a WhatsApp Cloud API template message.
 
-    Returns True on success, False on failure/skip.
-    """
-    access_token = _get_setting("WHATSAPP_ACCESS_TOKEN")
-    phone_number_id = _get_setting("WHATSAPP_PHONE_NUMBER_ID")
-    language_code = _get_setting("WHATSAPP_TEMPLATE_LANGUAGE", "en_US")
-    graph_api_version = _get_setting("WHATSAPP_GRAPH_API_VERSION", DEFAULT_GRAPH_API_VERSION)
-    timeout_seconds = _get_timeout_seconds(DEFAULT_TIMEOUT_SECONDS)
+def get_cloud_api_config() -> dict:
+    """Resolve Cloud API credentials once, so bulk senders don't re-read settings per message."""
+    db_settings = _db_whatsapp_cloud_settings()
+    graph_api_version = _get_setting("WHATSAPP_GRAPH_API_VERSION", DEFAULT_GRAPH_API_VERSION, db_settings)
+    phone_number_id = _get_setting("WHATSAPP_PHONE_NUMBER_ID", "", db_settings)
+    base_url = _get_setting("WHATSAPP_GRAPH_API_BASE_URL", DEFAULT_GRAPH_API_BASE_URL, db_settings).rstrip("/")
+    return {
+        "access_token": _get_setting("WHATSAPP_ACCESS_TOKEN", "", db_settings),
+        "phone_number_id": phone_number_id,
+        "language_code": _get_setting("WHATSAPP_TEMPLATE_LANGUAGE", "en_US", db_settings),
+        "timeout_seconds": _get_timeout_seconds(DEFAULT_TIMEOUT_SECONDS, db_settings),
+        "messages_url": f"{base_url}/{graph_api_version}/{phone_number_id}/messages",
+    }
 
-    normalized_to = _normalize_whatsapp_to(to)
-    if not normalized_to:
-        logger.warning("WhatsApp send skipped: invalid destination number")
-        return False
 
-    if not template_name:
-        logger.warning("WhatsApp send skipped: template_name is missing")
-        return False
+def get_http_session(pool_size: int = DEFAULT_HTTP_POOL_SIZE) -> requests.Session:
+    """Per-thread keep-alive session; avoids a new TLS handshake for every message."""
+    session = getattr(_http_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _http_local.session = session
+    return session
 
-    if not access_token or not phone_number_id:
-        logger.info(
-            "WhatsApp send skipped: missing config (%s%s)",
-            "WHATSAPP_ACCESS_TOKEN " if not access_token else "",
-            "WHATSAPP_PHONE_NUMBER_ID" if not phone_number_id else "",
-        )
-        return False
 
+def build_template_payload(to: str, template_name: str, variables, language_code: str) -> dict:
     body_params = [
         {"type": "text", "text": value}
         for value in _coerce_template_variables(variables)
     ]
-    components = [{"type": "body", "parameters": body_params}] if body_params else []
-
     payload = {
         "messaging_product": "whatsapp",
-        "to": normalized_to,
+        "to": to,
         "type": "template",
         "template": {
             "name": str(template_name).strip(),
             "language": {"code": language_code},
         },
     }
-    if components:
-        payload["template"]["components"] = components
+    if body_params:
+        payload["template"]["components"] = [{"type": "body", "parameters": body_params}]
+    return payload
+
+
+def post_template_message(config: dict, to: str, template_name: str, variables, session=None):
+    """
+    POST one template message with a resolved config.
 
-    url = f"https://graph.facebook.com/{graph_api_version}/{phone_number_id}/messages"
+    Returns (status_code, response_text); status_code is 0 on network errors.
+    """
+    payload = build_template_payload(to, template_name, variables, config["language_code"])
     headers = {
-        "Authorization": f"Bearer {access_token}",
+        "Authorization": f"Bearer {config['access_token']}",
         "Content-Type": "application/json",
     }
-
+    session = session or get_http_session()
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=timeout_seconds)
-    except requests.RequestException:
-        logger.exception("WhatsApp send failed (network error) to=%s template=%s", normalized_to, template_name)
+        response = session.post(config["messages_url"], headers=headers, json=payload, timeout=config["timeout_seconds"])
+    except requests.RequestException as exc:
+        return 0, str(exc)[:1000]
+    return response.status_code, (response.text or "")[:1000]
+
+
+def send_whatsapp_message(to, template_name, variables):
+    """
+    Send a WhatsApp Cloud API template message.
+
+    Returns True on success, False on failure/skip.
+    """
+    config = get_cloud_api_config()
+
+    normalized_to = _normalize_whatsapp_to(to)
+    if not normalized_to:
+        logger.warning("WhatsApp send skipped: invalid destination number")
+        return False
+
+    if not template_name:
+        logger.warning("WhatsApp send skipped: template_name is missing")
+        return False
+
+    if not config["access_token"] or not config["phone_number_id"]:
+        logger.info(
+            "WhatsApp send skipped: missing config (%s%s)",
+            "WHATSAPP_ACCESS_TOKEN " if not config["access_token"] else "",
+            "WHATSAPP_PHONE_NUMBER_ID" if not config["phone_number_id"] else "",
+        )
+        return False
+
+    status_code, response_text = post_template_message(config, normalized_to, template_name, variables)
+    if status_code == 0:
+        logger.error(
+            "WhatsApp send failed (network error) to=%s template=%s error=%s",
+            normalized_to,
+            template_name,
+            response_text,
+        )
         return False
 
-    if 200 <= response.status_code < 300:
+    if 200 <= status_code < 300:
         logger.info("WhatsApp template sent to=%s template=%s", normalized_to, template_name)
         return True
 
-    response_text = (response.text or "")[:1000]
     logger.error(
         "WhatsApp send failed status=%s to=%s template=%s response=%s",
-        response.status_code,
+        status_code,
         normalized_to,
         template_name,
         response_text,
@@ -1,6 +1,7 @@
 import os
 
 from celery import Celery
+from celery.signals import worker_process_shutdown
 
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "apps.backend.core_platform.settings")
@@ -8,3 +9,11 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "apps.backend.core_platform.sett
 app = Celery("workzilla")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
+
+
+@worker_process_shutdown.connect
+def flush_event_metrics_on_shutdown(**kwargs):
+    # Prefork children leave via os._exit, which skips the atexit flush.
+    from core.observability import flush_event_metrics
+
+    flush_event_metrics()
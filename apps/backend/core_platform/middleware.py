@@ -9,11 +9,10 @@ from django.core.cache import cache
 from django.middleware.csrf import get_token
 from django.utils import timezone
 
-from apps.backend.brand.models import ProductRouteMapping
+from apps.backend.brand.branding import get_branding_snapshot
 from core.access_control import build_login_redirect, check_product_access, get_request_product_slug, is_exempt_product_path
 
 from django.http import HttpResponseForbidden, JsonResponse
-from django.db import connection
 
 
 class LegacyMonitorRedirectMiddleware:
@@ -53,7 +52,8 @@ class AppCsrfBootstrapMiddleware:
 
     def __call__(self, request):
         path = request.path or ""
-        if path.startswith("/app"):
+        # Hashed bundles are cached as immutable; keep Set-Cookie off them.
+        if path.startswith("/app") and "/assets/" not in path:
             get_token(request)
         return self.get_response(request)
 
@@ -217,23 +217,7 @@ class ProductRouteRedirectMiddleware:
         if not slug:
             return self.get_response(request)
 
-        route = None
-        if connection.vendor == "sqlite":
-            for candidate in (
-                ProductRouteMapping.objects
-                .select_related("product")
-                .filter(redirect_enabled=True)
-            ):
-                legacy = candidate.legacy_slugs or []
-                if slug in legacy:
-                    route = candidate
-                    break
-        else:
-            route = (
-                ProductRouteMapping.objects.select_related("product")
-                .filter(redirect_enabled=True, legacy_slugs__contains=[slug])
-                .first()
-            )
+        route = get_branding_snapshot().legacy_route(slug, redirect_enabled=True)
         if route and route.public_slug and route.public_slug != slug:
             return HttpResponsePermanentRedirect(f"/products/{route.public_slug}/")
 
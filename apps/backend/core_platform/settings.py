@@ -293,7 +293,80 @@ CELERY_BEAT_SCHEDULE = {
         "task": "apps.backend.backups.tasks.run_due_org_google_backups_task",
         "schedule": 900.0,  # every 15 minutes
     },
+    "storage-purge-deleted-files": {
+        "task": "storage.purge_deleted_files",
+        "schedule": 600.0,  # every 10 minutes
+    },
+    "whatsapp-dispatch-pending-campaigns": {
+        "task": "whatsapp_automation.dispatch_pending_campaigns",
+        "schedule": 60.0,  # every minute
+    },
+    "whatsapp-purge-card-visits": {
+        "task": "whatsapp_automation.purge_card_visits",
+        "schedule": 86400.0,  # daily
+    },
+    "core-deliver-email-outbox": {
+        "task": "core.deliver_email_outbox",
+        "schedule": 60.0,  # every minute; picks up retries and anything a kick missed
+    },
+    "core-purge-email-outbox": {
+        "task": "core.purge_email_outbox",
+        "schedule": 86400.0,  # daily
+    },
+    "core-purge-media-tombstones": {
+        "task": "core.purge_media_tombstones",
+        "schedule": 300.0,  # every 5 minutes
+    },
+    "core-rebuild-event-metric-rollups": {
+        "task": "core.rebuild_event_metric_rollups",
+        "schedule": 86400.0,  # daily; drops counts of deleted orgs from the report window
+    },
+}
+
+# Write-behind buffers (usage events, metrics, visits) flush from a daemon thread in
+# each process. The test run flushes explicitly instead.
+BUFFER_FLUSH_THREAD_ENABLED = os.environ.get("BUFFER_FLUSH_THREAD_ENABLED", "1") == "1" and sys.argv[1:2] != ["test"]
+
+# Shared cache for rate limits and write-behind counters. Redis when configured so
+# every gunicorn worker sees the same values; per-process memory otherwise.
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "").strip()
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
 }
+
+
+def _require_redis_client(setting_name):
+    # Falling back to per-process state here would silently split counters and events per worker.
+    try:
+        import redis  # noqa: F401
+    except ImportError as exc:
+        raise ImproperlyConfigured(
+            f"{setting_name} is set but the redis client is not installed. Run pip install -r requirements.txt."
+        ) from exc
+
+
+if CACHE_REDIS_URL:
+    _require_redis_client("CACHE_REDIS_URL")
+    CACHES["default"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": CACHE_REDIS_URL,
+    }
+
+# Chatbot realtime fan-out (Redis pub/sub); empty keeps events in-process.
+CHAT_REALTIME_REDIS_URL = os.environ.get("CHAT_REALTIME_REDIS_URL", CACHE_REDIS_URL).strip()
+if CHAT_REALTIME_REDIS_URL:
+    _require_redis_client("CHAT_REALTIME_REDIS_URL")
+
+# Face inference server (manage.py run_face_inference_server); empty loads the models in each web worker.
+FACE_INFERENCE_ADDRESS = os.environ.get("FACE_INFERENCE_ADDRESS", "").strip()
+FACE_INFERENCE_WORKERS = int(os.environ.get("FACE_INFERENCE_WORKERS", "2"))
+# Threads per worker's model sessions; unset keeps the onnxruntime default (one per core).
+FACE_INFERENCE_INTRA_OP_THREADS = (
+    int(os.environ["FACE_INFERENCE_INTRA_OP_THREADS"]) if os.environ.get("FACE_INFERENCE_INTRA_OP_THREADS") else None
+)
+
 BACKUP_INCLUDE_PREFIXES = os.environ.get(
     "BACKUP_INCLUDE_PREFIXES",
     "critical/org_{org_id}/product_{product_id}/,critical/org_{org_id}/assets/",
@@ -0,0 +1,171 @@
+import gzip
+import mimetypes
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.conf import settings
+
+try:  # Optional: brotli variants are only written/served when the package is installed.
+    import brotli
+except ImportError:  # pragma: no cover - depends on the deployment image
+    brotli = None
+
+
+# Vite emits content-hashed names such as `index-AyTPA-y1.js` under `assets/`.
+HASHED_NAME_RE = re.compile(r"[-.][A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+COMPRESSIBLE_SUFFIXES = {".js", ".mjs", ".css", ".html", ".json", ".svg", ".map", ".txt", ".xml", ".wasm"}
+# Accept-Encoding token -> sibling file suffix, in order of preference.
+ENCODING_SUFFIXES = (("br", ".br"), ("gzip", ".gz"))
+PRECOMPRESS_MIN_BYTES = 1024
+
+
+@dataclass(frozen=True)
+class DistVariant:
+    path: Path
+    size: int
+
+
+@dataclass(frozen=True)
+class DistAsset:
+    path: Path
+    size: int
+    etag: str
+    last_modified: float
+    content_type: str
+    hashed: bool
+    variants: dict = field(default_factory=dict)
+
+    def pick_variant(self, accept_encoding):
+        """Return (encoding, variant) for the best precompressed sibling the client accepts."""
+        accepted = accepted_encodings(accept_encoding)
+        for encoding, _suffix in ENCODING_SUFFIXES:
+            if encoding in accepted and encoding in self.variants:
+                return encoding, self.variants[encoding]
+        return None, None
+
+
+def accepted_encodings(header):
+    accepted = set()
+    for item in (header or "").split(","):
+        token, _, params = item.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        qvalue = params.strip()
+        if qvalue.startswith("q="):
+            try:
+                if float(qvalue[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(token)
+    if "*" in accepted:
+        accepted.update(encoding for encoding, _suffix in ENCODING_SUFFIXES)
+    return accepted
+
+
+def is_hashed_asset(rel_path):
+    return "assets/" in f"/{rel_path}" and bool(HASHED_NAME_RE.search(rel_path))
+
+
+def _stat_etag(stat):
+    # Weak: the br/gzip/identity representations share one validator.
+    return f'W/"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def build_asset_manifest(root):
+    """Index every file under `root` once: relative path -> DistAsset (size, ETag, precompressed variants)."""
+    root = Path(root)
+    manifest = {}
+    if not root.is_dir():
+        return manifest
+    variant_suffixes = {suffix for _encoding, suffix in ENCODING_SUFFIXES}
+    for file_path in root.rglob("*"):
+        if not file_path.is_file() or file_path.suffix in variant_suffixes:
+            continue
+        stat = file_path.stat()
+        rel_path = file_path.relative_to(root).as_posix()
+        variants = {}
+        for encoding, suffix in ENCODING_SUFFIXES:
+            sibling = file_path.with_name(file_path.name + suffix)
+            if sibling.is_file():
+                sibling_stat = sibling.stat()
+                # A stale sibling from an older build would serve the wrong bytes.
+                if sibling_stat.st_mtime_ns >= stat.st_mtime_ns:
+                    variants[encoding] = DistVariant(path=sibling, size=sibling_stat.st_size)
+        content_type, _encoding = mimetypes.guess_type(file_path.name)
+        manifest[rel_path] = DistAsset(
+            path=file_path,
+            size=stat.st_size,
+            etag=_stat_etag(stat),
+            last_modified=stat.st_mtime,
+            content_type=content_type or "application/octet-stream",
+            hashed=is_hashed_asset(rel_path),
+            variants=variants,
+        )
+    return manifest
+
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+
+def get_asset_manifest():
+    global _manifest
+    if _manifest is None:
+        with _manifest_lock:
+            if _manifest is None:
+                _manifest = build_asset_manifest(settings.FRONTEND_DIST)
+    return _manifest
+
+
+def refresh_asset_manifest_if_stale():
+    """Re-index after a frontend rebuild without a restart; one stat of index.html per manifest miss."""
+    manifest = get_asset_manifest()
+    shell = manifest.get("index.html")
+    try:
+        current_etag = _stat_etag((Path(settings.FRONTEND_DIST) / "index.html").stat())
+    except OSError:
+        current_etag = None
+    if (shell.etag if shell else None) == current_etag:
+        return manifest
+    reset_asset_manifest()
+    return get_asset_manifest()
+
+
+def reset_asset_manifest():
+    """Drop the cached manifest so the next request re-indexes `frontend_dist` (tests, hot deploys)."""
+    global _manifest
+    with _manifest_lock:
+        _manifest = None
+
+
+def precompress_dist_assets(root, min_bytes=PRECOMPRESS_MIN_BYTES):
+    """Write `.gz` (and `.br` when brotli is installed) next to compressible files; returns files written."""
+    root = Path(root)
+    written = 0
+    if not root.is_dir():
+        return written
+    variant_suffixes = {suffix for _encoding, suffix in ENCODING_SUFFIXES}
+    for file_path in sorted(root.rglob("*")):
+        if (
+            not file_path.is_file()
+            or file_path.suffix in variant_suffixes
+            or file_path.suffix.lower() not in COMPRESSIBLE_SUFFIXES
+        ):
+            continue
+        data = file_path.read_bytes()
+        if len(data) < min_bytes:
+            continue
+        encoded = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            encoded[".br"] = brotli.compress(data, quality=11)
+        for suffix, payload in encoded.items():
+            # Only keep variants that actually save bytes.
+            if len(payload) >= len(data):
+                continue
+            file_path.with_name(file_path.name + suffix).write_bytes(payload)
+            written += 1
+    return written
@@ -1,6 +1,11 @@
+from concurrent.futures import ThreadPoolExecutor
+
 from django.conf import settings
 from django.core.files.storage import Storage, FileSystemStorage
 
+# S3 DeleteObjects accepts at most 1000 keys per request.
+OBJECT_DELETE_BATCH_SIZE = 1000
+
 
 def _load_storage_settings():
     try:
@@ -38,6 +43,41 @@ def _build_object_storage(config):
     return storage
 
 
+def _delete_many_object(backend, names):
+    from storages.utils import clean_name
+
+    failed = []
+    for start in range(0, len(names), OBJECT_DELETE_BATCH_SIZE):
+        chunk = names[start:start + OBJECT_DELETE_BATCH_SIZE]
+        key_map = {backend._normalize_name(clean_name(name)): name for name in chunk}
+        try:
+            response = backend.bucket.delete_objects(
+                Delete={"Objects": [{"Key": key} for key in key_map], "Quiet": True}
+            )
+        except Exception:
+            failed.extend(chunk)
+            continue
+        for error in response.get("Errors") or []:
+            failed.append(key_map.get(error.get("Key"), error.get("Key")))
+    return failed
+
+
+def _delete_many_parallel(backend, names, max_workers):
+    def _delete(name):
+        try:
+            backend.delete(name)
+            return None
+        except Exception:
+            return name
+
+    if len(names) <= 1 or max_workers <= 1:
+        results = [_delete(name) for name in names]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(_delete, names))
+    return [name for name in results if name]
+
+
 class DynamicMediaStorage(Storage):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -118,6 +158,19 @@ class DynamicMediaStorage(Storage):
                 return self._fallback_to_local().delete(name)
             raise
 
+    def delete_many(self, names, max_workers=8):
+        """
+        Delete many objects at once: batched DeleteObjects calls on object storage,
+        a small thread pool on local disk. Returns the names that could not be deleted.
+        """
+        names = [name for name in dict.fromkeys(names) if name]
+        if not names:
+            return []
+        backend = self._get_backend()
+        if hasattr(backend, "bucket") and hasattr(backend, "_normalize_name"):
+            return _delete_many_object(backend, names)
+        return _delete_many_parallel(backend, names, max_workers)
+
     def size(self, name):
         backend = self._get_backend()
         try:
@@ -3,12 +3,17 @@ from pathlib import Path
 from django.conf import settings
 from django.http import FileResponse, Http404
 from django.shortcuts import redirect
-from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
 from django.views.decorators.csrf import ensure_csrf_cookie
 
 from core.models import UserProfile
 
+from apps.backend.core_platform.spa_assets import get_asset_manifest, refresh_asset_manifest_if_stale
 
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, max-age=0, must-revalidate"
 DIST_DIR = Path(settings.BASE_DIR) / "frontend_dist"
 
 
@@ -22,9 +27,7 @@ def _disable_cache_headers(response):
     return response
 
 
-def _open_dist_file(path):
-    if not path:
-        return None
+def _candidate_paths(path):
     candidates = [path]
 
     # Backward-compatible asset paths:
@@ -43,40 +46,76 @@ def _open_dist_file(path):
         candidates.append(f"app/{asset_suffix}")
 
     # Deduplicate while preserving order.
-    seen = set()
-    unique_candidates = []
-    for candidate in candidates:
-        if candidate not in seen:
-            unique_candidates.append(candidate)
-            seen.add(candidate)
-
-    for candidate in unique_candidates:
-        try:
-            fullpath = safe_join(str(DIST_DIR), candidate)
-        except Exception:
-            continue
-        file_path = Path(fullpath)
-        if file_path.exists() and file_path.is_file():
-            response = FileResponse(open(file_path, "rb"))
-            return _disable_cache_headers(response)
+    return list(dict.fromkeys(candidates))
+
+
+def _lookup_asset(manifest, path):
+    for candidate in _candidate_paths(path):
+        asset = manifest.get(candidate)
+        if asset is not None:
+            return asset
     return None
 
 
-@ensure_csrf_cookie
+def _is_shell(asset):
+    return asset.content_type == "text/html"
+
+
+def _asset_response(request, asset):
+    """Serve a manifest entry: precompressed variant by Accept-Encoding, 304 on a matching validator."""
+    shell = _is_shell(asset)
+    if not shell:
+        not_modified = get_conditional_response(request, etag=asset.etag, last_modified=int(asset.last_modified))
+        if not_modified is not None:
+            not_modified["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if asset.hashed else REVALIDATE_CACHE_CONTROL
+            patch_vary_headers(not_modified, ("Accept-Encoding",))
+            return not_modified
+
+    encoding, variant = asset.pick_variant(request.META.get("HTTP_ACCEPT_ENCODING"))
+    source = variant.path if variant else asset.path
+    response = FileResponse(open(source, "rb"), content_type=asset.content_type, filename=asset.path.name)
+    if variant:
+        response["Content-Encoding"] = encoding
+    if asset.variants:
+        patch_vary_headers(response, ("Accept-Encoding",))
+    if shell:
+        # The HTML shell references the current hashed bundles, so it must never be cached.
+        return _disable_cache_headers(response)
+    response["ETag"] = asset.etag
+    response["Last-Modified"] = http_date(asset.last_modified)
+    response["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if asset.hashed else REVALIDATE_CACHE_CONTROL
+    return response
+
+
+def _open_dist_file(request, path):
+    if not path:
+        return None
+    asset = _lookup_asset(get_asset_manifest(), path)
+    if asset is None:
+        asset = _lookup_asset(refresh_asset_manifest_if_stale(), path)
+    if asset is None:
+        return None
+    return _asset_response(request, asset)
+
+
 def spa_serve(request, path=""):
+    # Static files skip the CSRF cookie so immutable asset responses carry no Set-Cookie.
+    if path and not path.endswith("/"):
+        file_response = _open_dist_file(request, path)
+        if file_response is not None:
+            return file_response
+    return _spa_shell(request, path)
+
+
+@ensure_csrf_cookie
+def _spa_shell(request, path=""):
     # Normalize SPA route URLs to always include a trailing slash.
     # This avoids separate cache entries for `/app/foo` vs `/app/foo/` and prevents
     # some browsers from reusing stale bundles during navigation.
     if path and not path.endswith("/") and "assets/" not in path:
-        file_response = _open_dist_file(path)
-        if file_response is None:
-            return redirect(f"/app/{path}/")
+        return redirect(f"/app/{path}/")
 
     if path and not path.endswith("/"):
-        file_response = _open_dist_file(path)
-        if file_response is not None:
-            return file_response
-
         # If this looked like an SPA asset request but no file exists,
         # return 404 instead of redirecting to login HTML (prevents JS MIME errors).
         if "assets/" in path:
@@ -90,9 +129,7 @@ def spa_serve(request, path=""):
         if not path or path.startswith("worksuite") or path.startswith("monitor"):
             return redirect("/app/ai-chatbot/")
 
-    index_file = DIST_DIR / "index.html"
-    if not index_file.exists():
-        raise Http404(f"Missing SPA build: {index_file}")
-    response = FileResponse(open(index_file, "rb"), content_type="text/html")
-    response = _disable_cache_headers(response)
-    return response
+    index_asset = get_asset_manifest().get("index.html") or refresh_asset_manifest_if_stale().get("index.html")
+    if index_asset is None:
+        raise Http404(f"Missing SPA build: {DIST_DIR / 'index.html'}")
+    return _asset_response(request, index_asset)
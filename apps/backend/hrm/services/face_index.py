@@ -0,0 +1,217 @@
+"""
+Per-org face identification index for attendance check-in.
+
+Each org's active enrollments are decrypted once into a float32 matrix of
+L2-normalized mean embeddings (one row per employee), so a check-in is scored
+with a single matrix-vector product instead of decrypting and averaging the
+stored samples per request. That covers both the 1:1 verify against a claimed
+employee and kiosk-mode 1:N identification. Indexes are kept per process and
+rebuilt when the org's enrollment version (bumped on every face profile or
+membership change) moves; a rebuild only decrypts the profiles whose
+updated_at changed. Without a shared cache the version bump only reaches the
+worker that saved the change, so indexes also expire after
+HRM_FACE_INDEX_LOCAL_SECONDS, and a match is re-checked against the current
+profile before it is used.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.backend.business_autopilot.models import EmployeeFaceProfile
+from core.cache_utils import local_snapshot_max_age
+from .face_recognition_service import (
+    FaceRecognitionValidationError,
+    FaceVerificationResult,
+    compare_embeddings,
+    decrypt_embeddings,
+    generate_embedding,
+    mean_embedding,
+)
+
+
+logger = logging.getLogger(__name__)
+
+VERSION_TTL_SECONDS = 7 * 24 * 3600
+
+
+@dataclass
+class FaceIdentificationResult:
+    matched: bool
+    employee_id: Optional[int]
+    score: float
+    threshold: float
+    embedding: List[float]
+
+
+def _max_cached_orgs():
+    return int(getattr(settings, "HRM_FACE_INDEX_CACHE_SIZE", 64))
+
+
+class FaceIndex:
+    """Unit mean embeddings of an org's enrolled employees; scores are cosine similarities clamped to [0, 1]."""
+
+    def __init__(self, vectors, stamps=None):
+        # vectors: OrganizationUser id -> unit mean embedding. Vectors of another dimension
+        # than the first one (an older model) cannot be compared and are left out.
+        self.vectors = {}
+        for employee_id in sorted(vectors):
+            vector = vectors[employee_id]
+            if self.vectors and vector.shape != next(iter(self.vectors.values())).shape:
+                continue
+            self.vectors[employee_id] = vector
+        self.stamps = stamps or {}
+        self.employee_ids = np.fromiter(self.vectors, dtype=np.int64, count=len(self.vectors))
+        self.matrix = np.vstack(list(self.vectors.values())) if self.vectors else np.zeros((0, 0), dtype=np.float32)
+        self.rows = {employee_id: index for index, employee_id in enumerate(self.vectors)}
+
+    @classmethod
+    def from_samples(cls, rows):
+        """Index (employee id, stored embedding samples) pairs, skipping degenerate enrollments."""
+        vectors = {}
+        for employee_id, embeddings in rows:
+            try:
+                vectors[employee_id] = mean_embedding(embeddings)
+            except (FaceRecognitionValidationError, ValueError):
+                continue
+        return cls(vectors)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _query(self, embedding):
+        query = np.asarray(embedding, dtype=np.float32).ravel()
+        if not len(self) or query.shape[0] != self.matrix.shape[1]:
+            return None
+        norm = float(np.linalg.norm(query))
+        return query / norm if norm > 0 else None
+
+    def score(self, employee_id, embedding):
+        """Similarity of `embedding` to one enrolled employee, or None when they are not indexed."""
+        row = self.rows.get(employee_id)
+        query = self._query(embedding)
+        if row is None or query is None:
+            return None
+        return max(0.0, min(1.0, float(self.matrix[row] @ query)))
+
+    def identify(self, embedding):
+        """(employee id, score) of the closest enrolled employee, or (None, 0.0)."""
+        query = self._query(embedding)
+        if query is None:
+            return None, 0.0
+        scores = self.matrix @ query
+        best = int(np.argmax(scores))
+        return int(self.employee_ids[best]), max(0.0, min(1.0, float(scores[best])))
+
+
+def build_face_index(org_id, previous=None):
+    """Index the org's active enrollments, reusing vectors of `previous` whose profile did not change."""
+    profiles = EmployeeFaceProfile.objects.filter(organization_id=org_id, is_active=True, employee__face_enrolled=True)
+    stamps = dict(profiles.values_list("employee_id", "updated_at"))
+    vectors = {}
+    stale = []
+    for employee_id, stamp in stamps.items():
+        if previous is not None and previous.stamps.get(employee_id) == stamp and employee_id in previous.vectors:
+            vectors[employee_id] = previous.vectors[employee_id]
+        else:
+            stale.append(employee_id)
+    if len(stale) == len(stamps):
+        batches = [profiles]
+    else:
+        batches = [profiles.filter(employee_id__in=stale[start:start + 500]) for start in range(0, len(stale), 500)]
+    for batch in batches:
+        for employee_id, payload in batch.values_list("employee_id", "face_embedding").iterator():
+            try:
+                vectors[employee_id] = mean_embedding(decrypt_embeddings(payload))
+            except (FaceRecognitionValidationError, ValueError):
+                logger.warning("Skipping unreadable face enrollment for employee %s in org %s", employee_id, org_id)
+    return FaceIndex(vectors, stamps)
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _version_key(org_id):
+    return f"hrm:face_index:version:{org_id}"
+
+
+def invalidate_face_index(org_id):
+    if org_id:
+        cache.set(_version_key(org_id), uuid.uuid4().hex, VERSION_TTL_SECONDS)
+
+
+def get_face_index(org):
+    org_id = getattr(org, "id", org)
+    version = cache.get(_version_key(org_id))
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(_version_key(org_id), version, VERSION_TTL_SECONDS):
+            version = cache.get(_version_key(org_id)) or version
+    max_age = local_snapshot_max_age("HRM_FACE_INDEX_LOCAL_SECONDS")
+    with _indexes_lock:
+        cached = _indexes.get(org_id)
+        if cached and cached[0] == version and (max_age is None or time.monotonic() - cached[2] < max_age):
+            _indexes.move_to_end(org_id)
+            return cached[1]
+    index = build_face_index(org_id, previous=cached[1] if cached else None)
+    with _indexes_lock:
+        _indexes[org_id] = (version, index, time.monotonic())
+        _indexes.move_to_end(org_id)
+        while len(_indexes) > _max_cached_orgs():
+            _indexes.popitem(last=False)
+    return index
+
+
+def verify_enrolled_face(org, employee_face_profile, image_file, *, min_score: float = 0.90) -> FaceVerificationResult:
+    """1:1 check-in verify against the indexed enrollment; same result as verify_employee_face."""
+    threshold = float(min_score or 0.90)
+    new_embedding = generate_embedding(image_file)
+    index = get_face_index(org)
+    score = None
+    # An index built before a re-enrollment still holds the old face.
+    if index.stamps.get(employee_face_profile.employee_id) == getattr(employee_face_profile, "updated_at", None):
+        score = index.score(employee_face_profile.employee_id, new_embedding)
+    if score is None:
+        embeddings = decrypt_embeddings(getattr(employee_face_profile, "face_embedding", ""))
+        if not embeddings:
+            raise FaceRecognitionValidationError("employee_face_enrollment_missing")
+        score = compare_embeddings(embeddings, new_embedding)
+    return FaceVerificationResult(matched=score >= threshold, score=score, threshold=threshold, embedding=new_embedding)
+
+
+def identify_face(org, image_file, *, min_score: float = 0.90) -> FaceIdentificationResult:
+    """Kiosk-mode 1:N identification: the best-scoring enrolled employee, matched at the verify threshold."""
+    threshold = float(min_score or 0.90)
+    new_embedding = generate_embedding(image_file)
+    index = get_face_index(org)
+    employee_id, score = index.identify(new_embedding)
+    matched = employee_id is not None and score >= threshold
+    if matched:
+        # The index may predate a deactivation or re-enrollment saved by another worker.
+        profile = (
+            EmployeeFaceProfile.objects
+            .filter(organization_id=getattr(org, "id", org), employee_id=employee_id, is_active=True, employee__face_enrolled=True)
+            .values_list("updated_at", "face_embedding")
+            .first()
+        )
+        if profile is None:
+            matched = False
+        elif profile[0] != index.stamps.get(employee_id):
+            score = compare_embeddings(decrypt_embeddings(profile[1]), new_embedding)
+            matched = score >= threshold
+    return FaceIdentificationResult(
+        matched=matched,
+        employee_id=employee_id if matched else None,
+        score=score,
+        threshold=threshold,
+        embedding=new_embedding,
+    )
@@ -0,0 +1,248 @@
+"""
+Shared face inference server for attendance enrollment and check-in.
+
+Loading buffalo_l in every gunicorn worker costs each worker its own copy of
+the models and makes the first check-in after a deploy wait for the load. The
+server (``manage.py run_face_inference_server``) instead keeps a pool of worker
+processes, each with one warmed detection + recognition session set, behind a
+local authenticated socket. Web workers send decoded, downscaled frames with
+embed_frames_remote(); frames arriving together from concurrent requests are
+micro-batched so one recognition run embeds all of them. A batch whose pool
+worker died never calls back, so each batch also fails after the request
+timeout and frees its slot.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+
+from django.conf import settings
+
+from .face_recognition_service import (
+    FaceRecognitionUnavailable,
+    _ensure_libraries,
+    create_face_app,
+    embed_frames,
+    warm_up_face_app,
+)
+
+
+def _workers():
+    return int(getattr(settings, "FACE_INFERENCE_WORKERS", 2))
+
+
+def _intra_op_threads():
+    """None keeps the onnxruntime default."""
+    value = getattr(settings, "FACE_INFERENCE_INTRA_OP_THREADS", None)
+    return int(value) if value else None
+
+
+def _batch_size():
+    return int(getattr(settings, "FACE_INFERENCE_BATCH_SIZE", 8))
+
+
+def _batch_window_seconds():
+    return float(getattr(settings, "FACE_INFERENCE_BATCH_WINDOW_MS", 15)) / 1000.0
+
+
+def _timeout_seconds():
+    return float(getattr(settings, "FACE_INFERENCE_TIMEOUT_SECONDS", 30))
+
+
+def _authkey():
+    return hashlib.sha256(f"face-inference:{settings.SECRET_KEY}".encode("utf-8")).digest()
+
+
+def parse_address(value):
+    """Parse "host:port" as a TCP address; anything else is a unix socket path."""
+    value = str(value or "").strip()
+    host, _, port = value.rpartition(":")
+    if host and port.isdigit():
+        return host, int(port)
+    return value
+
+
+# Pool worker side: one warmed model set per process.
+_WORKER_APP = None
+
+
+def _init_worker(intra_op_threads, det_size):
+    global _WORKER_APP
+    _WORKER_APP = create_face_app(intra_op_threads=intra_op_threads, det_size=det_size)
+    warm_up_face_app(_WORKER_APP)
+
+
+def _worker_ready(_):
+    return os.getpid()
+
+
+def _embed_in_worker(frames):
+    return embed_frames(_WORKER_APP, frames)
+
+
+class _Request:
+    def __init__(self, frames):
+        self.frames = frames
+        self.future = Future()
+
+
+class FaceInferenceServer:
+    def __init__(self, address, *, workers=None, intra_op_threads=None, batch_size=None, batch_window_ms=None,
+                 det_size=None, pool=None, batch_timeout=None):
+        self.address = address
+        self.workers = workers or _workers()
+        self.intra_op_threads = intra_op_threads or _intra_op_threads()
+        self.batch_size = batch_size or _batch_size()
+        self.batch_window = (batch_window_ms / 1000.0) if batch_window_ms is not None else _batch_window_seconds()
+        self.det_size = det_size or int(getattr(settings, "FACE_DETECTION_SIZE", 640))
+        self.pool = pool
+        self.batch_timeout = batch_timeout if batch_timeout is not None else _timeout_seconds()
+        self.requests = queue.Queue()
+        # One in-flight batch per worker; requests queue up (and batch together) while all are busy.
+        self.slots = threading.BoundedSemaphore(self.workers)
+        self.stopped = threading.Event()
+        self.listener = None
+
+    def start(self):
+        if self.pool is None:
+            _ensure_libraries()
+            self.pool = multiprocessing.get_context("spawn").Pool(
+                self.workers,
+                initializer=_init_worker,
+                initargs=(self.intra_op_threads, self.det_size),
+            )
+            # Returns once the workers have loaded and warmed their sessions.
+            self.pool.map(_worker_ready, range(self.workers), chunksize=1)
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)  # stale socket left by a previous run
+        self.listener = Listener(self.address, authkey=_authkey())
+        threading.Thread(target=self._batch_loop, name="face-inference-batcher", daemon=True).start()
+        threading.Thread(target=self._accept_loop, name="face-inference-accept", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.listener is not None:
+            self.listener.close()
+        if self.pool is not None:
+            self.pool.terminate()
+
+    def _accept_loop(self):
+        while not self.stopped.is_set():
+            try:
+                connection = self.listener.accept()
+            except (OSError, EOFError, multiprocessing.AuthenticationError):
+                continue
+            threading.Thread(target=self._serve_connection, args=(connection,), daemon=True).start()
+
+    def _serve_connection(self, connection):
+        with connection:
+            while not self.stopped.is_set():
+                try:
+                    frames = connection.recv()
+                except (OSError, EOFError):
+                    return
+                request = _Request(list(frames))
+                self.requests.put(request)
+                try:
+                    reply = {"results": request.future.result()}
+                except Exception as exc:
+                    reply = {"error": str(exc) or exc.__class__.__name__}
+                try:
+                    connection.send(reply)
+                except (OSError, EOFError):
+                    return
+
+    def _batch_loop(self):
+        while not self.stopped.is_set():
+            try:
+                first = self.requests.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self.slots.acquire()
+            batch = [first]
+            frame_count = len(first.frames)
+            deadline = time.monotonic() + self.batch_window
+            while frame_count < self.batch_size:
+                try:
+                    request = self.requests.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(request)
+                frame_count += len(request.frames)
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        settled = threading.Lock()
+
+        def settle():
+            # Whichever of result, error and timeout comes first frees the slot; the rest are dropped.
+            if not settled.acquire(blocking=False):
+                return False
+            timer.cancel()
+            self.slots.release()
+            return True
+
+        def done(results):
+            if not settle():
+                return
+            offset = 0
+            for request in batch:
+                request.future.set_result(results[offset:offset + len(request.frames)])
+                offset += len(request.frames)
+
+        def failed(exc):
+            if not settle():
+                return
+            for request in batch:
+                request.future.set_exception(exc)
+
+        # The pool replaces a worker that dies mid-batch but never calls back for its task.
+        timer = threading.Timer(self.batch_timeout, failed, args=(FaceRecognitionUnavailable("face_inference_worker_lost"),))
+        timer.daemon = True
+        timer.start()
+        frames = [frame for request in batch for frame in request.frames]
+        self.pool.apply_async(_embed_in_worker, (frames,), callback=done, error_callback=failed)
+
+
+_local = threading.local()
+
+
+def _drop_connection():
+    connection = getattr(_local, "connection", None)
+    _local.connection = None
+    if connection is not None:
+        try:
+            connection.close()
+        except OSError:
+            pass
+
+
+def embed_frames_remote(frames):
+    """embed_frames() on the inference server at FACE_INFERENCE_ADDRESS (one connection per thread)."""
+    frames = list(frames)
+    for attempt in range(2):
+        try:
+            connection = getattr(_local, "connection", None)
+            if connection is None:
+                connection = Client(parse_address(settings.FACE_INFERENCE_ADDRESS), authkey=_authkey())
+                _local.connection = connection
+            connection.send(frames)
+            if not connection.poll(_timeout_seconds()):
+                _drop_connection()
+                raise FaceRecognitionUnavailable("face_inference_timeout")
+            reply = connection.recv()
+            break
+        except (OSError, EOFError) as exc:
+            # A server restart leaves a dead cached connection; reconnect once.
+            _drop_connection()
+            if attempt:
+                raise FaceRecognitionUnavailable(f"face_inference_unreachable: {exc}") from exc
+    if "error" in reply:
+        raise FaceRecognitionUnavailable(f"face_inference_failed: {reply['error']}")
+    return reply["results"]
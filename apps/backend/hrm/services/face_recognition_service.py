@@ -2,25 +2,25 @@ import base64
 import hashlib
 import io
 import json
-import math
 import threading
 from dataclasses import dataclass
 from typing import Iterable, List
 
+import numpy as np
 from cryptography.fernet import Fernet, InvalidToken
 from django.conf import settings
 from PIL import Image, ImageOps
 
 try:
     import cv2
-    import numpy as np
     import onnxruntime as ort
     from insightface.app import FaceAnalysis
+    from insightface.utils import face_align
 except Exception:  # pragma: no cover - optional runtime dependency
     cv2 = None
-    np = None
     ort = None
     FaceAnalysis = None
+    face_align = None
 
 
 class FaceRecognitionUnavailable(RuntimeError):
@@ -42,7 +42,15 @@ class FaceVerificationResult:
 _FACE_APP = None
 _FACE_APP_ERROR = None
 _FACE_APP_LOCK = threading.Lock()
-_MAX_IMAGE_DIMENSION = 1024
+
+
+def _max_image_dimension():
+    # Frames are downscaled before detection; 0 keeps the uploaded size.
+    return int(getattr(settings, "FACE_DETECTION_MAX_DIMENSION", 1024))
+
+
+def _detection_size():
+    return int(getattr(settings, "FACE_DETECTION_SIZE", 640))
 
 
 def _get_fernet() -> Fernet:
@@ -51,10 +59,58 @@ def _get_fernet() -> Fernet:
 
 
 def _ensure_libraries():
-    if FaceAnalysis is None or np is None or cv2 is None or ort is None:
+    if FaceAnalysis is None or cv2 is None or ort is None:
         raise FaceRecognitionUnavailable("insightface_runtime_unavailable")
 
 
+def create_face_app(*, intra_op_threads=None, det_size=640):
+    """Load buffalo_l detection + recognition (the other buffalo_l models are never used)."""
+    _ensure_libraries()
+    app = FaceAnalysis(
+        name="buffalo_l",
+        allowed_modules=["detection", "recognition"],
+        providers=["CPUExecutionProvider"],
+        provider_options=[{}],
+    )
+    app.prepare(ctx_id=0, det_size=(det_size, det_size))
+    if intra_op_threads:
+        # insightface does not pass session options through, so reopen the sessions with them.
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = int(intra_op_threads)
+        options.inter_op_num_threads = 1
+        for model in app.models.values():
+            model.session = ort.InferenceSession(model.model_file, sess_options=options, providers=["CPUExecutionProvider"])
+    return app
+
+
+def embed_frames(app, frames) -> List[dict]:
+    """Largest face of each BGR frame, embedded in one recognition batch: [{face_count, embedding}]."""
+    recognizer = app.models["recognition"]
+    results = []
+    crops = []
+    for frame in frames:
+        bboxes, kpss = app.det_model.detect(frame, max_num=0, metric="default")
+        face_count = 0 if bboxes is None else len(bboxes)
+        results.append({"face_count": face_count, "embedding": None})
+        if not face_count or kpss is None:
+            continue
+        largest = int(np.argmax((bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1])))
+        crops.append((len(results) - 1, face_align.norm_crop(frame, landmark=kpss[largest], image_size=recognizer.input_size[0])))
+    if crops:
+        features = recognizer.get_feat([crop for _, crop in crops])
+        for (position, _), feature in zip(crops, features):
+            results[position]["embedding"] = feature.tolist()
+    return results
+
+
+def warm_up_face_app(app):
+    """Run detection and recognition once so the first real frame does not pay for session setup."""
+    width, height = app.det_model.input_size or (640, 640)
+    embed_frames(app, [np.zeros((height, width, 3), dtype=np.uint8)])
+    recognizer = app.models["recognition"]
+    recognizer.get_feat([np.zeros((recognizer.input_size[1], recognizer.input_size[0], 3), dtype=np.uint8)])
+
+
 def _get_face_app():
     global _FACE_APP, _FACE_APP_ERROR
     if _FACE_APP is not None:
@@ -67,16 +123,14 @@ def _get_face_app():
         if _FACE_APP_ERROR is not None:
             raise FaceRecognitionUnavailable(_FACE_APP_ERROR)
         try:
-            _ensure_libraries()
-            # Load once and keep shared for all requests.
-            app = FaceAnalysis(
-                name="buffalo_l",
-                providers=["CPUExecutionProvider"],
-                provider_options=[{}],
+            # Load once and keep shared for all requests of this process.
+            _FACE_APP = create_face_app(
+                intra_op_threads=getattr(settings, "FACE_INFERENCE_INTRA_OP_THREADS", None),
+                det_size=_detection_size(),
             )
-            app.prepare(ctx_id=0, det_size=(640, 640))
-            _FACE_APP = app
             return _FACE_APP
+        except FaceRecognitionUnavailable:
+            raise
         except Exception as exc:  # pragma: no cover - environment specific
             _FACE_APP_ERROR = f"insightface_init_failed: {exc}"
             raise FaceRecognitionUnavailable(_FACE_APP_ERROR) from exc
@@ -86,12 +140,24 @@ def _normalize_vector(vector: Iterable[float]) -> List[float]:
     return [float(value) for value in vector]
 
 
-def _normalize_embedding(vector: Iterable[float]) -> List[float]:
-    values = _normalize_vector(vector)
-    norm = math.sqrt(sum(value * value for value in values))
+def _unit_vector(vector) -> "np.ndarray":
+    values = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(values))
     if norm <= 0:
         raise FaceRecognitionValidationError("no_face_detected")
-    return [value / norm for value in values]
+    return values / norm
+
+
+def _normalize_embedding(vector: Iterable[float]) -> List[float]:
+    return _unit_vector(vector).tolist()
+
+
+def mean_embedding(embeddings) -> "np.ndarray":
+    """L2-normalized mean of an employee's enrolled samples, the vector check-ins are scored against."""
+    samples = np.asarray(embeddings, dtype=np.float32)
+    if samples.ndim == 2:
+        samples = samples.mean(axis=0)
+    return _unit_vector(samples)
 
 
 def _load_image(image_file):
@@ -99,7 +165,8 @@ def _load_image(image_file):
         image_file.seek(0)
         image = Image.open(image_file)
         image = ImageOps.exif_transpose(image).convert("RGB")
-        image.thumbnail((_MAX_IMAGE_DIMENSION, _MAX_IMAGE_DIMENSION))
+        if _max_image_dimension():
+            image.thumbnail((_max_image_dimension(), _max_image_dimension()))
         return image
     except Exception as exc:  # pragma: no cover - invalid user upload
         raise FaceRecognitionValidationError("invalid_image_file") from exc
@@ -107,50 +174,32 @@ def _load_image(image_file):
 
 def _pil_to_bgr(image) -> "np.ndarray":
     rgb_array = np.array(image, dtype=np.uint8)
-    return cv2.cvtColor(rgb_array, cv2.COLOR_RGB2BGR)
+    return np.ascontiguousarray(rgb_array[:, :, ::-1])
 
 
-def _face_area(face) -> float:
-    bbox = getattr(face, "bbox", None)
-    if bbox is None or len(bbox) < 4:
-        return 0.0
-    width = max(0.0, float(bbox[2]) - float(bbox[0]))
-    height = max(0.0, float(bbox[3]) - float(bbox[1]))
-    return width * height
-
-
-def detect_face(image_file) -> dict:
-    app = _get_face_app()
-    image = _load_image(image_file)
-    bgr_image = _pil_to_bgr(image)
-    faces = app.get(bgr_image) or []
-    if not faces:
-        return {
-            "face_detected": False,
-            "face_count": 0,
-            "warning": "",
-            "selected_face": None,
-            "image_array": bgr_image,
-        }
-    selected_face = max(faces, key=_face_area)
-    warning = "multiple_faces_detected_largest_used" if len(faces) > 1 else ""
-    return {
-        "face_detected": True,
-        "face_count": len(faces),
-        "warning": warning,
-        "selected_face": selected_face,
-        "image_array": bgr_image,
-    }
+def generate_embeddings(image_files) -> List[List[float]]:
+    """Normalized embedding of the largest face in each image, from one inference batch.
+
+    With FACE_INFERENCE_ADDRESS set, frames go to the shared inference server
+    (see face_inference) instead of a model loaded in this process.
+    """
+    frames = [_pil_to_bgr(_load_image(image_file)) for image_file in image_files]
+    if getattr(settings, "FACE_INFERENCE_ADDRESS", ""):
+        from .face_inference import embed_frames_remote
+
+        results = embed_frames_remote(frames)
+    else:
+        results = embed_frames(_get_face_app(), frames)
+    embeddings = []
+    for result in results:
+        if not result.get("embedding"):
+            raise FaceRecognitionValidationError("no_face_detected")
+        embeddings.append(_normalize_embedding(result["embedding"]))
+    return embeddings
 
 
 def generate_embedding(image_file) -> List[float]:
-    detected = detect_face(image_file)
-    if not detected["face_detected"] or detected["selected_face"] is None:
-        raise FaceRecognitionValidationError("no_face_detected")
-    embedding = getattr(detected["selected_face"], "embedding", None)
-    if embedding is None:
-        raise FaceRecognitionValidationError("no_face_detected")
-    return _normalize_embedding(embedding)
+    return generate_embeddings([image_file])[0]
 
 
 def encrypt_embeddings(embeddings: Iterable[Iterable[float]]) -> str:
@@ -170,23 +219,15 @@ def decrypt_embeddings(payload: str) -> List[List[float]]:
 
 
 def compare_embeddings(saved_embedding, new_embedding) -> float:
-    saved = list(saved_embedding or [])
-    new = [float(value) for value in (new_embedding or [])]
-    if saved and isinstance(saved[0], (list, tuple)):
-        length = len(saved[0])
-        if not length:
+    saved = np.asarray(list(saved_embedding or []), dtype=np.float32)
+    new = np.asarray(list(new_embedding or []), dtype=np.float32)
+    if saved.ndim == 2:
+        if not saved.shape[1]:
             return 0.0
-        saved = [
-            sum(float(row[index]) for row in saved) / float(len(saved))
-            for index in range(length)
-        ]
-    else:
-        saved = [float(value) for value in saved]
-    if not saved or not new or len(saved) != len(new):
+        saved = saved.mean(axis=0)
+    if not saved.size or not new.size or saved.shape != new.shape:
         return 0.0
-    saved = _normalize_embedding(saved)
-    new = _normalize_embedding(new)
-    cosine_similarity = float(sum(left * right for left, right in zip(saved, new)))
+    cosine_similarity = float(np.dot(_unit_vector(saved), _unit_vector(new)))
     return max(0.0, min(1.0, cosine_similarity))
 
 
@@ -11,9 +11,11 @@ urlpatterns = [
     path("rules/<int:rule_id>", api_views.automation_rule_detail_api, name="wa_rule_detail_api"),
     path("marketing/contacts", api_views.marketing_contacts_api, name="wa_marketing_contacts_api"),
     path("marketing/contacts/import-csv", api_views.marketing_contacts_import_csv_api, name="wa_marketing_contacts_import_csv_api"),
+    path("marketing/contacts/imports/<int:import_id>", api_views.marketing_contact_import_detail_api, name="wa_marketing_contact_import_detail_api"),
     path("marketing/contacts/opt-out", api_views.marketing_contacts_opt_out_api, name="wa_marketing_contacts_opt_out_api"),
     path("marketing/contacts/<int:contact_id>", api_views.marketing_contact_detail_api, name="wa_marketing_contact_detail_api"),
     path("marketing/campaigns", api_views.marketing_campaigns_api, name="wa_marketing_campaigns_api"),
+    path("marketing/campaigns/<int:campaign_id>", api_views.marketing_campaign_detail_api, name="wa_marketing_campaign_detail_api"),
     path("marketing/campaigns/<int:campaign_id>/retry-failed", api_views.marketing_campaign_retry_failed_api, name="wa_marketing_campaign_retry_failed_api"),
     path("preview-reply", api_views.automation_preview_reply, name="wa_preview_reply_api"),
     path("catalogue/page", api_views.catalogue_page_settings_api, name="wa_catalogue_page_settings_api"),
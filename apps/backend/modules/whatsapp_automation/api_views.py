@@ -7,7 +7,10 @@ import base64
 import uuid
 import mimetypes
 import os
-from datetime import timedelta
+import threading
+from datetime import datetime, timedelta
+
+from django.conf import settings
 
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
@@ -44,20 +47,20 @@ from .models import (
     MarketingCampaign,
     MarketingCampaignDelivery,
     MarketingContact,
+    MarketingContactImport,
     WhatsappSettings,
 )
-from apps.backend.common_auth.utils.whatsapp import send_whatsapp_message
+from .campaign_dispatch import failure_rate_guard, normalize_phone_number, queue_campaign, requeue_failed_deliveries
+from .card_visits import flush_card_visits, get_visit_summary
+from .contact_import import create_contact_import, get_import_settings, run_contact_import
+from .reply_matcher import match_reply_rule
+from .tasks import dispatch_campaign_task, run_contact_import_task
 
 
 def _get_org(request):
     return dashboard_views.get_active_org(request)
 
 
-def _cleanup_old_digital_card_visits(org):
-    cutoff = timezone.now() - timedelta(days=365)
-    DigitalCardVisit.objects.filter(organization=org, visited_at__lt=cutoff).delete()
-
-
 def _cleanup_old_feedback_enquiries(org):
     cutoff = timezone.now() - timedelta(days=365)
     DigitalCardFeedback.objects.filter(organization=org, created_at__lt=cutoff).delete()
@@ -380,6 +383,7 @@ def _rule_payload(obj):
     return {
         "id": obj.id,
         "keyword": obj.keyword or "",
+        "match_mode": obj.match_mode or AutomationRule.MATCH_CONTAINS,
         "reply_message": obj.reply_message or "",
         "is_default": bool(obj.is_default),
         "sort_order": obj.sort_order or 0,
@@ -387,13 +391,6 @@ def _rule_payload(obj):
     }
 
 
-def _normalize_phone_number(value):
-    digits = re.sub(r"\D", "", str(value or ""))
-    if len(digits) < 8 or len(digits) > 15:
-        return ""
-    return digits
-
-
 def _contact_payload(obj):
     return {
         "id": obj.id,
@@ -423,7 +420,13 @@ def _campaign_payload(obj):
         "sent_count": int(obj.sent_count or 0),
         "failed_count": int(obj.failed_count or 0),
         "skipped_count": int(obj.skipped_count or 0),
+        "queued_count": max(
+            0,
+            int(obj.total_contacts or 0) - int(obj.sent_count or 0) - int(obj.failed_count or 0) - int(obj.skipped_count or 0),
+        ),
         "compliance_note": obj.compliance_note or "",
+        "dispatch_started_at": obj.dispatch_started_at.isoformat() if obj.dispatch_started_at else "",
+        "dispatch_finished_at": obj.dispatch_finished_at.isoformat() if obj.dispatch_finished_at else "",
         "created_at": obj.created_at.isoformat() if obj.created_at else "",
         "updated_at": obj.updated_at.isoformat() if obj.updated_at else "",
     }
@@ -458,94 +461,38 @@ def _is_valid_template_name(value):
     return bool(re.fullmatch(r"[a-z0-9_]{3,180}", text))
 
 
-def _failure_rate_guard(org):
-    window_since = timezone.now() - timedelta(days=7)
-    qs = MarketingCampaignDelivery.objects.filter(organization=org, attempted_at__gte=window_since)
-    total = qs.count()
-    if total < 20:
-        return True, 0.0
-    failed = qs.filter(status=MarketingCampaignDelivery.STATUS_FAILED).count()
-    ratio = failed / float(total or 1)
-    return ratio <= 0.20, ratio
+def _run_in_background(task, *args):
+    broker_url = getattr(settings, "CELERY_BROKER_URL", "") or ""
+    if broker_url.startswith("memory://"):
+        threading.Thread(target=task, args=args, daemon=True).start()
+        return
+    task.delay(*args)
 
 
-def _campaign_send_to_contacts(campaign, contacts):
-    sent = 0
-    failed = 0
-    skipped = 0
-    for contact in contacts:
-        phone = _normalize_phone_number(contact.phone_number)
-        if not phone:
-            MarketingCampaignDelivery.objects.create(
-                campaign=campaign,
-                organization=campaign.organization,
-                contact=contact,
-                phone_number=contact.phone_number or "",
-                status=MarketingCampaignDelivery.STATUS_SKIPPED,
-                error_code="invalid_number",
-                error_message="Invalid phone number format.",
-            )
-            skipped += 1
-            continue
-        if not contact.is_opted_in or contact.has_opted_out:
-            MarketingCampaignDelivery.objects.create(
-                campaign=campaign,
-                organization=campaign.organization,
-                contact=contact,
-                phone_number=phone,
-                status=MarketingCampaignDelivery.STATUS_SKIPPED,
-                error_code="consent_required",
-                error_message="Contact is not eligible (opt-in required / opted-out).",
-            )
-            skipped += 1
-            continue
-        ok = send_whatsapp_message(
-            to=phone,
-            template_name=campaign.template_name,
-            variables=campaign.template_variables or [],
-        )
-        if ok:
-            MarketingCampaignDelivery.objects.create(
-                campaign=campaign,
-                organization=campaign.organization,
-                contact=contact,
-                phone_number=phone,
-                status=MarketingCampaignDelivery.STATUS_SENT,
-            )
-            contact.last_message_at = timezone.now()
-            contact.save(update_fields=["last_message_at", "updated_at"])
-            sent += 1
-        else:
-            MarketingCampaignDelivery.objects.create(
-                campaign=campaign,
-                organization=campaign.organization,
-                contact=contact,
-                phone_number=phone,
-                status=MarketingCampaignDelivery.STATUS_FAILED,
-                error_code="provider_send_failed",
-                error_message="WhatsApp template send failed.",
-            )
-            failed += 1
-    campaign.total_contacts = len(contacts)
-    campaign.sent_count = sent
-    campaign.failed_count = failed
-    campaign.skipped_count = skipped
-    if failed and sent:
-        campaign.status = MarketingCampaign.STATUS_PARTIAL
-    elif failed and not sent:
-        campaign.status = MarketingCampaign.STATUS_FAILED
-    elif sent and not failed:
-        campaign.status = MarketingCampaign.STATUS_SENT
-    else:
-        campaign.status = MarketingCampaign.STATUS_BLOCKED
-    campaign.save(update_fields=[
-        "total_contacts",
-        "sent_count",
-        "failed_count",
-        "skipped_count",
-        "status",
-        "updated_at",
-    ])
+def _start_campaign_dispatch(campaign):
+    _run_in_background(dispatch_campaign_task, campaign.id)
+
+
+def _start_contact_import(job):
+    _run_in_background(run_contact_import_task, job.id)
+
+
+def _contact_import_payload(obj):
+    return {
+        "id": obj.id,
+        "status": obj.status or MarketingContactImport.STATUS_QUEUED,
+        "filename": obj.original_filename or "",
+        "size_bytes": int(obj.size_bytes or 0),
+        "processed_rows": int(obj.processed_rows or 0),
+        "created": int(obj.created_count or 0),
+        "updated": int(obj.updated_count or 0),
+        "skipped": int(obj.skipped_count or 0),
+        "row_errors": obj.row_errors or [],
+        "error_message": obj.error_message or "",
+        "started_at": obj.started_at.isoformat() if obj.started_at else "",
+        "finished_at": obj.finished_at.isoformat() if obj.finished_at else "",
+        "created_at": obj.created_at.isoformat() if obj.created_at else "",
+    }
 
 
 def _catalogue_payload(obj):
@@ -1110,7 +1057,11 @@ def automation_rules_api(request):
             },
             status=400,
         )
+    match_mode = str(data.get("match_mode") or rule.match_mode or AutomationRule.MATCH_CONTAINS).strip().lower()
+    if match_mode not in dict(AutomationRule.MATCH_MODE_CHOICES):
+        return JsonResponse({"match_mode": ["invalid_choice"]}, status=400)
     rule.keyword = keyword
+    rule.match_mode = match_mode
     rule.reply_message = reply_message
     rule.is_default = _to_bool(data.get("is_default", False), default=False)
     rule.sort_order = int(data.get("sort_order") or 0)
@@ -1153,7 +1104,7 @@ def marketing_contacts_api(request):
     data = _json_body(request)
     if data is None:
         return JsonResponse({"error": "invalid_json"}, status=400)
-    phone = _normalize_phone_number(data.get("phone_number"))
+    phone = normalize_phone_number(data.get("phone_number"))
     if not phone:
         return JsonResponse({"phone_number": ["invalid"]}, status=400)
     name = str(data.get("name") or "").strip()[:160]
@@ -1207,7 +1158,7 @@ def marketing_contact_detail_api(request, contact_id):
     if "name" in data:
         row.name = str(data.get("name") or "").strip()[:160]
     if "phone_number" in data:
-        phone = _normalize_phone_number(data.get("phone_number"))
+        phone = normalize_phone_number(data.get("phone_number"))
         if not phone:
             return JsonResponse({"phone_number": ["invalid"]}, status=400)
         exists = MarketingContact.objects.filter(organization=org, phone_number=phone).exclude(id=row.id).exists()
@@ -1251,7 +1202,7 @@ def marketing_contacts_opt_out_api(request):
     data = _json_body(request)
     if data is None:
         return JsonResponse({"error": "invalid_json"}, status=400)
-    phone = _normalize_phone_number(data.get("phone_number"))
+    phone = normalize_phone_number(data.get("phone_number"))
     if not phone:
         return JsonResponse({"phone_number": ["invalid"]}, status=400)
     reason = str(data.get("reason") or "STOP").strip()[:160] or "STOP"
@@ -1274,51 +1225,41 @@ def marketing_contacts_import_csv_api(request):
         return JsonResponse({"error": "organization_required", "redirect": "/select-organization/"}, status=403)
     if not _is_org_admin_user(request.user):
         return HttpResponseForbidden("Access denied.")
-    data = _json_body(request)
-    if data is None:
-        return JsonResponse({"error": "invalid_json"}, status=400)
-    csv_text = str(data.get("csv_text") or "")
-    if not csv_text.strip():
-        return JsonResponse({"csv_text": ["required"]}, status=400)
-    reader = csv.DictReader(io.StringIO(csv_text))
-    created = 0
-    updated = 0
-    skipped = 0
-    for item in reader:
-        if not isinstance(item, dict):
-            skipped += 1
-            continue
-        phone = _normalize_phone_number(item.get("phone_number") or item.get("phone") or item.get("mobile"))
-        if not phone:
-            skipped += 1
-            continue
-        name = str(item.get("name") or "").strip()[:160]
-        email = str(item.get("email") or "").strip()
-        tags = str(item.get("tags") or "").strip()[:240]
-        raw_opt_in = str(item.get("is_opted_in") or item.get("opt_in") or "false").strip().lower()
-        is_opted_in = raw_opt_in in {"true", "1", "yes", "y"}
-        opt_in_source = str(item.get("opt_in_source") or "csv_import").strip()[:120]
-        consent_note = str(item.get("consent_note") or "").strip()
-        row, was_created = MarketingContact.objects.get_or_create(
-            organization=org,
-            phone_number=phone,
-            defaults={"name": name},
-        )
-        row.name = name or row.name
-        row.email = email
-        row.tags = tags
-        row.opt_in_source = opt_in_source
-        row.consent_note = consent_note
-        if is_opted_in and not row.has_opted_out:
-            row.is_opted_in = True
-            if not row.opt_in_at:
-                row.opt_in_at = timezone.now()
-        row.save()
-        if was_created:
-            created += 1
-        else:
-            updated += 1
-    return JsonResponse({"status": "ok", "created": created, "updated": updated, "skipped": skipped})
+    upload = request.FILES.get("file")
+    if upload is None:
+        data = _json_body(request)
+        if data is None:
+            return JsonResponse({"error": "invalid_json"}, status=400)
+        csv_text = str(data.get("csv_text") or "")
+        if not csv_text.strip():
+            return JsonResponse({"csv_text": ["required"]}, status=400)
+        upload = ContentFile(csv_text.encode("utf-8"), name="contacts.csv")
+    job = create_contact_import(org, request.user, upload, getattr(upload, "name", ""))
+    if job.size_bytes <= get_import_settings()["inline_max_bytes"]:
+        job = run_contact_import(job.id) or job
+        if job.status == MarketingContactImport.STATUS_FAILED:
+            return JsonResponse({"error": "import_failed", "job": _contact_import_payload(job)}, status=500)
+        return JsonResponse({
+            "status": "ok",
+            "created": job.created_count,
+            "updated": job.updated_count,
+            "skipped": job.skipped_count,
+            "job": _contact_import_payload(job),
+        })
+    _start_contact_import(job)
+    return JsonResponse({"status": "queued", "job": _contact_import_payload(job)}, status=202)
+
+
+@login_required
+@require_http_methods(["GET"])
+def marketing_contact_import_detail_api(request, import_id):
+    org = _get_org(request)
+    if not org:
+        return JsonResponse({"error": "organization_required", "redirect": "/select-organization/"}, status=403)
+    job = MarketingContactImport.objects.filter(id=import_id, organization=org).first()
+    if not job:
+        return JsonResponse({"error": "not_found"}, status=404)
+    return JsonResponse({"job": _contact_import_payload(job)})
 
 
 @login_required
@@ -1382,7 +1323,7 @@ def marketing_campaigns_api(request):
     contacts = list(contacts_qs.order_by("id"))
     if not contacts:
         return JsonResponse({"contact_ids": ["no_contacts_selected"]}, status=400)
-    allowed_to_send, ratio = _failure_rate_guard(org)
+    allowed_to_send, ratio = failure_rate_guard(org)
     campaign = MarketingCampaign.objects.create(
         organization=org,
         name=name,
@@ -1409,7 +1350,20 @@ def marketing_campaigns_api(request):
             },
             status=400,
         )
-    _campaign_send_to_contacts(campaign, contacts)
+    queue_campaign(campaign, contacts)
+    _start_campaign_dispatch(campaign)
+    return JsonResponse({"campaign": _campaign_payload(campaign), "status": "queued"}, status=202)
+
+
+@login_required
+@require_http_methods(["GET"])
+def marketing_campaign_detail_api(request, campaign_id):
+    org = _get_org(request)
+    if not org:
+        return JsonResponse({"error": "organization_required", "redirect": "/select-organization/"}, status=403)
+    campaign = MarketingCampaign.objects.filter(id=campaign_id, organization=org).first()
+    if not campaign:
+        return JsonResponse({"error": "not_found"}, status=404)
     return JsonResponse({"campaign": _campaign_payload(campaign)})
 
 
@@ -1424,23 +1378,18 @@ def marketing_campaign_retry_failed_api(request, campaign_id):
     campaign = MarketingCampaign.objects.filter(id=campaign_id, organization=org).first()
     if not campaign:
         return JsonResponse({"error": "not_found"}, status=404)
-    allowed_to_send, ratio = _failure_rate_guard(org)
+    allowed_to_send, ratio = failure_rate_guard(org)
     if not allowed_to_send:
         return JsonResponse(
             {"error": "blocked", "detail": f"Retry blocked due to high failure rate ({round(ratio * 100, 1)}%)."},
             status=400,
         )
-    failed_contact_ids = list(
-        MarketingCampaignDelivery.objects
-        .filter(campaign=campaign, status=MarketingCampaignDelivery.STATUS_FAILED, contact__isnull=False)
-        .values_list("contact_id", flat=True)
-        .distinct()
-    )
-    contacts = list(MarketingContact.objects.filter(organization=org, id__in=failed_contact_ids))
-    if not contacts:
+    if campaign.status in (MarketingCampaign.STATUS_QUEUED, MarketingCampaign.STATUS_SENDING):
+        return JsonResponse({"error": "campaign_in_progress", "campaign": _campaign_payload(campaign)}, status=409)
+    if not requeue_failed_deliveries(campaign):
         return JsonResponse({"status": "ok", "detail": "No failed contacts to retry.", "campaign": _campaign_payload(campaign)})
-    _campaign_send_to_contacts(campaign, contacts)
-    return JsonResponse({"status": "ok", "campaign": _campaign_payload(campaign)})
+    _start_campaign_dispatch(campaign)
+    return JsonResponse({"status": "queued", "campaign": _campaign_payload(campaign)}, status=202)
 
 
 @login_required
@@ -1458,17 +1407,7 @@ def automation_preview_reply(request):
     company_profile = CompanyProfile.objects.filter(organization=org).first()
     if not settings_obj.auto_reply_enabled:
         return JsonResponse({"reply": "", "matched_rule": None, "auto_reply_enabled": False})
-    rules = list(AutomationRule.objects.filter(organization=org, is_active=True))
-    matched = None
-    lower_incoming = incoming.lower()
-    if lower_incoming:
-        for rule in rules:
-            keyword = (rule.keyword or "").strip().lower()
-            if keyword and keyword in lower_incoming:
-                matched = rule
-                break
-    if not matched:
-        matched = next((rule for rule in rules if rule.is_default), None)
+    matched = match_reply_rule(org, incoming)
     if matched:
         return JsonResponse({
             "reply": matched.reply_message or "",
@@ -2027,13 +1966,13 @@ def digital_card_visitor_analytics_api(request):
     org = _get_org(request)
     if not org:
         return JsonResponse({"error": "organization_required", "redirect": "/select-organization/"}, status=403)
-    _cleanup_old_digital_card_visits(org)
+    flush_card_visits()
     range_key = str(request.GET.get("range") or "week").strip().lower()
     if range_key not in {"day", "week", "month"}:
         range_key = "week"
     days_map = {"day": 1, "week": 7, "month": 30}
-    now = timezone.now()
-    start_at = now - timedelta(days=days_map[range_key])
+    start_day = timezone.localdate() - timedelta(days=days_map[range_key] - 1)
+    start_at = timezone.make_aware(datetime.combine(start_day, datetime.min.time()))
 
     query = str(request.GET.get("q") or "").strip()
     try:
@@ -2056,18 +1995,24 @@ def digital_card_visitor_analytics_api(request):
             | Q(public_slug__icontains=query)
         )
 
-    total_visits = base_qs.count()
-    unique_visitors = base_qs.exclude(visitor_key="").values("visitor_key").distinct().count()
-    if not unique_visitors:
-        unique_visitors = base_qs.exclude(visitor_ip="").values("visitor_ip").distinct().count()
-
-    chart_rows = (
-        base_qs
-        .annotate(day=TruncDate("visited_at"))
-        .values("day")
-        .annotate(visits=Count("id"))
-        .order_by("day")
-    )
+    if query:
+        # Free-text search needs the raw visit fields; unfiltered views read rollups only.
+        total_visits = base_qs.count()
+        unique_visitors = base_qs.exclude(visitor_key="").values("visitor_key").distinct().count()
+        if not unique_visitors:
+            unique_visitors = base_qs.exclude(visitor_ip="").values("visitor_ip").distinct().count()
+        chart_rows = (
+            base_qs
+            .annotate(day=TruncDate("visited_at"))
+            .values("day")
+            .annotate(visits=Count("id"))
+            .order_by("day")
+        )
+    else:
+        summary = get_visit_summary(org, start_day)
+        total_visits = summary["total_visits"]
+        unique_visitors = summary["unique_visitors"]
+        chart_rows = summary["chart"]
     chart = [
         {
             "day": row["day"].isoformat() if row.get("day") else "",
@@ -0,0 +1,336 @@
+"""
+Queued WhatsApp campaign delivery.
+
+Creating a campaign only writes one queued delivery row per contact. A background
+dispatcher then drains the queue in batches: messages go out concurrently over
+pooled keep-alive sessions, paced per sending number, and each batch's results
+are written back with a handful of bulk statements so progress is visible live.
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from apps.backend.common_auth.utils.whatsapp import get_cloud_api_config, post_template_message
+
+from .models import MarketingCampaign, MarketingCampaignDelivery, MarketingContact
+
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {0, 429, 500, 502, 503, 504}
+MAX_RETRY_DELAY_SECONDS = 30.0
+
+
+def get_dispatch_settings():
+    return {
+        "workers": max(1, int(getattr(settings, "WHATSAPP_CAMPAIGN_WORKERS", 8))),
+        "batch_size": max(1, int(getattr(settings, "WHATSAPP_CAMPAIGN_BATCH_SIZE", 200))),
+        "rate_per_second": float(getattr(settings, "WHATSAPP_CAMPAIGN_RATE_PER_SECOND", 20)),
+        "max_retries": max(0, int(getattr(settings, "WHATSAPP_CAMPAIGN_MAX_RETRIES", 2))),
+        "lease_seconds": int(getattr(settings, "WHATSAPP_CAMPAIGN_DISPATCH_LEASE_SECONDS", 300)),
+    }
+
+
+def normalize_phone_number(value):
+    digits = re.sub(r"\D", "", str(value or ""))
+    if len(digits) < 8 or len(digits) > 15:
+        return ""
+    return digits
+
+
+class _RateLimiter:
+    """Spaces calls evenly at `rate_per_second` across every thread sharing it."""
+
+    def __init__(self, rate_per_second):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_at)
+            self.next_at = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def _rate_limiter_for(phone_number_id, rate_per_second):
+    # One limiter per sending number, shared by every campaign this process runs.
+    key = (phone_number_id, rate_per_second)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = _RateLimiter(rate_per_second)
+        return limiter
+
+
+def _retry_delay(attempt, response_text):
+    try:
+        hinted = float(json.loads(response_text or "{}").get("retry_after") or 0)
+    except (TypeError, ValueError, AttributeError):
+        hinted = 0
+    return min(MAX_RETRY_DELAY_SECONDS, max(hinted, 0.5 * (2 ** attempt)))
+
+
+def _send_one(config, limiter, max_retries, phone, template_name, variables):
+    """Runs in a worker thread; no DB access. Returns (status, error_code, error_message)."""
+    attempt = 0
+    while True:
+        limiter.wait()
+        status_code, response_text = post_template_message(config, phone, template_name, variables)
+        if 200 <= status_code < 300:
+            return MarketingCampaignDelivery.STATUS_SENT, "", ""
+        if status_code not in RETRYABLE_STATUS_CODES or attempt >= max_retries:
+            break
+        time.sleep(_retry_delay(attempt, response_text))
+        attempt += 1
+    if status_code == 0:
+        return MarketingCampaignDelivery.STATUS_FAILED, "provider_unreachable", f"WhatsApp Cloud API unreachable: {response_text}"[:1000]
+    return (
+        MarketingCampaignDelivery.STATUS_FAILED,
+        "provider_send_failed",
+        f"WhatsApp template send failed (HTTP {status_code}): {response_text}"[:1000],
+    )
+
+
+def failure_rate_guard(org):
+    window_since = timezone.now() - timedelta(days=7)
+    stats = (
+        MarketingCampaignDelivery.objects
+        .filter(organization=org, attempted_at__gte=window_since)
+        .exclude(status=MarketingCampaignDelivery.STATUS_QUEUED)
+        .aggregate(
+            total=Count("id"),
+            failed=Count("id", filter=Q(status=MarketingCampaignDelivery.STATUS_FAILED)),
+        )
+    )
+    total = int(stats["total"] or 0)
+    if total < 20:
+        return True, 0.0
+    ratio = int(stats["failed"] or 0) / float(total or 1)
+    return ratio <= 0.20, ratio
+
+
+def refresh_campaign_progress(campaign, finished=False):
+    """Recompute counters from delivery rows in one grouped query and save them."""
+    counts = dict(
+        MarketingCampaignDelivery.objects
+        .filter(campaign=campaign)
+        .order_by()
+        .values_list("status")
+        .annotate(total=Count("id"))
+    )
+    sent = counts.get(MarketingCampaignDelivery.STATUS_SENT, 0)
+    failed = counts.get(MarketingCampaignDelivery.STATUS_FAILED, 0)
+    campaign.total_contacts = sum(counts.values())
+    campaign.sent_count = sent
+    campaign.failed_count = failed
+    campaign.skipped_count = counts.get(MarketingCampaignDelivery.STATUS_SKIPPED, 0)
+    update_fields = ["total_contacts", "sent_count", "failed_count", "skipped_count", "updated_at"]
+    if finished:
+        if failed and sent:
+            campaign.status = MarketingCampaign.STATUS_PARTIAL
+        elif failed and not sent:
+            campaign.status = MarketingCampaign.STATUS_FAILED
+        elif sent and not failed:
+            campaign.status = MarketingCampaign.STATUS_SENT
+        else:
+            campaign.status = MarketingCampaign.STATUS_BLOCKED
+        campaign.dispatch_finished_at = timezone.now()
+        update_fields += ["status", "dispatch_finished_at"]
+    campaign.save(update_fields=update_fields)
+    return campaign
+
+
+def queue_campaign(campaign, contacts):
+    """Write one queued delivery per contact and hand the campaign to the dispatcher."""
+    rows = [
+        MarketingCampaignDelivery(
+            campaign=campaign,
+            organization_id=campaign.organization_id,
+            contact=contact,
+            phone_number=normalize_phone_number(contact.phone_number) or (contact.phone_number or "")[:40],
+            status=MarketingCampaignDelivery.STATUS_QUEUED,
+        )
+        for contact in contacts
+    ]
+    with transaction.atomic():
+        MarketingCampaignDelivery.objects.bulk_create(rows, batch_size=1000)
+        campaign.status = MarketingCampaign.STATUS_QUEUED
+        campaign.dispatch_finished_at = None
+        campaign.save(update_fields=["status", "dispatch_finished_at", "updated_at"])
+        refresh_campaign_progress(campaign)
+    return len(rows)
+
+
+def requeue_failed_deliveries(campaign):
+    """Put failed deliveries back on the queue; returns how many were requeued."""
+    with transaction.atomic():
+        requeued = (
+            MarketingCampaignDelivery.objects
+            .filter(campaign=campaign, status=MarketingCampaignDelivery.STATUS_FAILED, contact__isnull=False)
+            .update(status=MarketingCampaignDelivery.STATUS_QUEUED, error_code="", error_message="")
+        )
+        if requeued:
+            campaign.status = MarketingCampaign.STATUS_QUEUED
+            campaign.dispatch_finished_at = None
+            campaign.save(update_fields=["status", "dispatch_finished_at", "updated_at"])
+            refresh_campaign_progress(campaign)
+    return requeued
+
+
+def _claim_campaign(campaign_id, lease_seconds):
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=lease_seconds)
+    claimable = Q(status=MarketingCampaign.STATUS_QUEUED) | Q(
+        Q(dispatch_heartbeat_at__isnull=True) | Q(dispatch_heartbeat_at__lt=stale_before),
+        status=MarketingCampaign.STATUS_SENDING,
+    )
+    claimed = (
+        MarketingCampaign.objects
+        .filter(claimable, id=campaign_id)
+        .update(status=MarketingCampaign.STATUS_SENDING, dispatch_heartbeat_at=now, updated_at=now)
+    )
+    if not claimed:
+        return None
+    MarketingCampaign.objects.filter(id=campaign_id, dispatch_started_at__isnull=True).update(dispatch_started_at=now)
+    return MarketingCampaign.objects.select_related("organization").get(id=campaign_id)
+
+
+def _skip_reason(delivery):
+    contact = delivery.contact
+    if contact is None:
+        return "contact_removed", "Contact was deleted before the message was sent."
+    if not normalize_phone_number(contact.phone_number):
+        return "invalid_number", "Invalid phone number format."
+    if not contact.is_opted_in or contact.has_opted_out:
+        return "consent_required", "Contact is not eligible (opt-in required / opted-out)."
+    return None
+
+
+def _process_batch(campaign, deliveries, config, executor, limiter, max_retries):
+    now = timezone.now()
+    to_send = []
+    for delivery in deliveries:
+        delivery.attempted_at = now
+        reason = _skip_reason(delivery)
+        if reason:
+            delivery.status = MarketingCampaignDelivery.STATUS_SKIPPED
+            delivery.error_code, delivery.error_message = reason
+        elif not config["access_token"] or not config["phone_number_id"]:
+            delivery.status = MarketingCampaignDelivery.STATUS_FAILED
+            delivery.error_code = "provider_not_configured"
+            delivery.error_message = "WhatsApp Cloud API credentials are not configured."
+        else:
+            delivery.phone_number = normalize_phone_number(delivery.contact.phone_number)
+            to_send.append(delivery)
+
+    variables = campaign.template_variables or []
+    futures = [
+        executor.submit(_send_one, config, limiter, max_retries, delivery.phone_number, campaign.template_name, variables)
+        for delivery in to_send
+    ]
+    for delivery, future in zip(to_send, futures):
+        delivery.status, delivery.error_code, delivery.error_message = future.result()
+
+    finished_at = timezone.now()
+    sent_contact_ids = [
+        delivery.contact_id for delivery in to_send if delivery.status == MarketingCampaignDelivery.STATUS_SENT
+    ]
+    with transaction.atomic():
+        MarketingCampaignDelivery.objects.bulk_update(
+            deliveries,
+            ["status", "phone_number", "error_code", "error_message", "attempted_at"],
+            batch_size=500,
+        )
+        if sent_contact_ids:
+            MarketingContact.objects.filter(id__in=sent_contact_ids).update(
+                last_message_at=finished_at,
+                updated_at=finished_at,
+            )
+        campaign.dispatch_heartbeat_at = finished_at
+        campaign.save(update_fields=["dispatch_heartbeat_at", "updated_at"])
+        refresh_campaign_progress(campaign)
+
+
+def dispatch_campaign(campaign_id, max_batches=None):
+    """
+    Drain a campaign's queued deliveries. Only one dispatcher holds a campaign at a
+    time; a dispatcher that stops heartbeating loses its claim after the lease.
+    """
+    config_values = get_dispatch_settings()
+    campaign = _claim_campaign(campaign_id, config_values["lease_seconds"])
+    if campaign is None:
+        return {"status": "not_claimed", "campaign_id": campaign_id}
+
+    config = get_cloud_api_config()
+    limiter = _rate_limiter_for(config["phone_number_id"], config_values["rate_per_second"])
+    batches = 0
+    queued = (
+        MarketingCampaignDelivery.objects
+        .filter(campaign=campaign, status=MarketingCampaignDelivery.STATUS_QUEUED)
+        .select_related("contact")
+        .order_by("id")
+    )
+    try:
+        with ThreadPoolExecutor(max_workers=config_values["workers"]) as executor:
+            while max_batches is None or batches < max_batches:
+                deliveries = list(queued[:config_values["batch_size"]])
+                if not deliveries:
+                    break
+                _process_batch(campaign, deliveries, config, executor, limiter, config_values["max_retries"])
+                batches += 1
+    except Exception:
+        logger.exception("WhatsApp campaign dispatch failed campaign=%s", campaign_id)
+        # Leave the campaign claimable again immediately instead of waiting out the lease.
+        MarketingCampaign.objects.filter(id=campaign.id).update(status=MarketingCampaign.STATUS_QUEUED)
+        raise
+
+    remaining = queued.exists()
+    if remaining:
+        MarketingCampaign.objects.filter(id=campaign.id).update(status=MarketingCampaign.STATUS_QUEUED)
+    else:
+        refresh_campaign_progress(campaign, finished=True)
+    return {
+        "status": "queued" if remaining else campaign.status,
+        "campaign_id": campaign.id,
+        "batches": batches,
+        "sent": campaign.sent_count,
+        "failed": campaign.failed_count,
+        "skipped": campaign.skipped_count,
+    }
+
+
+def dispatch_pending_campaigns(limit=20):
+    """Pick up queued campaigns and ones whose dispatcher stopped heartbeating."""
+    stale_before = timezone.now() - timedelta(seconds=get_dispatch_settings()["lease_seconds"])
+    campaign_ids = list(
+        MarketingCampaign.objects
+        .filter(
+            Q(status=MarketingCampaign.STATUS_QUEUED)
+            | Q(
+                Q(dispatch_heartbeat_at__isnull=True) | Q(dispatch_heartbeat_at__lt=stale_before),
+                status=MarketingCampaign.STATUS_SENDING,
+            )
+        )
+        .order_by("updated_at")
+        .values_list("id", flat=True)[:limit]
+    )
+    return [dispatch_campaign(campaign_id) for campaign_id in campaign_ids]
@@ -0,0 +1,162 @@
+"""
+Cached routing and rendering for public digital cards.
+
+Custom-domain lookups go through a host map kept per process and in the shared
+cache, including "no card" answers, so the main site's "/" never reaches the
+database. Rendered card pages are cached per URL and stamped with the owning
+org's card version; any save to the card or the data it shows bumps that
+version. Visits are still recorded for every hit, but the view counter printed
+on a cached page can lag by up to the page cache TTL.
+
+Version bumps only reach other workers through a shared cache. With the
+per-process fallback, host lookups and pages are kept for at most
+WHATSAPP_CARD_LOCAL_CACHE_SECONDS, so a domain or card change made in another
+worker shows up within that time.
+"""
+
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from core.cache_utils import local_snapshot_max_age
+from .models import DigitalCardEntry
+
+
+VERSION_TTL_SECONDS = 7 * 24 * 3600
+HOST_VERSION_KEY = "wa:card_hosts:version"
+# Signed storage URLs on the page expire after 15 minutes; never outlive them.
+MAX_PAGE_CACHE_SECONDS = 600
+ROUTING_FIELDS = {"public_slug", "custom_domain", "custom_domain_active", "is_active"}
+
+
+def _local_max_age():
+    return local_snapshot_max_age("WHATSAPP_CARD_LOCAL_CACHE_SECONDS")
+
+
+def _bounded_seconds(seconds):
+    max_age = _local_max_age()
+    return seconds if max_age is None else min(seconds, int(max_age))
+
+
+def _host_cache_seconds():
+    return int(getattr(settings, "WHATSAPP_CARD_HOST_CACHE_SECONDS", 3600))
+
+
+def _host_map_size():
+    return int(getattr(settings, "WHATSAPP_CARD_HOST_MAP_SIZE", 4096))
+
+
+def _page_cache_seconds():
+    return _bounded_seconds(min(MAX_PAGE_CACHE_SECONDS, int(getattr(settings, "WHATSAPP_CARD_PAGE_CACHE_SECONDS", 300))))
+
+
+def _current_version(key):
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(key, version, VERSION_TTL_SECONDS):
+            version = cache.get(key) or version
+    return version
+
+
+def _page_version_key(org_id):
+    return f"wa:card_page:version:{org_id}"
+
+
+_hosts = OrderedDict()
+_hosts_lock = threading.Lock()
+
+
+def invalidate_card_hosts():
+    cache.set(HOST_VERSION_KEY, uuid.uuid4().hex, VERSION_TTL_SECONDS)
+
+
+def invalidate_card_pages(org_id):
+    if org_id:
+        cache.set(_page_version_key(org_id), uuid.uuid4().hex, VERSION_TTL_SECONDS)
+
+
+def resolve_card_host(host):
+    """Public slug of the active card mapped to `host`, or None."""
+    version = _current_version(HOST_VERSION_KEY)
+    max_age = _local_max_age()
+    with _hosts_lock:
+        cached = _hosts.get(host)
+        if cached and cached[0] == version and (max_age is None or time.monotonic() - cached[2] < max_age):
+            _hosts.move_to_end(host)
+            return cached[1] or None
+    # A per-process cache would only duplicate the host map, with a longer lifetime.
+    shared_key = f"wa:card_host:{version}:{host}" if max_age is None else None
+    slug = cache.get(shared_key) if shared_key else None
+    if slug is None:
+        slug = (
+            DigitalCardEntry.objects
+            .filter(custom_domain=host, custom_domain_active=True, is_active=True)
+            .values_list("public_slug", flat=True)
+            .first()
+        ) or ""
+        if shared_key:
+            cache.set(shared_key, slug, _host_cache_seconds())
+    with _hosts_lock:
+        _hosts[host] = (version, slug, time.monotonic())
+        _hosts.move_to_end(host)
+        while len(_hosts) > _host_map_size():
+            _hosts.popitem(last=False)
+    return slug or None
+
+
+def _page_key(public_slug, canonical_url):
+    # canonical_url has no query string: ?utm_... and ?fbclid=... share one entry and cannot flood the cache.
+    digest = hashlib.sha1(f"{public_slug}|{canonical_url}".encode("utf-8")).hexdigest()
+    return f"wa:card_page:{digest}"
+
+
+def get_cached_card_page(public_slug, canonical_url):
+    if _page_cache_seconds() <= 0:
+        return None
+    entry = cache.get(_page_key(public_slug, canonical_url))
+    if not entry or entry["version"] != _current_version(_page_version_key(entry["org_id"])):
+        return None
+    return entry
+
+
+def cache_card_page(public_slug, canonical_url, *, org, card_entry, response):
+    """Store a rendered 200 card page; returns the cache entry or None when not cacheable."""
+    org_id = getattr(org, "id", None)
+    if _page_cache_seconds() <= 0 or not org_id or response.status_code != 200:
+        return None
+    html = response.content
+    entry = {
+        "version": _current_version(_page_version_key(org_id)),
+        "org_id": org_id,
+        "card_entry_id": getattr(card_entry, "id", None),
+        "content": html,
+        "content_type": response.get("Content-Type", "text/html; charset=utf-8"),
+        "etag": quote_etag(hashlib.sha1(html).hexdigest()),
+        "last_modified": int(timezone.now().timestamp()),
+    }
+    cache.set(_page_key(public_slug, canonical_url), entry, _page_cache_seconds())
+    return entry
+
+
+def card_page_response(request, entry):
+    """Serve a cached page, answering conditional requests with 304."""
+    response = HttpResponse(entry["content"], content_type=entry["content_type"])
+    response["ETag"] = entry["etag"]
+    response["Last-Modified"] = http_date(entry["last_modified"])
+    response["Cache-Control"] = "public, max-age=0, must-revalidate"
+    return get_conditional_response(
+        request,
+        etag=entry["etag"],
+        last_modified=entry["last_modified"],
+        response=response,
+    )
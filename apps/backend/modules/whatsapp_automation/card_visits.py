@@ -0,0 +1,238 @@
+"""
+Buffered digital card visit collection.
+
+Public card views append to a per-process buffer instead of writing a row each.
+A background thread flushes it every few seconds; a view only flushes once the
+buffer is full (or on the interval when the thread is off). A flush writes the
+raw visits with one bulk INSERT, adds the hashed visitors to the per-card daily
+visitor sets, and bumps the per-card daily rollups with a multi-row UPSERT.
+Public view counts and analytics summaries read the rollups only. Old rows are
+removed by a scheduled purge rather than on every request.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from core.flush_utils import PeriodicFlusher
+from .models import DigitalCardDailyVisitor, DigitalCardVisit, DigitalCardVisitDaily
+
+
+logger = logging.getLogger(__name__)
+
+VISITOR_SET_RETENTION_DAYS = 35
+PURGE_BATCH_SIZE = 5000
+STATEMENT_ROWS = 1000
+
+
+def _flush_interval_seconds():
+    return float(getattr(settings, "WHATSAPP_CARD_VISIT_FLUSH_SECONDS", 10))
+
+
+def _flush_max_visits():
+    return int(getattr(settings, "WHATSAPP_CARD_VISIT_FLUSH_MAX_VISITS", 200))
+
+
+def _retention_days():
+    return int(getattr(settings, "WHATSAPP_CARD_VISIT_RETENTION_DAYS", 365))
+
+
+def card_key_for(card_entry=None, public_slug=""):
+    card_entry_id = getattr(card_entry, "id", card_entry)
+    if card_entry_id:
+        return str(card_entry_id)
+    return f"slug:{public_slug or ''}"[:240]
+
+
+class _VisitBuffer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.visits = []
+        self.last_flush = time.monotonic()
+
+    def append(self, visit):
+        with self.lock:
+            self.visits.append(visit)
+            return len(self.visits)
+
+    def pending_views(self, org_id, card_key):
+        with self.lock:
+            return sum(
+                1 for visit in self.visits
+                if visit.organization_id == org_id and card_key_for(visit.card_entry_id, visit.public_slug) == card_key
+            )
+
+    def drain(self):
+        with self.lock:
+            visits, self.visits = self.visits, []
+            self.last_flush = time.monotonic()
+        return visits
+
+    def restore(self, visits):
+        with self.lock:
+            self.visits[:0] = visits
+
+
+_buffer = _VisitBuffer()
+
+
+def record_card_visit(*, org, card_entry, public_slug, visitor_ip="", visitor_country="Unknown",
+                      visitor_key="", user_agent="", page_path="", page_url=""):
+    if not org:
+        return
+    size = _buffer.append(DigitalCardVisit(
+        organization_id=getattr(org, "id", org),
+        card_entry_id=getattr(card_entry, "id", card_entry),
+        public_slug=str(public_slug or "")[:220],
+        visitor_ip=str(visitor_ip or "")[:80],
+        visitor_country=str(visitor_country or "Unknown")[:120],
+        visitor_key=str(visitor_key or "")[:120],
+        user_agent=str(user_agent or "")[:400],
+        page_path=str(page_path or "")[:300],
+        page_url=str(page_url or "")[:2000],
+        visited_at=timezone.now(),
+    ))
+    _flusher.ensure_started()
+    if size >= _flush_max_visits() or (
+        not _flusher.running and time.monotonic() - _buffer.last_flush >= _flush_interval_seconds()
+    ):
+        if not connection.in_atomic_block:
+            flush_card_visits()
+
+
+def _apply_rollups(visits):
+    views = defaultdict(int)
+    cards = {}
+    visitors = set()
+    for visit in visits:
+        key = (visit.organization_id, card_key_for(visit.card_entry_id, visit.public_slug), timezone.localdate(visit.visited_at))
+        views[key] += 1
+        cards[key] = (visit.card_entry_id, visit.public_slug)
+        if visit.visitor_key:
+            visitors.add(key + (visit.visitor_key[:40],))
+
+    new_uniques = defaultdict(int)
+    visitor_rows = sorted(visitors)
+    with connection.cursor() as cursor:
+        for start in range(0, len(visitor_rows), STATEMENT_ROWS):
+            chunk = visitor_rows[start:start + STATEMENT_ROWS]
+            cursor.execute(
+                f"INSERT INTO {DigitalCardDailyVisitor._meta.db_table} (organization_id, card_key, day, visitor_hash) "
+                f"VALUES {', '.join(['(%s, %s, %s, %s)'] * len(chunk))} "
+                f"ON CONFLICT (organization_id, card_key, day, visitor_hash) DO NOTHING "
+                f"RETURNING organization_id, card_key, day",
+                [value for row in chunk for value in row],
+            )
+            for org_id, card_key, day in cursor.fetchall():
+                new_uniques[(org_id, card_key, day)] += 1
+
+    table = DigitalCardVisitDaily._meta.db_table
+    rollup_keys = sorted(views)
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        for start in range(0, len(rollup_keys), STATEMENT_ROWS):
+            chunk = rollup_keys[start:start + STATEMENT_ROWS]
+            params = []
+            for key in chunk:
+                card_entry_id, public_slug = cards[key]
+                params.extend([key[0], key[1], card_entry_id, public_slug, key[2], views[key], new_uniques.get(key, 0), now])
+            cursor.execute(
+                f"INSERT INTO {table} "
+                f"(organization_id, card_key, card_entry_id, public_slug, day, views, unique_visitors, updated_at) "
+                f"VALUES {', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s)'] * len(chunk))} "
+                f"ON CONFLICT (organization_id, card_key, day) DO UPDATE SET "
+                f"views = {table}.views + EXCLUDED.views, "
+                f"unique_visitors = {table}.unique_visitors + EXCLUDED.unique_visitors, "
+                f"updated_at = EXCLUDED.updated_at",
+                params,
+            )
+
+
+def flush_card_visits():
+    """Write buffered visits and their rollups; on failure the visits stay buffered."""
+    visits = _buffer.drain()
+    if not visits:
+        return 0
+    try:
+        with transaction.atomic():
+            DigitalCardVisit.objects.bulk_create(visits, batch_size=500)
+            _apply_rollups(visits)
+    except Exception:
+        logger.exception("Digital card visit flush failed; keeping %s visits buffered", len(visits))
+        for visit in visits:
+            visit.pk = None
+        _buffer.restore(visits)
+        return 0
+    return len(visits)
+
+
+_flusher = PeriodicFlusher("card-visits-flush", flush_card_visits, _flush_interval_seconds)
+
+
+def get_card_view_count(*, org, card_entry, public_slug):
+    if not org:
+        return 0
+    card_key = card_key_for(card_entry, public_slug)
+    total = (
+        DigitalCardVisitDaily.objects
+        .filter(organization=org, card_key=card_key)
+        .aggregate(total=Sum("views"))["total"]
+    ) or 0
+    return int(total) + _buffer.pending_views(org.id, card_key)
+
+
+def get_visit_summary(org, start_day):
+    """Views, exact uniques and a per-day chart for the org since `start_day`, from rollups only."""
+    rollups = DigitalCardVisitDaily.objects.filter(organization=org, day__gte=start_day)
+    chart_rows = list(rollups.order_by().values("day").annotate(visits=Sum("views")).order_by("day"))
+    unique_visitors = (
+        DigitalCardDailyVisitor.objects
+        .filter(organization=org, day__gte=start_day)
+        .aggregate(total=Count("visitor_hash", distinct=True))["total"]
+    ) or 0
+    return {
+        "total_visits": sum(int(row["visits"] or 0) for row in chart_rows),
+        "unique_visitors": int(unique_visitors),
+        "chart": chart_rows,
+    }
+
+
+def _delete_in_batches(queryset, batch_size=PURGE_BATCH_SIZE):
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by().values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += queryset.model.objects.filter(id__in=ids).delete()[0]
+
+
+def purge_card_visits():
+    """Drop raw visits and rollups past retention, and visitor sets no range query needs."""
+    flush_card_visits()
+    now = timezone.now()
+    visit_cutoff = now - timedelta(days=_retention_days())
+    return {
+        "visits": _delete_in_batches(DigitalCardVisit.objects.filter(visited_at__lt=visit_cutoff)),
+        "rollups": _delete_in_batches(DigitalCardVisitDaily.objects.filter(day__lt=visit_cutoff.date())),
+        "visitors": _delete_in_batches(
+            DigitalCardDailyVisitor.objects.filter(day__lt=(now - timedelta(days=VISITOR_SET_RETENTION_DAYS)).date())
+        ),
+    }
+
+
+def _flush_at_exit():
+    try:
+        flush_card_visits()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
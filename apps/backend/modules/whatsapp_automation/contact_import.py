@@ -0,0 +1,219 @@
+"""
+Streaming CSV import for marketing contacts.
+
+The upload is parked in object storage and read back line by line, so memory use
+does not grow with the file. Rows are normalized in batches and each batch costs
+two queries: one to read the existing contacts it touches and one multi-row
+UPSERT on (organization, phone_number).
+"""
+
+import codecs
+import csv
+import logging
+
+from django.conf import settings
+from django.utils import timezone
+
+from apps.backend.storage.storage_backend import build_storage_key, storage_delete, storage_open, storage_save
+
+from .campaign_dispatch import normalize_phone_number
+from .models import MarketingContact, MarketingContactImport
+
+
+logger = logging.getLogger(__name__)
+
+MAX_ROW_ERRORS = 500
+TRUTHY_VALUES = {"true", "1", "yes", "y"}
+UPSERT_FIELDS = [
+    "name",
+    "email",
+    "tags",
+    "opt_in_source",
+    "consent_note",
+    "is_opted_in",
+    "opt_in_at",
+    "updated_at",
+]
+
+
+def get_import_settings():
+    return {
+        "batch_size": max(1, int(getattr(settings, "WHATSAPP_CONTACT_IMPORT_BATCH_SIZE", 2000))),
+        "inline_max_bytes": int(getattr(settings, "WHATSAPP_CONTACT_IMPORT_INLINE_MAX_BYTES", 256 * 1024)),
+    }
+
+
+def _parse_row(item):
+    raw_phone = item.get("phone_number") or item.get("phone") or item.get("mobile") or ""
+    phone = normalize_phone_number(raw_phone)
+    if not phone:
+        return None, {"error": "invalid_phone_number", "value": str(raw_phone)[:40]}
+    raw_opt_in = str(item.get("is_opted_in") or item.get("opt_in") or "false").strip().lower()
+    return {
+        "phone_number": phone,
+        "name": str(item.get("name") or "").strip()[:160],
+        "email": str(item.get("email") or "").strip()[:254],
+        "tags": str(item.get("tags") or "").strip()[:240],
+        "is_opted_in": raw_opt_in in TRUTHY_VALUES,
+        "opt_in_source": str(item.get("opt_in_source") or "csv_import").strip()[:120],
+        "consent_note": str(item.get("consent_note") or "").strip(),
+    }, None
+
+
+def _merge(previous, current):
+    """Later rows for the same number win, but never clear a name or an opt-in."""
+    if previous is None:
+        return current
+    current["name"] = current["name"] or previous["name"]
+    current["is_opted_in"] = current["is_opted_in"] or previous["is_opted_in"]
+    return current
+
+
+def upsert_contacts(org, items):
+    """
+    Upsert one batch of parsed rows keyed by phone number. Existing opt-outs and
+    opt-in timestamps are preserved. Returns (created, updated).
+    """
+    if not items:
+        return 0, 0
+    existing = {
+        row["phone_number"]: row
+        for row in MarketingContact.objects
+        .filter(organization=org, phone_number__in=list(items))
+        .values("phone_number", "name", "is_opted_in", "has_opted_out", "opt_in_at")
+    }
+    now = timezone.now()
+    contacts = []
+    for phone, item in items.items():
+        current = existing.get(phone) or {}
+        is_opted_in = bool(current.get("is_opted_in"))
+        opt_in_at = current.get("opt_in_at")
+        if item["is_opted_in"] and not current.get("has_opted_out"):
+            is_opted_in = True
+            opt_in_at = opt_in_at or now
+        contacts.append(MarketingContact(
+            organization=org,
+            phone_number=phone,
+            name=item["name"] or current.get("name") or "",
+            email=item["email"],
+            tags=item["tags"],
+            opt_in_source=item["opt_in_source"],
+            consent_note=item["consent_note"],
+            is_opted_in=is_opted_in,
+            opt_in_at=opt_in_at,
+        ))
+    MarketingContact.objects.bulk_create(
+        contacts,
+        update_conflicts=True,
+        unique_fields=["organization", "phone_number"],
+        update_fields=UPSERT_FIELDS,
+    )
+    created = len(items) - len(existing)
+    return created, len(existing)
+
+
+def import_contacts_csv(org, lines, batch_size=2000):
+    """
+    Import CSV text lines. Yields a progress dict after every batch; row errors
+    carry the CSV line number so users can fix the source file.
+    """
+    reader = csv.DictReader(lines)
+    if reader.fieldnames:
+        reader.fieldnames = [str(name or "").strip().lower() for name in reader.fieldnames]
+    progress = {"processed": 0, "created": 0, "updated": 0, "skipped": 0, "errors": []}
+    batch = {}
+    duplicates = 0
+    unreported = False
+
+    def flush():
+        created, updated = upsert_contacts(org, batch)
+        progress["created"] += created
+        progress["updated"] += updated + duplicates
+        batch.clear()
+
+    for item in reader:
+        progress["processed"] += 1
+        unreported = True
+        parsed, error = _parse_row(item)
+        if error:
+            progress["skipped"] += 1
+            if len(progress["errors"]) < MAX_ROW_ERRORS:
+                progress["errors"].append({"row": reader.line_num, **error})
+            continue
+        phone = parsed["phone_number"]
+        if phone in batch:
+            duplicates += 1
+        batch[phone] = _merge(batch.get(phone), parsed)
+        if len(batch) >= batch_size:
+            flush()
+            duplicates = 0
+            unreported = False
+            yield progress
+    if batch:
+        flush()
+    if unreported:
+        yield progress
+
+
+def create_contact_import(org, user, file_obj, filename=""):
+    filename = filename or getattr(file_obj, "name", "") or "contacts.csv"
+    storage_key = storage_save(build_storage_key(org, user, "imports", filename), file_obj)
+    return MarketingContactImport.objects.create(
+        organization=org,
+        created_by=user,
+        original_filename=str(filename)[:255],
+        storage_key=storage_key,
+        size_bytes=int(getattr(file_obj, "size", 0) or 0),
+    )
+
+
+def run_contact_import(import_id):
+    now = timezone.now()
+    claimed = (
+        MarketingContactImport.objects
+        .filter(id=import_id, status=MarketingContactImport.STATUS_QUEUED)
+        .update(status=MarketingContactImport.STATUS_RUNNING, started_at=now, updated_at=now)
+    )
+    if not claimed:
+        return None
+    job = MarketingContactImport.objects.select_related("organization").get(id=import_id)
+    progress = {}
+    try:
+        handle = storage_open(job.storage_key, "rb")
+        try:
+            lines = codecs.iterdecode(iter(handle), "utf-8-sig", errors="replace")
+            for progress in import_contacts_csv(job.organization, lines, get_import_settings()["batch_size"]):
+                MarketingContactImport.objects.filter(id=job.id).update(
+                    processed_rows=progress["processed"],
+                    created_count=progress["created"],
+                    updated_count=progress["updated"],
+                    skipped_count=progress["skipped"],
+                    updated_at=timezone.now(),
+                )
+        finally:
+            handle.close()
+        job.status = MarketingContactImport.STATUS_COMPLETED
+    except Exception as exc:
+        logger.exception("Marketing contact import failed import=%s", import_id)
+        job.status = MarketingContactImport.STATUS_FAILED
+        job.error_message = str(exc)[:1000]
+    finally:
+        storage_delete(job.storage_key)
+    job.processed_rows = progress.get("processed", 0)
+    job.created_count = progress.get("created", 0)
+    job.updated_count = progress.get("updated", 0)
+    job.skipped_count = progress.get("skipped", 0)
+    job.row_errors = progress.get("errors", [])
+    job.finished_at = timezone.now()
+    job.save(update_fields=[
+        "status",
+        "error_message",
+        "processed_rows",
+        "created_count",
+        "updated_count",
+        "skipped_count",
+        "row_errors",
+        "finished_at",
+        "updated_at",
+    ])
+    return job
@@ -0,0 +1,68 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.backend.modules.whatsapp_automation.models import AutomationRule
+from apps.backend.modules.whatsapp_automation.reply_matcher import ReplyMatcher, normalize_text
+
+
+WORDS = [
+    "price", "order", "delivery", "refund", "support", "hello", "catalogue", "offer", "status", "invoice",
+    "booking", "payment", "address", "timing", "discount", "warranty", "return", "exchange", "stock", "menu",
+]
+
+
+def _linear_match(rules, message):
+    text = normalize_text(message)
+    for rule in rules:
+        keyword = normalize_text(rule.keyword)
+        if keyword and keyword in text:
+            return rule
+    return next((rule for rule in rules if rule.is_default), None)
+
+
+class Command(BaseCommand):
+    help = "Compare the compiled auto-reply matcher with a linear keyword scan on synthetic rules (no DB access)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rules", type=int, default=1000, help="Number of synthetic keyword rules.")
+        parser.add_argument("--messages", type=int, default=20000, help="Number of messages to match.")
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        rules = [
+            AutomationRule(
+                id=index + 1,
+                keyword=f"{rng.choice(WORDS)} {rng.choice(WORDS)} {index}",
+                reply_message="reply",
+                sort_order=index,
+                is_active=True,
+            )
+            for index in range(options["rules"])
+        ]
+        messages = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 20))) + f" {rng.randint(0, options['rules'] * 2)}"
+            for _ in range(options["messages"])
+        ]
+
+        started = time.perf_counter()
+        matcher = ReplyMatcher(rules)
+        compile_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        compiled = [matcher.match(message) for message in messages]
+        compiled_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        linear = [_linear_match(rules, message) for message in messages]
+        linear_s = time.perf_counter() - started
+
+        mismatches = sum(1 for left, right in zip(compiled, linear) if left is not right)
+        self.stdout.write(
+            f"{len(rules)} rules, {len(messages)} messages: compile {compile_ms:.1f} ms, "
+            f"compiled {compiled_s * 1e6 / len(messages):.1f} us/msg, "
+            f"linear {linear_s * 1e6 / len(messages):.1f} us/msg, "
+            f"speedup {linear_s / max(compiled_s, 1e-9):.1f}x, mismatches {mismatches}"
+        )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.backend.modules.whatsapp_automation.campaign_dispatch import dispatch_pending_campaigns
+
+
+class Command(BaseCommand):
+    help = "Send queued WhatsApp campaigns and resume stalled ones (for setups without a Celery beat)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=20, help="Campaigns to pick up per run.")
+
+    def handle(self, *args, **options):
+        results = dispatch_pending_campaigns(limit=options["limit"])
+        sent = sum(result.get("sent", 0) for result in results)
+        self.stdout.write(self.style.SUCCESS(f"Dispatched {len(results)} campaign(s), {sent} message(s) sent in total."))
@@ -1,6 +1,7 @@
+from django.contrib.auth.models import AnonymousUser
 from django.utils.deprecation import MiddlewareMixin
 
-from .models import DigitalCardEntry
+from .card_routing import resolve_card_host
 from .views import public_digital_card
 
 
@@ -17,12 +18,10 @@ class CustomDigitalCardDomainMiddleware(MiddlewareMixin):
         host = (request.get_host() or "").split(":")[0].strip().lower()
         if not host or host in self.LOCAL_HOSTS:
             return None
-        card = (
-            DigitalCardEntry.objects
-            .filter(custom_domain=host, custom_domain_active=True, is_active=True)
-            .only("public_slug")
-            .first()
-        )
-        if not card:
+        public_slug = resolve_card_host(host)
+        if not public_slug:
             return None
-        return public_digital_card(request, card.public_slug)
+        # Runs ahead of AuthenticationMiddleware; card pages are always anonymous.
+        if not hasattr(request, "user"):
+            request.user = AnonymousUser()
+        return public_digital_card(request, public_slug)
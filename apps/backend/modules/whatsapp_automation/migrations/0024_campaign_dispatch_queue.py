@@ -0,0 +1,42 @@
+# Generated by Django 4.2.10 on 2026-10-19 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp_automation', '0023_digitalcardentry_save_contact_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='marketingcampaign',
+            name='dispatch_finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='marketingcampaign',
+            name='dispatch_heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='marketingcampaign',
+            name='dispatch_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='marketingcampaign',
+            name='status',
+            field=models.CharField(choices=[('draft', 'Draft'), ('queued', 'Queued'), ('sending', 'Sending'), ('sent', 'Sent'), ('partial', 'Partial'), ('blocked', 'Blocked'), ('failed', 'Failed')], default='draft', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='marketingcampaigndelivery',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('sent', 'Sent'), ('failed', 'Failed'), ('skipped', 'Skipped')], max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='marketingcampaign',
+            index=models.Index(fields=['status', 'dispatch_heartbeat_at'], name='whatsapp_au_status_d13c7a_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.10 on 2026-10-19 03:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0157_plan_actual_offer_prices'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('whatsapp_automation', '0024_campaign_dispatch_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketingContactImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('original_filename', models.CharField(blank=True, default='', max_length=255)),
+                ('storage_key', models.CharField(blank=True, default='', max_length=512)),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('processed_rows', models.PositiveIntegerField(default=0)),
+                ('created_count', models.PositiveIntegerField(default=0)),
+                ('updated_count', models.PositiveIntegerField(default=0)),
+                ('skipped_count', models.PositiveIntegerField(default=0)),
+                ('row_errors', models.JSONField(blank=True, default=list)),
+                ('error_message', models.TextField(blank=True, default='')),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='wa_marketing_contact_imports', to=settings.AUTH_USER_MODEL)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='wa_marketing_contact_imports', to='core.organization')),
+            ],
+            options={
+                'ordering': ('-created_at', '-id'),
+                'indexes': [models.Index(fields=['organization', 'created_at'], name='whatsapp_au_organiz_34d6ea_idx'), models.Index(fields=['status', 'updated_at'], name='whatsapp_au_status_71059b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-19 03:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp_automation', '0025_marketing_contact_import'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='automationrule',
+            name='match_mode',
+            field=models.CharField(choices=[('contains', 'Contains'), ('exact', 'Exact'), ('starts_with', 'Starts with')], default='contains', max_length=20),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 4.2.10 on 2026-10-19 03:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+
+
+def backfill_visit_rollups(apps, schema_editor):
+    DigitalCardVisit = apps.get_model("whatsapp_automation", "DigitalCardVisit")
+    DigitalCardVisitDaily = apps.get_model("whatsapp_automation", "DigitalCardVisitDaily")
+    DigitalCardDailyVisitor = apps.get_model("whatsapp_automation", "DigitalCardDailyVisitor")
+    visits = DigitalCardVisit._meta.db_table
+    card_key = "COALESCE(v.card_entry_id::text, 'slug:' || v.public_slug)"
+    day = "(v.visited_at AT TIME ZONE %s)::date"
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {DigitalCardDailyVisitor._meta.db_table} (organization_id, card_key, day, visitor_hash) "
+            f"SELECT DISTINCT v.organization_id, {card_key}, {day}, LEFT(v.visitor_key, 40) "
+            f"FROM {visits} v WHERE v.visitor_key <> '' "
+            f"ON CONFLICT DO NOTHING",
+            [settings.TIME_ZONE],
+        )
+        cursor.execute(
+            f"INSERT INTO {DigitalCardVisitDaily._meta.db_table} "
+            f"(organization_id, card_key, card_entry_id, public_slug, day, views, unique_visitors, updated_at) "
+            f"SELECT v.organization_id, {card_key}, MAX(v.card_entry_id), MAX(v.public_slug), {day}, COUNT(*), "
+            f"COUNT(DISTINCT NULLIF(LEFT(v.visitor_key, 40), '')), NOW() "
+            f"FROM {visits} v GROUP BY 1, 2, 5 "
+            f"ON CONFLICT DO NOTHING",
+            [settings.TIME_ZONE],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0157_plan_actual_offer_prices'),
+        ('whatsapp_automation', '0026_automation_rule_match_mode'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='digitalcardvisit',
+            name='visited_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='DigitalCardDailyVisitor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('card_key', models.CharField(max_length=240)),
+                ('day', models.DateField()),
+                ('visitor_hash', models.CharField(max_length=40)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='wa_digital_card_daily_visitors', to='core.organization')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DigitalCardVisitDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('card_key', models.CharField(max_length=240)),
+                ('public_slug', models.SlugField(blank=True, default='', max_length=220)),
+                ('day', models.DateField()),
+                ('views', models.PositiveBigIntegerField(default=0)),
+                ('unique_visitors', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('card_entry', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='visit_days', to='whatsapp_automation.digitalcardentry')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='wa_digital_card_visit_days', to='core.organization')),
+            ],
+            options={
+                'ordering': ('-day', 'id'),
+                'indexes': [models.Index(fields=['organization', 'day'], name='whatsapp_au_organiz_276ecb_idx'), models.Index(fields=['card_key', 'day'], name='whatsapp_au_card_ke_f5678c_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='digitalcardvisitdaily',
+            constraint=models.UniqueConstraint(fields=('organization', 'card_key', 'day'), name='wa_card_visit_daily_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='digitalcarddailyvisitor',
+            index=models.Index(fields=['organization', 'day'], name='whatsapp_au_organiz_182769_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='digitalcarddailyvisitor',
+            constraint=models.UniqueConstraint(fields=('organization', 'card_key', 'day', 'visitor_hash'), name='wa_card_daily_visitor_unique'),
+        ),
+        migrations.RunPython(backfill_visit_rollups, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,7 @@ from django.conf import settings
 from django.db import models
 from django.db.models.signals import post_delete, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.text import slugify
 
 from core.models import Organization
@@ -148,7 +149,8 @@ class DigitalCardVisit(models.Model):
     user_agent = models.CharField(max_length=400, blank=True, default="")
     page_path = models.CharField(max_length=300, blank=True, default="")
     page_url = models.TextField(blank=True, default="")
-    visited_at = models.DateTimeField(auto_now_add=True)
+    # Set when the visit happens, not when the buffered row is written.
+    visited_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ("-visited_at", "-id")
@@ -162,6 +164,61 @@ class DigitalCardVisit(models.Model):
         return f"{self.organization_id}:{self.public_slug}:{self.visited_at.isoformat()}"
 
 
+class DigitalCardVisitDaily(models.Model):
+    """Per-card, per-day visit rollup; `card_key` is the card entry id or `slug:<public_slug>`."""
+
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="wa_digital_card_visit_days")
+    card_key = models.CharField(max_length=240)
+    card_entry = models.ForeignKey(
+        DigitalCardEntry,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="visit_days",
+    )
+    public_slug = models.SlugField(max_length=220, blank=True, default="")
+    day = models.DateField()
+    views = models.PositiveBigIntegerField(default=0)
+    unique_visitors = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ("-day", "id")
+        constraints = [
+            models.UniqueConstraint(fields=["organization", "card_key", "day"], name="wa_card_visit_daily_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["organization", "day"]),
+            models.Index(fields=["card_key", "day"]),
+        ]
+
+    def __str__(self):
+        return f"{self.organization_id}:{self.card_key}:{self.day}:{self.views}"
+
+
+class DigitalCardDailyVisitor(models.Model):
+    """Hashed visitor set per card and day, used for exact unique counts over any day range."""
+
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="wa_digital_card_daily_visitors")
+    card_key = models.CharField(max_length=240)
+    day = models.DateField()
+    visitor_hash = models.CharField(max_length=40)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["organization", "card_key", "day", "visitor_hash"],
+                name="wa_card_daily_visitor_unique",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["organization", "day"]),
+        ]
+
+    def __str__(self):
+        return f"{self.organization_id}:{self.card_key}:{self.day}:{self.visitor_hash}"
+
+
 class CataloguePage(models.Model):
     company_profile = models.OneToOneField(CompanyProfile, on_delete=models.CASCADE, related_name="catalogue_page")
     public_slug = models.SlugField(max_length=220, unique=True)
@@ -203,8 +260,18 @@ class WhatsappSettings(models.Model):
 
 
 class AutomationRule(models.Model):
+    MATCH_CONTAINS = "contains"
+    MATCH_EXACT = "exact"
+    MATCH_STARTS_WITH = "starts_with"
+    MATCH_MODE_CHOICES = (
+        (MATCH_CONTAINS, "Contains"),
+        (MATCH_EXACT, "Exact"),
+        (MATCH_STARTS_WITH, "Starts with"),
+    )
+
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="wa_automation_rules")
     keyword = models.CharField(max_length=120, blank=True, default="")
+    match_mode = models.CharField(max_length=20, choices=MATCH_MODE_CHOICES, default=MATCH_CONTAINS)
     reply_message = models.TextField(blank=True, default="")
     is_default = models.BooleanField(default=False)
     sort_order = models.PositiveIntegerField(default=0)
@@ -295,14 +362,64 @@ class MarketingContact(models.Model):
         return f"{self.organization_id}:{self.phone_number}"
 
 
+class MarketingContactImport(models.Model):
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_COMPLETED = "completed"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_COMPLETED, "Completed"),
+        (STATUS_FAILED, "Failed"),
+    )
+
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="wa_marketing_contact_imports")
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="wa_marketing_contact_imports",
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    original_filename = models.CharField(max_length=255, blank=True, default="")
+    storage_key = models.CharField(max_length=512, blank=True, default="")
+    size_bytes = models.BigIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0)
+    row_errors = models.JSONField(default=list, blank=True)
+    error_message = models.TextField(blank=True, default="")
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ("-created_at", "-id")
+        indexes = [
+            models.Index(fields=["organization", "created_at"]),
+            models.Index(fields=["status", "updated_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.organization_id}:{self.original_filename}:{self.status}"
+
+
 class MarketingCampaign(models.Model):
     STATUS_DRAFT = "draft"
+    STATUS_QUEUED = "queued"
+    STATUS_SENDING = "sending"
     STATUS_SENT = "sent"
     STATUS_PARTIAL = "partial"
     STATUS_BLOCKED = "blocked"
     STATUS_FAILED = "failed"
     STATUS_CHOICES = (
         (STATUS_DRAFT, "Draft"),
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_SENDING, "Sending"),
         (STATUS_SENT, "Sent"),
         (STATUS_PARTIAL, "Partial"),
         (STATUS_BLOCKED, "Blocked"),
@@ -326,6 +443,9 @@ class MarketingCampaign(models.Model):
         on_delete=models.SET_NULL,
         related_name="wa_marketing_campaigns_created",
     )
+    dispatch_started_at = models.DateTimeField(null=True, blank=True)
+    dispatch_heartbeat_at = models.DateTimeField(null=True, blank=True)
+    dispatch_finished_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -334,6 +454,7 @@ class MarketingCampaign(models.Model):
         indexes = [
             models.Index(fields=["organization", "status"]),
             models.Index(fields=["organization", "created_at"]),
+            models.Index(fields=["status", "dispatch_heartbeat_at"]),
         ]
 
     def __str__(self):
@@ -341,10 +462,12 @@ class MarketingCampaign(models.Model):
 
 
 class MarketingCampaignDelivery(models.Model):
+    STATUS_QUEUED = "queued"
     STATUS_SENT = "sent"
     STATUS_FAILED = "failed"
     STATUS_SKIPPED = "skipped"
     STATUS_CHOICES = (
+        (STATUS_QUEUED, "Queued"),
         (STATUS_SENT, "Sent"),
         (STATUS_FAILED, "Failed"),
         (STATUS_SKIPPED, "Skipped"),
@@ -0,0 +1,177 @@
+"""
+Compiled keyword matching for WhatsApp auto-replies.
+
+Each org's active rules are compiled once into an Aho-Corasick automaton for
+"contains" keywords, a trie for "starts with" keywords and a dict for exact
+matches, so matching an inbound message is linear in its length no matter how
+many rules the org has. Compiled matchers are kept per process and rebuilt when
+the org's rule version (bumped on every rule save/delete) changes. The version
+only reaches other workers through a shared cache; with the per-process
+fallback a matcher is rebuilt after WHATSAPP_REPLY_MATCHER_LOCAL_CACHE_SECONDS
+so rule edits made in another worker still take effect.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.cache_utils import local_snapshot_max_age
+from .models import AutomationRule
+
+
+VERSION_TTL_SECONDS = 7 * 24 * 3600
+
+
+def normalize_text(value):
+    return str(value or "").strip().lower()
+
+
+class _Trie:
+    """Keyword trie with Aho-Corasick failure links; `best` keeps the winning rule index per node."""
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.best = [None]
+
+    def add(self, keyword, rank):
+        node = 0
+        for char in keyword:
+            nxt = self.goto[node].get(char)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][char] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.best.append(None)
+            node = nxt
+        if self.best[node] is None or rank < self.best[node]:
+            self.best[node] = rank
+
+    def build_failure_links(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[child] = target if target != child else 0
+                inherited = self.best[self.fail[child]]
+                if inherited is not None and (self.best[child] is None or inherited < self.best[child]):
+                    self.best[child] = inherited
+
+    def search(self, text):
+        """Best rank among keywords occurring anywhere in `text`."""
+        goto, fail, best = self.goto, self.fail, self.best
+        node = 0
+        found = None
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            rank = best[node]
+            if rank is not None and (found is None or rank < found):
+                found = rank
+        return found
+
+    def prefix_search(self, text):
+        """Best rank among keywords that `text` starts with; plain trie walk, no failure links."""
+        node = 0
+        found = None
+        for char in text:
+            node = self.goto[node].get(char)
+            if node is None:
+                break
+            rank = self.best[node]
+            if rank is not None and (found is None or rank < found):
+                found = rank
+        return found
+
+
+class ReplyMatcher:
+    """
+    Matches messages against rules in priority order (sort_order, then id), the
+    same order the rules table uses. The first rule by that order wins whatever
+    its match mode; the default rule is the fallback.
+    """
+
+    def __init__(self, rules):
+        self.rules = sorted(rules, key=lambda rule: (rule.sort_order or 0, rule.id or 0))
+        self.contains = _Trie()
+        self.starts_with = _Trie()
+        self.exact = {}
+        self.default_rule = next((rule for rule in self.rules if rule.is_default), None)
+        for rank, rule in enumerate(self.rules):
+            keyword = normalize_text(rule.keyword)
+            if not keyword:
+                continue
+            if rule.match_mode == AutomationRule.MATCH_EXACT:
+                self.exact.setdefault(keyword, rank)
+            elif rule.match_mode == AutomationRule.MATCH_STARTS_WITH:
+                self.starts_with.add(keyword, rank)
+            else:
+                self.contains.add(keyword, rank)
+        self.contains.build_failure_links()
+
+    def match(self, message):
+        text = normalize_text(message)
+        if not text:
+            return self.default_rule
+        ranks = [
+            self.exact.get(text),
+            self.starts_with.prefix_search(text),
+            self.contains.search(text),
+        ]
+        ranks = [rank for rank in ranks if rank is not None]
+        if ranks:
+            return self.rules[min(ranks)]
+        return self.default_rule
+
+
+_matchers = OrderedDict()
+_matchers_lock = threading.Lock()
+
+
+def _version_key(org_id):
+    return f"wa:reply_rules:version:{org_id}"
+
+
+def _max_cached_orgs():
+    return int(getattr(settings, "WHATSAPP_REPLY_MATCHER_CACHE_SIZE", 512))
+
+
+def invalidate_reply_matcher(org_id):
+    cache.set(_version_key(org_id), uuid.uuid4().hex, VERSION_TTL_SECONDS)
+
+
+def get_reply_matcher(org):
+    org_id = getattr(org, "id", org)
+    version = cache.get(_version_key(org_id))
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(_version_key(org_id), version, VERSION_TTL_SECONDS):
+            version = cache.get(_version_key(org_id)) or version
+    with _matchers_lock:
+        cached = _matchers.get(org_id)
+        max_age = local_snapshot_max_age("WHATSAPP_REPLY_MATCHER_LOCAL_CACHE_SECONDS")
+        if cached and cached[0] == version and (max_age is None or time.monotonic() - cached[2] < max_age):
+            _matchers.move_to_end(org_id)
+            return cached[1]
+    matcher = ReplyMatcher(AutomationRule.objects.filter(organization_id=org_id, is_active=True))
+    with _matchers_lock:
+        _matchers[org_id] = (version, matcher, time.monotonic())
+        _matchers.move_to_end(org_id)
+        while len(_matchers) > _max_cached_orgs():
+            _matchers.popitem(last=False)
+    return matcher
+
+
+def match_reply_rule(org, message):
+    return get_reply_matcher(org).match(message)
@@ -1,7 +1,20 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from .models import CataloguePage, CompanyProfile, DigitalCard, WhatsappSettings, build_unique_public_slug
+from .card_routing import ROUTING_FIELDS, invalidate_card_hosts, invalidate_card_pages
+from .models import (
+    AutomationRule,
+    CatalogueCategory,
+    CataloguePage,
+    CatalogueProduct,
+    CompanyProfile,
+    DigitalCard,
+    DigitalCardEntry,
+    DigitalCardFeedback,
+    WhatsappSettings,
+    build_unique_public_slug,
+)
+from .reply_matcher import invalidate_reply_matcher
 
 
 def _company_display_name(company_profile):
@@ -67,3 +80,37 @@ def ensure_company_profile_assets(sender, instance, created, **kwargs):
     elif wa_settings.company_profile_id is None:
         wa_settings.company_profile = instance
         wa_settings.save(update_fields=["company_profile", "updated_at"])
+
+
+@receiver(post_save, sender=AutomationRule, dispatch_uid="wa.automation_rule.invalidate_matcher_on_save")
+@receiver(post_delete, sender=AutomationRule, dispatch_uid="wa.automation_rule.invalidate_matcher_on_delete")
+def invalidate_rule_matcher(sender, instance, **kwargs):
+    invalidate_reply_matcher(instance.organization_id)
+
+
+@receiver(post_save, sender=DigitalCardEntry, dispatch_uid="wa.card_entry.invalidate_routing_on_save")
+@receiver(post_delete, sender=DigitalCardEntry, dispatch_uid="wa.card_entry.invalidate_routing_on_delete")
+def invalidate_card_entry_routing(sender, instance, **kwargs):
+    update_fields = kwargs.get("update_fields")
+    if update_fields is None or ROUTING_FIELDS.intersection(update_fields):
+        invalidate_card_hosts()
+    invalidate_card_pages(instance.organization_id)
+
+
+@receiver(post_save, sender=CompanyProfile, dispatch_uid="wa.company_profile.invalidate_card_pages_on_save")
+@receiver(post_save, sender=WhatsappSettings, dispatch_uid="wa.settings.invalidate_card_pages_on_save")
+@receiver(post_save, sender=CatalogueCategory, dispatch_uid="wa.catalogue_category.invalidate_card_pages_on_save")
+@receiver(post_delete, sender=CatalogueCategory, dispatch_uid="wa.catalogue_category.invalidate_card_pages_on_delete")
+@receiver(post_save, sender=CatalogueProduct, dispatch_uid="wa.catalogue_product.invalidate_card_pages_on_save")
+@receiver(post_delete, sender=CatalogueProduct, dispatch_uid="wa.catalogue_product.invalidate_card_pages_on_delete")
+@receiver(post_save, sender=DigitalCardFeedback, dispatch_uid="wa.card_feedback.invalidate_card_pages_on_save")
+@receiver(post_delete, sender=DigitalCardFeedback, dispatch_uid="wa.card_feedback.invalidate_card_pages_on_delete")
+def invalidate_org_card_pages(sender, instance, **kwargs):
+    invalidate_card_pages(instance.organization_id)
+
+
+@receiver(post_save, sender=DigitalCard, dispatch_uid="wa.digital_card.invalidate_card_pages_on_save")
+@receiver(post_save, sender=CataloguePage, dispatch_uid="wa.catalogue_page.invalidate_card_pages_on_save")
+def invalidate_profile_card_pages(sender, instance, **kwargs):
+    org_id = CompanyProfile.objects.filter(id=instance.company_profile_id).values_list("organization_id", flat=True).first()
+    invalidate_card_pages(org_id)
@@ -0,0 +1,32 @@
+try:
+    from celery import shared_task
+except Exception:  # pragma: no cover
+    def shared_task(*args, **kwargs):
+        def decorator(fn):
+            return fn
+        return decorator
+
+from .campaign_dispatch import dispatch_campaign, dispatch_pending_campaigns
+from .card_visits import purge_card_visits
+from .contact_import import run_contact_import
+
+
+@shared_task(name="whatsapp_automation.dispatch_campaign")
+def dispatch_campaign_task(campaign_id):
+    return dispatch_campaign(campaign_id)
+
+
+@shared_task(name="whatsapp_automation.dispatch_pending_campaigns")
+def dispatch_pending_campaigns_task():
+    return dispatch_pending_campaigns()
+
+
+@shared_task(name="whatsapp_automation.run_contact_import")
+def run_contact_import_task(import_id):
+    job = run_contact_import(import_id)
+    return {"status": job.status if job else "not_claimed", "import_id": import_id}
+
+
+@shared_task(name="whatsapp_automation.purge_card_visits")
+def purge_card_visits_task():
+    return purge_card_visits()
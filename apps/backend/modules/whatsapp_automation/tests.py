@@ -0,0 +1,463 @@
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from core.models import Organization, UserProfile
+from apps.backend.modules.whatsapp_automation.campaign_dispatch import dispatch_campaign
+from apps.backend.modules.whatsapp_automation import card_visits
+from apps.backend.modules.whatsapp_automation.card_routing import resolve_card_host
+from apps.backend.modules.whatsapp_automation.card_visits import (
+    flush_card_visits,
+    get_card_view_count,
+    purge_card_visits,
+    record_card_visit,
+)
+from apps.backend.modules.whatsapp_automation.contact_import import run_contact_import
+from apps.backend.modules.whatsapp_automation.reply_matcher import get_reply_matcher, match_reply_rule
+from apps.backend.modules.whatsapp_automation.models import (
+    AutomationRule,
+    CatalogueProduct,
+    CompanyProfile,
+    DigitalCardDailyVisitor,
+    DigitalCardEntry,
+    DigitalCardVisit,
+    DigitalCardVisitDaily,
+    MarketingCampaign,
+    MarketingCampaignDelivery,
+    MarketingContact,
+    MarketingContactImport,
+)
+from apps.backend.storage.storage_backend import storage_backend, storage_exists
+
+
+User = get_user_model()
+
+FAILING_NUMBER = "15550000002"
+THROTTLED_NUMBER = "15550000003"
+
+
+class _FakeCloudApiHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        server = self.server
+        with server.lock:
+            server.requests.append({"path": self.path, "auth": self.headers.get("Authorization"), "body": body})
+            attempts = server.attempts[body.get("to")] = server.attempts.get(body.get("to"), 0) + 1
+        if body.get("to") == FAILING_NUMBER:
+            status, payload = 400, {"error": {"code": 131026, "message": "Message undeliverable"}}
+        elif body.get("to") == THROTTLED_NUMBER and attempts == 1:
+            status, payload = 429, {"error": {"code": 130429, "message": "Rate limit hit"}, "retry_after": 0}
+        else:
+            status, payload = 200, {"messages": [{"id": f"wamid.{body.get('to')}"}]}
+        encoded = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, *args):
+        pass
+
+
+class CampaignDispatchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeCloudApiHandler)
+        cls.server.lock = threading.Lock()
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+        cls.settings_override = override_settings(
+            WHATSAPP_ACCESS_TOKEN="test-token",
+            WHATSAPP_PHONE_NUMBER_ID="1234567890",
+            WHATSAPP_GRAPH_API_BASE_URL=f"http://127.0.0.1:{cls.server.server_port}",
+            WHATSAPP_CAMPAIGN_RATE_PER_SECOND=0,
+            WHATSAPP_CAMPAIGN_BATCH_SIZE=3,
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.requests = []
+        self.server.attempts = {}
+        self.org = Organization.objects.create(name="WA Org", company_key="WA-ORG")
+        self.user = User.objects.create_user(username="wa@acme.test", email="wa@acme.test", password="pw123456")
+        UserProfile.objects.create(user=self.user, organization=self.org, role="company_admin")
+        self.client.force_login(self.user)
+        numbers = ["15550000001", FAILING_NUMBER, THROTTLED_NUMBER, "15550000004", "15550000005"]
+        for index, number in enumerate(numbers):
+            MarketingContact.objects.create(
+                organization=self.org, name=f"Contact {index}", phone_number=number, is_opted_in=True,
+            )
+        MarketingContact.objects.create(organization=self.org, name="No consent", phone_number="15550000009")
+
+    def _create_campaign(self):
+        with mock.patch("apps.backend.modules.whatsapp_automation.api_views._start_campaign_dispatch") as start:
+            response = self.client.post(
+                "/api/whatsapp-automation/marketing/campaigns",
+                data=json.dumps({
+                    "name": "Launch",
+                    "template_name": "launch_offer",
+                    "template_variables": ["Acme"],
+                    "compliance_note": "Reply STOP to opt out.",
+                }),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 202)
+        start.assert_called_once()
+        return response.json()["campaign"]
+
+    def test_create_returns_immediately_with_queued_deliveries(self):
+        campaign = self._create_campaign()
+
+        self.assertEqual(campaign["status"], MarketingCampaign.STATUS_QUEUED)
+        self.assertEqual(campaign["queued_count"], 6)
+        self.assertEqual(self.server.requests, [])
+        self.assertEqual(
+            MarketingCampaignDelivery.objects.filter(status=MarketingCampaignDelivery.STATUS_QUEUED).count(),
+            6,
+        )
+
+    def test_dispatcher_sends_through_cloud_api_and_records_results(self):
+        campaign = self._create_campaign()
+
+        result = dispatch_campaign(campaign["id"])
+
+        self.assertEqual(result["batches"], 2)
+        self.assertEqual((result["sent"], result["failed"], result["skipped"]), (4, 1, 1))
+        self.assertEqual(self.server.attempts[THROTTLED_NUMBER], 2)
+        first = self.server.requests[0]
+        self.assertEqual(first["path"], "/v21.0/1234567890/messages")
+        self.assertEqual(first["auth"], "Bearer test-token")
+        self.assertEqual(first["body"]["template"]["components"][0]["parameters"], [{"type": "text", "text": "Acme"}])
+
+        failed = MarketingCampaignDelivery.objects.get(status=MarketingCampaignDelivery.STATUS_FAILED)
+        self.assertEqual(failed.phone_number, FAILING_NUMBER)
+        self.assertEqual(failed.error_code, "provider_send_failed")
+        skipped = MarketingCampaignDelivery.objects.get(status=MarketingCampaignDelivery.STATUS_SKIPPED)
+        self.assertEqual(skipped.error_code, "consent_required")
+        self.assertEqual(MarketingContact.objects.filter(last_message_at__isnull=False).count(), 4)
+
+        progress = self.client.get(f"/api/whatsapp-automation/marketing/campaigns/{campaign['id']}").json()["campaign"]
+        self.assertEqual(progress["status"], MarketingCampaign.STATUS_PARTIAL)
+        self.assertEqual(progress["queued_count"], 0)
+        self.assertTrue(progress["dispatch_finished_at"])
+
+    def test_second_dispatcher_cannot_claim_running_campaign(self):
+        campaign = self._create_campaign()
+
+        partial = dispatch_campaign(campaign["id"], max_batches=1)
+        self.assertEqual(partial["status"], "queued")
+        # Another worker holds the claim and is still heartbeating.
+        MarketingCampaign.objects.filter(id=campaign["id"]).update(status=MarketingCampaign.STATUS_SENDING)
+        blocked = dispatch_campaign(campaign["id"])
+        self.assertEqual(blocked["status"], "not_claimed")
+
+        MarketingCampaign.objects.filter(id=campaign["id"]).update(dispatch_heartbeat_at=None)
+        resumed = dispatch_campaign(campaign["id"])
+        self.assertEqual(resumed["status"], MarketingCampaign.STATUS_PARTIAL)
+
+    def test_retry_requeues_failed_deliveries(self):
+        campaign = self._create_campaign()
+        dispatch_campaign(campaign["id"])
+        MarketingContact.objects.filter(phone_number=FAILING_NUMBER).update(phone_number="15550000012")
+
+        with mock.patch("apps.backend.modules.whatsapp_automation.api_views._start_campaign_dispatch"):
+            response = self.client.post(f"/api/whatsapp-automation/marketing/campaigns/{campaign['id']}/retry-failed")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["campaign"]["queued_count"], 1)
+
+        result = dispatch_campaign(campaign["id"])
+        self.assertEqual((result["status"], result["sent"], result["failed"]), (MarketingCampaign.STATUS_SENT, 5, 0))
+
+
+class ContactImportTests(TestCase):
+    def setUp(self):
+        self._media = tempfile.TemporaryDirectory()
+        self._media_override = override_settings(MEDIA_ROOT=self._media.name)
+        self._media_override.enable()
+        storage_backend._backend = None
+        self.org = Organization.objects.create(name="Import Org", company_key="IMPORT-ORG")
+        self.user = User.objects.create_user(username="import@acme.test", email="import@acme.test", password="pw123456")
+        UserProfile.objects.create(user=self.user, organization=self.org, role="company_admin")
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        self._media_override.disable()
+        storage_backend._backend = None
+        self._media.cleanup()
+
+    def _post_csv(self, csv_text):
+        return self.client.post(
+            "/api/whatsapp-automation/marketing/contacts/import-csv",
+            data=json.dumps({"csv_text": csv_text}),
+            content_type="application/json",
+        )
+
+    def test_small_import_runs_inline_and_preserves_opt_outs(self):
+        MarketingContact.objects.create(
+            organization=self.org, name="Existing", phone_number="15550001111", has_opted_out=True,
+        )
+        csv_text = (
+            "Phone,Name,Opt_In,Tags\n"
+            "+1 555 000 1111,,yes,vip\n"
+            "15550002222,New,yes,\n"
+            "not-a-number,Bad,yes,\n"
+            "15550002222,,no,repeat\n"
+        )
+
+        response = self._post_csv(csv_text)
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data["created"], data["updated"], data["skipped"]), (1, 2, 1))
+        self.assertEqual(data["job"]["row_errors"], [{"row": 4, "error": "invalid_phone_number", "value": "not-a-number"}])
+        existing = MarketingContact.objects.get(phone_number="15550001111")
+        self.assertEqual((existing.name, existing.tags, existing.is_opted_in), ("Existing", "vip", False))
+        created = MarketingContact.objects.get(phone_number="15550002222")
+        self.assertEqual((created.name, created.tags, created.is_opted_in), ("New", "repeat", True))
+        self.assertIsNotNone(created.opt_in_at)
+        self.assertFalse(storage_exists(MarketingContactImport.objects.get().storage_key))
+
+    @override_settings(WHATSAPP_CONTACT_IMPORT_INLINE_MAX_BYTES=0, WHATSAPP_CONTACT_IMPORT_BATCH_SIZE=500)
+    def test_large_import_is_queued_and_upserted_in_batches(self):
+        rows = "\n".join(f"1555{index:07d},Contact {index},1" for index in range(2000))
+        with mock.patch("apps.backend.modules.whatsapp_automation.api_views._start_contact_import") as start:
+            response = self._post_csv("phone_number,name,is_opted_in\n" + rows)
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["job"]["id"]
+        start.assert_called_once()
+
+        with CaptureQueriesContext(connection) as queries:
+            run_contact_import(job_id)
+        contact_writes = [q for q in queries.captured_queries if "whatsapp_automation_marketingcontact\"" in q["sql"]]
+        self.assertEqual(len(contact_writes), 4 * 2)
+
+        job = self.client.get(f"/api/whatsapp-automation/marketing/contacts/imports/{job_id}").json()["job"]
+        self.assertEqual(job["status"], MarketingContactImport.STATUS_COMPLETED)
+        self.assertEqual((job["processed_rows"], job["created"], job["updated"]), (2000, 2000, 0))
+        self.assertEqual(MarketingContact.objects.filter(organization=self.org, is_opted_in=True).count(), 2000)
+
+
+class ReplyMatcherTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.org = Organization.objects.create(name="Rules Org", company_key="RULES-ORG")
+
+    def _rule(self, keyword, match_mode=AutomationRule.MATCH_CONTAINS, sort_order=0, **extra):
+        return AutomationRule.objects.create(
+            organization=self.org, keyword=keyword, match_mode=match_mode, sort_order=sort_order,
+            reply_message=f"reply:{keyword}", **extra,
+        )
+
+    def test_modes_and_priority(self):
+        fallback = self._rule("fallback", is_default=True, sort_order=99)
+        price = self._rule("price", sort_order=5)
+        price_list = self._rule("price list", sort_order=1)
+        hi = self._rule("hi", AutomationRule.MATCH_EXACT, sort_order=0)
+        order = self._rule("order", AutomationRule.MATCH_STARTS_WITH, sort_order=2)
+        self._rule("refund", is_active=False)
+
+        self.assertEqual(match_reply_rule(self.org, "Send me the PRICE LIST please"), price_list)
+        self.assertEqual(match_reply_rule(self.org, "what is the price?"), price)
+        self.assertEqual(match_reply_rule(self.org, "  Hi "), hi)
+        self.assertEqual(match_reply_rule(self.org, "hi there"), fallback)
+        self.assertEqual(match_reply_rule(self.org, "order status, price"), order)
+        self.assertEqual(match_reply_rule(self.org, "where is my order"), fallback)
+        self.assertEqual(match_reply_rule(self.org, "I want a refund"), fallback)
+
+    def test_overlapping_keywords_found_through_failure_links(self):
+        she = self._rule("she", sort_order=3)
+        hers = self._rule("hers", sort_order=1)
+        self._rule("his", sort_order=2)
+
+        self.assertEqual(match_reply_rule(self.org, "ushers"), hers)
+        self.assertEqual(match_reply_rule(self.org, "ushe"), she)
+
+    def test_matcher_is_cached_until_a_rule_changes(self):
+        rule = self._rule("price")
+        get_reply_matcher(self.org)
+        with self.assertNumQueries(0):
+            self.assertEqual(match_reply_rule(self.org, "price?"), rule)
+
+        rule.keyword = "cost"
+        rule.save()
+        self.assertIsNone(match_reply_rule(self.org, "price?"))
+        self.assertEqual(match_reply_rule(self.org, "cost?"), rule)
+
+        rule.delete()
+        self.assertIsNone(match_reply_rule(self.org, "cost?"))
+
+    def test_matcher_expires_without_a_shared_cache(self):
+        rule = self._rule("price")
+        self.assertEqual(match_reply_rule(self.org, "price?"), rule)
+        # Edited through another worker: its version bump never reaches this one.
+        AutomationRule.objects.filter(id=rule.id).update(keyword="cost")
+        with self.settings(WHATSAPP_REPLY_MATCHER_LOCAL_CACHE_SECONDS=60):
+            self.assertEqual(match_reply_rule(self.org, "price?"), rule)
+        with self.settings(WHATSAPP_REPLY_MATCHER_LOCAL_CACHE_SECONDS=0):
+            self.assertEqual(match_reply_rule(self.org, "cost?"), rule)
+
+
+class CardVisitRollupTests(TestCase):
+    def setUp(self):
+        flush_card_visits()
+        self.org = Organization.objects.create(name="Card Org", company_key="CARD-ORG")
+        self.user = User.objects.create_user(username="card@acme.test", email="card@acme.test", password="pw123456")
+        UserProfile.objects.create(user=self.user, organization=self.org, role="company_admin")
+        self.card = DigitalCardEntry.objects.create(organization=self.org, public_slug="acme-card")
+
+    def _visit(self, visitor_key):
+        record_card_visit(
+            org=self.org, card_entry=self.card, public_slug="acme-card",
+            visitor_ip="203.0.113.9", visitor_key=visitor_key, page_path="/card/acme-card/",
+        )
+
+    def test_visits_are_buffered_then_rolled_up_per_card_and_day(self):
+        for key in ["a" * 40, "b" * 40, "a" * 40]:
+            self._visit(key)
+        self.assertFalse(DigitalCardVisit.objects.exists())
+        self.assertEqual(get_card_view_count(org=self.org, card_entry=self.card, public_slug="acme-card"), 3)
+
+        self.assertEqual(flush_card_visits(), 3)
+        self._visit("c" * 40)
+        self._visit("a" * 40)
+        flush_card_visits()
+
+        rollup = DigitalCardVisitDaily.objects.get(organization=self.org)
+        self.assertEqual((rollup.card_key, rollup.views, rollup.unique_visitors), (str(self.card.id), 5, 3))
+        self.assertEqual(DigitalCardVisit.objects.count(), 5)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_card_view_count(org=self.org, card_entry=self.card, public_slug="acme-card"), 5)
+
+    @override_settings(WHATSAPP_CARD_VISIT_FLUSH_SECONDS=0)
+    def test_views_leave_interval_flushes_to_the_flusher_thread(self):
+        self.addCleanup(card_visits._buffer.drain)
+        outside_transaction = mock.Mock(in_atomic_block=False)
+        with mock.patch.object(card_visits, "connection", outside_transaction), \
+                mock.patch.object(card_visits, "flush_card_visits") as flush:
+            with mock.patch.object(card_visits._flusher, "pid", os.getpid()):
+                self._visit("a" * 40)
+            flush.assert_not_called()
+            self._visit("b" * 40)
+            flush.assert_called_once_with()
+
+    def test_analytics_summary_reads_rollups(self):
+        self._visit("a" * 40)
+        self._visit("b" * 40)
+        flush_card_visits()
+        yesterday = timezone.localdate() - timedelta(days=1)
+        DigitalCardVisitDaily.objects.create(
+            organization=self.org, card_key=str(self.card.id), card_entry=self.card, day=yesterday, views=4, unique_visitors=1,
+        )
+        DigitalCardDailyVisitor.objects.create(organization=self.org, card_key=str(self.card.id), day=yesterday, visitor_hash="a" * 40)
+        self.client.force_login(self.user)
+
+        data = self.client.get("/api/whatsapp-automation/digital-cards/visitor-analytics?range=week").json()
+
+        self.assertEqual(data["summary"]["total_visits"], 6)
+        self.assertEqual(data["summary"]["unique_visitors"], 2)
+        self.assertEqual([row["visits"] for row in data["chart"]], [4, 2])
+        self.assertEqual(len(data["items"]), 2)
+
+    def test_purge_drops_rows_past_retention(self):
+        old_day = timezone.localdate() - timedelta(days=400)
+        DigitalCardVisit.objects.create(
+            organization=self.org, card_entry=self.card, public_slug="acme-card",
+            visited_at=timezone.now() - timedelta(days=400),
+        )
+        DigitalCardVisitDaily.objects.create(organization=self.org, card_key=str(self.card.id), day=old_day, views=1)
+        DigitalCardDailyVisitor.objects.create(
+            organization=self.org, card_key=str(self.card.id), day=timezone.localdate() - timedelta(days=40), visitor_hash="x" * 40,
+        )
+        self._visit("a" * 40)
+
+        result = purge_card_visits()
+
+        self.assertEqual(result, {"visits": 1, "rollups": 1, "visitors": 1})
+        self.assertEqual(DigitalCardVisit.objects.count(), 1)
+        self.assertEqual(DigitalCardVisitDaily.objects.get().views, 1)
+
+
+@override_settings(ALLOWED_HOSTS=["*"])
+class CardRoutingCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        flush_card_visits()
+        self.org = Organization.objects.create(name="Route Org", company_key="ROUTE-ORG")
+        self.profile = CompanyProfile.objects.create(organization=self.org, company_name="Route Co")
+        self.card = DigitalCardEntry.objects.create(
+            organization=self.org,
+            company_profile=self.profile,
+            public_slug="route-card",
+            person_name="Asha",
+            custom_domain="cards.route.test",
+            custom_domain_active=True,
+        )
+
+    def tearDown(self):
+        flush_card_visits()
+
+    def test_host_map_caches_hits_and_misses_until_a_card_changes(self):
+        self.assertEqual(resolve_card_host("cards.route.test"), "route-card")
+        self.assertIsNone(resolve_card_host("www.main.test"))
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_card_host("cards.route.test"), "route-card")
+            self.assertIsNone(resolve_card_host("www.main.test"))
+
+        self.card.custom_domain_active = False
+        self.card.save()
+        self.assertIsNone(resolve_card_host("cards.route.test"))
+
+    def test_host_map_expires_without_a_shared_cache(self):
+        self.assertEqual(resolve_card_host("cards.route.test"), "route-card")
+        # Deactivated through another worker: its version bump never reaches this one.
+        DigitalCardEntry.objects.filter(id=self.card.id).update(custom_domain_active=False)
+        with self.settings(WHATSAPP_CARD_LOCAL_CACHE_SECONDS=60):
+            self.assertEqual(resolve_card_host("cards.route.test"), "route-card")
+        with self.settings(WHATSAPP_CARD_LOCAL_CACHE_SECONDS=0):
+            self.assertIsNone(resolve_card_host("cards.route.test"))
+
+    def test_repeat_card_hits_are_served_from_the_page_cache(self):
+        first = self.client.get("/", HTTP_HOST="cards.route.test")
+        self.assertEqual(first.status_code, 200)
+        self.assertContains(first, "Asha")
+        etag = first["ETag"]
+
+        with self.assertNumQueries(0):
+            repeat = self.client.get("/", HTTP_HOST="cards.route.test")
+            not_modified = self.client.get("/", HTTP_HOST="cards.route.test", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(repeat.content, first.content)
+        self.assertEqual(not_modified.status_code, 304)
+        with self.assertNumQueries(0):
+            shared = self.client.get("/?utm_source=whatsapp&fbclid=abc", HTTP_HOST="cards.route.test")
+        self.assertEqual(shared.content, first.content)
+
+        flush_card_visits()
+        self.assertEqual(DigitalCardVisit.objects.filter(card_entry=self.card).count(), 4)
+
+    def test_saving_card_data_invalidates_cached_pages(self):
+        self.client.get("/card/route-card/")
+        CatalogueProduct.objects.create(organization=self.org, title="Masala Tea", is_active=True)
+
+        response = self.client.get("/card/route-card/")
+
+        self.assertContains(response, "Masala Tea")
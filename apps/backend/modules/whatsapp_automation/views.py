@@ -1,10 +1,8 @@
 import hashlib
 import re
-from datetime import timedelta
 from urllib.parse import quote
 
 from django.db import DatabaseError
-from django.utils import timezone
 from django.shortcuts import get_object_or_404, render
 
 from .models import (
@@ -14,9 +12,10 @@ from .models import (
     DigitalCard,
     DigitalCardEntry,
     DigitalCardFeedback,
-    DigitalCardVisit,
     WhatsappSettings,
 )
+from .card_routing import cache_card_page, card_page_response, get_cached_card_page
+from .card_visits import get_card_view_count, record_card_visit
 from apps.backend.storage.storage_backend import storage_url
 
 
@@ -101,23 +100,19 @@ def _track_card_visit(request, *, org, card_entry, public_slug):
     if not org:
         return
     try:
-        cutoff = timezone.now() - timedelta(days=365)
-        DigitalCardVisit.objects.filter(organization=org, visited_at__lt=cutoff).delete()
         ip = _client_ip(request)
         user_agent = str(request.META.get("HTTP_USER_AGENT") or "").strip()
         visitor_key = hashlib.sha1(f"{ip}|{user_agent}".encode("utf-8")).hexdigest() if (ip or user_agent) else ""
-        page_path = str(getattr(request, "path", "") or "")[:300]
-        page_url = str(request.build_absolute_uri() or "")[:2000]
-        DigitalCardVisit.objects.create(
-            organization=org,
+        record_card_visit(
+            org=org,
             card_entry=card_entry,
-            public_slug=str(public_slug or "")[:220],
-            visitor_ip=ip[:80],
+            public_slug=public_slug,
+            visitor_ip=ip,
             visitor_country=_visitor_country(request),
-            visitor_key=visitor_key[:120],
-            user_agent=user_agent[:400],
-            page_path=page_path,
-            page_url=page_url,
+            visitor_key=visitor_key,
+            user_agent=user_agent,
+            page_path=str(getattr(request, "path", "") or ""),
+            page_url=str(request.build_absolute_uri() or ""),
         )
     except DatabaseError:
         # Do not block public card rendering if analytics table is not ready.
@@ -128,17 +123,18 @@ def _card_visit_count(*, org, card_entry, public_slug):
     if not org:
         return 0
     try:
-        queryset = DigitalCardVisit.objects.filter(organization=org)
-        if card_entry:
-            queryset = queryset.filter(card_entry=card_entry)
-        else:
-            queryset = queryset.filter(public_slug=public_slug)
-        return queryset.count()
+        return get_card_view_count(org=org, card_entry=card_entry, public_slug=public_slug)
     except DatabaseError:
         return 0
 
 
 def public_digital_card(request, public_slug):
+    # The page does not read the query string, so tracking params neither reach the share link nor split the cache.
+    public_url = request.build_absolute_uri(request.path)
+    cached_page = get_cached_card_page(public_slug, public_url)
+    if cached_page:
+        _track_card_visit(request, org=cached_page["org_id"], card_entry=cached_page["card_entry_id"], public_slug=public_slug)
+        return card_page_response(request, cached_page)
     card_entry = (
         DigitalCardEntry.objects.select_related("company_profile", "organization")
         .filter(public_slug=public_slug, is_active=True)
@@ -196,7 +192,6 @@ def public_digital_card(request, public_slug):
                 "title": str(row.get("title") or "").strip(),
                 "image_url": image_url,
             })
-    public_url = request.build_absolute_uri()
     _track_card_visit(request, org=org, card_entry=card_entry, public_slug=public_slug)
     view_count = _card_visit_count(org=org, card_entry=card_entry, public_slug=public_slug)
     resolved_address = (
@@ -259,7 +254,9 @@ def public_digital_card(request, public_slug):
             ).order_by("-created_at", "-id")[:8]
         ],
     }
-    return render(request, "whatsapp_automation/public_card.html", context)
+    response = render(request, "whatsapp_automation/public_card.html", context)
+    entry = cache_card_page(public_slug, public_url, org=org, card_entry=card_entry, response=response)
+    return card_page_response(request, entry) if entry else response
 
 
 def public_catalogue(request, public_slug):
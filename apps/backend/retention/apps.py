@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RetentionConfig(AppConfig):
     name = "apps.backend.retention"
     verbose_name = "Retention Policy"
+
+    def ready(self):
+        from . import signals  # noqa: F401
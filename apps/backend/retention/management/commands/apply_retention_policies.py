@@ -5,9 +5,10 @@ from django.utils import timezone
 
 from core.models import Organization
 
-from apps.backend.retention.models import RetentionStatus
+from apps.backend.retention.models import RetentionStatus, TenantRetentionStatus
 from apps.backend.retention.utils.retention import (
-    evaluate_tenant_status,
+    evaluate_all_tenant_statuses,
+    publish_tenant_snapshots,
     run_cleanup_handlers,
 )
 
@@ -20,42 +21,36 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         now = timezone.now()
-        total = 0
-        transitioned = 0
-        deleted = 0
-
-        for org in Organization.objects.all().iterator():
-            total += 1
-            previous = None
-            existing = (
-                org.retention_status
-                if hasattr(org, "retention_status")
-                else None
+        result = evaluate_all_tenant_statuses(now=now)
+        for org_id, from_status, to_status in result.transitions:
+            logger.info(
+                "Retention status changed",
+                extra={"org_id": org_id, "from_status": from_status, "to_status": to_status},
             )
-            if existing:
-                previous = existing.status
-            retention = evaluate_tenant_status(org, now=now)
-            if retention.status == RetentionStatus.PENDING_DELETE:
-                if retention.deleted_at:
-                    continue
-                ok = run_cleanup_handlers(org)
-                if not ok:
-                    logger.warning("Retention cleanup failed; will retry", extra={"org_id": org.id})
-                    continue
-                retention.status = RetentionStatus.DELETED
-                retention.deleted_at = now
-                retention.save(update_fields=["status", "deleted_at"])
-                deleted += 1
-                logger.info("Tenant deleted via retention policy", extra={"org_id": org.id})
+
+        deleted = 0
+        pending = {row.organization_id: row for row in result.pending_delete}
+        for org in Organization.objects.filter(id__in=pending).iterator():
+            if not run_cleanup_handlers(org):
+                logger.warning("Retention cleanup failed; will retry", extra={"org_id": org.id})
                 continue
-            if previous and previous != retention.status:
-                logger.info(
-                    "Retention status changed",
-                    extra={"org_id": org.id, "from_status": previous, "to_status": retention.status},
-                )
-            transitioned += 1
+            retention = pending[org.id]
+            retention.status = RetentionStatus.DELETED
+            retention.deleted_at = now
+            TenantRetentionStatus.objects.filter(organization_id=org.id).update(
+                status=retention.status, deleted_at=now, updated_at=now
+            )
+            publish_tenant_snapshots([retention])
+            deleted += 1
+            logger.info("Tenant deleted via retention policy", extra={"org_id": org.id})
 
         logger.info(
             "Retention policy run completed",
-            extra={"total": total, "transitioned": transitioned, "deleted": deleted},
+            extra={
+                "total": result.total,
+                "created": result.created,
+                "updated": result.updated,
+                "transitioned": len(result.transitions),
+                "deleted": deleted,
+            },
         )
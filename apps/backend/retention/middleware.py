@@ -5,8 +5,7 @@ from django.utils import timezone
 
 from apps.backend.retention.models import RetentionStatus, resolve_effective_policy
 from apps.backend.retention.utils.retention import (
-    evaluate_tenant_status,
-    get_tenant_status,
+    get_tenant_snapshot,
     is_action_allowed_in_grace,
     is_export_request,
     is_write_method,
@@ -82,9 +81,7 @@ class RetentionEnforcementMiddleware:
         if not organization:
             return self.get_response(request)
 
-        retention = get_tenant_status(organization)
-        if retention.last_evaluated_at is None:
-            retention = evaluate_tenant_status(organization)
+        retention = get_tenant_snapshot(organization)
 
         status = retention.status
         if status == RetentionStatus.GRACE_READONLY:
@@ -116,7 +116,13 @@ def resolve_effective_policy(
     override = None
     if organization:
         override = TenantRetentionOverride.objects.filter(organization=organization).first()
+    return merge_retention_policy(global_policy, override)
 
+
+def merge_retention_policy(
+    global_policy: GlobalRetentionPolicy,
+    override: Optional[TenantRetentionOverride],
+) -> EffectiveRetentionPolicy:
     def pick(value, fallback):
         return fallback if value is None else value
 
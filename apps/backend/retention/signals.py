@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.backend.retention.models import TenantRetentionStatus
+from apps.backend.retention.utils.retention import forget_tenant_snapshot, publish_tenant_snapshots
+
+
+@receiver(post_save, sender=TenantRetentionStatus, dispatch_uid="retention.tenant_status.publish_on_save")
+def publish_tenant_status(sender, instance, **kwargs):
+    publish_tenant_snapshots([instance])
+
+
+@receiver(post_delete, sender=TenantRetentionStatus, dispatch_uid="retention.tenant_status.forget_on_delete")
+def forget_tenant_status(sender, instance, **kwargs):
+    forget_tenant_snapshot(instance.organization_id)
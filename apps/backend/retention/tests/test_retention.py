@@ -1,11 +1,14 @@
 from datetime import timedelta
+from unittest import mock
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
 from django.http import HttpResponse
 from django.test import RequestFactory, TestCase
 from django.utils import timezone
 
-from core.models import Organization, UserProfile
+from core.models import Organization, Plan, Subscription, UserProfile
 
 from apps.backend.retention.middleware import RetentionEnforcementMiddleware
 from apps.backend.retention.models import (
@@ -16,6 +19,7 @@ from apps.backend.retention.models import (
     compute_retention_status,
     resolve_effective_policy,
 )
+from apps.backend.retention.utils.retention import evaluate_all_tenant_statuses, get_tenant_snapshot
 
 
 class RetentionPolicyTests(TestCase):
@@ -85,3 +89,83 @@ class RetentionMiddlewareTests(TestCase):
         request.user = self.user
         response = self._middleware()(request)
         self.assertEqual(response.status_code, 403)
+
+
+class RetentionBulkEvaluationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        self.user = get_user_model().objects.create_user(username="owner", email="owner@example.com", password="pass1234")
+        self.plan = Plan.objects.create(name="Pro", monthly_price=499)
+
+    def _org(self, key, end_in_days=None):
+        org = Organization.objects.create(name=key, company_key=key)
+        if end_in_days is not None:
+            Subscription.objects.create(
+                user=self.user,
+                organization=org,
+                plan=self.plan,
+                status="active",
+                end_date=self.now + timedelta(days=end_in_days),
+            )
+        return org
+
+    def test_bulk_evaluation_writes_changed_rows_and_publishes_snapshots(self):
+        lapsed = self._org("lapsed", end_in_days=-10)
+        archived = self._org("archived", end_in_days=-45)
+        active = self._org("active", end_in_days=20)
+        unsubscribed = self._org("unsubscribed")
+        TenantRetentionStatus.objects.create(organization=archived, status=RetentionStatus.ACTIVE)
+
+        result = evaluate_all_tenant_statuses(now=self.now)
+
+        self.assertEqual((result.created, result.updated), (3, 1))
+        self.assertEqual(result.transitions, [(archived.id, RetentionStatus.ACTIVE, RetentionStatus.ARCHIVED)])
+        self.assertEqual(
+            dict(TenantRetentionStatus.objects.values_list("organization_id", "status")),
+            {
+                lapsed.id: RetentionStatus.GRACE_READONLY,
+                archived.id: RetentionStatus.ARCHIVED,
+                active.id: RetentionStatus.ACTIVE,
+                unsubscribed.id: RetentionStatus.ACTIVE,
+            },
+        )
+        with mock.patch("apps.backend.retention.utils.retention.cache_is_shared", return_value=True):
+            with self.assertNumQueries(0):
+                snapshot = get_tenant_snapshot(lapsed)
+        self.assertEqual(snapshot.status, RetentionStatus.GRACE_READONLY)
+        self.assertIsNotNone(snapshot.grace_until)
+
+        # Policy, overrides, existing rows and one annotated org query; nothing changed, nothing written.
+        with self.assertNumQueries(4):
+            result = evaluate_all_tenant_statuses(now=self.now)
+        self.assertEqual((result.created, result.updated, result.transitions), (0, 0, []))
+
+    def test_saving_a_status_refreshes_the_snapshot(self):
+        org = self._org("renewed", end_in_days=-10)
+        evaluate_all_tenant_statuses(now=self.now)
+        retention = TenantRetentionStatus.objects.get(organization=org)
+        with mock.patch("apps.backend.retention.utils.retention.cache_is_shared", return_value=True):
+            self.assertEqual(get_tenant_snapshot(org).status, RetentionStatus.GRACE_READONLY)
+            retention.status = RetentionStatus.ACTIVE
+            retention.save()
+            self.assertEqual(get_tenant_snapshot(org).status, RetentionStatus.ACTIVE)
+
+    def test_per_process_cache_reads_the_stored_status(self):
+        org = self._org("lapsed-elsewhere", end_in_days=-10)
+        evaluate_all_tenant_statuses(now=self.now)
+        self.assertEqual(get_tenant_snapshot(org).status, RetentionStatus.GRACE_READONLY)
+        # Written by another process: nothing is published into this process's cache.
+        TenantRetentionStatus.objects.filter(organization=org).update(status=RetentionStatus.ACTIVE)
+        self.assertEqual(get_tenant_snapshot(org).status, RetentionStatus.ACTIVE)
+
+    def test_command_deletes_tenants_past_hard_delete(self):
+        org = self._org("expired-long-ago", end_in_days=-10)
+        TenantRetentionOverride.objects.create(organization=org, grace_days=1, archive_days=1, hard_delete_days=1)
+        call_command("apply_retention_policies")
+        retention = TenantRetentionStatus.objects.get(organization=org)
+        self.assertEqual(retention.status, RetentionStatus.DELETED)
+        self.assertIsNotNone(retention.deleted_at)
+        self.assertEqual(get_tenant_snapshot(org).status, RetentionStatus.DELETED)
+        call_command("apply_retention_policies")
+        self.assertEqual(TenantRetentionStatus.objects.get(organization=org).status, RetentionStatus.DELETED)
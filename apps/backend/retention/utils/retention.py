@@ -1,18 +1,27 @@
 from __future__ import annotations
 
 import logging
-from typing import Callable, Dict, Iterable, List, Optional
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
+from django.db.models import OuterRef, Subquery
 from django.utils import timezone
 
+from core.cache_utils import cache_is_shared
 from core.models import Organization, Subscription, UserProfile
 from core.subscription_utils import get_effective_end_date
 
 from apps.backend.retention.models import (
     EffectiveRetentionPolicy,
+    GlobalRetentionPolicy,
     RetentionStatus,
+    TenantRetentionOverride,
     TenantRetentionStatus,
+    merge_retention_policy,
     resolve_effective_policy,
     compute_retention_status,
 )
@@ -22,6 +31,8 @@ logger = logging.getLogger(__name__)
 
 WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
 EXPORT_PATH_HINTS = ("/export", "/exports", "export=")
+STATUS_FIELDS = ("status", "subscription_expires_at", "grace_until", "archive_until")
+WRITE_BATCH_SIZE = 500
 
 _cleanup_registry: Dict[str, Callable[[Organization], None]] = {}
 
@@ -100,6 +111,122 @@ def get_tenant_status(
     return retention
 
 
+@dataclass(frozen=True)
+class TenantStatusSnapshot:
+    status: str
+    grace_until: Optional[datetime] = None
+
+
+@dataclass
+class RetentionEvaluation:
+    total: int = 0
+    created: int = 0
+    updated: int = 0
+    transitions: List[Tuple[int, str, str]] = field(default_factory=list)
+    pending_delete: List[TenantRetentionStatus] = field(default_factory=list)
+
+
+def _snapshot_ttl_seconds() -> int:
+    return int(getattr(settings, "RETENTION_SNAPSHOT_TTL_SECONDS", 60))
+
+
+def _snapshot_key(org_id) -> str:
+    return f"retention:tenant_status:{org_id}"
+
+
+def publish_tenant_snapshots(rows: Iterable[TenantRetentionStatus]) -> None:
+    snapshots = {}
+    for row in rows:
+        snapshots[_snapshot_key(row.organization_id)] = (row.status, row.grace_until)
+        if len(snapshots) >= 1000:
+            cache.set_many(snapshots, _snapshot_ttl_seconds())
+            snapshots = {}
+    if snapshots:
+        cache.set_many(snapshots, _snapshot_ttl_seconds())
+
+
+def forget_tenant_snapshot(org_id) -> None:
+    cache.delete(_snapshot_key(org_id))
+
+
+def get_tenant_snapshot(
+    organization: Organization,
+    now=None,
+) -> TenantStatusSnapshot:
+    """
+    (status, grace_until) of the tenant. With a shared cache it is served from there
+    (refreshed by status saves and evaluation runs, and expiring within
+    RETENTION_SNAPSHOT_TTL_SECONDS); a per-process cache never sees other
+    processes' publishes, so then the stored row is read on every call.
+    """
+    if not cache_is_shared():
+        retention = get_tenant_status(organization, now=now)
+        return TenantStatusSnapshot(retention.status, retention.grace_until)
+    cached = cache.get(_snapshot_key(organization.id))
+    if cached is None:
+        retention = get_tenant_status(organization, now=now)
+        publish_tenant_snapshots([retention])
+        cached = (retention.status, retention.grace_until)
+    return TenantStatusSnapshot(*cached)
+
+
+def evaluate_all_tenant_statuses(now=None) -> RetentionEvaluation:
+    """
+    Evaluate every tenant from one org query annotated with its latest subscription's
+    effective end, write only the rows whose state changed, and publish all snapshots.
+    """
+    current = now or timezone.now()
+    global_policy = GlobalRetentionPolicy.get_active()
+    default_policy = merge_retention_policy(global_policy, None)
+    overrides = {override.organization_id: override for override in TenantRetentionOverride.objects.all()}
+    existing = {row.organization_id: row for row in TenantRetentionStatus.objects.all()}
+    latest_expiry = (
+        Subscription.objects.filter(organization=OuterRef("pk"))
+        .order_by("-start_date", "-id")
+        .values("effective_end_at")[:1]
+    )
+    orgs = Organization.objects.annotate(expires_at=Subquery(latest_expiry)).values_list("id", "expires_at")
+
+    result = RetentionEvaluation()
+    created, changed = [], []
+    for org_id, expires_at in orgs.iterator(chunk_size=2000):
+        result.total += 1
+        override = overrides.get(org_id)
+        policy = merge_retention_policy(global_policy, override) if override else default_policy
+        status, grace_until, archive_until, _ = compute_retention_status(expires_at, policy, now=current)
+        row = existing.get(org_id)
+        if row is not None and row.status == RetentionStatus.DELETED and status == RetentionStatus.PENDING_DELETE:
+            status = RetentionStatus.DELETED
+        values = {
+            "status": status,
+            "subscription_expires_at": expires_at,
+            "grace_until": grace_until,
+            "archive_until": archive_until,
+        }
+        if row is None:
+            row = TenantRetentionStatus(organization_id=org_id, last_evaluated_at=current, **values)
+            created.append(row)
+        elif any(getattr(row, key) != value for key, value in values.items()):
+            if row.status != status:
+                result.transitions.append((org_id, row.status, status))
+            for key, value in values.items():
+                setattr(row, key, value)
+            row.last_evaluated_at = current
+            row.updated_at = current
+            changed.append(row)
+        if row.status == RetentionStatus.PENDING_DELETE and not row.deleted_at:
+            result.pending_delete.append(row)
+
+    # ignore_conflicts: a request may have evaluated a brand-new tenant meanwhile.
+    TenantRetentionStatus.objects.bulk_create(created, batch_size=WRITE_BATCH_SIZE, ignore_conflicts=True)
+    TenantRetentionStatus.objects.bulk_update(
+        changed, [*STATUS_FIELDS, "last_evaluated_at", "updated_at"], batch_size=WRITE_BATCH_SIZE
+    )
+    result.created, result.updated = len(created), len(changed)
+    publish_tenant_snapshots([*existing.values(), *created])
+    return result
+
+
 def is_write_method(method: str) -> bool:
     return method.upper() in WRITE_METHODS
 
@@ -137,7 +264,7 @@ def enforce_retention_for_org(
     action: str = "write",
     now=None,
 ) -> None:
-    status = get_tenant_status(organization, now=now)
+    status = get_tenant_snapshot(organization, now=now)
     if status.status == RetentionStatus.GRACE_READONLY:
         if action == "write":
             raise PermissionDenied("Tenant is in read-only grace period.")
@@ -229,6 +229,9 @@
   var emojiPicker = ui.querySelector(".wz-ai-chatbot__emoji-picker");
 
   var pollHandle = null;
+  var eventSource = null;
+  var threadCursor = null;
+  var threadCursorCategory = null;
   var conversationIds = { sales: null, support: null };
   var currentCategory = "sales";
   var typingEl = null;
@@ -322,12 +325,49 @@
     }
   }
 
+  function schedulePolling() {
+    if (pollHandle) {
+      window.clearInterval(pollHandle);
+    }
+    // With a live stream, polling is only a safety net.
+    pollHandle = window.setInterval(fetchThread, eventSource ? 30000 : 5000);
+  }
+
+  function openStream() {
+    if (eventSource || !window.EventSource) {
+      return;
+    }
+    eventSource = new window.EventSource(apiBase + "/widget/stream?key=" + encodeURIComponent(widgetKey) +
+      "&visitor_id=" + encodeURIComponent(visitorId));
+    var onChange = function () {
+      fetchThread();
+    };
+    eventSource.addEventListener("message", onChange);
+    eventSource.addEventListener("conversation", onChange);
+    eventSource.onerror = function () {
+      if (eventSource && eventSource.readyState === 2) {
+        eventSource = null;
+        if (pollHandle) {
+          schedulePolling();
+        }
+      }
+    };
+  }
+
+  function closeStream() {
+    if (eventSource) {
+      eventSource.close();
+      eventSource = null;
+    }
+  }
+
   function startPolling() {
     if (pollHandle) {
       return;
     }
     fetchThread();
-    pollHandle = window.setInterval(fetchThread, 5000);
+    openStream();
+    schedulePolling();
   }
 
   buildEmojiPicker();
@@ -432,6 +472,7 @@
       window.clearInterval(pollHandle);
       pollHandle = null;
     }
+    closeStream();
   }
 
   function setOpen(isOpen) {
@@ -569,17 +610,29 @@
   }
 
   function fetchThread() {
+    var category = currentCategory;
     var url = apiBase + "/widget/thread?key=" + encodeURIComponent(widgetKey) +
       "&visitor_id=" + encodeURIComponent(visitorId) +
-      "&category=" + encodeURIComponent(currentCategory);
+      "&category=" + encodeURIComponent(category);
+    if (threadCursor && threadCursorCategory === category) {
+      url += "&since=" + encodeURIComponent(threadCursor);
+    }
     return fetch(url)
       .then(function (response) {
+        if (response.status === 304) {
+          return null;
+        }
         if (!response.ok) {
           throw new Error("thread_failed");
         }
         return response.json();
       })
       .then(function (data) {
+        if (!data) {
+          return null;
+        }
+        threadCursor = data.cursor || null;
+        threadCursorCategory = category;
         if (data.conversation_id) {
           conversationIds[currentCategory] = data.conversation_id;
         }
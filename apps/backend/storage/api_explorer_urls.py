@@ -7,6 +7,10 @@ urlpatterns = [
     path("root", explorer.explorer_root, name="storage_explorer_root"),
     path("folder/<uuid:folder_id>", explorer.explorer_folder, name="storage_explorer_folder"),
     path("upload", explorer.explorer_upload, name="storage_explorer_upload"),
+    path("uploads/init", explorer.explorer_upload_init, name="storage_explorer_upload_init"),
+    path("uploads/<uuid:session_id>", explorer.explorer_upload_session, name="storage_explorer_upload_session"),
+    path("uploads/<uuid:session_id>/parts/<int:part_number>", explorer.explorer_upload_part, name="storage_explorer_upload_part"),
+    path("uploads/<uuid:session_id>/complete", explorer.explorer_upload_complete, name="storage_explorer_upload_complete"),
     path("files/<uuid:file_id>/download", explorer.explorer_download, name="storage_explorer_download"),
     path("download-bulk", explorer.explorer_bulk_download, name="storage_explorer_bulk_download"),
     path("folders/create", explorer.explorer_folder_create, name="storage_explorer_folder_create"),
@@ -18,4 +22,4 @@ urlpatterns = [
     path("files/<uuid:file_id>/delete", explorer.explorer_file_delete, name="storage_explorer_file_delete"),
     path("status", explorer.explorer_status, name="storage_explorer_status"),
     path("search", explorer.explorer_search, name="storage_explorer_search"),
-]
+]
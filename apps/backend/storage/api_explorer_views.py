@@ -6,6 +6,7 @@ import json
 import os
 import tempfile
 import zipfile
+from types import SimpleNamespace
 
 from .services_explorer import (
     resolve_context,
@@ -26,11 +27,19 @@ from .services_explorer import (
     search_files,
     open_file_stream,
 )
+from .services_uploads import (
+    start_upload_session,
+    get_upload_session,
+    save_upload_part,
+    complete_upload_session,
+    abort_upload_session,
+    serialize_upload_session,
+)
 from .models import StorageFolder, StorageFile
 from .models import StorageGlobalSettings
 from .security import rate_limit, get_storage_security_settings, validate_upload
-from .events import emit_security_event
-from .services import get_storage_access_state, apply_bandwidth_usage
+from .events import emit_event, emit_security_event
+from .services import get_storage_access_state, apply_bandwidth_usage, check_storage_bytes, reserve_storage_bytes
 
 
 def _error(code, status=400, extra=None):
@@ -612,4 +621,162 @@ def explorer_search(request):
         return JsonResponse({"items": [], "limit": int(request.GET.get("limit") or 50)})
     limit = int(request.GET.get("limit") or 50)
     items = search_files(org, owner_id, ctx["role"], query, limit=limit)
-    return JsonResponse({"items": items, "limit": limit})
+    return JsonResponse({"items": items, "limit": limit})
+
+
+def _upload_session_context(request, require_active=True):
+    ctx = resolve_context(request)
+    if not ctx:
+        return None, _error("permission_denied", status=403)
+    if ctx["role"] == "saas_admin":
+        emit_security_event("permission_denied", request=request)
+        return None, _error("permission_denied", status=403)
+    access_state, _ = get_storage_access_state(ctx["org"])
+    if require_active and access_state != "active":
+        return None, _error("read_only", status=403)
+    if access_state == "none":
+        return None, _error("subscription_required", status=403)
+    return ctx, None
+
+
+def _load_upload_session(request, ctx, session_id):
+    owner_id = get_owner_from_request(request, ctx["org"], ctx["role"])
+    try:
+        session = get_upload_session(ctx["org"], owner_id, ctx["role"], session_id)
+    except PermissionError:
+        return None, _error("permission_denied", status=403)
+    if not session:
+        return None, _error("session_not_found", status=404)
+    return session, None
+
+
+@csrf_exempt
+@login_required
+@require_http_methods(["POST"])
+def explorer_upload_init(request):
+    ctx, error = _upload_session_context(request)
+    if error:
+        return error
+    org = ctx["org"]
+    owner_id = get_owner_from_request(request, org, ctx["role"])
+    settings_obj = StorageGlobalSettings.get_solo()
+    if not settings_obj.uploads_globally_enabled or settings_obj.read_only_globally_enabled:
+        emit_security_event("uploads_disabled", org_id=org.id, user_id=request.user.id, request=request)
+        return _error("uploads_disabled", status=403)
+    sec = get_storage_security_settings()
+    if rate_limit(f"upload:user:{request.user.id}", sec["rate_limit_user_per_min"], 60):
+        return _error("rate_limited", status=429)
+    if rate_limit(f"upload:org:{org.id}", sec["rate_limit_org_per_min"], 60):
+        return _error("rate_limited", status=429)
+    try:
+        payload = json.loads(request.body.decode("utf-8") or "{}")
+    except json.JSONDecodeError:
+        payload = {}
+    name = _clean_name(payload.get("filename"))
+    if not name:
+        return _error("file_required", status=400)
+    try:
+        size = int(payload.get("size") or 0)
+    except (TypeError, ValueError):
+        size = -1
+    if size < 0:
+        return _error("invalid_size", status=400)
+    content_type = str(payload.get("content_type") or "")[:120]
+    validation_error = validate_upload(SimpleNamespace(name=name, size=size, content_type=content_type), sec)
+    if validation_error:
+        emit_security_event(validation_error, org_id=org.id, user_id=request.user.id, request=request)
+        return _error(validation_error, status=400)
+    folder_id = payload.get("folder_id")
+    if folder_id:
+        try:
+            folder = ensure_folder_access(org, owner_id, ctx["role"], folder_id)
+        except PermissionError:
+            return _error("permission_denied", status=403)
+    else:
+        folder = get_root_folder(org, owner_id)
+    session = start_upload_session(
+        org,
+        owner_id,
+        folder,
+        name,
+        size,
+        content_type=content_type,
+        sha256=payload.get("sha256"),
+    )
+    if session.status != "completed":
+        allowed, usage = check_storage_bytes(org, size)
+        if not allowed:
+            abort_upload_session(session)
+            emit_security_event("storage_limit_exceeded", org_id=org.id, user_id=request.user.id, request=request)
+            return _error("storage_limit_exceeded", status=409, extra=usage)
+    data = serialize_upload_session(session)
+    data["deduplicated"] = session.status == "completed"
+    return JsonResponse(data, status=200 if data["deduplicated"] else 201)
+
+
+@csrf_exempt
+@login_required
+@require_http_methods(["GET", "DELETE"])
+def explorer_upload_session(request, session_id):
+    ctx, error = _upload_session_context(request, require_active=request.method != "GET")
+    if error:
+        return error
+    session, error = _load_upload_session(request, ctx, session_id)
+    if error:
+        return error
+    if request.method == "DELETE":
+        abort_upload_session(session)
+    return JsonResponse(serialize_upload_session(session))
+
+
+@csrf_exempt
+@login_required
+@require_http_methods(["PUT"])
+def explorer_upload_part(request, session_id, part_number):
+    ctx, error = _upload_session_context(request)
+    if error:
+        return error
+    session, error = _load_upload_session(request, ctx, session_id)
+    if error:
+        return error
+    try:
+        part, error = save_upload_part(session, part_number, request.body)
+    except Exception:
+        return _error("storage_unavailable", status=503)
+    if error:
+        return _error(error, status=409 if error in ("session_closed", "session_expired") else 400)
+    return JsonResponse({
+        "session_id": str(session.id),
+        "part_number": part.part_number,
+        "size": part.size_bytes,
+        "sha256": part.sha256,
+    })
+
+
+@csrf_exempt
+@login_required
+@require_http_methods(["POST"])
+def explorer_upload_complete(request, session_id):
+    ctx, error = _upload_session_context(request)
+    if error:
+        return error
+    session, error = _load_upload_session(request, ctx, session_id)
+    if error:
+        return error
+    try:
+        item, error, extra = complete_upload_session(session, reserve_quota=reserve_storage_bytes)
+    except Exception:
+        return _error("storage_unavailable", status=503)
+    if error == "storage_limit_exceeded":
+        emit_security_event("storage_limit_exceeded", org_id=session.organization_id, user_id=request.user.id, request=request)
+        return _error(error, status=409, extra=extra)
+    if error:
+        return _error(error, status=409 if error in ("session_closed", "session_busy") else 400, extra=extra)
+    emit_event("file_uploaded", file_id=str(item.id), org_id=item.organization_id, owner_id=item.owner_id)
+    return JsonResponse({
+        "file_id": str(item.id),
+        "filename": item.original_filename,
+        "size": item.size_bytes,
+        "sha256": item.blob.sha256 if item.blob_id else "",
+        "folder_id": str(item.folder_id) if item.folder_id else None,
+    })
@@ -5,6 +5,7 @@ from django.contrib.auth.decorators import login_required
 from django.db import models
 from django.http import JsonResponse, FileResponse, Http404
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from django.views.decorators.http import require_http_methods
 
 from .models import (
@@ -16,12 +17,12 @@ from .models import (
     OrgUser,
 )
 from .storage_backend import (
-    build_storage_key,
     storage_delete,
-    storage_save,
     storage_open,
 )
-from .events import emit_event, soft_delete_folder, hard_delete_file
+from .events import emit_event, soft_delete_folder
+from .services_uploads import store_upload
+from .usage_cache import decrement_usage
 from .permissions import (
     is_org_admin,
     is_saas_admin,
@@ -32,7 +33,7 @@ from .services import (
     get_active_storage_subscription,
     get_storage_access_state,
     get_org_storage_usage,
-    can_store_bytes,
+    reserve_storage_bytes,
     check_storage_available,
     is_system_sync_enabled,
     apply_bandwidth_usage,
@@ -100,21 +101,6 @@ def _is_inline_previewable(item):
     return filename.endswith((".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp", ".svg"))
 
 
-def _resolve_root_folder_name(folder):
-    if not folder:
-        return "sync"
-    current = folder
-    direct_child = None
-    while current:
-        if current.parent_id is None:
-            break
-        direct_child = current
-        current = current.parent
-    if folder.parent_id is None:
-        return "sync"
-    return (direct_child.name if direct_child else folder.name) or "sync"
-
-
 def _folder_path_map(folders):
     mapping = {}
     for folder in folders:
@@ -777,7 +763,8 @@ def upload_file(request):
                 created_by=request.user,
                 is_deleted=False,
             )
-    allowed, usage = can_store_bytes(org, upload.size or 0)
+    reserved_bytes = int(upload.size or 0)
+    allowed, usage = reserve_storage_bytes(org, reserved_bytes)
     if not allowed:
         return _json_error(
             "storage_limit_exceeded",
@@ -790,27 +777,14 @@ def upload_file(request):
             },
         )
     if not check_storage_available():
+        decrement_usage(org, reserved_bytes)
         return _json_error("storage_unavailable", status=503)
     name = _clean_name(upload.name or "file")
-    storage_key = build_storage_key(
-        org,
-        owner,
-        root_folder_name=_resolve_root_folder_name(folder),
-        original_filename=name,
-    )
     try:
-        storage_save(storage_key, upload)
+        item, _ = store_upload(org, owner.id, folder, upload, name=name, reserved=True)
     except Exception:
+        decrement_usage(org, reserved_bytes)
         return _json_error("storage_unavailable", status=503)
-    item = StorageFile.objects.create(
-        organization=org,
-        folder=folder,
-        owner=owner,
-        original_filename=name,
-        storage_key=storage_key,
-        size_bytes=upload.size or 0,
-        content_type=getattr(upload, "content_type", "") or "",
-    )
     emit_event("file_uploaded", file_id=str(item.id), org_id=org.id, owner_id=owner.id)
     return JsonResponse({
         "id": str(item.id),
@@ -1030,9 +1004,9 @@ def delete_file(request, file_id):
     item = get_object_or_404(StorageFile, id=file_id, organization=org, is_deleted=False)
     if not allow_all and item.owner_id != request.user.id:
         return _json_error("forbidden", status=403)
-    hard_delete_file(item.storage_key)
     item.is_deleted = True
-    item.save(update_fields=["is_deleted"])
+    item.deleted_at = timezone.now()
+    item.save(update_fields=["is_deleted", "deleted_at"])
     emit_event("file_deleted", file_id=str(item.id), org_id=org.id, owner_id=item.owner_id)
     return JsonResponse({"deleted": True})
 
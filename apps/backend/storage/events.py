@@ -29,18 +29,25 @@ def emit_security_event(action, org_id=None, user_id=None, request=None, **extra
 
 
 def soft_delete_folder(folder):
+    """Mark a folder tree deleted; stored objects are removed later by the purge task."""
     if folder.is_deleted:
         return
-    files = list(StorageFile.objects.filter(folder=folder, is_deleted=False).only("storage_key"))
-    for item in files:
-        hard_delete_file(item.storage_key)
+    folder_ids = [folder.id]
+    frontier = [folder.id]
+    while frontier:
+        frontier = list(
+            StorageFolder.objects
+            .filter(parent_id__in=frontier, is_deleted=False)
+            .values_list("id", flat=True)
+        )
+        folder_ids.extend(frontier)
+    StorageFile.objects.filter(folder_id__in=folder_ids, is_deleted=False).update(
+        is_deleted=True,
+        deleted_at=timezone.now(),
+    )
+    StorageFolder.objects.filter(id__in=folder_ids).update(is_deleted=True)
     folder.is_deleted = True
-    folder.save(update_fields=["is_deleted"])
-    StorageFile.objects.filter(folder=folder, is_deleted=False).update(is_deleted=True)
-    children = StorageFolder.objects.filter(parent=folder, is_deleted=False)
-    for child in children:
-        soft_delete_folder(child)
 
 
 def hard_delete_file(storage_key):
-    return storage_delete(storage_key)
+    return storage_delete(storage_key)
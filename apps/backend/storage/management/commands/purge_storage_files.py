@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from apps.backend.storage.tasks import purge_deleted_files, purge_expired_upload_sessions
+
+
+class Command(BaseCommand):
+    help = "Purge soft-deleted storage files and expired upload sessions in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None, help="Rows per keyset batch.")
+        parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches (resumes from checkpoint).")
+        parser.add_argument("--retention-hours", type=int, default=None, help="Only purge files deleted longer ago than this.")
+
+    def handle(self, *args, **options):
+        stats = purge_deleted_files(
+            batch_size=options.get("batch_size"),
+            max_batches=options.get("max_batches"),
+            retention_hours=options.get("retention_hours"),
+        )
+        sessions = purge_expired_upload_sessions()
+        self.stdout.write(
+            f"Purged {stats['purged']} files in {stats['batches']} batches "
+            f"({stats['failed']} retried later), closed {sessions} expired upload sessions."
+        )
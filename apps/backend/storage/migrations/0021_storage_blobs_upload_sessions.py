@@ -0,0 +1,82 @@
+# Generated by Django 4.2.10 on 2026-10-19 03:16
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0157_plan_actual_offer_prices'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('storage', '0020_plan_actual_offer_prices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageUploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('original_filename', models.CharField(default='', max_length=255)),
+                ('content_type', models.CharField(blank=True, default='', max_length=120)),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('part_size_bytes', models.BigIntegerField(default=0)),
+                ('expected_sha256', models.CharField(blank=True, default='', max_length=64)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('aborted', 'Aborted')], default='pending', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('expires_at', models.DateTimeField()),
+                ('file', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='storage.storagefile')),
+                ('folder', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='storage.storagefolder')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='storage_upload_sessions', to='core.organization')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='storage_upload_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StorageUploadPart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('part_number', models.PositiveIntegerField()),
+                ('storage_key', models.TextField(default='')),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('sha256', models.CharField(default='', max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parts', to='storage.storageuploadsession')),
+            ],
+            options={
+                'ordering': ('part_number',),
+            },
+        ),
+        migrations.CreateModel(
+            name='StorageBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64)),
+                ('storage_key', models.TextField(default='')),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='storage_blobs', to='core.organization')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='storagefile',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='files', to='storage.storageblob'),
+        ),
+        migrations.AddIndex(
+            model_name='storageuploadsession',
+            index=models.Index(fields=['status', 'expires_at'], name='storage_upl_status_exp_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='storageuploadpart',
+            unique_together={('session', 'part_number')},
+        ),
+        migrations.AddConstraint(
+            model_name='storageblob',
+            constraint=models.UniqueConstraint(fields=('organization', 'sha256'), name='storage_blob_org_sha256_uniq'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.10 on 2026-10-19 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0021_storage_blobs_upload_sessions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoragePurgeCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=60, unique=True)),
+                ('last_file_id', models.UUIDField(blank=True, null=True)),
+                ('files_purged', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='storagefile',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='storagefile',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['id'], name='storage_file_purge_idx'),
+        ),
+    ]
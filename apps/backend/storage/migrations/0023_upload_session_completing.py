@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-19 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0022_storage_file_purge'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='storageuploadsession',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('completing', 'Completing'), ('completed', 'Completed'), ('aborted', 'Aborted')], default='pending', max_length=20),
+        ),
+    ]
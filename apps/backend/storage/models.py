@@ -50,6 +50,24 @@ class StorageFolder(models.Model):
         super().save(*args, **kwargs)
 
 
+class StorageBlob(models.Model):
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="storage_blobs")
+    sha256 = models.CharField(max_length=64)
+    storage_key = models.TextField(default="")
+    size_bytes = models.BigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["organization", "sha256"], name="storage_blob_org_sha256_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.organization_id}:{self.sha256[:12]} x{self.ref_count}"
+
+
 class StorageFile(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="storage_files")
@@ -57,16 +75,19 @@ class StorageFile(models.Model):
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="storage_files")
     original_filename = models.CharField(max_length=255, default="")
     storage_key = models.TextField(default="")
+    blob = models.ForeignKey(StorageBlob, on_delete=models.SET_NULL, null=True, blank=True, related_name="files")
     size_bytes = models.BigIntegerField(default=0)
     content_type = models.CharField(max_length=120, blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
     is_deleted = models.BooleanField(default=False)
+    deleted_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         indexes = [
             models.Index(fields=["organization", "owner"], name="storage_sto_organiz_12ab80_idx"),
             models.Index(fields=["organization", "folder"], name="storage_sto_organiz_a94251_idx"),
             models.Index(fields=["organization", "is_deleted"], name="storage_sto_organiz_3a2f7d_idx"),
+            models.Index(fields=["id"], condition=models.Q(is_deleted=True), name="storage_file_purge_idx"),
         ]
         ordering = ("-created_at",)
 
@@ -253,6 +274,70 @@ class OrgBandwidthUsage(models.Model):
         return f"{self.organization_id} bandwidth {self.billing_cycle_start}"
 
 
+class StorageUploadSession(models.Model):
+    STATUS_CHOICES = (
+        ("pending", "Pending"),
+        ("completing", "Completing"),
+        ("completed", "Completed"),
+        ("aborted", "Aborted"),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="storage_upload_sessions")
+    folder = models.ForeignKey(StorageFolder, on_delete=models.CASCADE, related_name="upload_sessions")
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="storage_upload_sessions")
+    original_filename = models.CharField(max_length=255, default="")
+    content_type = models.CharField(max_length=120, blank=True, default="")
+    size_bytes = models.BigIntegerField(default=0)
+    part_size_bytes = models.BigIntegerField(default=0)
+    expected_sha256 = models.CharField(max_length=64, blank=True, default="")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    file = models.ForeignKey(StorageFile, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "expires_at"], name="storage_upl_status_exp_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.organization_id}:{self.original_filename} ({self.status})"
+
+    @property
+    def part_count(self):
+        if not self.part_size_bytes:
+            return 0
+        return max(1, -(-int(self.size_bytes or 0) // int(self.part_size_bytes)))
+
+
+class StorageUploadPart(models.Model):
+    session = models.ForeignKey(StorageUploadSession, on_delete=models.CASCADE, related_name="parts")
+    part_number = models.PositiveIntegerField()
+    storage_key = models.TextField(default="")
+    size_bytes = models.BigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("session", "part_number")
+        ordering = ("part_number",)
+
+    def __str__(self):
+        return f"{self.session_id}#{self.part_number}"
+
+
+class StoragePurgeCheckpoint(models.Model):
+    name = models.CharField(max_length=60, unique=True)
+    last_file_id = models.UUIDField(null=True, blank=True)
+    files_purged = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_file_id or 'start'}"
+
+
 @receiver(post_delete, sender=StorageFile)
 def storage_file_delete(sender, instance, **kwargs):
     return
@@ -1,13 +1,13 @@
 ﻿from decimal import Decimal
 from datetime import timedelta
 
-from django.db import models, transaction
+from django.db import models
 from django.db.models import Sum, Q, F
 from django.utils import timezone
 
 from core.models import Subscription, UserProfile
-from .models import OrgSubscription, OrgAddOn, StorageFile, StorageFolder, OrgBandwidthUsage
-from .usage_cache import get_usage_for_org
+from .models import OrgSubscription, OrgAddOn, StorageFile, StorageFolder
+from .usage_counters import add_bandwidth_usage, add_storage_usage, get_bandwidth_used, get_storage_used
 from .storage_backend import storage_backend
 from core.subscription_utils import is_subscription_active, normalize_subscription_end_date, maybe_expire_subscription, resolve_plan_limits
 
@@ -171,8 +171,7 @@ def get_org_storage_limits(org):
 def get_org_storage_usage_bytes(org):
     if not org:
         return 0
-    usage = get_usage_for_org(org)
-    return int(usage.used_storage_bytes or 0)
+    return get_storage_used(org)
 
 
 def storage_gb_to_bytes(value_gb):
@@ -216,11 +215,7 @@ def get_org_bandwidth_status(org):
     limit_gb, is_limited = get_plan_bandwidth_limit_gb(sub.plan, limits_override=effective_limits)
     limit_bytes = storage_gb_to_bytes(limit_gb)
     cycle_start = _get_bandwidth_cycle_start(sub)
-    usage = OrgBandwidthUsage.objects.filter(
-        organization=org,
-        billing_cycle_start=cycle_start,
-    ).first()
-    used_bytes = int(usage.used_bandwidth_bytes or 0) if usage else 0
+    used_bytes = get_bandwidth_used(org, cycle_start)
     remaining_bytes = max(0, limit_bytes - used_bytes) if is_limited and limit_bytes else 0
     used_gb = int(used_bytes / (1024 ** 3))
     remaining_gb = int(remaining_bytes / (1024 ** 3))
@@ -246,23 +241,16 @@ def apply_bandwidth_usage(org, size_bytes):
     limit_bytes = storage_gb_to_bytes(limit_gb)
     cycle_start = _get_bandwidth_cycle_start(sub)
     size_bytes = int(size_bytes or 0)
-    with transaction.atomic():
-        usage, _ = OrgBandwidthUsage.objects.select_for_update().get_or_create(
-            organization=org,
-            billing_cycle_start=cycle_start,
-            defaults={"used_bandwidth_bytes": 0},
-        )
-        used_bytes = int(usage.used_bandwidth_bytes or 0)
-        projected = used_bytes + size_bytes
-        if is_limited and limit_bytes and projected > limit_bytes:
-            return False, {
-                "limit_bytes": limit_bytes,
-                "used_bytes": used_bytes,
-                "remaining_bytes": max(0, limit_bytes - used_bytes),
-                "is_limited": True,
-            }
-        usage.used_bandwidth_bytes = projected
-        usage.save(update_fields=["used_bandwidth_bytes", "updated_at"])
+    # Reserve first with an atomic increment, then hand the bytes back if it overshoots.
+    projected = add_bandwidth_usage(org, cycle_start, size_bytes)
+    if is_limited and limit_bytes and projected > limit_bytes:
+        used_bytes = add_bandwidth_usage(org, cycle_start, -size_bytes)
+        return False, {
+            "limit_bytes": limit_bytes,
+            "used_bytes": used_bytes,
+            "remaining_bytes": max(0, limit_bytes - used_bytes),
+            "is_limited": True,
+        }
     return True, {
         "limit_bytes": limit_bytes,
         "used_bytes": projected,
@@ -302,13 +290,34 @@ def check_storage_available():
         return False
 
 
-def can_store_bytes(org, extra_bytes):
-    usage = get_org_storage_usage(org)
-    limit_bytes = usage.get("limit_bytes") or 0
+def storage_limit_bytes(org):
+    """The org's storage allowance; 0 (no active plan) allows nothing."""
+    return storage_gb_to_bytes(get_org_storage_limits(org).get("total_storage_gb", 0))
+
+
+def check_storage_bytes(org, extra_bytes):
+    """Advisory check that `extra_bytes` still fit, for refusing an upload before its bytes are sent."""
+    limit_bytes = storage_limit_bytes(org)
+    used_bytes = get_storage_used(org)
+    allowed = bool(limit_bytes) and used_bytes + int(extra_bytes or 0) <= limit_bytes
+    return allowed, {"used_bytes": used_bytes, "limit_bytes": limit_bytes, "remaining_bytes": max(0, limit_bytes - used_bytes)}
+
+
+def reserve_storage_bytes(org, extra_bytes):
+    """
+    Claim `extra_bytes` of the org's storage before writing them, so concurrent
+    uploads cannot all pass the same check. Refused reservations are handed back;
+    a caller whose write fails releases its reservation with decrement_usage.
+    """
+    limit_bytes = storage_limit_bytes(org)
     if not limit_bytes:
-        return False, usage
-    projected = usage.get("used_bytes", 0) + int(extra_bytes or 0)
-    return projected <= limit_bytes, usage
+        return check_storage_bytes(org, extra_bytes)
+    extra_bytes = int(extra_bytes or 0)
+    used_bytes = add_storage_usage(org, extra_bytes)
+    allowed = used_bytes <= limit_bytes
+    if not allowed:
+        used_bytes = add_storage_usage(org, -extra_bytes)
+    return allowed, {"used_bytes": used_bytes, "limit_bytes": limit_bytes, "remaining_bytes": max(0, limit_bytes - used_bytes)}
 
 
 def total_allowed_storage_gb(org):
@@ -1,12 +1,13 @@
-﻿from django.db import transaction
-from django.shortcuts import get_object_or_404
+﻿from django.shortcuts import get_object_or_404
+from django.utils import timezone
 
 from .models import StorageFolder, StorageFile
-from .services import total_allowed_storage_gb, get_org_bandwidth_status, get_org_storage_usage
-from .usage_cache import get_usage_for_org, increment_usage, decrement_usage
+from .services import total_allowed_storage_gb, get_org_bandwidth_status, get_org_storage_usage, reserve_storage_bytes
+from .usage_cache import decrement_usage
 from .permissions import resolve_org_for_user, is_org_admin, is_saas_admin
-from .storage_backend import build_storage_key, storage_save, storage_open
-from .events import emit_event, soft_delete_folder, hard_delete_file
+from .storage_backend import storage_open
+from .events import emit_event, soft_delete_folder
+from .services_uploads import store_upload
 
 
 def resolve_context(request):
@@ -106,47 +107,19 @@ def ensure_unique_folder_name(org, owner_id, parent, name):
     return not exists
 
 
-def _resolve_root_folder_name(folder):
-    if not folder:
-        return "sync"
-    current = folder
-    direct_child = None
-    while current:
-        if current.parent_id is None:
-            break
-        direct_child = current
-        current = current.parent
-    if folder.parent_id is None:
-        return "sync"
-    return (direct_child.name if direct_child else folder.name) or "sync"
-
-
 def upload_file(org, owner_id, folder, upload):
     incoming = int(upload.size or 0)
-    with transaction.atomic():
-        usage = get_usage_for_org(org, lock=True)
-        allowed_bytes = total_allowed_storage_gb(org) * (1024 ** 3)
-        if allowed_bytes and (usage.used_storage_bytes + incoming) > allowed_bytes:
-            return None, "storage_limit_exceeded", {
-                "used_bytes": usage.used_storage_bytes,
-                "limit_bytes": allowed_bytes,
-            }
-        root_folder_name = _resolve_root_folder_name(folder)
-        storage_key = build_storage_key(org, owner_id, root_folder_name=root_folder_name, original_filename=upload.name)
-        storage_save(storage_key, upload)
-        item = StorageFile.objects.create(
-            organization=org,
-            folder=folder,
-            owner_id=owner_id,
-            original_filename=upload.name or "file",
-            storage_key=storage_key,
-            size_bytes=incoming,
-            content_type=getattr(upload, "content_type", "") or "",
-            is_deleted=False,
-        )
-        increment_usage(org, incoming)
+    allowed, usage = reserve_storage_bytes(org, incoming)
+    if not allowed:
+        return None, "storage_limit_exceeded", usage
+    # Identical content already stored for the org is linked, not re-stored or re-billed.
+    try:
+        item, _ = store_upload(org, owner_id, folder, upload, reserved=True)
+    except Exception:
+        decrement_usage(org, incoming)
+        raise
     emit_event("file_uploaded", file_id=str(item.id), org_id=org.id, owner_id=owner_id)
-    return item, "", {"used_bytes": usage.used_storage_bytes, "limit_bytes": allowed_bytes}
+    return item, "", usage
 
 
 def rename_file(item, name):
@@ -164,10 +137,9 @@ def move_file(item, folder):
 def soft_delete_file(item):
     if item.is_deleted:
         return item
-    hard_delete_file(item.storage_key)
     item.is_deleted = True
-    item.save(update_fields=["is_deleted"])
-    decrement_usage(item.organization, item.size_bytes or 0)
+    item.deleted_at = timezone.now()
+    item.save(update_fields=["is_deleted", "deleted_at"])
     emit_event("file_deleted", file_id=str(item.id), org_id=item.organization_id, owner_id=item.owner_id)
     return item
 
@@ -201,10 +173,9 @@ def delete_folder(folder):
 
 
 def get_storage_status(org):
-    usage = get_usage_for_org(org)
     storage_usage = get_org_storage_usage(org)
     total_gb = total_allowed_storage_gb(org)
-    used_gb = int((usage.used_storage_bytes or 0) / (1024 ** 3))
+    used_gb = int((storage_usage.get("used_bytes") or 0) / (1024 ** 3))
     remaining_gb = max(0, total_gb - used_gb)
     bandwidth = get_org_bandwidth_status(org)
     return {
@@ -244,4 +215,4 @@ def search_files(org, owner_id, role, query, limit=50):
 
 
 def open_file_stream(item):
-    return storage_open(item.storage_key, "rb")
+    return storage_open(item.storage_key, "rb")
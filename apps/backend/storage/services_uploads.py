@@ -0,0 +1,379 @@
+import hashlib
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import StorageBlob, StorageFile, StorageUploadPart, StorageUploadSession
+from .storage_backend import (
+    build_blob_key,
+    build_upload_part_key,
+    storage_delete,
+    storage_open,
+    storage_save,
+)
+from .usage_cache import decrement_usage, increment_usage
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def get_upload_session_settings():
+    return {
+        "part_size_bytes": int(getattr(settings, "STORAGE_UPLOAD_PART_SIZE_MB", 8)) * 1024 * 1024,
+        "session_ttl_hours": int(getattr(settings, "STORAGE_UPLOAD_SESSION_TTL_HOURS", 24)),
+    }
+
+
+def normalize_sha256(value):
+    digest = str(value or "").strip().lower()
+    if len(digest) != 64 or any(ch not in "0123456789abcdef" for ch in digest):
+        return ""
+    return digest
+
+
+def hash_file(file_obj):
+    """Return (sha256, size) for a file-like object and rewind it."""
+    digest = hashlib.sha256()
+    size = 0
+    if hasattr(file_obj, "seek"):
+        file_obj.seek(0)
+    chunks = file_obj.chunks(HASH_CHUNK_BYTES) if hasattr(file_obj, "chunks") else iter(lambda: file_obj.read(HASH_CHUNK_BYTES), b"")
+    for chunk in chunks:
+        digest.update(chunk)
+        size += len(chunk)
+    if hasattr(file_obj, "seek"):
+        file_obj.seek(0)
+    return digest.hexdigest(), size
+
+
+def acquire_existing_blob(org, sha256, size_bytes=None, owner_id=None):
+    """
+    Add a reference to an existing blob, or return None when it is not stored yet.
+    With `owner_id`, only content that owner already keeps in a live file counts.
+    """
+    with transaction.atomic():
+        blobs = StorageBlob.objects.select_for_update().filter(organization=org, sha256=sha256)
+        if owner_id is not None:
+            blobs = blobs.filter(
+                id__in=StorageFile.objects.filter(organization=org, owner_id=owner_id, is_deleted=False).values("blob_id")
+            )
+        blob = blobs.first()
+        if not blob:
+            return None
+        if size_bytes is not None and int(blob.size_bytes or 0) != int(size_bytes or 0):
+            return None
+        StorageBlob.objects.filter(id=blob.id).update(ref_count=F("ref_count") + 1, updated_at=timezone.now())
+        blob.ref_count += 1
+        return blob
+
+
+def store_blob(org, file_obj, sha256, size_bytes, reserved=False):
+    """
+    Store content once per org. Returns (blob, created); usage counters only grow
+    when the content was not stored before. With `reserved` the caller already
+    counted size_bytes against the quota, and it is handed back when the content
+    turns out to be stored already.
+    """
+    blob = acquire_existing_blob(org, sha256, size_bytes)
+    if blob:
+        if reserved:
+            decrement_usage(org, size_bytes)
+        return blob, False
+    saved_key = storage_save(build_blob_key(org, sha256), file_obj)
+    try:
+        with transaction.atomic():
+            blob = StorageBlob.objects.create(
+                organization=org,
+                sha256=sha256,
+                storage_key=saved_key,
+                size_bytes=int(size_bytes or 0),
+                ref_count=1,
+            )
+    except IntegrityError:
+        # Another upload stored the same content first; keep theirs.
+        storage_delete(saved_key)
+        blob = acquire_existing_blob(org, sha256)
+        if not blob:
+            raise
+        if reserved:
+            decrement_usage(org, size_bytes)
+        return blob, False
+    if not reserved:
+        increment_usage(org, size_bytes)
+    return blob, True
+
+
+def create_file_for_blob(org, folder, owner_id, blob, name, content_type=""):
+    return StorageFile.objects.create(
+        organization=org,
+        folder=folder,
+        owner_id=owner_id,
+        original_filename=name or "file",
+        storage_key=blob.storage_key,
+        blob=blob,
+        size_bytes=int(blob.size_bytes or 0),
+        content_type=content_type or "",
+        is_deleted=False,
+    )
+
+
+def store_upload(org, owner_id, folder, upload, name=None, reserved=False):
+    """Hash a single-request upload and store it content-addressed. Returns (item, created)."""
+    sha256, size_bytes = hash_file(upload)
+    blob, created = store_blob(org, upload, sha256, size_bytes, reserved=reserved)
+    item = create_file_for_blob(
+        org,
+        folder,
+        owner_id,
+        blob,
+        name or upload.name or "file",
+        getattr(upload, "content_type", "") or "",
+    )
+    return item, created
+
+
+def start_upload_session(org, owner_id, folder, name, size_bytes, content_type="", sha256=""):
+    """
+    Open a chunked upload session. When the client already knows the content hash
+    and the owner already stores that content, the file is linked immediately and
+    no bytes are sent. A client hash alone proves nothing about the bytes, so
+    content stored by anyone else is only shared once the upload completes and
+    the server-side hash matches.
+    """
+    config = get_upload_session_settings()
+    sha256 = normalize_sha256(sha256)
+    now = timezone.now()
+    session = StorageUploadSession(
+        organization=org,
+        folder=folder,
+        owner_id=owner_id,
+        original_filename=name or "file",
+        content_type=content_type or "",
+        size_bytes=int(size_bytes or 0),
+        part_size_bytes=config["part_size_bytes"],
+        expected_sha256=sha256,
+        expires_at=now + timedelta(hours=config["session_ttl_hours"]),
+    )
+    if sha256:
+        blob = acquire_existing_blob(org, sha256, size_bytes, owner_id=owner_id)
+        if blob:
+            session.file = create_file_for_blob(org, folder, owner_id, blob, session.original_filename, session.content_type)
+            session.status = "completed"
+    session.save()
+    return session
+
+
+def get_upload_session(org, owner_id, role, session_id):
+    session = StorageUploadSession.objects.filter(id=session_id, organization=org).select_related("folder").first()
+    if not session:
+        return None
+    if role != "org_admin" and session.owner_id != owner_id:
+        raise PermissionError("permission_denied")
+    return session
+
+
+def save_upload_part(session, part_number, data):
+    if session.status != "pending":
+        return None, "session_closed"
+    if session.expires_at <= timezone.now():
+        return None, "session_expired"
+    try:
+        part_number = int(part_number)
+    except (TypeError, ValueError):
+        return None, "invalid_part_number"
+    if part_number < 1 or part_number > session.part_count:
+        return None, "invalid_part_number"
+    data = data or b""
+    is_last = part_number == session.part_count
+    expected_size = session.size_bytes - (session.part_count - 1) * session.part_size_bytes if is_last else session.part_size_bytes
+    if len(data) != expected_size:
+        return None, "invalid_part_size"
+    sha256 = hashlib.sha256(data).hexdigest()
+    existing = StorageUploadPart.objects.filter(session=session, part_number=part_number).first()
+    if existing and existing.sha256 == sha256:
+        return existing, ""
+    saved_key = storage_save(build_upload_part_key(session.organization, session.id, part_number), ContentFile(data))
+    if existing:
+        storage_delete(existing.storage_key)
+        existing.storage_key = saved_key
+        existing.size_bytes = len(data)
+        existing.sha256 = sha256
+        existing.save(update_fields=["storage_key", "size_bytes", "sha256"])
+        part = existing
+    else:
+        part = StorageUploadPart.objects.create(
+            session=session,
+            part_number=part_number,
+            storage_key=saved_key,
+            size_bytes=len(data),
+            sha256=sha256,
+        )
+    StorageUploadSession.objects.filter(id=session.id).update(updated_at=timezone.now())
+    return part, ""
+
+
+def _discard_parts(session):
+    parts = list(StorageUploadPart.objects.filter(session=session).only("id", "storage_key"))
+    for part in parts:
+        storage_delete(part.storage_key)
+    StorageUploadPart.objects.filter(session=session).delete()
+
+
+def _completion_lease():
+    return timedelta(minutes=int(getattr(settings, "STORAGE_UPLOAD_COMPLETE_LEASE_MINUTES", 30)))
+
+
+def _claim_is_stale(session):
+    return session.status == "completing" and session.updated_at <= timezone.now() - _completion_lease()
+
+
+def _claim_for_completion(session):
+    """Move the session from pending to completing; returns (item, error, extra) when it cannot be claimed."""
+    with transaction.atomic():
+        locked = StorageUploadSession.objects.select_for_update().get(id=session.id)
+        if locked.status == "completed" and locked.file_id:
+            return locked.file, "", {}
+        if locked.status == "completing" and not _claim_is_stale(locked):
+            return None, "session_busy", {}
+        if locked.status not in ("pending", "completing"):
+            return None, "session_closed", {}
+        received = list(
+            StorageUploadPart.objects.filter(session=locked).order_by("part_number").values_list("part_number", flat=True)
+        )
+        if received != list(range(1, locked.part_count + 1)):
+            missing = sorted(set(range(1, locked.part_count + 1)) - set(received))
+            return None, "parts_missing", {"missing_parts": missing}
+        locked.status = "completing"
+        locked.save(update_fields=["status", "updated_at"])
+    session.status = "completing"
+    return None, "", {}
+
+
+def _release_claim(session):
+    StorageUploadSession.objects.filter(id=session.id, status="completing").update(status="pending", updated_at=timezone.now())
+    session.status = "pending"
+
+
+def _store_session_content(session, reserve_quota):
+    """Assemble the parts, verify them and store the content; returns (blob, error, extra)."""
+    parts = list(StorageUploadPart.objects.filter(session=session).order_by("part_number"))
+    digest = hashlib.sha256()
+    size_bytes = 0
+    with tempfile.TemporaryFile() as assembled:
+        for part in parts:
+            handle = storage_open(part.storage_key, "rb")
+            try:
+                for chunk in iter(lambda: handle.read(HASH_CHUNK_BYTES), b""):
+                    digest.update(chunk)
+                    assembled.write(chunk)
+                    size_bytes += len(chunk)
+            finally:
+                handle.close()
+        sha256 = digest.hexdigest()
+        if size_bytes != session.size_bytes:
+            return None, "size_mismatch", {"received_bytes": size_bytes}
+        if session.expected_sha256 and session.expected_sha256 != sha256:
+            return None, "checksum_mismatch", {"sha256": sha256}
+        blob = acquire_existing_blob(session.organization, sha256, size_bytes)
+        if blob:
+            return blob, "", {}
+        reserved = reserve_quota is not None
+        if reserved:
+            allowed, usage = reserve_quota(session.organization, size_bytes)
+            if not allowed:
+                return None, "storage_limit_exceeded", {
+                    "used_bytes": usage.get("used_bytes"),
+                    "limit_bytes": usage.get("limit_bytes"),
+                }
+        assembled.seek(0)
+        try:
+            blob, _ = store_blob(
+                session.organization,
+                File(assembled, name=session.original_filename),
+                sha256,
+                size_bytes,
+                reserved=reserved,
+            )
+        except Exception:
+            if reserved:
+                decrement_usage(session.organization, size_bytes)
+            raise
+    return blob, "", {}
+
+
+def complete_upload_session(session, reserve_quota=None):
+    """
+    Assemble received parts, verify the server-side SHA-256 and link the file to a
+    content-addressed blob. `reserve_quota(org, size)` claims new content against
+    the quota before it is stored. Returns (item, error, extra).
+
+    A short transaction claims the session (pending -> completing), so a second
+    completion gets session_busy; the parts are read and stored outside any
+    transaction, and a second short transaction links the file. A claim left by
+    a crashed worker can be taken over after STORAGE_UPLOAD_COMPLETE_LEASE_MINUTES.
+    """
+    item, error, extra = _claim_for_completion(session)
+    if item is not None or error:
+        return item, error, extra
+    try:
+        blob, error, extra = _store_session_content(session, reserve_quota)
+    except Exception:
+        _release_claim(session)
+        raise
+    if error:
+        _release_claim(session)
+        return None, error, extra
+    try:
+        with transaction.atomic():
+            item = create_file_for_blob(
+                session.organization,
+                session.folder,
+                session.owner_id,
+                blob,
+                session.original_filename,
+                session.content_type,
+            )
+            StorageUploadSession.objects.filter(id=session.id).update(status="completed", file=item, updated_at=timezone.now())
+            # Storage deletes cannot roll back, so the parts go only once the file is linked.
+            transaction.on_commit(lambda: _discard_parts(session))
+    except Exception:
+        StorageBlob.objects.filter(id=blob.id).update(ref_count=F("ref_count") - 1, updated_at=timezone.now())
+        _release_claim(session)
+        raise
+    session.status = "completed"
+    session.file = item
+    return item, "", {}
+
+
+def abort_upload_session(session):
+    if session.status == "completing" and not _claim_is_stale(session):
+        # A completion is reading the parts.
+        return session
+    if session.status in ("pending", "completing"):
+        session.status = "aborted"
+        session.save(update_fields=["status", "updated_at"])
+    _discard_parts(session)
+    return session
+
+
+def serialize_upload_session(session):
+    received = list(
+        StorageUploadPart.objects.filter(session=session).order_by("part_number").values_list("part_number", flat=True)
+    ) if session.status == "pending" else []
+    return {
+        "session_id": str(session.id),
+        "status": session.status,
+        "filename": session.original_filename,
+        "size": session.size_bytes,
+        "part_size": session.part_size_bytes,
+        "part_count": session.part_count,
+        "received_parts": received,
+        "expires_at": session.expires_at.isoformat(),
+        "file_id": str(session.file_id) if session.file_id else None,
+        "folder_id": str(session.folder_id) if session.folder_id else None,
+    }
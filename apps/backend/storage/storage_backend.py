@@ -45,6 +45,20 @@ def build_storage_key(org, user, root_folder_name="sync", original_filename=""):
     return f"media-storage/{org_part}/media-storage/{root_part}/{user_id or 'user'}-{uid}{ext}"
 
 
+def build_blob_key(org, sha256):
+    org_id, org_name = _resolve_org(org)
+    org_part = f"{_safe_part(org_name, 'org')}-{org_id or 'unknown'}"
+    digest = str(sha256 or "").strip().lower()
+    # The suffix keeps a re-created blob from landing on a key the purge worker is still deleting.
+    return f"media-storage/{org_part}/blobs/{digest[:2]}/{digest}-{uuid.uuid4().hex[:8]}"
+
+
+def build_upload_part_key(org, session_id, part_number):
+    org_id, org_name = _resolve_org(org)
+    org_part = f"{_safe_part(org_name, 'org')}-{org_id or 'unknown'}"
+    return f"media-storage/{org_part}/uploads/{session_id}/{int(part_number):05d}"
+
+
 def storage_exists(key):
     try:
         return storage_backend.exists(key)
@@ -68,6 +82,14 @@ def storage_delete(key):
         return False
 
 
+def storage_delete_many(keys, max_workers=8):
+    """Delete keys in bulk; returns the keys that failed so callers can retry them."""
+    try:
+        return storage_backend.delete_many(keys, max_workers=max_workers)
+    except Exception:
+        return [key for key in keys if key]
+
+
 def storage_url(key, expires_seconds=900):
     try:
         return storage_backend.url(key, expire=expires_seconds)
@@ -75,4 +97,4 @@ def storage_url(key, expires_seconds=900):
         try:
             return storage_backend.url(key)
         except Exception:
-            return ""
+            return ""
@@ -1,13 +1,163 @@
-﻿from django.db import transaction
+﻿try:
+    from celery import shared_task
+except Exception:  # pragma: no cover
+    def shared_task(*args, **kwargs):
+        def decorator(fn):
+            return fn
+        return decorator
 
-from .storage_backend import storage_delete
-from .models import StorageFile
+import logging
+from collections import Counter, defaultdict
+from datetime import timedelta
 
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
 
-@transaction.atomic
-def purge_deleted_files(limit=200):
-    rows = list(StorageFile.objects.filter(is_deleted=True)[:limit])
-    for row in rows:
-        storage_delete(row.storage_key)
-        row.delete()
-    return len(rows)
+from .storage_backend import storage_delete_many
+from .models import StorageBlob, StorageFile, StoragePurgeCheckpoint, StorageUploadSession
+from .services_uploads import abort_upload_session
+from .usage_cache import decrement_usage
+from .usage_counters import flush_usage_counters
+
+
+logger = logging.getLogger(__name__)
+
+PURGE_CHECKPOINT_NAME = "deleted_files"
+
+
+def get_purge_settings():
+    return {
+        "batch_size": int(getattr(settings, "STORAGE_PURGE_BATCH_SIZE", 1000)),
+        "max_workers": int(getattr(settings, "STORAGE_PURGE_WORKERS", 8)),
+        "retention_hours": int(getattr(settings, "STORAGE_PURGE_RETENTION_HOURS", 0)),
+    }
+
+
+def _release_usage(freed_by_org):
+    for org_id, freed in freed_by_org.items():
+        if freed > 0:
+            decrement_usage(org_id, freed)
+
+
+def _release_blob_refs(blob_refs):
+    """Drop references in one locked pass; returns blobs whose last reference went away."""
+    if not blob_refs:
+        return []
+    with transaction.atomic():
+        blobs = list(StorageBlob.objects.select_for_update().filter(id__in=list(blob_refs)))
+        freed = [blob for blob in blobs if blob.ref_count <= blob_refs[blob.id]]
+        kept = [blob for blob in blobs if blob.ref_count > blob_refs[blob.id]]
+        for blob in kept:
+            blob.ref_count -= blob_refs[blob.id]
+        if kept:
+            StorageBlob.objects.bulk_update(kept, ["ref_count"])
+        if freed:
+            StorageBlob.objects.filter(id__in=[blob.id for blob in freed]).delete()
+    return freed
+
+
+def purge_deleted_batch(after_id=None, batch_size=1000, cutoff=None, max_workers=8):
+    """
+    Purge one keyset batch of soft-deleted files. Returns (last_id, purged, failed);
+    last_id is None when nothing is left after the checkpoint.
+    """
+    queryset = StorageFile.objects.filter(is_deleted=True)
+    if cutoff is not None:
+        queryset = queryset.filter(Q(deleted_at__isnull=True) | Q(deleted_at__lte=cutoff))
+    if after_id is not None:
+        queryset = queryset.filter(id__gt=after_id)
+    rows = list(
+        queryset
+        .order_by("id")
+        .values("id", "organization_id", "storage_key", "blob_id", "size_bytes", "deleted_at")[:batch_size]
+    )
+    if not rows:
+        return None, 0, 0
+
+    # Rows without deleted_at were soft-deleted before deferred purge existed: their
+    # objects, blob references and usage were already released at delete time.
+    pending = [row for row in rows if row["deleted_at"] is not None]
+    legacy = [row for row in rows if row["deleted_at"] is None]
+    blob_refs = Counter(row["blob_id"] for row in pending if row["blob_id"])
+    plain = [row for row in pending if not row["blob_id"]]
+    plain += [row for row in legacy if not row["blob_id"] and row["storage_key"]]
+
+    plain_keys = {row["storage_key"] for row in plain if row["storage_key"]}
+    shared_keys = set(
+        StorageBlob.objects.filter(storage_key__in=plain_keys).values_list("storage_key", flat=True)
+    ) | set(
+        StorageFile.objects
+        .filter(storage_key__in=plain_keys, is_deleted=False)
+        .values_list("storage_key", flat=True)
+    )
+    failed_keys = set(storage_delete_many(sorted(plain_keys - shared_keys), max_workers=max_workers))
+
+    freed_blobs = _release_blob_refs(blob_refs)
+    failed_blob_keys = set(storage_delete_many([blob.storage_key for blob in freed_blobs], max_workers=max_workers))
+    if failed_blob_keys:
+        logger.warning("Storage purge left orphaned blob objects", extra={"keys": sorted(failed_blob_keys)[:20]})
+
+    freed_by_org = defaultdict(int)
+    purged_ids = []
+    for row in pending:
+        if row["blob_id"] or row["storage_key"] not in failed_keys:
+            purged_ids.append(row["id"])
+            if not row["blob_id"]:
+                freed_by_org[row["organization_id"]] += int(row["size_bytes"] or 0)
+    purged_ids += [row["id"] for row in legacy if row["storage_key"] not in failed_keys]
+    for blob in freed_blobs:
+        freed_by_org[blob.organization_id] += int(blob.size_bytes or 0)
+
+    StorageFile.objects.filter(id__in=purged_ids).delete()
+    _release_usage(freed_by_org)
+    return rows[-1]["id"], len(purged_ids), len(rows) - len(purged_ids)
+
+
+def purge_deleted_files(batch_size=None, max_batches=None, retention_hours=None):
+    """
+    Purge soft-deleted files in keyset batches, resuming from the stored checkpoint.
+    Rows whose objects could not be deleted are skipped and retried on the next pass.
+    """
+    config = get_purge_settings()
+    batch_size = int(batch_size or config["batch_size"])
+    retention_hours = config["retention_hours"] if retention_hours is None else int(retention_hours)
+    cutoff = timezone.now() - timedelta(hours=retention_hours) if retention_hours > 0 else None
+    checkpoint, _ = StoragePurgeCheckpoint.objects.get_or_create(name=PURGE_CHECKPOINT_NAME)
+    stats = {"batches": 0, "purged": 0, "failed": 0}
+    while max_batches is None or stats["batches"] < max_batches:
+        last_id, purged, failed = purge_deleted_batch(
+            after_id=checkpoint.last_file_id,
+            batch_size=batch_size,
+            cutoff=cutoff,
+            max_workers=config["max_workers"],
+        )
+        checkpoint.last_file_id = last_id
+        checkpoint.files_purged = int(checkpoint.files_purged or 0) + purged
+        checkpoint.save(update_fields=["last_file_id", "files_purged", "updated_at"])
+        if last_id is None:
+            break
+        stats["batches"] += 1
+        stats["purged"] += purged
+        stats["failed"] += failed
+    flush_usage_counters()
+    return stats
+
+
+def purge_expired_upload_sessions(limit=200):
+    rows = list(
+        StorageUploadSession.objects
+        .filter(status__in=("pending", "completing"), expires_at__lte=timezone.now())
+        .select_related("organization")[:limit]
+    )
+    for session in rows:
+        abort_upload_session(session)
+    return len(rows)
+
+
+@shared_task(name="storage.purge_deleted_files")
+def purge_deleted_files_task(max_batches=50):
+    stats = purge_deleted_files(max_batches=max_batches)
+    stats["expired_upload_sessions"] = purge_expired_upload_sessions()
+    return stats
@@ -0,0 +1,315 @@
+import hashlib
+import json
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from core.models import Organization, UserProfile
+from apps.backend.storage.models import (
+    OrgStorageUsage,
+    OrgSubscription,
+    Plan,
+    Product,
+    StorageBlob,
+    OrgBandwidthUsage,
+    StorageFile,
+    StorageFolder,
+    StoragePurgeCheckpoint,
+    StorageUploadPart,
+    StorageUploadSession,
+)
+from apps.backend.storage.storage_backend import storage_backend, storage_exists, storage_save
+from apps.backend.storage.services import apply_bandwidth_usage, reserve_storage_bytes
+from apps.backend.storage.tasks import purge_deleted_files
+from apps.backend.storage.usage_cache import rebuild_all_usage
+from apps.backend.storage.usage_counters import flush_usage_counters, get_bandwidth_used, get_storage_used
+
+
+User = get_user_model()
+
+
+@override_settings(STORAGE_UPLOAD_PART_SIZE_MB=1)
+class StorageChunkedUploadTests(TestCase):
+    def setUp(self):
+        self._media = tempfile.TemporaryDirectory()
+        self._media_override = override_settings(MEDIA_ROOT=self._media.name)
+        self._media_override.enable()
+        storage_backend._backend = None
+        cache.clear()
+        flush_usage_counters()
+        self.org = Organization.objects.create(name="Acme", company_key="ACME-STORAGE")
+        self.user = User.objects.create_user(username="admin@acme.test", email="admin@acme.test", password="pw123456")
+        UserProfile.objects.create(user=self.user, organization=self.org, role="company_admin")
+        product = Product.objects.create(name="Online Storage")
+        plan = Plan.objects.create(product=product, name="Pro", storage_limit_gb=10)
+        OrgSubscription.objects.create(organization=self.org, product=product, plan=plan, status="active")
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        self._media_override.disable()
+        storage_backend._backend = None
+        self._media.cleanup()
+
+    def _init(self, name, payload, **extra):
+        body = {"filename": name, "size": len(payload), "content_type": "application/octet-stream"}
+        body.update(extra)
+        return self.client.post(
+            "/api/storage/explorer/uploads/init",
+            data=json.dumps(body),
+            content_type="application/json",
+        )
+
+    def _put_part(self, session_id, part_number, data):
+        return self.client.put(
+            f"/api/storage/explorer/uploads/{session_id}/parts/{part_number}",
+            data=data,
+            content_type="application/octet-stream",
+        )
+
+    def _upload_chunked(self, name, payload):
+        session = self._init(name, payload).json()
+        part_size = session["part_size"]
+        for index in range(session["part_count"]):
+            chunk = payload[index * part_size:(index + 1) * part_size]
+            self.assertEqual(self._put_part(session["session_id"], index + 1, chunk).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(f"/api/storage/explorer/uploads/{session['session_id']}/complete")
+
+    def test_chunked_upload_assembles_file_and_hashes_server_side(self):
+        payload = b"a" * (1024 * 1024) + b"tail-bytes"
+        response = self._upload_chunked("report.bin", payload)
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["sha256"], hashlib.sha256(payload).hexdigest())
+        item = StorageFile.objects.get(id=data["file_id"])
+        self.assertEqual(item.size_bytes, len(payload))
+        self.assertFalse(StorageUploadPart.objects.exists())
+        self.assertEqual(get_storage_used(self.org), len(payload))
+
+    def test_resume_reports_missing_parts(self):
+        payload = b"b" * (1024 * 1024) + b"xyz"
+        session = self._init("resume.bin", payload).json()
+        self._put_part(session["session_id"], 2, b"xyz")
+
+        response = self.client.post(f"/api/storage/explorer/uploads/{session['session_id']}/complete")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["missing_parts"], [1])
+        status = self.client.get(f"/api/storage/explorer/uploads/{session['session_id']}").json()
+        self.assertEqual(status["received_parts"], [2])
+
+    def test_duplicate_content_is_stored_once_and_init_skips_upload(self):
+        payload = b"same-content" * 1000
+        self._upload_chunked("first.bin", payload)
+        digest = hashlib.sha256(payload).hexdigest()
+
+        response = self._init("copy.bin", payload, sha256=digest)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["deduplicated"])
+        blob = StorageBlob.objects.get(organization=self.org, sha256=digest)
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(StorageFile.objects.filter(blob=blob).count(), 2)
+        self.assertEqual(get_storage_used(self.org), len(payload))
+
+    def test_init_hash_only_links_content_the_uploader_already_owns(self):
+        payload = b"private-content" * 1000
+        self._upload_chunked("salary.bin", payload)
+        digest = hashlib.sha256(payload).hexdigest()
+        other = User.objects.create_user(username="staff@acme.test", email="staff@acme.test", password="pw123456")
+        UserProfile.objects.create(user=other, organization=self.org, role="company_admin")
+        self.client.force_login(other)
+
+        session = self._init("guess.bin", payload, sha256=digest).json()
+        self.assertFalse(session["deduplicated"])
+
+        # With the bytes actually sent, the verified content is stored once.
+        self.assertEqual(self._put_part(session["session_id"], 1, payload).status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(f"/api/storage/explorer/uploads/{session['session_id']}/complete")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any("FOR UPDATE" in query["sql"] and StorageUploadSession._meta.db_table in query["sql"] for query in queries.captured_queries))
+        self.assertEqual(StorageBlob.objects.get(organization=self.org, sha256=digest).ref_count, 2)
+        self.assertEqual(get_storage_used(self.org), len(payload))
+
+    def test_completion_claims_the_session_and_releases_it_on_failure(self):
+        payload = b"c" * 100
+        session = self._init("claim.bin", payload, sha256="0" * 64).json()
+        self._put_part(session["session_id"], 1, payload)
+        complete_url = f"/api/storage/explorer/uploads/{session['session_id']}/complete"
+
+        StorageUploadSession.objects.filter(id=session["session_id"]).update(status="completing")
+        response = self.client.post(complete_url)
+        self.assertEqual((response.status_code, response.json()["error"]), (409, "session_busy"))
+
+        # A claim whose worker died is taken over after the lease; a failed check hands it back.
+        StorageUploadSession.objects.filter(id=session["session_id"]).update(updated_at=timezone.now() - timedelta(hours=1))
+        response = self.client.post(complete_url)
+        self.assertEqual(response.json()["error"], "checksum_mismatch")
+        self.assertEqual(StorageUploadSession.objects.get(id=session["session_id"]).status, "pending")
+        self.assertTrue(StorageUploadPart.objects.filter(session_id=session["session_id"]).exists())
+
+    def test_single_request_upload_reuses_blob_and_purge_keeps_shared_content(self):
+        payload = b"single-upload-body"
+        first = self.client.post("/api/storage/explorer/upload", {"file": SimpleUploadedFile("a.txt", payload)})
+        second = self.client.post("/api/storage/explorer/upload", {"file": SimpleUploadedFile("b.txt", payload)})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        blob = StorageBlob.objects.get(organization=self.org)
+        self.assertEqual(blob.ref_count, 2)
+
+        self.client.delete(f"/api/storage/explorer/files/{first.json()['file_id']}/delete")
+        purge_deleted_files()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(storage_exists(blob.storage_key))
+
+        self.client.delete(f"/api/storage/explorer/files/{second.json()['file_id']}/delete")
+        purge_deleted_files()
+        self.assertFalse(StorageBlob.objects.exists())
+        self.assertFalse(storage_exists(blob.storage_key))
+        self.assertEqual(get_storage_used(self.org), 0)
+
+
+class StoragePurgeTests(TestCase):
+    def setUp(self):
+        self._media = tempfile.TemporaryDirectory()
+        self._media_override = override_settings(MEDIA_ROOT=self._media.name)
+        self._media_override.enable()
+        storage_backend._backend = None
+        cache.clear()
+        flush_usage_counters()
+        self.org = Organization.objects.create(name="Purge Org", company_key="PURGE-ORG")
+        self.user = User.objects.create_user(username="purge@acme.test", email="purge@acme.test", password="pw123456")
+        self.folder = StorageFolder.objects.create(organization=self.org, owner=self.user, name="Root")
+
+    def tearDown(self):
+        self._media_override.disable()
+        storage_backend._backend = None
+        self._media.cleanup()
+
+    def _create_file(self, index, deleted_at):
+        key = storage_save(f"purge-test/file-{index}.bin", ContentFile(b"x" * 10))
+        return StorageFile.objects.create(
+            organization=self.org,
+            folder=self.folder,
+            owner=self.user,
+            original_filename=f"file-{index}.bin",
+            storage_key=key,
+            size_bytes=10,
+            is_deleted=deleted_at is not None,
+            deleted_at=deleted_at,
+        )
+
+    def test_purge_runs_in_batches_and_releases_usage_once_per_org(self):
+        now = timezone.now()
+        OrgStorageUsage.objects.create(organization=self.org, used_storage_bytes=100)
+        deleted = [self._create_file(index, now) for index in range(5)]
+        kept = self._create_file(99, None)
+
+        stats = purge_deleted_files(batch_size=2)
+
+        self.assertEqual(stats, {"batches": 3, "purged": 5, "failed": 0})
+        self.assertEqual(list(StorageFile.objects.values_list("id", flat=True)), [kept.id])
+        for item in deleted:
+            self.assertFalse(storage_exists(item.storage_key))
+        self.assertTrue(storage_exists(kept.storage_key))
+        self.assertEqual(get_storage_used(self.org), 50)
+        self.assertEqual(OrgStorageUsage.objects.get(organization=self.org).used_storage_bytes, 50)
+        self.assertIsNone(StoragePurgeCheckpoint.objects.get(name="deleted_files").last_file_id)
+
+    def test_purge_resumes_from_checkpoint_and_honours_retention(self):
+        old = timezone.now() - timedelta(hours=48)
+        for index in range(3):
+            self._create_file(index, old)
+        recent = self._create_file(10, timezone.now())
+
+        stats = purge_deleted_files(batch_size=1, max_batches=1, retention_hours=24)
+        self.assertEqual(stats["purged"], 1)
+        self.assertIsNotNone(StoragePurgeCheckpoint.objects.get(name="deleted_files").last_file_id)
+
+        purge_deleted_files(batch_size=1, retention_hours=24)
+        self.assertEqual(list(StorageFile.objects.values_list("id", flat=True)), [recent.id])
+
+
+class StorageUsageCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        flush_usage_counters()
+        self.org = Organization.objects.create(name="Counter Org", company_key="COUNTER-ORG")
+        self.user = User.objects.create_user(username="counter@acme.test", email="counter@acme.test", password="pw123456")
+        product = Product.objects.create(name="Online Storage")
+        plan = Plan.objects.create(product=product, name="Tiny", storage_limit_gb=1, bandwidth_limit_gb_monthly=1)
+        OrgSubscription.objects.create(organization=self.org, product=product, plan=plan, status="active")
+
+    @mock.patch("apps.backend.storage.usage_counters.cache_is_shared", return_value=True)
+    def test_bandwidth_is_counted_in_cache_and_flushed_as_one_upsert(self, _shared):
+        one_gb = 1024 ** 3
+        ok, usage = apply_bandwidth_usage(self.org, one_gb - 10)
+        self.assertTrue(ok)
+        self.assertFalse(OrgBandwidthUsage.objects.exists())
+
+        ok, usage = apply_bandwidth_usage(self.org, 20)
+        self.assertFalse(ok)
+        self.assertEqual(usage["used_bytes"], one_gb - 10)
+
+        flush_usage_counters()
+        row = OrgBandwidthUsage.objects.get(organization=self.org)
+        self.assertEqual(row.used_bandwidth_bytes, one_gb - 10)
+        self.assertEqual(get_bandwidth_used(self.org, row.billing_cycle_start), one_gb - 10)
+
+    def test_without_a_shared_cache_usage_is_written_through(self):
+        one_gb = 1024 ** 3
+        ok, _ = apply_bandwidth_usage(self.org, 100)
+        self.assertTrue(ok)
+        self.assertEqual(OrgBandwidthUsage.objects.get(organization=self.org).used_bandwidth_bytes, 100)
+
+        # Another worker's upload is visible to this one's next check.
+        OrgStorageUsage.objects.create(organization=self.org, used_storage_bytes=one_gb - 10)
+        self.assertEqual(get_storage_used(self.org), one_gb - 10)
+
+    def test_storage_quota_is_reserved_before_the_upload_is_stored(self):
+        one_gb = 1024 ** 3
+        OrgStorageUsage.objects.create(organization=self.org, used_storage_bytes=one_gb - 10)
+
+        allowed, usage = reserve_storage_bytes(self.org, 6)
+        self.assertTrue(allowed)
+        self.assertEqual(usage["used_bytes"], one_gb - 4)
+
+        allowed, usage = reserve_storage_bytes(self.org, 6)
+        self.assertFalse(allowed)
+        self.assertEqual(usage["used_bytes"], one_gb - 4)
+        self.assertEqual(OrgStorageUsage.objects.get(organization=self.org).used_storage_bytes, one_gb - 4)
+
+        # Without an active plan the allowance is 0 and nothing can be stored.
+        unsubscribed = Organization.objects.create(name="No Plan", company_key="NOPLAN-STORAGE")
+        allowed, usage = reserve_storage_bytes(unsubscribed, 6)
+        self.assertEqual((allowed, usage["limit_bytes"], get_storage_used(unsubscribed)), (False, 0, 0))
+
+    def test_rebuild_all_usage_counts_blobs_once(self):
+        folder = StorageFolder.objects.create(organization=self.org, owner=self.user, name="Root")
+        blob = StorageBlob.objects.create(organization=self.org, sha256="a" * 64, storage_key="k", size_bytes=40, ref_count=2)
+        for index in range(2):
+            StorageFile.objects.create(
+                organization=self.org, folder=folder, owner=self.user, original_filename=f"copy-{index}",
+                storage_key="k", blob=blob, size_bytes=40,
+            )
+        StorageFile.objects.create(
+            organization=self.org, folder=folder, owner=self.user, original_filename="plain",
+            storage_key="plain", size_bytes=7,
+        )
+
+        rows = rebuild_all_usage()
+
+        self.assertEqual([(row.organization_id, row.used_storage_bytes) for row in rows], [(self.org.id, 47)])
+        self.assertEqual(OrgStorageUsage.objects.get(organization=self.org).used_storage_bytes, 47)
+        self.assertEqual(get_storage_used(self.org), 47)
@@ -1,8 +1,11 @@
-﻿from django.db import transaction
+﻿from collections import defaultdict
+
+from django.db import transaction
 from django.db.models import Sum
 from django.utils import timezone
 
-from .models import OrgStorageUsage, StorageFile
+from .models import OrgStorageUsage, StorageBlob, StorageFile
+from .usage_counters import add_storage_usage, flush_usage_counters, set_storage_used
 
 
 @transaction.atomic
@@ -17,43 +20,60 @@ def get_usage_for_org(org, lock=False):
     return usage
 
 
-@transaction.atomic
 def increment_usage(org, delta_bytes):
-    usage = get_usage_for_org(org, lock=True)
-    usage.used_storage_bytes = max(0, int(usage.used_storage_bytes or 0) + int(delta_bytes or 0))
-    usage.last_calculated_at = timezone.now()
-    usage.save(update_fields=["used_storage_bytes", "last_calculated_at"])
-    return usage
+    return add_storage_usage(org, int(delta_bytes or 0))
 
 
-@transaction.atomic
 def decrement_usage(org, delta_bytes):
-    usage = get_usage_for_org(org, lock=True)
-    usage.used_storage_bytes = max(0, int(usage.used_storage_bytes or 0) - int(delta_bytes or 0))
-    usage.last_calculated_at = timezone.now()
-    usage.save(update_fields=["used_storage_bytes", "last_calculated_at"])
-    return usage
+    return add_storage_usage(org, -int(delta_bytes or 0))
+
+
+def _stored_bytes_queryset(org=None):
+    # Plain files count until the purge removes their object; blob-backed files share
+    # stored content, so each blob is counted once.
+    files = StorageFile.objects.filter(blob__isnull=True)
+    blobs = StorageBlob.objects.filter(ref_count__gt=0)
+    if org is not None:
+        files = files.filter(organization=org)
+        blobs = blobs.filter(organization=org)
+    files = files.order_by().values("organization_id").annotate(total=Sum("size_bytes"))
+    blobs = blobs.order_by().values("organization_id").annotate(total=Sum("size_bytes"))
+    return files.union(blobs, all=True)
 
 
-@transaction.atomic
 def rebuild_usage(org):
-    total = (
-        StorageFile.objects
-        .filter(organization=org, is_deleted=False)
-        .aggregate(total=Sum("size_bytes"))
-        .get("total")
-        or 0
-    )
-    usage = get_usage_for_org(org, lock=True)
-    usage.used_storage_bytes = int(total or 0)
-    usage.last_calculated_at = timezone.now()
-    usage.save(update_fields=["used_storage_bytes", "last_calculated_at"])
+    flush_usage_counters()
+    total = sum(int(row["total"] or 0) for row in _stored_bytes_queryset(org))
+    with transaction.atomic():
+        usage = get_usage_for_org(org, lock=True)
+        usage.used_storage_bytes = int(total or 0)
+        usage.last_calculated_at = timezone.now()
+        usage.save(update_fields=["used_storage_bytes", "last_calculated_at"])
+    set_storage_used(org, usage.used_storage_bytes)
     return usage
 
 
 def rebuild_all_usage():
+    """Recalculate every org from one grouped query and write the totals in a single UPSERT."""
     from core.models import Organization
-    results = []
-    for org in Organization.objects.all():
-        results.append(rebuild_usage(org))
-    return results
+
+    flush_usage_counters()
+    totals = defaultdict(int)
+    for row in _stored_bytes_queryset():
+        totals[row["organization_id"]] += int(row["total"] or 0)
+    org_ids = set(OrgStorageUsage.objects.values_list("organization_id", flat=True)) | set(totals)
+    org_ids &= set(Organization.objects.filter(id__in=org_ids).values_list("id", flat=True))
+    now = timezone.now()
+    rows = [
+        OrgStorageUsage(organization_id=org_id, used_storage_bytes=totals.get(org_id, 0), last_calculated_at=now)
+        for org_id in sorted(org_ids)
+    ]
+    OrgStorageUsage.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["organization"],
+        update_fields=["used_storage_bytes", "last_calculated_at"],
+    )
+    for row in rows:
+        set_storage_used(row.organization_id, row.used_storage_bytes)
+    return rows
@@ -0,0 +1,293 @@
+"""
+Write-behind usage counters.
+
+Live per-org totals sit in the shared cache and are bumped with atomic increments,
+so quota checks never lock a DB row. Each process also buffers the deltas it
+applied and writes them to the DB as one multi-row UPSERT per counter table per flush.
+
+A per-process cache would give every worker its own total, so without a shared
+cache each delta is applied straight to its DB row with a single-row UPSERT and
+reads come from the DB.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.cache_utils import cache_is_shared
+from core.flush_utils import PeriodicFlusher
+from .models import OrgBandwidthUsage, OrgStorageUsage
+
+
+logger = logging.getLogger(__name__)
+
+LIVE_COUNTER_TTL_SECONDS = 7 * 24 * 3600
+
+
+def _org_id(org_or_id):
+    return getattr(org_or_id, "id", org_or_id)
+
+
+def _storage_key(org_id):
+    return f"storage:usage:{org_id}"
+
+
+def _bandwidth_key(org_id, cycle_start):
+    return f"storage:bandwidth:{org_id}:{cycle_start.isoformat()}"
+
+
+def _flush_interval_seconds():
+    return float(getattr(settings, "STORAGE_USAGE_FLUSH_SECONDS", 5))
+
+
+def _flush_max_keys():
+    return int(getattr(settings, "STORAGE_USAGE_FLUSH_MAX_KEYS", 500))
+
+
+class _PendingDeltas:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.storage = defaultdict(int)
+        self.bandwidth = defaultdict(int)
+        self.last_flush = time.monotonic()
+
+    def add(self, bucket, key, delta):
+        with self.lock:
+            bucket[key] += delta
+
+    def pending(self, bucket, key):
+        with self.lock:
+            return bucket.get(key, 0)
+
+    def size(self):
+        with self.lock:
+            return len(self.storage) + len(self.bandwidth)
+
+    def drain(self):
+        with self.lock:
+            storage, self.storage = self.storage, defaultdict(int)
+            bandwidth, self.bandwidth = self.bandwidth, defaultdict(int)
+            self.last_flush = time.monotonic()
+        return storage, bandwidth
+
+    def restore(self, storage, bandwidth):
+        with self.lock:
+            for key, delta in storage.items():
+                self.storage[key] += delta
+            for key, delta in bandwidth.items():
+                self.bandwidth[key] += delta
+
+
+_pending = _PendingDeltas()
+
+
+def _live_add(key, delta, seed):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, seed(), LIVE_COUNTER_TTL_SECONDS)
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # Evicted between add and incr; the next read reseeds from the DB.
+        return seed() + delta
+
+
+def _seed_storage(org_id):
+    used = (
+        OrgStorageUsage.objects
+        .filter(organization_id=org_id)
+        .values_list("used_storage_bytes", flat=True)
+        .first()
+    ) or 0
+    return max(0, int(used) + _pending.pending(_pending.storage, org_id))
+
+
+def _seed_bandwidth(org_id, cycle_start):
+    used = (
+        OrgBandwidthUsage.objects
+        .filter(organization_id=org_id, billing_cycle_start=cycle_start)
+        .values_list("used_bandwidth_bytes", flat=True)
+        .first()
+    ) or 0
+    return max(0, int(used) + _pending.pending(_pending.bandwidth, (org_id, cycle_start)))
+
+
+def get_storage_used(org):
+    org_id = _org_id(org)
+    if not cache_is_shared():
+        return _seed_storage(org_id)
+    value = cache.get(_storage_key(org_id))
+    if value is None:
+        value = _seed_storage(org_id)
+        cache.add(_storage_key(org_id), value, LIVE_COUNTER_TTL_SECONDS)
+    return max(0, int(value))
+
+
+def add_storage_usage(org, delta_bytes):
+    org_id = _org_id(org)
+    delta = int(delta_bytes or 0)
+    if not org_id or not delta:
+        return get_storage_used(org_id) if org_id else 0
+    if not cache_is_shared():
+        return _add_in_db(OrgStorageUsage, ("organization_id",), "used_storage_bytes", "last_calculated_at", org_id, delta)
+    # Buffer first so a reseed triggered by this incr already includes the delta.
+    _pending.add(_pending.storage, org_id, delta)
+    value = _live_add(_storage_key(org_id), delta, lambda: _seed_storage(org_id) - delta)
+    maybe_flush_usage_counters()
+    return max(0, int(value))
+
+
+def set_storage_used(org, used_bytes):
+    """Overwrite the live counter after a rebuild and drop this process's stale deltas."""
+    org_id = _org_id(org)
+    with _pending.lock:
+        _pending.storage.pop(org_id, None)
+    cache.set(_storage_key(org_id), max(0, int(used_bytes or 0)), LIVE_COUNTER_TTL_SECONDS)
+
+
+def get_bandwidth_used(org, cycle_start):
+    org_id = _org_id(org)
+    if not cache_is_shared():
+        return _seed_bandwidth(org_id, cycle_start)
+    key = _bandwidth_key(org_id, cycle_start)
+    value = cache.get(key)
+    if value is None:
+        value = _seed_bandwidth(org_id, cycle_start)
+        cache.add(key, value, LIVE_COUNTER_TTL_SECONDS)
+    return max(0, int(value))
+
+
+def add_bandwidth_usage(org, cycle_start, delta_bytes):
+    org_id = _org_id(org)
+    delta = int(delta_bytes or 0)
+    if not delta:
+        return get_bandwidth_used(org_id, cycle_start)
+    if not cache_is_shared():
+        return _add_in_db(
+            OrgBandwidthUsage, ("organization_id", "billing_cycle_start"), "used_bandwidth_bytes", "updated_at",
+            (org_id, cycle_start), delta,
+        )
+    _pending.add(_pending.bandwidth, (org_id, cycle_start), delta)
+    value = _live_add(
+        _bandwidth_key(org_id, cycle_start),
+        delta,
+        lambda: _seed_bandwidth(org_id, cycle_start) - delta,
+    )
+    maybe_flush_usage_counters()
+    return max(0, int(value))
+
+
+def _apply_deltas(model, key_columns, value_column, stamp_column, rows, now):
+    """
+    Add signed deltas to counter rows in one statement: existing rows are updated in
+    place, missing rows are inserted, and totals never drop below zero.
+    """
+    table = model._meta.db_table
+    keys = ", ".join(key_columns)
+    match = " AND ".join(f"t.{col} = v.{col}" for col in key_columns)
+    returned = " AND ".join(f"u.{col} = v.{col}" for col in key_columns)
+    values_sql = ", ".join(["(" + ", ".join(["%s"] * (len(key_columns) + 1)) + ")"] * len(rows))
+    params = []
+    for key, delta in rows:
+        params.extend(key if isinstance(key, tuple) else (key,))
+        params.append(delta)
+    sql = (
+        f"WITH v ({keys}, delta) AS (VALUES {values_sql}), "
+        f"updated AS ("
+        f"UPDATE {table} AS t SET {value_column} = GREATEST(0, t.{value_column} + v.delta), {stamp_column} = %s "
+        f"FROM v WHERE {match} RETURNING {', '.join('t.' + col for col in key_columns)}"
+        f") "
+        f"INSERT INTO {table} ({keys}, {value_column}, {stamp_column}) "
+        f"SELECT {', '.join('v.' + col for col in key_columns)}, GREATEST(0, v.delta), %s FROM v "
+        f"WHERE NOT EXISTS (SELECT 1 FROM updated u WHERE {returned}) "
+        f"ON CONFLICT ({keys}) DO UPDATE SET "
+        f"{value_column} = GREATEST(0, {table}.{value_column} + EXCLUDED.{value_column}), "
+        f"{stamp_column} = EXCLUDED.{stamp_column}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [now, now])
+
+
+def _add_in_db(model, key_columns, value_column, stamp_column, key, delta):
+    """Add one signed delta to its counter row (created when missing) and return the new total."""
+    table = model._meta.db_table
+    keys = ", ".join(key_columns)
+    placeholders = ", ".join(["%s"] * len(key_columns))
+    sql = (
+        f"INSERT INTO {table} ({keys}, {value_column}, {stamp_column}) "
+        f"VALUES ({placeholders}, GREATEST(0, %s), %s) "
+        f"ON CONFLICT ({keys}) DO UPDATE SET "
+        f"{value_column} = GREATEST(0, {table}.{value_column} + %s), "
+        f"{stamp_column} = EXCLUDED.{stamp_column} "
+        f"RETURNING {value_column}"
+    )
+    params = list(key if isinstance(key, tuple) else (key,)) + [delta, timezone.now(), delta]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return int(cursor.fetchone()[0])
+
+
+def flush_usage_counters():
+    """Write buffered deltas to the DB; on failure they stay buffered for the next flush."""
+    storage, bandwidth = _pending.drain()
+    storage_rows = sorted((key, delta) for key, delta in storage.items() if delta)
+    bandwidth_rows = sorted((key, delta) for key, delta in bandwidth.items() if delta)
+    if not storage_rows and not bandwidth_rows:
+        return 0
+    try:
+        from core.models import Organization
+
+        org_ids = {org_id for org_id, _ in storage_rows} | {org_id for (org_id, _), _ in bandwidth_rows}
+        # Deltas for organizations deleted since they were buffered are dropped.
+        live_ids = set(Organization.objects.filter(id__in=org_ids).values_list("id", flat=True))
+        storage_rows = [row for row in storage_rows if row[0] in live_ids]
+        bandwidth_rows = [row for row in bandwidth_rows if row[0][0] in live_ids]
+        now = timezone.now()
+        with transaction.atomic():
+            if storage_rows:
+                _apply_deltas(
+                    OrgStorageUsage, ("organization_id",), "used_storage_bytes", "last_calculated_at",
+                    storage_rows, now,
+                )
+            if bandwidth_rows:
+                _apply_deltas(
+                    OrgBandwidthUsage, ("organization_id", "billing_cycle_start"), "used_bandwidth_bytes", "updated_at",
+                    bandwidth_rows, now,
+                )
+    except Exception:
+        logger.exception("Storage usage flush failed; keeping deltas buffered")
+        _pending.restore(storage, bandwidth)
+        return 0
+    return len(storage_rows) + len(bandwidth_rows)
+
+
+def maybe_flush_usage_counters():
+    _flusher.ensure_started()
+    if connection.in_atomic_block:
+        # Never write counters inside a caller's transaction that may still roll back.
+        return 0
+    due = not _flusher.running and time.monotonic() - _pending.last_flush >= _flush_interval_seconds()
+    if not due and _pending.size() < _flush_max_keys():
+        return 0
+    return flush_usage_counters()
+
+
+_flusher = PeriodicFlusher("storage-usage-flush", flush_usage_counters, _flush_interval_seconds)
+
+
+def _flush_at_exit():
+    try:
+        flush_usage_counters()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
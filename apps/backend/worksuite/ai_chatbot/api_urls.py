@@ -9,6 +9,7 @@ urlpatterns = [
     path("widget/message", api_views.widget_message, name="ai_chatbot_widget_message"),
     path("widget/attachment", api_views.widget_attachment, name="ai_chatbot_widget_attachment"),
     path("widget/thread", api_views.widget_thread, name="ai_chatbot_widget_thread"),
+    path("widget/stream", api_views.widget_stream, name="ai_chatbot_widget_stream"),
     path("enquiry", api_views.enquiry_submit, name="ai_chatbot_enquiry_submit"),
     path("leads", api_views.leads_list, name="ai_chatbot_leads_list"),
     path("leads/<int:lead_id>", api_views.lead_update, name="ai_chatbot_lead_update"),
@@ -20,6 +21,7 @@ urlpatterns = [
     path("widgets", api_views.widgets_collection, name="ai_chatbot_widgets_collection"),
     path("widgets/<int:widget_id>", api_views.widget_update, name="ai_chatbot_widget_update"),
     path("inbox/conversations", api_views.inbox_conversations, name="ai_chatbot_inbox_conversations"),
+    path("inbox/stream", api_views.inbox_stream, name="ai_chatbot_inbox_stream"),
     path("inbox/conversations/<int:conversation_id>/messages", api_views.inbox_messages, name="ai_chatbot_inbox_messages"),
     path("inbox/conversations/<int:conversation_id>/reply", api_views.inbox_reply, name="ai_chatbot_inbox_reply"),
     path("inbox/conversations/<int:conversation_id>/attachment", api_views.inbox_attachment, name="ai_chatbot_inbox_attachment"),
@@ -32,6 +34,7 @@ urlpatterns = [
     path("history/<int:conversation_id>", api_views.history_delete, name="ai_chatbot_history_delete"),
     path("media-library", api_views.media_library_list, name="ai_chatbot_media_library_list"),
     path("media-library/website-import", api_views.media_library_website_import, name="ai_chatbot_media_library_website_import"),
+    path("media-library/website-import/<int:job_id>", api_views.media_library_website_import_status, name="ai_chatbot_media_library_website_import_status"),
     path("media-library/<int:item_id>/reupload", api_views.media_library_reupload, name="ai_chatbot_media_library_reupload"),
     path("media-library/delete", api_views.media_library_delete, name="ai_chatbot_media_library_delete"),
     path("faqs", api_views.faq_list, name="ai_chatbot_faq_list"),
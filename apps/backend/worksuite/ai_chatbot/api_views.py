@@ -1,37 +1,55 @@
 import json
+import logging
 import os
 import secrets
 import io
+import threading
 import zipfile
 from html.parser import HTMLParser
 from html import escape as html_escape
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError, URLError
 from decimal import Decimal, ROUND_HALF_UP
 from datetime import timedelta
 from urllib.parse import urlparse, urljoin
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from django.core.cache import cache
 from django.core.files.base import ContentFile
-from django.http import JsonResponse, HttpResponse
-from django.db import models, transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.db import IntegrityError, models, transaction
 from django.db.models import Q
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.dateparse import parse_datetime
 from django.utils.text import slugify
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
-from core.models import Subscription, UserProfile, OrganizationSettings, ChatWidget, ChatConversation, ChatMessage, ChatTransferLog, ChatLead, ChatEnquiryLead, AiUsageCounter, AiUsageMonthly, AiMediaLibraryItem, AiFaq
+from core.models import Subscription, UserProfile, OrganizationSettings, ChatWidget, ChatConversation, ChatMessage, ChatTransferLog, ChatLead, ChatEnquiryLead, AiUsageCounter, AiUsageMonthly, AiMediaLibraryItem, AiWebsiteImportJob, AiFaq
 from core.serializers import AiMediaLibraryItemSerializer, AiFaqSerializer
 from core.observability import log_event
 from core.subscription_utils import is_subscription_active
+from core.tasks import run_website_import_task
 from apps.backend.ai_chatbot.services.ai_limits import can_use_ai
 from apps.backend.ai_chatbot.services.plan_limits import get_org_plan_limits, get_org_retention_days
-from apps.backend.ai_chatbot.services.ai_usage import record_ai_usage
+from apps.backend.ai_chatbot.services.ai_usage import get_ai_replies_used, record_ai_usage
+from apps.backend.ai_chatbot.services.knowledge_index import match_faq
+from apps.backend.ai_chatbot.services.widget_config import (
+    get_widget_config_snapshot,
+    is_origin_allowed,
+    split_allowed_domains,
+    widget_config_cache_control,
+)
+from apps.backend.ai_chatbot.services.realtime import cursor_unchanged, ensure_cursor, inbox_channel, publish_chat_event, stream_events, visitor_channel
+from apps.backend.ai_chatbot.services.website_import import WebsiteCrawler, WebsiteFetchError, extract_page, is_same_domain, page_content
+
+
+logger = logging.getLogger(__name__)
 
 
 def _money(value):
@@ -141,17 +159,6 @@ def get_period_yyyymm(now=None):
     return (now or timezone.now()).strftime("%Y%m")
 
 
-def _get_ai_usage(org):
-    period = _current_period()
-    usage, _ = AiUsageMonthly.objects.get_or_create(
-        organization=org,
-        product_slug="ai-chatbot",
-        period_yyyymm=period,
-        defaults={"ai_replies_used": 0},
-    )
-    return usage
-
-
 def _prune_chat_history(org):
     retention_days = get_org_retention_days(org, default_days=30)
     if not retention_days or retention_days <= 0:
@@ -210,28 +217,6 @@ def increment_ai_usage(org, tokens_total=0, cost_usd=0):
     return obj
 
 
-def _split_allowed_domains(raw_value):
-    if not raw_value:
-        return []
-    if isinstance(raw_value, (list, tuple)):
-        items = [str(item).strip() for item in raw_value if str(item).strip()]
-    else:
-        cleaned = raw_value.replace(",", "\n")
-        items = [item.strip() for item in cleaned.splitlines() if item.strip()]
-    normalized = []
-    for item in items:
-        value = item.lower()
-        if "://" in value:
-            try:
-                parsed = urlparse(value)
-                if parsed.hostname:
-                    value = parsed.hostname.lower()
-            except ValueError:
-                pass
-        normalized.append(value)
-    return normalized
-
-
 ALLOWED_ATTACHMENT_EXTENSIONS = {
     ".png",
     ".jpg",
@@ -248,6 +233,8 @@ ALLOWED_ATTACHMENT_EXTENSIONS = {
 }
 MAX_ATTACHMENT_SIZE = 5 * 1024 * 1024
 MAX_FAQS_PER_ORG = 50
+INBOX_PAGE_SIZE = 100
+WEBSITE_IMPORT_STALE_MINUTES = 30
 AI_MEDIA_ALLOWED_EXTENSIONS = {
     ".pdf": "pdf",
     ".doc": "word",
@@ -257,7 +244,7 @@ AI_MEDIA_ALLOWED_EXTENSIONS = {
 
 
 def _is_domain_allowed(widget, request):
-    allowed = _split_allowed_domains(widget.allowed_domains)
+    allowed = split_allowed_domains(widget.allowed_domains)
     if not allowed:
         return True
     referer = request.META.get("HTTP_REFERER", "")
@@ -318,6 +305,35 @@ def _serialize_message(message):
         "attachment_size": message.attachment_size or 0,
         "created_at": message.created_at.isoformat(),
     }
+
+
+def _publish_chat_update(conversation, message=None, widget_key=None):
+    """Tell the visitor's widget and the org inbox that a conversation changed."""
+    if widget_key is None:
+        widget_key = ChatWidget.objects.filter(id=conversation.widget_id).values_list("widget_key", flat=True).first()
+    event = {
+        "type": "message" if message is not None else "conversation",
+        "conversation_id": conversation.id,
+        "category": conversation.category or "",
+        "status": conversation.status,
+        "active_agent_id": conversation.active_agent_id,
+    }
+    if message is not None:
+        event["message"] = _serialize_message(message)
+    publish_chat_event(
+        [
+            visitor_channel(widget_key, conversation.visitor_id) if widget_key else "",
+            inbox_channel(conversation.organization_id),
+        ],
+        event,
+    )
+
+
+def _event_stream_response(channels, accept=None):
+    response = StreamingHttpResponse(stream_events(channels, accept=accept), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
 
 
 def _fetch_last_messages(conversation, limit=50):
@@ -360,20 +376,12 @@ def _is_valid_http_url(value):
     return parsed.scheme in {"http", "https"} and bool(parsed.netloc)
 
 
-def _fetch_website_html(source_url, timeout_seconds=12):
-    request = Request(
-        source_url,
-        headers={
-            "User-Agent": "WorkZillaBot/1.0 (+https://workzilla.local)",
-            "Accept": "text/html,application/xhtml+xml",
-        },
-    )
-    with urlopen(request, timeout=timeout_seconds) as response:
-        content_type = response.headers.get("Content-Type", "")
-        if "text/html" not in content_type and "application/xhtml+xml" not in content_type:
-            raise ValueError("unsupported_content_type")
-        raw = response.read()
-        return raw.decode("utf-8", errors="replace")
+def _run_in_background(task, *args):
+    broker_url = getattr(settings, "CELERY_BROKER_URL", "") or ""
+    if broker_url.startswith("memory://"):
+        threading.Thread(target=task, args=args, daemon=True).start()
+        return
+    task.delay(*args)
 
 
 def _log_import_failure(org, user, url, error_code, detected_reason=""):
@@ -391,7 +399,7 @@ def _log_import_failure(org, user, url, error_code, detected_reason=""):
     )
 
 
-def _failure_response(error_code, reason, suggestion, status=400, info_note=""):
+def _failure_payload(error_code, reason, suggestion, info_note=""):
     payload = {
         "status": "failed",
         "error_code": error_code,
@@ -400,7 +408,11 @@ def _failure_response(error_code, reason, suggestion, status=400, info_note=""):
     }
     if info_note:
         payload["info_note"] = info_note
-    return JsonResponse(payload, status=status)
+    return payload
+
+
+def _failure_response(error_code, reason, suggestion, status=400, info_note=""):
+    return JsonResponse(_failure_payload(error_code, reason, suggestion, info_note=info_note), status=status)
 
 
 def _create_website_placeholder(org, user, source_url, name):
@@ -526,254 +538,6 @@ class _ReadableTextExtractor(HTMLParser):
         return self.title, self._entries
 
 
-class _FallbackTextExtractor(HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self._ignore_depth = 0
-        self._chunks = []
-
-    def handle_starttag(self, tag, attrs):
-        if tag in {"script", "style", "noscript"}:
-            self._ignore_depth += 1
-
-    def handle_endtag(self, tag):
-        if self._ignore_depth and tag in {"script", "style", "noscript"}:
-            self._ignore_depth -= 1
-
-    def handle_data(self, data):
-        if self._ignore_depth:
-            return
-        text = (data or "").strip()
-        if text:
-            self._chunks.append(text)
-
-    def extract(self):
-        if not self._chunks:
-            return ""
-        text = " ".join(self._chunks).strip()
-        return text
-
-
-class _MetaExtractor(HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self.title = ""
-        self._current_tag = ""
-        self.meta = {}
-
-    def handle_starttag(self, tag, attrs):
-        if tag == "title":
-            self._current_tag = "title"
-            return
-        if tag != "meta":
-            return
-        attrs_dict = {key.lower(): value for key, value in attrs if key and value}
-        name = (attrs_dict.get("name") or attrs_dict.get("property") or "").lower()
-        content = attrs_dict.get("content") or ""
-        if name and content:
-            self.meta[name] = content.strip()
-
-    def handle_endtag(self, tag):
-        if tag == "title":
-            self._current_tag = ""
-
-    def handle_data(self, data):
-        if self._current_tag == "title" and not self.title:
-            text = (data or "").strip()
-            if text:
-                self.title = text
-
-    def extract(self):
-        return self.title, self.meta
-
-
-class _TagTextExtractor(HTMLParser):
-    BLOCK_TAGS = {"p", "div", "section", "article", "li"}
-    HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
-
-    def __init__(self, include_tags=None, exclude_tags=None):
-        super().__init__()
-        self.include_tags = set(include_tags or [])
-        self.exclude_tags = set(exclude_tags or [])
-        self.title = ""
-        self._current_tag = ""
-        self._ignore_depth = 0
-        self._include_depth = 0
-        self._text_chunks = []
-        self._entries = []
-
-    def handle_starttag(self, tag, attrs):
-        if tag == "title":
-            self._current_tag = "title"
-            return
-        if tag in self.exclude_tags:
-            self._ignore_depth += 1
-            return
-        if self._ignore_depth:
-            return
-        if self.include_tags:
-            if tag in self.include_tags:
-                self._include_depth += 1
-            if self._include_depth == 0:
-                return
-        if tag in self.BLOCK_TAGS or tag in self.HEADING_TAGS:
-            self._flush_text()
-            self._current_tag = tag
-
-    def handle_endtag(self, tag):
-        if tag == "title":
-            self._current_tag = ""
-            return
-        if tag in self.exclude_tags and self._ignore_depth:
-            self._ignore_depth -= 1
-            return
-        if self._ignore_depth:
-            return
-        if self.include_tags and tag in self.include_tags and self._include_depth:
-            self._include_depth -= 1
-        if tag in self.BLOCK_TAGS or tag in self.HEADING_TAGS:
-            self._flush_text()
-            self._current_tag = ""
-
-    def handle_data(self, data):
-        if self._ignore_depth:
-            return
-        if self.include_tags and self._include_depth == 0:
-            return
-        text = (data or "").strip()
-        if not text:
-            return
-        if self._current_tag == "title" and not self.title:
-            self.title = text
-            return
-        self._text_chunks.append(text)
-
-    def _flush_text(self):
-        if not self._text_chunks:
-            return
-        text = " ".join(self._text_chunks).strip()
-        self._text_chunks = []
-        if not text:
-            return
-        self._entries.append((self._current_tag or "p", text))
-
-    def extract(self):
-        self._flush_text()
-        return self.title, self._entries
-
-
-class _DensityExtractor(HTMLParser):
-    CONTAINER_TAGS = {"div", "section", "article", "main"}
-    EXCLUDE_TAGS = {"header", "footer", "nav", "script", "style", "aside", "form"}
-
-    def __init__(self):
-        super().__init__()
-        self._ignore_depth = 0
-        self._containers = {}
-        self._stack = []
-        self._link_depth = 0
-        self._counter = 0
-
-    def handle_starttag(self, tag, attrs):
-        if tag in self.EXCLUDE_TAGS:
-            self._ignore_depth += 1
-            return
-        if self._ignore_depth:
-            return
-        if tag in self.CONTAINER_TAGS:
-            self._counter += 1
-            container_id = self._counter
-            self._containers[container_id] = {"text_len": 0, "link_text_len": 0, "chunks": []}
-            self._stack.append(container_id)
-        if tag == "a":
-            self._link_depth += 1
-
-    def handle_endtag(self, tag):
-        if tag in self.EXCLUDE_TAGS and self._ignore_depth:
-            self._ignore_depth -= 1
-            return
-        if self._ignore_depth:
-            return
-        if tag in self.CONTAINER_TAGS and self._stack:
-            self._stack.pop()
-        if tag == "a" and self._link_depth:
-            self._link_depth -= 1
-
-    def handle_data(self, data):
-        if self._ignore_depth:
-            return
-        text = (data or "").strip()
-        if not text or not self._stack:
-            return
-        text_len = len(text)
-        for container_id in self._stack:
-            container = self._containers.get(container_id)
-            if not container:
-                continue
-            container["text_len"] += text_len
-            container["chunks"].append(text)
-            if self._link_depth:
-                container["link_text_len"] += text_len
-
-    def best_text(self):
-        best_score = 0
-        best_text = ""
-        for container in self._containers.values():
-            text_len = container["text_len"]
-            if text_len <= 0:
-                continue
-            score = text_len - (container["link_text_len"] * 0.7)
-            if score > best_score:
-                best_score = score
-                best_text = " ".join(container["chunks"]).strip()
-        return best_text
-
-
-def _count_words(entries):
-    return sum(len(text.split()) for _, text in entries if text)
-
-
-def _extract_multi_pass_content(html):
-    exclude = {"header", "footer", "nav", "script", "style", "aside", "form"}
-    meta_parser = _MetaExtractor()
-    meta_parser.feed(html or "")
-    meta_title, _ = meta_parser.extract()
-
-    best_entries = []
-    best_title = meta_title or ""
-    best_words = 0
-
-    pass1_parser = _TagTextExtractor(include_tags={"main", "article", "section"}, exclude_tags=exclude)
-    pass1_parser.feed(html or "")
-    title1, entries1 = pass1_parser.extract()
-    words1 = _count_words(entries1)
-    if words1 > best_words:
-        best_entries = entries1
-        best_words = words1
-        best_title = title1 or best_title
-
-    density_parser = _DensityExtractor()
-    density_parser.feed(html or "")
-    dense_text = density_parser.best_text()
-    if dense_text:
-        entries2 = [("p", dense_text)]
-        words2 = _count_words(entries2)
-        if words2 > best_words:
-            best_entries = entries2
-            best_words = words2
-
-    pass3_parser = _TagTextExtractor(include_tags={"body"}, exclude_tags=exclude)
-    pass3_parser.feed(html or "")
-    title3, entries3 = pass3_parser.extract()
-    words3 = _count_words(entries3)
-    if words3 > best_words:
-        best_entries = entries3
-        best_words = words3
-        best_title = title3 or best_title
-
-    return best_title, best_entries, best_words
-
-
 class _LinkExtractor(HTMLParser):
     def __init__(self):
         super().__init__()
@@ -787,44 +551,6 @@ class _LinkExtractor(HTMLParser):
                 self.links.append(value)
 
 
-class _MenuLinkExtractor(HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self.links = []
-        self._include_depth = 0
-        self._tag_stack = []
-        self._current_href = ""
-        self._current_text = []
-
-    def handle_starttag(self, tag, attrs):
-        attrs_dict = {key.lower(): value for key, value in attrs if key}
-        class_hint = (attrs_dict.get("class") or "").lower()
-        id_hint = (attrs_dict.get("id") or "").lower()
-        if tag in {"nav", "header"} or "menu" in class_hint or "nav" in class_hint or "menu" in id_hint or "nav" in id_hint:
-            self._include_depth += 1
-        self._tag_stack.append(tag)
-        if tag == "a" and self._include_depth:
-            self._current_href = attrs_dict.get("href") or ""
-            self._current_text = []
-
-    def handle_endtag(self, tag):
-        if tag == "a" and self._include_depth and self._current_href:
-            text = " ".join(self._current_text).strip()
-            self.links.append({"href": self._current_href, "text": text})
-            self._current_href = ""
-            self._current_text = []
-        if self._tag_stack:
-            self._tag_stack.pop()
-        if tag in {"nav", "header"} or (self._include_depth and not self._tag_stack):
-            self._include_depth = max(0, self._include_depth - 1)
-
-    def handle_data(self, data):
-        if self._current_href:
-            text = (data or "").strip()
-            if text:
-                self._current_text.append(text)
-
-
 def _normalize_url(url):
     if not url:
         return ""
@@ -838,20 +564,6 @@ def _normalize_url(url):
     return cleaned.geturl()
 
 
-def _is_same_domain(base_netloc, candidate_netloc):
-    if not base_netloc or not candidate_netloc:
-        return False
-    base = base_netloc.lower()
-    cand = candidate_netloc.lower()
-    if cand == base:
-        return True
-    if cand == f"www.{base}":
-        return True
-    if base == f"www.{cand}":
-        return True
-    return cand.endswith(f".{base}")
-
-
 def _classify_page_type(url):
     if not url:
         return "other"
@@ -934,7 +646,7 @@ def _scan_website_pages(source_url, html):
         if not normalized:
             continue
         parsed = urlparse(normalized)
-        if not _is_same_domain(base.netloc, parsed.netloc):
+        if not is_same_domain(base.netloc, parsed.netloc):
             continue
         if _is_excluded_internal_url(normalized):
             continue
@@ -957,13 +669,11 @@ def _scan_website_pages(source_url, html):
     }
 
 
-def _menu_pages_from_homepage(source_url, html):
+def _menu_pages_from_homepage(source_url, menu_links):
     base = urlparse(source_url)
-    extractor = _MenuLinkExtractor()
-    extractor.feed(html or "")
     allowed_keywords = ("about", "service", "services", "printing", "pricing", "contact", "support")
     filtered = set()
-    for link in extractor.links:
+    for link in menu_links:
         href = link.get("href") or ""
         if not href:
             continue
@@ -974,7 +684,7 @@ def _menu_pages_from_homepage(source_url, html):
         if not normalized:
             continue
         parsed = urlparse(normalized)
-        if not _is_same_domain(base.netloc, parsed.netloc):
+        if not is_same_domain(base.netloc, parsed.netloc):
             continue
         if _is_excluded_internal_url(normalized):
             continue
@@ -993,58 +703,6 @@ def _menu_pages_from_homepage(source_url, html):
     return pages
 
 
-def _limit_entries_by_words(title, entries, max_words=1800):
-    words_used = 0
-    limited = []
-    for tag, text in entries:
-        if not text:
-            continue
-        words = text.split()
-        if not words:
-            continue
-        if words_used >= max_words:
-            break
-        remaining = max_words - words_used
-        if len(words) > remaining:
-            text = " ".join(words[:remaining])
-            limited.append((tag, text))
-            words_used += remaining
-            break
-        limited.append((tag, text))
-        words_used += len(words)
-    return title, limited
-
-
-def _extract_page_content(url, max_words=1800):
-    html = _fetch_website_html(url)
-    title, entries, word_count = _extract_multi_pass_content(html)
-    if not entries:
-        fallback = _FallbackTextExtractor()
-        fallback.feed(html)
-        text = fallback.extract()
-        if text:
-            entries = [("p", text)]
-            word_count = _count_words(entries)
-    if not entries or word_count < 40:
-        meta_parser = _MetaExtractor()
-        meta_parser.feed(html)
-        meta_title, meta = meta_parser.extract()
-        description = (
-            meta.get("description")
-            or meta.get("og:description")
-            or meta.get("twitter:description")
-            or ""
-        ).strip()
-        if meta_title and not title:
-            title = meta_title
-        if description:
-            entries = entries + [("p", description)] if entries else [("p", description)]
-            word_count = _count_words(entries)
-    title, limited_entries = _limit_entries_by_words(title, entries, max_words=max_words)
-    limited_word_count = _count_words(limited_entries)
-    return title, limited_entries, limited_word_count
-
-
 def _normalize_text_signature(text):
     raw = " ".join(str(text or "").split()).strip().lower()
     return raw
@@ -1206,13 +864,274 @@ def _check_ai_library_storage(org, subscription, extra_bytes):
     return usage_bytes + int(extra_bytes or 0) <= limit_bytes, usage_bytes, limit_bytes
 
 
-def _check_ai_library_storage_replace(org, subscription, old_bytes, new_bytes):
-    limit_bytes = _get_ai_library_limit_bytes(subscription)
-    if not limit_bytes:
-        return True, 0, None
-    usage_bytes = _get_ai_library_usage_bytes(org)
-    projected = usage_bytes - int(old_bytes or 0) + int(new_bytes or 0)
-    return projected <= limit_bytes, usage_bytes, limit_bytes
+def _check_ai_library_storage_replace(org, subscription, old_bytes, new_bytes):
+    limit_bytes = _get_ai_library_limit_bytes(subscription)
+    if not limit_bytes:
+        return True, 0, None
+    usage_bytes = _get_ai_library_usage_bytes(org)
+    projected = usage_bytes - int(old_bytes or 0) + int(new_bytes or 0)
+    return projected <= limit_bytes, usage_bytes, limit_bytes
+
+
+def _build_website_docx(source_url, page_sections):
+    paragraphs = []
+    paragraphs.append(("Heading1", "Website Overview", {"bold": True, "font_size": 16, "dedupe": False}))
+    paragraphs.append((None, f"Source URL: {source_url}", {}))
+    paragraphs.append((None, "", {}))
+    sections = {
+        "home": "HOME PAGE",
+        "about": "ABOUT US",
+        "services": "SERVICES",
+        "pricing": "PRICING",
+        "contact": "CONTACT",
+        "support": "SUPPORT",
+        "other": "OTHER MENU PAGES",
+    }
+    ordered_sections = ["home", "about", "services", "pricing", "contact", "support", "other"]
+    grouped = {key: [] for key in sections}
+    for section in page_sections:
+        page_type = _classify_page_type(section["url"])
+        key = page_type if page_type in grouped else "other"
+        grouped[key].append(section)
+    section_keywords = {
+        "overview": ("overview", "about", "intro", "introduction"),
+        "services": ("service", "services", "offer", "offering", "solution"),
+        "products": ("product", "products", "package", "packages", "catalog"),
+        "contact": ("contact", "reach", "call", "email", "phone", "address", "location"),
+    }
+    for key in ordered_sections:
+        items = grouped.get(key) or []
+        if not items:
+            continue
+        paragraphs.append(("Heading1", sections[key], {"bold": True, "font_size": 18, "uppercase": True, "dedupe": False}))
+        for section in items:
+            paragraphs.append(("Heading2", section["title"], {"bold": True, "dedupe": False}))
+            paragraphs.append((None, f"Source: {section['url']}", {}))
+            subsections = {key: [] for key in section_keywords}
+            other_entries = []
+            for tag, text in section["entries"]:
+                normalized = " ".join(text.lower().split())
+                matched = False
+                for subkey, tokens in section_keywords.items():
+                    if any(token in normalized for token in tokens):
+                        subsections[subkey].append((tag, text))
+                        matched = True
+                        break
+                if not matched:
+                    other_entries.append((tag, text))
+            for subkey, entries in subsections.items():
+                if not entries:
+                    continue
+                paragraphs.append(("Heading3", subkey.upper(), {"bold": True, "dedupe": False}))
+                for tag, text in entries:
+                    paragraphs.append((None, text, {}))
+            if other_entries:
+                paragraphs.append(("Heading3", "OTHER", {"bold": True, "dedupe": False}))
+                for tag, text in other_entries:
+                    paragraphs.append((None, text, {}))
+            paragraphs.append((None, f"[END OF {sections[key]}]", {"bold": True, "dedupe": False}))
+            paragraphs.append((None, "", {"divider": True}))
+    return _build_docx_from_paragraphs(paragraphs)
+
+
+def _website_page_record(url, fetched, title, entries, word_count):
+    return {
+        "url": url,
+        "etag": fetched.get("etag") or "",
+        "last_modified": fetched.get("last_modified") or "",
+        "title": title or "",
+        "entries": [[tag, text] for tag, text in entries],
+        "word_count": word_count,
+    }
+
+
+def _website_import_job_payload(job):
+    return {
+        "id": job.id,
+        "status": job.status,
+        "source_url": job.source_url,
+        "total_pages": len(job.page_urls or []),
+        "result": job.result or {},
+        "created_at": job.created_at.isoformat() if job.created_at else "",
+        "finished_at": job.finished_at.isoformat() if job.finished_at else "",
+    }
+
+
+def _previous_website_pages(job):
+    """Pages from the org's earlier imports, keyed by URL, for conditional re-fetching."""
+    previous = {}
+    earlier_pages = (
+        AiWebsiteImportJob.objects
+        .filter(organization_id=job.organization_id)
+        .exclude(id=job.id)
+        .order_by("-created_at", "-id")
+        .values_list("pages", flat=True)[:5]
+    )
+    for pages in earlier_pages:
+        for page in pages or []:
+            if page.get("url") and (page.get("etag") or page.get("last_modified")):
+                previous.setdefault(page["url"], page)
+    return previous
+
+
+def _crawl_website_pages(job):
+    known = {page["url"]: page for page in job.pages or []}
+    previous = _previous_website_pages(job)
+    pending = [url for url in job.page_urls if url not in known]
+    with WebsiteCrawler(job.source_url) as crawler:
+        results = crawler.fetch_many(pending, validators=previous)
+    for url, fetched, error in results:
+        if error is not None:
+            continue
+        if fetched["not_modified"]:
+            cached = previous[url]
+            known[url] = _website_page_record(
+                url, fetched, cached.get("title"), cached.get("entries") or [], cached.get("word_count") or 0,
+            )
+        else:
+            known[url] = _website_page_record(url, fetched, *page_content(extract_page(fetched["html"]), max_words=1800))
+    return [known[url] for url in job.page_urls if url in known]
+
+
+def _import_website(job):
+    """Crawl the job's pages and build the website document. Returns (succeeded, result, item)."""
+    org = job.organization
+    user = job.created_by
+    source_url = job.source_url
+    job.pages = _crawl_website_pages(job)
+
+    page_sections = []
+    total_words = 0
+    for page in job.pages:
+        if not page["entries"]:
+            continue
+        total_words += page["word_count"]
+        page_sections.append({
+            "url": page["url"],
+            "title": page["title"] or page["url"],
+            "entries": [(tag, text) for tag, text in page["entries"]],
+        })
+
+    if not page_sections:
+        _log_import_failure(org, user, source_url, "NO_READABLE_CONTENT", "no_page_sections")
+        item = _create_website_placeholder(org, user, source_url, job.name)
+        result = _failure_payload(
+            "NO_READABLE_CONTENT",
+            "We couldn't find readable text on this page.",
+            "Try another URL or upload a Word file.",
+        )
+        if item:
+            result["item"] = _serialize_media_item(item)
+        return False, result, item
+
+    name = job.name or urlparse(source_url).netloc or "Website content"
+    docx_bytes = _build_website_docx(source_url, page_sections)
+    subscription, _ = _require_active_subscription(org)
+    allowed, usage_bytes, limit_bytes = _check_ai_library_storage(org, subscription, len(docx_bytes))
+    if not allowed:
+        return False, {
+            "detail": "storage_limit_exceeded",
+            "usage_bytes": usage_bytes,
+            "limit_bytes": limit_bytes,
+        }, None
+    safe_base = slugify(name) or "website-content"
+    filename = f"{safe_base}-{secrets.token_hex(4)}.docx"
+    try:
+        with transaction.atomic():
+            item = AiMediaLibraryItem.objects.create(
+                organization=org,
+                name=name,
+                type="word_website_data",
+                source_url=source_url,
+                file_path=ContentFile(docx_bytes, name=filename),
+                file_size=len(docx_bytes),
+                is_auto_generated=True,
+                created_by=user,
+            )
+    except IntegrityError:
+        return False, {
+            "status": "blocked",
+            "message": "Website data already exists. Delete it before resubmitting.",
+        }, None
+    result = {"item": _serialize_media_item(item)}
+    warning_payload = {}
+    if total_words < 300:
+        log_event(
+            "website_import_limited_content",
+            status="warning",
+            org=org,
+            user=user,
+            product_slug="ai-chatbot",
+            meta={
+                "url": source_url,
+                "word_count": total_words,
+            },
+        )
+        warning_payload = {
+            "status": "warning",
+            "code": "LIMITED_CONTENT",
+            "message": "Only limited readable content was detected on this website.",
+            "suggestion": "Please review the downloaded Word file and re-upload an edited version for better AI results.",
+        }
+    elif len(page_sections) <= 1:
+        warning_payload = {
+            "status": "warning",
+            "code": "ONLY_HOMEPAGE_IMPORTED",
+            "message": "Only the homepage content was imported.",
+            "suggestion": "Please review the Word file and re-upload an edited version that includes menu pages.",
+        }
+    if warning_payload:
+        result.update(warning_payload)
+    return True, result, item
+
+
+def _expire_stale_website_imports(org_id, job_id=None):
+    """Fail queued or running imports older than WEBSITE_IMPORT_STALE_MINUTES; their worker never finished them."""
+    now = timezone.now()
+    stale = AiWebsiteImportJob.objects.filter(
+        organization_id=org_id,
+        status__in=(AiWebsiteImportJob.STATUS_QUEUED, AiWebsiteImportJob.STATUS_RUNNING),
+        created_at__lt=now - timedelta(minutes=WEBSITE_IMPORT_STALE_MINUTES),
+    )
+    if job_id is not None:
+        stale = stale.filter(id=job_id)
+    return stale.update(
+        status=AiWebsiteImportJob.STATUS_FAILED,
+        finished_at=now,
+        updated_at=now,
+        result=_failure_payload(
+            "IMPORT_TIMED_OUT",
+            "The website import did not finish in time.",
+            "Try the import again.",
+        ),
+    )
+
+
+def run_website_import_job(job_id):
+    now = timezone.now()
+    claimed = (
+        AiWebsiteImportJob.objects
+        .filter(id=job_id, status=AiWebsiteImportJob.STATUS_QUEUED)
+        .update(status=AiWebsiteImportJob.STATUS_RUNNING, started_at=now, updated_at=now)
+    )
+    if not claimed:
+        return None
+    job = AiWebsiteImportJob.objects.select_related("organization", "created_by").get(id=job_id)
+    try:
+        succeeded, job.result, job.item = _import_website(job)
+        job.status = AiWebsiteImportJob.STATUS_COMPLETED if succeeded else AiWebsiteImportJob.STATUS_FAILED
+    except Exception:
+        logger.exception("Website import failed job=%s", job_id)
+        _log_import_failure(job.organization, job.created_by, job.source_url, "WEBSITE_NOT_REACHABLE", "import_exception")
+        job.status = AiWebsiteImportJob.STATUS_FAILED
+        job.result = _failure_payload(
+            "WEBSITE_NOT_REACHABLE",
+            "The website could not be reached.",
+            "Try again later or use a different URL.",
+        )
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "pages", "item", "result", "finished_at", "updated_at"])
+    return job
 
 
 @login_required
@@ -1240,6 +1159,17 @@ def media_library_website_import(request):
             "status": "blocked",
             "message": "Website data already exists. Delete it before resubmitting.",
         }, status=409)
+    _expire_stale_website_imports(org.id)
+    pending_import = AiWebsiteImportJob.objects.filter(
+        organization=org,
+        status__in=(AiWebsiteImportJob.STATUS_QUEUED, AiWebsiteImportJob.STATUS_RUNNING),
+    ).first()
+    if pending_import:
+        return JsonResponse({
+            "status": "blocked",
+            "message": "A website import is already running.",
+            "job": _website_import_job_payload(pending_import),
+        }, status=409)
 
     if not _is_valid_http_url(source_url):
         _log_import_failure(org, user, source_url, "INVALID_URL")
@@ -1250,12 +1180,14 @@ def media_library_website_import(request):
             status=400
         )
 
+    crawler = WebsiteCrawler(source_url)
     try:
-        html = _fetch_website_html(source_url)
-    except HTTPError as error:
-        code = error.code or 0
-        if code in (401, 403, 429):
-            _log_import_failure(org, user, source_url, "ACCESS_BLOCKED", f"http_status_{code}")
+        homepage = crawler.fetch(source_url)
+    except WebsiteFetchError as error:
+        code = error.status_code
+        if code in (401, 403, 429) or error.reason == "robots_disallowed":
+            detected_reason = f"http_status_{code}" if code else "robots_txt"
+            _log_import_failure(org, user, source_url, "ACCESS_BLOCKED", detected_reason)
             item = _create_website_placeholder(org, user, source_url, name)
             response = _failure_response(
                 "ACCESS_BLOCKED",
@@ -1276,35 +1208,36 @@ def media_library_website_import(request):
                 "Check the URL or try another page.",
                 status=404
             )
-        _log_import_failure(org, user, source_url, "WEBSITE_NOT_REACHABLE", "http_error")
-        return _failure_response(
-            "WEBSITE_NOT_REACHABLE",
-            "The website could not be reached.",
-            "Try again later or use a different URL.",
-            status=502
-        )
-    except URLError:
-        _log_import_failure(org, user, source_url, "WEBSITE_NOT_REACHABLE", "url_error")
+        if error.reason == "unsupported_content_type":
+            _log_import_failure(org, user, source_url, "NO_READABLE_CONTENT", "unsupported_content_type")
+            item = _create_website_placeholder(org, user, source_url, name)
+            response = _failure_response(
+                "NO_READABLE_CONTENT",
+                "This page does not provide readable text.",
+                "Try another page or paste the content manually.",
+                status=400
+            )
+            if item:
+                response_data = json.loads(response.content.decode("utf-8"))
+                response_data["item"] = _serialize_media_item(item)
+                return JsonResponse(response_data, status=400)
+            return response
+        if error.reason == "http_error":
+            _log_import_failure(org, user, source_url, "WEBSITE_NOT_REACHABLE", "http_error")
+            return _failure_response(
+                "WEBSITE_NOT_REACHABLE",
+                "The website could not be reached.",
+                "Try again later or use a different URL.",
+                status=502
+            )
+        detected_reason = "url_error" if error.reason == "unreachable" else error.reason
+        _log_import_failure(org, user, source_url, "WEBSITE_NOT_REACHABLE", detected_reason)
         return _failure_response(
             "WEBSITE_NOT_REACHABLE",
             "The website could not be reached.",
             "Check your URL or try again later.",
             status=502
         )
-    except ValueError:
-        _log_import_failure(org, user, source_url, "NO_READABLE_CONTENT", "unsupported_content_type")
-        item = _create_website_placeholder(org, user, source_url, name)
-        response = _failure_response(
-            "NO_READABLE_CONTENT",
-            "This page does not provide readable text.",
-            "Try another page or paste the content manually.",
-            status=400
-        )
-        if item:
-            response_data = json.loads(response.content.decode("utf-8"))
-            response_data["item"] = _serialize_media_item(item)
-            return JsonResponse(response_data, status=400)
-        return response
     except Exception:
         _log_import_failure(org, user, source_url, "WEBSITE_NOT_REACHABLE", "fetch_exception")
         return _failure_response(
@@ -1313,9 +1246,12 @@ def media_library_website_import(request):
             "Try again later or use a different URL.",
             status=502
         )
+    finally:
+        crawler.close()
 
-    readable_title, readable_entries, _ = _extract_multi_pass_content(html)
-    readable_length = sum(len(text) for _, text in readable_entries)
+    html = homepage["html"]
+    homepage_content = extract_page(html)
+    readable_length = sum(len(text) for _, text in homepage_content["entries"])
     issue = _detect_blocked_or_login(html, readable_length=readable_length)
     if issue == "ACCESS_BLOCKED":
         info_note = ""
@@ -1367,7 +1303,7 @@ def media_library_website_import(request):
             return JsonResponse(response_data, status=400)
         return response
 
-    menu_pages = _menu_pages_from_homepage(source_url, html)
+    menu_pages = _menu_pages_from_homepage(source_url, homepage_content["menu_links"])
     scan = {
         "total_pages_found": len(menu_pages),
         "page_types": {},
@@ -1426,161 +1362,36 @@ def media_library_website_import(request):
         unique_pages.append(url)
     pages_to_import = unique_pages
 
-    page_sections = []
-    total_words = 0
-    for url in pages_to_import:
-        try:
-            page_title, page_entries, page_words = _extract_page_content(url, max_words=1800)
-        except (HTTPError, URLError, ValueError):
-            continue
-        except Exception:
-            continue
-        if not page_entries:
-            continue
-        total_words += page_words
-        page_sections.append({
-            "url": url,
-            "title": page_title or url,
-            "entries": page_entries,
-        })
-
-    if not page_sections:
-        _log_import_failure(org, user, source_url, "NO_READABLE_CONTENT", "no_page_sections")
-        item = _create_website_placeholder(org, user, source_url, name)
-        response = _failure_response(
-            "NO_READABLE_CONTENT",
-            "We couldn't find readable text on this page.",
-            "Try another URL or upload a Word file.",
-            status=400
-        )
-        if item:
-            response_data = json.loads(response.content.decode("utf-8"))
-            response_data["item"] = _serialize_media_item(item)
-            return JsonResponse(response_data, status=400)
-        return response
-
-    if not name:
-        name = urlparse(source_url).netloc or "Website content"
-
-    paragraphs = []
-    paragraphs.append(("Heading1", "Website Overview", {"bold": True, "font_size": 16, "dedupe": False}))
-    paragraphs.append((None, f"Source URL: {source_url}", {}))
-    paragraphs.append((None, "", {}))
-    sections = {
-        "home": "HOME PAGE",
-        "about": "ABOUT US",
-        "services": "SERVICES",
-        "pricing": "PRICING",
-        "contact": "CONTACT",
-        "support": "SUPPORT",
-        "other": "OTHER MENU PAGES",
-    }
-    ordered_sections = ["home", "about", "services", "pricing", "contact", "support", "other"]
-    grouped = {key: [] for key in sections}
-    for section in page_sections:
-        page_type = _classify_page_type(section["url"])
-        key = page_type if page_type in grouped else "other"
-        grouped[key].append(section)
-    section_keywords = {
-        "overview": ("overview", "about", "intro", "introduction"),
-        "services": ("service", "services", "offer", "offering", "solution"),
-        "products": ("product", "products", "package", "packages", "catalog"),
-        "contact": ("contact", "reach", "call", "email", "phone", "address", "location"),
-    }
-    for key in ordered_sections:
-        items = grouped.get(key) or []
-        if not items:
-            continue
-        paragraphs.append(("Heading1", sections[key], {"bold": True, "font_size": 18, "uppercase": True, "dedupe": False}))
-        for section in items:
-            paragraphs.append(("Heading2", section["title"], {"bold": True, "dedupe": False}))
-            paragraphs.append((None, f"Source: {section['url']}", {}))
-            subsections = {key: [] for key in section_keywords}
-            other_entries = []
-            for tag, text in section["entries"]:
-                normalized = " ".join(text.lower().split())
-                matched = False
-                for subkey, tokens in section_keywords.items():
-                    if any(token in normalized for token in tokens):
-                        subsections[subkey].append((tag, text))
-                        matched = True
-                        break
-                if not matched:
-                    other_entries.append((tag, text))
-            for subkey, entries in subsections.items():
-                if not entries:
-                    continue
-                paragraphs.append(("Heading3", subkey.upper(), {"bold": True, "dedupe": False}))
-                for tag, text in entries:
-                    paragraphs.append((None, text, {}))
-            if other_entries:
-                paragraphs.append(("Heading3", "OTHER", {"bold": True, "dedupe": False}))
-                for tag, text in other_entries:
-                    paragraphs.append((None, text, {}))
-            paragraphs.append((None, f"[END OF {sections[key]}]", {"bold": True, "dedupe": False}))
-            paragraphs.append((None, "", {"divider": True}))
-    for section in page_sections:
-        paragraphs.append(("Heading1", section["title"]))
-        paragraphs.append((None, f"Source: {section['url']}"))
-        for tag, text in section["entries"]:
-            style = None
-            if tag in {"h1", "h2"}:
-                style = "Heading1"
-            elif tag in {"h3", "h4"}:
-                style = "Heading2"
-            elif tag in {"h5", "h6"}:
-                style = "Heading3"
-            paragraphs.append((style, text))
-    docx_bytes = _build_docx_from_paragraphs(paragraphs)
-    allowed, usage_bytes, limit_bytes = _check_ai_library_storage(org, subscription, len(docx_bytes))
-    if not allowed:
-        return JsonResponse({
-            "detail": "storage_limit_exceeded",
-            "usage_bytes": usage_bytes,
-            "limit_bytes": limit_bytes,
-        }, status=413)
-    safe_base = slugify(name) or "website-content"
-    filename = f"{safe_base}-{secrets.token_hex(4)}.docx"
-    item = AiMediaLibraryItem.objects.create(
+    homepage_urls = {source_url, _normalize_url(source_url) or source_url}
+    homepage_page = page_content(homepage_content, max_words=1800)
+    job = AiWebsiteImportJob.objects.create(
         organization=org,
-        name=name,
-        type="word_website_data",
-        source_url=source_url,
-        file_path=ContentFile(docx_bytes, name=filename),
-        file_size=len(docx_bytes),
-        is_auto_generated=True,
         created_by=user,
+        source_url=source_url,
+        name=name,
+        page_urls=pages_to_import,
+        pages=[
+            _website_page_record(url, homepage, *homepage_page)
+            for url in pages_to_import
+            if url in homepage_urls
+        ],
     )
-    response_payload = {"item": _serialize_media_item(item)}
-    warning_payload = {}
-    if total_words < 300:
-        log_event(
-            "website_import_limited_content",
-            status="warning",
-            org=org,
-            user=user,
-            product_slug="ai-chatbot",
-            meta={
-                "url": source_url,
-                "word_count": total_words,
-            },
-        )
-        warning_payload = {
-            "status": "warning",
-            "code": "LIMITED_CONTENT",
-            "message": "Only limited readable content was detected on this website.",
-            "suggestion": "Please review the downloaded Word file and re-upload an edited version for better AI results.",
-        }
-    elif len(page_sections) <= 1:
-        warning_payload = {
-            "status": "warning",
-            "code": "ONLY_HOMEPAGE_IMPORTED",
-            "message": "Only the homepage content was imported.",
-            "suggestion": "Please review the Word file and re-upload an edited version that includes menu pages.",
-        }
-    if warning_payload:
-        response_payload.update(warning_payload)
-    return JsonResponse(response_payload, status=201)
+    transaction.on_commit(lambda: _run_in_background(run_website_import_task, job.id))
+    return JsonResponse({"status": "queued", "job": _website_import_job_payload(job)}, status=202)
+
+
+@login_required
+@require_http_methods(["GET"])
+def media_library_website_import_status(request, job_id):
+    user = request.user
+    org = _resolve_org_for_user(user)
+    if not org or not _is_org_admin(user):
+        return JsonResponse({"detail": "forbidden"}, status=403)
+    _expire_stale_website_imports(org.id, job_id=job_id)
+    job = AiWebsiteImportJob.objects.filter(organization=org, id=job_id).first()
+    if not job:
+        return JsonResponse({"detail": "not_found"}, status=404)
+    return JsonResponse({"job": _website_import_job_payload(job)})
 
 
 def _lock_conversation_for_update(org, conversation_id):
@@ -1653,8 +1464,7 @@ def dashboard_summary(request):
     if ai_limit is None:
         ai_limit = limits.get("conversations_per_month", 0)
     ai_limit = int(ai_limit or 0)
-    usage = _get_ai_usage(org) if org and ai_limit else None
-    ai_used = usage.ai_replies_used if usage else 0
+    ai_used = get_ai_replies_used(org) if org and ai_limit else 0
     usage_percent = int((ai_used / ai_limit) * 100) if ai_limit else 0
 
     return JsonResponse({
@@ -1680,29 +1490,19 @@ def widget_config(request):
     key = request.GET.get("key", "").strip()
     if not key:
         return JsonResponse({"detail": "key_required"}, status=400)
-    widget = ChatWidget.objects.filter(widget_key=key, is_active=True).select_related("organization").first()
-    if not widget:
+    snapshot = get_widget_config_snapshot(key)
+    if not snapshot:
         return JsonResponse({"detail": "not_found"}, status=404)
-    if not _is_domain_allowed(widget, request):
+    if not is_origin_allowed(snapshot, request):
         return JsonResponse({"detail": "domain_not_allowed"}, status=403)
-    rl_suffix = f"{_get_client_ip(request)}:{widget.public_chat_code}"
+    rl_suffix = f"{_get_client_ip(request)}:{snapshot['public_chat_code']}"
     if _rate_limit(request, "widget_message", limit=40, window_seconds=60, key_suffix=rl_suffix):
         return JsonResponse({"detail": "rate_limited"}, status=429)
-    settings_obj, _ = OrganizationSettings.objects.get_or_create(organization=widget.organization)
-    return JsonResponse({
-        "id": widget.id,
-        "name": widget.name,
-        "widget_key": widget.widget_key,
-        "theme": {
-            "preset": widget.theme_preset,
-            "primary": widget.theme_primary,
-            "accent": widget.theme_accent,
-            "background": widget.theme_background,
-        },
-        "allowed_domains": _split_allowed_domains(widget.allowed_domains),
-        "is_active": widget.is_active,
-        "allow_visitor_attachments": bool(settings_obj.ai_chatbot_user_attachments_enabled),
-    })
+    response = get_conditional_response(request, etag=snapshot["etag"]) or JsonResponse(snapshot["payload"])
+    response["ETag"] = snapshot["etag"]
+    response["Cache-Control"] = widget_config_cache_control()
+    patch_vary_headers(response, ("Origin",))
+    return response
 
 
 @csrf_exempt
@@ -1842,23 +1642,38 @@ def widget_message(request):
             "ai_conv_limit": ai_conv_limit,
         }, status=429)
 
-    ChatMessage.objects.create(
-        conversation=conversation,
-        sender_type="visitor",
-        text=text,
-    )
+    with transaction.atomic():
+        visitor_message = ChatMessage.objects.create(
+            conversation=conversation,
+            sender_type="visitor",
+            text=text,
+        )
+        _publish_chat_update(conversation, visitor_message, widget_key=widget.widget_key)
     bot_text = "Thanks for reaching out! We'll reply shortly."
-    has_auto_reply = ChatMessage.objects.filter(
+    # An FAQ the visitor asked (near) verbatim is answered from the index, no model call,
+    # but only while no agent has taken the conversation over.
+    bot_may_answer = conversation.status == "open" and not conversation.active_agent_id
+    faq_hit = match_faq(widget.organization, text) if ai_enabled and bot_may_answer else None
+    if faq_hit:
+        with transaction.atomic():
+            bot_message = ChatMessage.objects.create(
+                conversation=conversation,
+                sender_type="bot",
+                text=faq_hit["text"],
+            )
+            _publish_chat_update(conversation, bot_message, widget_key=widget.widget_key)
+    elif not ChatMessage.objects.filter(
         conversation=conversation,
         sender_type="bot",
         text=bot_text,
-    ).exists()
-    if not has_auto_reply:
-        ChatMessage.objects.create(
-            conversation=conversation,
-            sender_type="bot",
-            text=bot_text,
-        )
+    ).exists():
+        with transaction.atomic():
+            bot_message = ChatMessage.objects.create(
+                conversation=conversation,
+                sender_type="bot",
+                text=bot_text,
+            )
+            _publish_chat_update(conversation, bot_message, widget_key=widget.widget_key)
 
     messages = _fetch_last_messages(conversation, limit=50)
     ai_used_next = ai_used + (1 if allow_ai else 0)
@@ -1947,16 +1762,17 @@ def widget_attachment(request):
             last_message_at=timezone.now(),
         )
 
-    ChatMessage.objects.create(
-        conversation=conversation,
-        sender_type="visitor",
-        text=filename,
-        attachment=upload,
-        attachment_name=filename,
-        attachment_type=getattr(upload, "content_type", "") or "",
-        attachment_size=getattr(upload, "size", 0) or 0,
-    )
-    ChatConversation.objects.filter(id=conversation.id).update(last_message_at=timezone.now())
+    with transaction.atomic():
+        visitor_message = ChatMessage.objects.create(
+            conversation=conversation,
+            sender_type="visitor",
+            text=filename,
+            attachment=upload,
+            attachment_name=filename,
+            attachment_type=getattr(upload, "content_type", "") or "",
+            attachment_size=getattr(upload, "size", 0) or 0,
+        )
+        _publish_chat_update(conversation, visitor_message, widget_key=widget.widget_key)
     bot_text = "Thanks for reaching out! We'll reply shortly."
     has_auto_reply = ChatMessage.objects.filter(
         conversation=conversation,
@@ -1964,11 +1780,13 @@ def widget_attachment(request):
         text=bot_text,
     ).exists()
     if not has_auto_reply:
-        ChatMessage.objects.create(
-            conversation=conversation,
-            sender_type="bot",
-            text=bot_text,
-        )
+        with transaction.atomic():
+            bot_message = ChatMessage.objects.create(
+                conversation=conversation,
+                sender_type="bot",
+                text=bot_text,
+            )
+            _publish_chat_update(conversation, bot_message, widget_key=widget.widget_key)
 
     messages = _fetch_last_messages(conversation, limit=50)
     return JsonResponse({
@@ -1988,6 +1806,10 @@ def widget_thread(request):
         category = ""
     if not key or not visitor_id:
         return JsonResponse({"detail": "invalid_params"}, status=400)
+    # Polling fallback: nothing published for this visitor since the client's cursor.
+    cursor = ensure_cursor(visitor_channel(key, visitor_id))
+    if cursor_unchanged(cursor, request.GET.get("since", "").strip()):
+        return HttpResponse(status=304)
     widget = ChatWidget.objects.filter(widget_key=key, is_active=True).select_related("organization").first()
     if not widget:
         return JsonResponse({"detail": "not_found"}, status=404)
@@ -2007,6 +1829,7 @@ def widget_thread(request):
             "conversation_id": None,
             "messages": [],
             "allow_visitor_attachments": bool(settings_obj.ai_chatbot_user_attachments_enabled),
+            "cursor": cursor,
         })
     messages = _fetch_last_messages(conversation, limit=50)
     return JsonResponse({
@@ -2014,9 +1837,32 @@ def widget_thread(request):
         "category": conversation.category,
         "messages": messages,
         "allow_visitor_attachments": bool(settings_obj.ai_chatbot_user_attachments_enabled),
+        "cursor": cursor,
     })
 
 
+async def widget_stream(request):
+    """Server-sent events for one widget visitor; needs the ASGI server."""
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"detail": "realtime_unavailable"}, status=501)
+    if _rate_limit(request, "widget_stream", limit=30, window_seconds=60):
+        return JsonResponse({"detail": "rate_limited"}, status=429)
+    key = request.GET.get("key", "").strip()
+    visitor_id = request.GET.get("visitor_id", "").strip()
+    if not key or not visitor_id:
+        return JsonResponse({"detail": "invalid_params"}, status=400)
+    widget = await sync_to_async(
+        lambda: ChatWidget.objects.filter(widget_key=key, is_active=True).only("id", "allowed_domains").first()
+    )()
+    if not widget:
+        return JsonResponse({"detail": "not_found"}, status=404)
+    if not _is_domain_allowed(widget, request):
+        return JsonResponse({"detail": "domain_not_allowed"}, status=403)
+    return _event_stream_response([visitor_channel(key, visitor_id)])
+
+
 @login_required
 @require_http_methods(["GET", "PATCH"])
 def chat_settings(request):
@@ -2605,7 +2451,7 @@ def widgets_collection(request):
                         "accent": widget.theme_accent,
                         "background": widget.theme_background,
                     },
-                    "allowed_domains": _split_allowed_domains(widget.allowed_domains),
+                    "allowed_domains": split_allowed_domains(widget.allowed_domains),
                     "is_active": widget.is_active,
                     "created_at": widget.created_at.isoformat(),
                 }
@@ -2628,7 +2474,7 @@ def widgets_collection(request):
         organization=org,
         name=name,
         widget_key=widget_key,
-        allowed_domains="\n".join(_split_allowed_domains(allowed_domains)),
+        allowed_domains="\n".join(split_allowed_domains(allowed_domains)),
         is_active=True,
         theme_preset=theme_preset or "emerald",
         theme_primary=theme_primary,
@@ -2650,7 +2496,7 @@ def widgets_collection(request):
             "accent": widget.theme_accent,
             "background": widget.theme_background,
         },
-        "allowed_domains": _split_allowed_domains(widget.allowed_domains),
+        "allowed_domains": split_allowed_domains(widget.allowed_domains),
         "is_active": widget.is_active,
         "created_at": widget.created_at.isoformat(),
     }, status=201)
@@ -2674,7 +2520,7 @@ def widget_update(request, widget_id):
     if "name" in payload:
         widget.name = str(payload.get("name", "")).strip() or widget.name
     if "allowed_domains" in payload:
-        widget.allowed_domains = "\n".join(_split_allowed_domains(payload.get("allowed_domains")))
+        widget.allowed_domains = "\n".join(split_allowed_domains(payload.get("allowed_domains")))
     if "theme" in payload or "theme_preset" in payload:
         theme = payload.get("theme", {}) or {}
         widget.theme_preset = str(theme.get("preset", "") or payload.get("theme_preset", "") or widget.theme_preset)
@@ -2699,7 +2545,7 @@ def widget_update(request, widget_id):
             "accent": widget.theme_accent,
             "background": widget.theme_background,
         },
-        "allowed_domains": _split_allowed_domains(widget.allowed_domains),
+        "allowed_domains": split_allowed_domains(widget.allowed_domains),
         "is_active": widget.is_active,
         "created_at": widget.created_at.isoformat(),
     })
@@ -2823,8 +2669,15 @@ def inbox_conversations(request):
     if not subscription:
         detail = "Trial ended. Please upgrade your plan." if error_detail == "trial_ended" else "subscription_required"
         return JsonResponse({"detail": detail}, status=403)
+    cursor = ensure_cursor(inbox_channel(org.id))
+    if cursor_unchanged(cursor, request.GET.get("since", "").strip()):
+        return HttpResponse(status=304)
     status = request.GET.get("status", "open")
     category = request.GET.get("category", "all")
+    try:
+        limit = max(1, min(int(request.GET.get("limit") or INBOX_PAGE_SIZE), INBOX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        limit = INBOX_PAGE_SIZE
     qs = (
         ChatConversation.objects
         .filter(organization=org)
@@ -2837,35 +2690,30 @@ def inbox_conversations(request):
             qs = qs.filter(status__in=("open", "in-progress"))
         else:
             qs = qs.filter(status=status)
-    
+
     is_admin = _is_org_admin(user)
     if not is_admin:
         qs = qs.filter(Q(active_agent__isnull=True) | Q(active_agent=user))
 
-    qs = qs.order_by("-last_message_at", "-created_at")[:100]
-    conversation_ids = [row.id for row in qs]
-    last_messages = (
-        ChatMessage.objects
-        .filter(conversation_id__in=conversation_ids)
-        .order_by("conversation_id", "-created_at")
-    )
-    last_text_by_conversation = {}
-    for message in last_messages:
-        if message.conversation_id not in last_text_by_conversation:
-            last_text_by_conversation[message.conversation_id] = message.text
-    last_visitor_by_conversation = {}
-    visitor_messages = (
-        ChatMessage.objects
-        .filter(conversation_id__in=conversation_ids, sender_type="visitor")
-        .order_by("conversation_id", "-created_at")
-    )
-    for message in visitor_messages:
-        if message.conversation_id not in last_visitor_by_conversation:
-            last_visitor_by_conversation[message.conversation_id] = message.created_at
+    # Keyset pagination on (last_message_at, id): `before` is the previous page's next_before.
+    before = str(request.GET.get("before", "")).strip()
+    if before:
+        before_at, _, before_id = before.rpartition("|")
+        before_at = parse_datetime(before_at)
+        if not before_at or not before_id.isdigit():
+            return JsonResponse({"detail": "invalid_cursor"}, status=400)
+        qs = qs.filter(
+            Q(last_message_at__lt=before_at)
+            | Q(last_message_at=before_at, id__lt=int(before_id))
+        )
+
+    rows = list(qs.order_by("-last_message_at", "-id")[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
     now = timezone.now()
-    
+
     conversations_data = []
-    for row in qs:
+    for row in rows:
         data = {
             "id": row.id,
             "widget_id": row.widget_id,
@@ -2874,29 +2722,71 @@ def inbox_conversations(request):
             "visitor_name": row.visitor_name or "",
             "visitor_email": row.visitor_email or "",
             "visitor_phone": row.visitor_phone or "",
-            "visitor_status": _visitor_presence(last_visitor_by_conversation.get(row.id), now=now),
+            "visitor_status": _visitor_presence(row.last_visitor_message_at, now=now),
             "status": row.status,
             "category": row.category or "",
             "source": row.source or "",
             "last_message_at": row.last_message_at.isoformat() if row.last_message_at else "",
-            "last_message": last_text_by_conversation.get(row.id, ""),
+            "last_message": row.last_message_preview or "",
+            "last_sender": row.last_sender or "",
+            "unread_count": row.unread_for_agent,
             "created_at": row.created_at.isoformat(),
             "active_agent_id": row.active_agent_id,
             "active_agent_name": "",
         }
         if row.active_agent:
             data["active_agent_name"] = f"{row.active_agent.first_name} {row.active_agent.last_name}".strip() or row.active_agent.username
-        
+
         if is_admin and row.active_agent_id and row.active_agent_id != user.id:
             data["last_message"] = ""
 
         conversations_data.append(data)
 
+    next_before = ""
+    if has_more and rows[-1].last_message_at:
+        next_before = f"{rows[-1].last_message_at.isoformat()}|{rows[-1].id}"
     return JsonResponse({
-        "conversations": conversations_data
+        "conversations": conversations_data,
+        "cursor": cursor,
+        "next_before": next_before,
     })
 
 
+def _inbox_stream_viewer(request):
+    user = request.user
+    if not user or not user.is_authenticated:
+        return None, JsonResponse({"detail": "authentication_required"}, status=401)
+    org = _resolve_org_for_user(user)
+    if not org or not _is_agent_or_admin(user):
+        return None, JsonResponse({"detail": "forbidden"}, status=403)
+    subscription, error_detail = _require_active_subscription(org)
+    if not subscription:
+        detail = "Trial ended. Please upgrade your plan." if error_detail == "trial_ended" else "subscription_required"
+        return None, JsonResponse({"detail": detail}, status=403)
+    return {"user_id": user.id, "org_id": org.id, "is_admin": _is_org_admin(user)}, None
+
+
+async def inbox_stream(request):
+    """Server-sent events for the org inbox, filtered like inbox_conversations; needs the ASGI server."""
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"detail": "realtime_unavailable"}, status=501)
+    viewer, error_response = await sync_to_async(_inbox_stream_viewer)(request)
+    if error_response is not None:
+        return error_response
+
+    def accept(event):
+        agent_id = event.get("active_agent_id")
+        if not agent_id or agent_id == viewer["user_id"]:
+            return event
+        if not viewer["is_admin"]:
+            return None
+        return {key: value for key, value in event.items() if key != "message"}
+
+    return _event_stream_response([inbox_channel(viewer["org_id"])], accept=accept)
+
+
 @login_required
 @require_http_methods(["GET"])
 def inbox_messages(request, conversation_id):
@@ -2917,6 +2807,10 @@ def inbox_messages(request, conversation_id):
     if conversation.active_agent_id != user.id:
         return JsonResponse({"detail": "conversation_taken"}, status=403)
 
+    if conversation.unread_for_agent:
+        ChatConversation.objects.filter(id=conversation.id).update(unread_for_agent=0)
+        # Inbox only: other tabs drop the unread badge; the visitor's widget has nothing new.
+        _publish_chat_update(conversation, widget_key="")
     messages = _fetch_last_messages(conversation, limit=None)
     return JsonResponse({
         "conversation_id": conversation.id,
@@ -2959,7 +2853,7 @@ def inbox_reply(request, conversation_id):
             sender_user=user,
             text=text,
         )
-        ChatConversation.objects.filter(id=conversation.id).update(last_message_at=timezone.now())
+        _publish_chat_update(conversation, message)
     return JsonResponse({
         "message": _serialize_message(message),
     })
@@ -3008,7 +2902,7 @@ def inbox_attachment(request, conversation_id):
             attachment_type=getattr(upload, "content_type", "") or "",
             attachment_size=getattr(upload, "size", 0) or 0,
         )
-        ChatConversation.objects.filter(id=conversation.id).update(last_message_at=timezone.now())
+        _publish_chat_update(conversation, message)
 
     return JsonResponse({
         "message": _serialize_message(message),
@@ -3039,6 +2933,7 @@ def inbox_close(request, conversation_id):
         conversation.active_agent = None
         conversation.last_message_at = timezone.now()
         conversation.save(update_fields=["status", "active_agent", "last_message_at"])
+        _publish_chat_update(conversation)
     return JsonResponse({
         "id": conversation.id,
         "status": conversation.status,
@@ -3067,6 +2962,7 @@ def inbox_reopen(request, conversation_id):
         conversation.status = "open"
         conversation.last_message_at = timezone.now()
         conversation.save(update_fields=["status", "last_message_at", "active_agent"])
+        _publish_chat_update(conversation)
     return JsonResponse({
         "id": conversation.id,
         "status": conversation.status,
@@ -3093,6 +2989,7 @@ def inbox_take_conversation(request, conversation_id):
         conversation.active_agent = user
         conversation.status = "in-progress"
         conversation.save(update_fields=["active_agent", "status"])
+        _publish_chat_update(conversation)
 
     return JsonResponse({
         "id": conversation.id,
@@ -3149,6 +3046,7 @@ def inbox_transfer_conversation(request, conversation_id):
             from_agent=old_agent,
             to_agent=new_agent,
         )
+        _publish_chat_update(conversation)
 
     log_event(
         "ai_chatbot_conversation_transferred",
@@ -3278,6 +3176,7 @@ def history_delete(request, conversation_id):
     conversation = ChatConversation.objects.filter(id=conversation_id, organization=org).first()
     if not conversation:
         return JsonResponse({"detail": "not_found"}, status=404)
+    _publish_chat_update(conversation)
     ChatMessage.objects.filter(conversation=conversation).delete()
     conversation.delete()
     return HttpResponse(status=204)
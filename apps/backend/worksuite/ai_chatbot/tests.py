@@ -0,0 +1,566 @@
+import io
+import json
+import threading
+import time
+import zipfile
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncClient, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.backend.products.models import Product
+from core.models import (
+    AiFaq,
+    AiMediaLibraryItem,
+    AiUsageEvent,
+    AiUsageMonthly,
+    AiWebsiteImportJob,
+    ChatConversation,
+    ChatMessage,
+    ChatWidget,
+    Organization,
+    OrganizationProduct,
+    OrganizationSettings,
+    Plan,
+    Subscription,
+    UserProfile,
+)
+from ai_chatbot.api_views import _publish_chat_update, run_website_import_job
+from apps.backend.ai_chatbot.services import ai_limits, ai_usage, knowledge_index, realtime, widget_config
+from apps.backend.ai_chatbot.services.website_import import WebsiteCrawler, extract_page
+
+
+class ChatRealtimeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        realtime._broker = realtime.InMemoryBroker()
+        self.org = Organization.objects.create(name="Chat Org", company_key="CHAT-ORG")
+        self.widget = ChatWidget.objects.create(organization=self.org, name="Site", widget_key="wk-realtime")
+
+    def _thread(self, since=""):
+        params = {"key": "wk-realtime", "visitor_id": "visitor-1", "category": "sales"}
+        if since:
+            params["since"] = since
+        return self.client.get("/api/ai-chatbot/widget/thread", params)
+
+    def test_thread_poll_returns_304_until_something_is_published(self):
+        first = self._thread()
+        self.assertEqual(first.status_code, 200)
+        cursor = first.json()["cursor"]
+
+        # A per-process cache can miss publishes from other workers: polls always read.
+        self.assertEqual(self._thread(since=cursor).status_code, 200)
+
+        with mock.patch.object(realtime, "cache_is_shared", return_value=True):
+            with self.assertNumQueries(0):
+                unchanged = self._thread(since=cursor)
+        self.assertEqual(unchanged.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/ai-chatbot/widget/message",
+                data=json.dumps({
+                    "key": "wk-realtime",
+                    "visitor_id": "visitor-1",
+                    "category": "sales",
+                    "text": "Hello",
+                    "name": "Ravi",
+                    "email": "ravi@example.test",
+                    "phone": "9876543210",
+                }),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+
+        changed = self._thread(since=cursor)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.json()["cursor"], cursor)
+        self.assertEqual([item["text"] for item in changed.json()["messages"]][0], "Hello")
+
+    def test_stream_requires_asgi(self):
+        response = self.client.get("/api/ai-chatbot/widget/stream", {"key": "wk-realtime", "visitor_id": "visitor-1"})
+
+        self.assertEqual(response.status_code, 501)
+
+    async def test_widget_stream_relays_published_messages(self):
+        response = await AsyncClient().get(
+            "/api/ai-chatbot/widget/stream",
+            {"key": "wk-realtime", "visitor_id": "visitor-1"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        frames = response.streaming_content.__aiter__()
+        self.assertIn(b"event: ready", await frames.__anext__())
+
+        realtime._publish_now(
+            [realtime.visitor_channel("wk-realtime", "visitor-1"), realtime.visitor_channel("wk-realtime", "other")],
+            {"type": "message", "conversation_id": 7, "message": {"text": "Hi there"}},
+        )
+        frame = (await frames.__anext__()).decode("utf-8")
+        await frames.aclose()
+
+        self.assertTrue(frame.startswith("event: message\n"))
+        self.assertEqual(json.loads(frame.split("data: ", 1)[1])["message"]["text"], "Hi there")
+
+    def test_chat_updates_move_visitor_and_inbox_cursors(self):
+        conversation = ChatConversation.objects.create(
+            organization=self.org, widget=self.widget, visitor_id="visitor-1", category="sales",
+        )
+        message = ChatMessage.objects.create(conversation=conversation, sender_type="bot", text="Welcome")
+
+        channels = [realtime.visitor_channel("wk-realtime", "visitor-1"), realtime.inbox_channel(self.org.id)]
+        before = [realtime.ensure_cursor(channel) for channel in channels]
+        with self.captureOnCommitCallbacks(execute=True):
+            _publish_chat_update(conversation, message)
+
+        after = [realtime.get_cursor(channel) for channel in channels]
+        self.assertNotEqual(before[0], after[0])
+        self.assertNotEqual(before[1], after[1])
+
+
+class InboxSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.org = Organization.objects.create(name="Inbox Org", company_key="INBOX-ORG")
+        product, _ = Product.objects.get_or_create(slug="ai-chatbot", defaults={"name": "AI Chatbot"})
+        plan = Plan.objects.create(name="Chat Pro", product=product)
+        self.admin = get_user_model().objects.create_user(username="inbox@acme.test", email="inbox@acme.test", password="pw123456")
+        UserProfile.objects.create(user=self.admin, organization=self.org, role="company_admin")
+        Subscription.objects.create(user=self.admin, organization=self.org, plan=plan, status="active")
+        OrganizationProduct.objects.update_or_create(
+            organization=self.org, product=product, defaults={"subscription_status": "active", "source": "test"},
+        )
+        self.widget = ChatWidget.objects.create(organization=self.org, name="Site", widget_key="wk-inbox")
+        self.client.force_login(self.admin)
+
+    def _conversation(self, visitor_id, texts):
+        conversation = ChatConversation.objects.create(
+            organization=self.org, widget=self.widget, visitor_id=visitor_id, category="sales",
+        )
+        for sender_type, text in texts:
+            ChatMessage.objects.create(conversation=conversation, sender_type=sender_type, text=text)
+        return conversation
+
+    def test_message_inserts_maintain_the_summary(self):
+        conversation = self._conversation("v1", [("visitor", "Hi"), ("bot", "Thanks"), ("visitor", "Price  of\nplan?")])
+        conversation.refresh_from_db()
+
+        self.assertEqual(conversation.last_message_preview, "Price of plan?")
+        self.assertEqual(conversation.last_sender, "visitor")
+        self.assertEqual(conversation.unread_for_agent, 2)
+        self.assertIsNotNone(conversation.last_visitor_message_at)
+
+        ChatMessage.objects.create(conversation=conversation, sender_type="agent", sender_user=self.admin, text="Sent")
+        conversation.refresh_from_db()
+        self.assertEqual((conversation.last_sender, conversation.unread_for_agent), ("agent", 0))
+
+    def test_inbox_list_is_one_query_and_keyset_paginated(self):
+        for index in range(5):
+            self._conversation(f"v{index}", [("visitor", f"message {index}")] * (index + 1))
+
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get("/api/ai-chatbot/inbox/conversations", {"status": "all", "limit": 3}).json()
+        conversation_queries = [q for q in queries.captured_queries if '"core_chatconversation"' in q["sql"]]
+        self.assertEqual(len(conversation_queries), 1)
+        self.assertNotIn('"core_chatmessage"', " ".join(q["sql"] for q in queries.captured_queries))
+
+        self.assertEqual([row["visitor_id"] for row in first["conversations"]], ["v4", "v3", "v2"])
+        self.assertEqual(first["conversations"][0]["last_message"], "message 4")
+        self.assertEqual(first["conversations"][0]["unread_count"], 5)
+        self.assertEqual(first["conversations"][0]["visitor_status"], "online")
+
+        second = self.client.get(
+            "/api/ai-chatbot/inbox/conversations",
+            {"status": "all", "limit": 3, "before": first["next_before"]},
+        ).json()
+        self.assertEqual([row["visitor_id"] for row in second["conversations"]], ["v1", "v0"])
+        self.assertEqual(second["next_before"], "")
+
+    def test_opening_a_thread_clears_unread_and_moves_the_inbox_cursor(self):
+        conversation = self._conversation("v1", [("visitor", "Hi"), ("visitor", "Anyone?")])
+        ChatConversation.objects.filter(id=conversation.id).update(active_agent=self.admin, status="in-progress")
+        inbox = realtime.inbox_channel(self.org.id)
+        before = realtime.ensure_cursor(inbox)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(f"/api/ai-chatbot/inbox/conversations/{conversation.id}/messages")
+
+        self.assertEqual(response.status_code, 200)
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.unread_for_agent, 0)
+        self.assertNotEqual(realtime.get_cursor(inbox), before)
+
+
+FIXTURE_BODY = "Our team prints brochures, banners and catalogues for local businesses every single day. " * 6
+FIXTURE_PAGES = {
+    "/": (
+        "<html><head><title>Acme Print</title><meta name='description' content='Acme print shop'></head><body>"
+        "<nav><a href='/about'>About</a><a href='/services'>Services</a><a href='/contact'>Contact</a>"
+        "<a href='/private/pricing'>Pricing</a><a href='http://elsewhere.test/about'>Partner</a></nav>"
+        f"<main><h1>Welcome to Acme</h1><p>{FIXTURE_BODY}</p></main><footer>Footer links</footer></body></html>"
+    ),
+    "/about": f"<html><head><title>About Acme</title></head><body><article><h2>Our story</h2><p>{FIXTURE_BODY}</p></article></body></html>",
+    "/services": f"<html><head><title>Services</title></head><body><section><p>Printing services. {FIXTURE_BODY}</p></section></body></html>",
+    "/contact": "<html><head><title>Contact</title></head><body><div><p>Call us on 555 0100 or email hello@acme.test.</p></div></body></html>",
+    "/private/pricing": "<html><body><p>Secret pricing</p></body></html>",
+}
+
+
+class _FixtureSiteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        site = self.server.site
+        with site["lock"]:
+            site["requests"].append((self.path, self.headers.get("If-None-Match"), self.client_address[1]))
+            site["in_flight"] += 1
+            site["max_in_flight"] = max(site["max_in_flight"], site["in_flight"])
+        try:
+            time.sleep(0.03)
+            if self.path == "/robots.txt":
+                self._send(200, "text/plain", "User-agent: *\nDisallow: /private\n")
+            elif self.path in FIXTURE_PAGES:
+                etag = f'"v1-{len(FIXTURE_PAGES[self.path])}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self._send(304, "", "", etag=etag)
+                else:
+                    self._send(200, "text/html; charset=utf-8", FIXTURE_PAGES[self.path], etag=etag)
+            else:
+                self._send(404, "text/plain", "missing")
+        finally:
+            with site["lock"]:
+                site["in_flight"] -= 1
+
+    def _send(self, status, content_type, body, etag=""):
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if payload:
+            self.wfile.write(payload)
+
+
+class WebsiteImportTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _FixtureSiteHandler)
+        self.server.daemon_threads = True
+        self.server.site = {"lock": threading.Lock(), "requests": [], "in_flight": 0, "max_in_flight": 0}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def _requests(self, path=None):
+        return [row for row in self.server.site["requests"] if path is None or row[0] == path]
+
+    def test_single_pass_extraction(self):
+        page = extract_page(FIXTURE_PAGES["/"])
+
+        self.assertEqual(page["title"], "Acme Print")
+        self.assertEqual(page["entries"][0], ("h1", "Welcome to Acme"))
+        self.assertEqual(page["meta"]["description"], "Acme print shop")
+        self.assertEqual([link["href"] for link in page["menu_links"]][:3], ["/about", "/services", "/contact"])
+        self.assertNotIn("Footer links", " ".join(text for _, text in page["entries"]))
+
+    def test_crawler_honours_robots_origin_and_host_limit_over_reused_connections(self):
+        urls = [f"{self.base}{path}" for path in ("/about", "/services", "/contact", "/private/pricing")]
+        with WebsiteCrawler(self.base, concurrency=4, per_host=2, host_delay=0) as crawler:
+            results = crawler.fetch_many(urls + ["http://elsewhere.test/about"])
+
+        errors = {url: error.reason for url, _, error in results if error}
+        self.assertEqual(errors, {urls[3]: "robots_disallowed", "http://elsewhere.test/about": "off_site"})
+        self.assertIn("Our story", results[0][1]["html"])
+        self.assertEqual(self._requests("/private/pricing"), [])
+        self.assertEqual(len(self._requests("/robots.txt")), 1)
+        self.assertLessEqual(self.server.site["max_in_flight"], 2)
+        self.assertLessEqual(len({port for _, _, port in self._requests()}), 2)
+
+    def _login_import_admin(self):
+        org = Organization.objects.create(name="Import Org", company_key="IMPORT-ORG")
+        product, _ = Product.objects.get_or_create(slug="ai-chatbot", defaults={"name": "AI Chatbot"})
+        plan = Plan.objects.create(name="Chat Import", product=product, website_page_limit=5)
+        admin = get_user_model().objects.create_user(username="import@acme.test", email="import@acme.test", password="pw123456")
+        UserProfile.objects.create(user=admin, organization=org, role="company_admin")
+        Subscription.objects.create(user=admin, organization=org, plan=plan, status="active")
+        OrganizationProduct.objects.update_or_create(
+            organization=org, product=product, defaults={"subscription_status": "active", "source": "test"},
+        )
+        self.client.force_login(admin)
+        return org, admin
+
+    def test_import_runs_in_background_and_revalidates_on_reimport(self):
+        self._login_import_admin()
+        pages = [f"{self.base}/", f"{self.base}/about", f"{self.base}/services", f"{self.base}/contact"]
+
+        def run_import():
+            response = self.client.post(
+                "/api/ai-chatbot/media-library/website-import",
+                data=json.dumps({"source_url": f"{self.base}/", "selected_pages": pages}),
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 202)
+            job_id = response.json()["job"]["id"]
+            run_website_import_job(job_id)
+            return self.client.get(f"/api/ai-chatbot/media-library/website-import/{job_id}").json()["job"]
+
+        job = run_import()
+        self.assertEqual(job["status"], AiWebsiteImportJob.STATUS_COMPLETED)
+        self.assertEqual(job["total_pages"], 4)
+        item = AiMediaLibraryItem.objects.get(id=job["result"]["item"]["id"])
+        with item.file_path.open("rb") as handle:
+            document = zipfile.ZipFile(io.BytesIO(handle.read())).read("word/document.xml").decode("utf-8")
+        self.assertIn("Our story", document)
+        self.assertIn("Call us on 555 0100", document)
+        self.assertEqual(len(self._requests("/")), 1)
+
+        item.delete()
+        self.server.site["requests"].clear()
+        job = run_import()
+
+        self.assertEqual(job["status"], AiWebsiteImportJob.STATUS_COMPLETED)
+        revalidated = [row for row in self._requests() if row[0] in {"/about", "/services", "/contact"}]
+        self.assertEqual(len(revalidated), 3)
+        self.assertTrue(all(if_none_match for _, if_none_match, _ in revalidated))
+        self.assertEqual(
+            AiWebsiteImportJob.objects.get(id=job["id"]).item.name,
+            f"127.0.0.1:{self.server.server_address[1]}",
+        )
+
+    def test_stale_jobs_are_failed_instead_of_polled_forever(self):
+        org, admin = self._login_import_admin()
+        job = AiWebsiteImportJob.objects.create(
+            organization=org, created_by=admin, source_url=f"{self.base}/", status=AiWebsiteImportJob.STATUS_RUNNING,
+        )
+        fresh = self.client.get(f"/api/ai-chatbot/media-library/website-import/{job.id}").json()["job"]
+        self.assertEqual(fresh["status"], AiWebsiteImportJob.STATUS_RUNNING)
+
+        AiWebsiteImportJob.objects.filter(id=job.id).update(created_at=timezone.now() - timedelta(hours=1))
+        stale = self.client.get(f"/api/ai-chatbot/media-library/website-import/{job.id}").json()["job"]
+
+        self.assertEqual(stale["status"], AiWebsiteImportJob.STATUS_FAILED)
+        self.assertEqual(stale["result"]["error_code"], "IMPORT_TIMED_OUT")
+        self.assertIsNone(run_website_import_job(job.id))
+
+
+class KnowledgeIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.org = Organization.objects.create(name="Know Org", company_key="KNOW-ORG")
+        self.refund = AiFaq.objects.create(
+            organization=self.org, question="What is your refund policy?", answer="Refunds are issued within 14 days.",
+        )
+        AiFaq.objects.create(organization=self.org, question="Do you ship abroad?", answer="We ship to 30 countries.")
+        AiMediaLibraryItem.objects.create(
+            organization=self.org,
+            name="Opening hours",
+            type="extra_text",
+            text_content="Our showroom opens at 9am and closes at 6pm on weekdays. " * 40,
+        )
+
+    def test_search_ranks_passages_and_refreshes_only_changed_sources(self):
+        hits = knowledge_index.search_knowledge(self.org, "when does the showroom open", k=2)
+        self.assertEqual(hits[0]["kind"], "text")
+        self.assertEqual(len(hits), 2)
+        self.assertEqual(knowledge_index.search_knowledge(self.org, "refund")[0]["ref"], self.refund.id)
+        self.assertEqual(knowledge_index.search_knowledge(self.org, "zebra"), [])
+
+        self.refund.answer = "Refunds are issued within 30 days."
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.refund.save()
+        # Until the background refresh lands, queries keep the current index and never rebuild.
+        with mock.patch.object(knowledge_index, "refresh_knowledge_index") as refresh:
+            self.assertEqual(knowledge_index.search_knowledge(self.org, "refund")[0]["text"], "Refunds are issued within 14 days.")
+        refresh.assert_not_called()
+        with mock.patch.object(knowledge_index, "_start_refresh", knowledge_index.refresh_knowledge_index), \
+                mock.patch.object(knowledge_index, "tokenize", wraps=knowledge_index.tokenize) as tokenize:
+            for callback in callbacks:
+                callback()
+            hits = knowledge_index.search_knowledge(self.org, "refund")
+        # One call for the edited FAQ, one for the query; the other sources are reused.
+        self.assertEqual(tokenize.call_count, 2)
+        self.assertEqual(hits[0]["text"], "Refunds are issued within 30 days.")
+
+        with mock.patch.object(knowledge_index, "_start_refresh", knowledge_index.refresh_knowledge_index), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.refund.delete()
+        self.assertEqual(knowledge_index.search_knowledge(self.org, "refund"), [])
+
+    def test_other_workers_pick_up_the_stored_version(self):
+        knowledge_index.search_knowledge(self.org, "refund")
+        with self.assertNumQueries(1):
+            knowledge_index.search_knowledge(self.org, "refund")
+        # Refreshed by another worker: this process only sees the new version on the row.
+        AiFaq.objects.filter(id=self.refund.id).update(answer="Refunds take 7 days.")
+        knowledge_index.refresh_knowledge_index(self.org.id)
+        self.assertEqual(knowledge_index.search_knowledge(self.org, "refund")[0]["text"], "Refunds take 7 days.")
+
+    def test_widget_answers_exact_faq_hit_from_the_index(self):
+        product, _ = Product.objects.get_or_create(slug="ai-chatbot", defaults={"name": "AI Chatbot"})
+        plan = Plan.objects.create(name="Chat AI", product=product, features={"ai_enabled": True})
+        owner = get_user_model().objects.create_user(username="know@acme.test", email="know@acme.test", password="pw123456")
+        Subscription.objects.create(user=owner, organization=self.org, plan=plan, status="active")
+        ChatWidget.objects.create(organization=self.org, name="Site", widget_key="wk-know")
+
+        def ask(text):
+            return self.client.post(
+                "/api/ai-chatbot/widget/message",
+                data=json.dumps({
+                    "key": "wk-know", "visitor_id": "visitor-9", "category": "support", "text": text,
+                    "name": "Mia", "email": "mia@example.test", "phone": "9876543210",
+                }),
+                content_type="application/json",
+            ).json()["messages"]
+
+        messages = ask("what's your refund policy")
+        self.assertEqual(messages[-1]["text"], "Refunds are issued within 14 days.")
+        messages = ask("can I pay by card")
+        self.assertEqual(messages[-1]["text"], "Thanks for reaching out! We'll reply shortly.")
+
+        # Once an agent has the conversation, the visitor's message is left for them.
+        ChatConversation.objects.filter(visitor_id="visitor-9").update(status="in-progress", active_agent_id=owner.id)
+        messages = ask("what's your refund policy")
+        self.assertEqual(messages[-1]["sender_type"], "visitor")
+
+
+class AiUsageAccountingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        ai_usage._buffer.drain()
+        self.org = Organization.objects.create(name="Usage Org", company_key="USAGE-ORG")
+        self.period = ai_usage._period_yyyymm()
+        AiUsageMonthly.objects.create(
+            organization=self.org, period_yyyymm=self.period, ai_replies_used=5, tokens_total=500, request_count=5,
+        )
+        self.usage = {"prompt_tokens": 100, "completion_tokens": 20}
+
+    @mock.patch.object(ai_usage, "cache_is_shared", return_value=True)
+    def test_record_counts_live_without_queries_and_flush_upserts_totals(self, _shared):
+        self.assertEqual(ai_usage.get_ai_replies_used(self.org), 5)
+        with self.settings(AI_USAGE_FLUSH_SECONDS=3600), self.assertNumQueries(0):
+            for _ in range(3):
+                used = ai_usage.record_ai_usage(self.org, "gpt-4o-mini", self.usage)
+        self.assertEqual(used, 8)
+        self.assertEqual(AiUsageMonthly.objects.get(organization=self.org).ai_replies_used, 5)
+
+        self.assertEqual(ai_usage.flush_ai_usage(), 3)
+        monthly = AiUsageMonthly.objects.get(organization=self.org)
+        self.assertEqual((monthly.ai_replies_used, monthly.tokens_total, monthly.request_count), (8, 860, 8))
+        self.assertEqual(AiUsageEvent.objects.filter(organization=self.org).count(), 3)
+        self.assertEqual(ai_usage.flush_ai_usage(), 0)
+
+        # A cold cache reseeds from the stored totals plus anything still buffered.
+        with self.settings(AI_USAGE_FLUSH_SECONDS=3600):
+            ai_usage.record_ai_usage(self.org, "gpt-4o-mini", self.usage)
+        cache.clear()
+        self.assertEqual(ai_usage.get_ai_replies_used(self.org), 9)
+
+        other = Organization.objects.create(name="New Org", company_key="NEW-ORG")
+        with self.settings(AI_USAGE_FLUSH_SECONDS=3600):
+            self.assertEqual(ai_usage.record_ai_usage(other, "gpt-4o-mini", self.usage), 1)
+        ai_usage.flush_ai_usage()
+        self.assertEqual(AiUsageMonthly.objects.get(organization=other).ai_replies_used, 1)
+        self.assertEqual(AiUsageMonthly.objects.get(organization=self.org).ai_replies_used, 9)
+
+    def test_flush_keeps_events_buffered_when_the_write_fails(self):
+        with self.settings(AI_USAGE_FLUSH_SECONDS=3600):
+            ai_usage.record_ai_usage(self.org, "gpt-4o-mini", self.usage)
+        with mock.patch.object(ai_usage, "_upsert_monthly", side_effect=RuntimeError("db down")), \
+                self.assertLogs(ai_usage.logger.name, level="ERROR"):
+            self.assertEqual(ai_usage.flush_ai_usage(), 0)
+        self.assertEqual(AiUsageEvent.objects.filter(organization=self.org).count(), 0)
+        self.assertEqual(ai_usage.flush_ai_usage(), 1)
+        self.assertEqual(AiUsageMonthly.objects.get(organization=self.org).ai_replies_used, 6)
+
+    def test_limit_check_reads_the_live_counter(self):
+        limits = {"ai_enabled": True, "ai_replies_per_month": 6}
+        with mock.patch.object(ai_limits, "get_org_plan_limits", return_value=limits):
+            self.assertTrue(ai_limits.can_use_ai(self.org)["allowed"])
+            with self.settings(AI_USAGE_FLUSH_SECONDS=3600):
+                ai_usage.record_ai_usage(self.org, "gpt-4o-mini", self.usage)
+            result = ai_limits.can_use_ai(self.org)
+        self.assertEqual((result["allowed"], result["reason"], result["used"]), (False, "AI_LIMIT_REACHED", 6))
+
+    def test_limit_without_a_shared_cache_counts_other_workers_flushes(self):
+        limits = {"ai_enabled": True, "ai_replies_per_month": 7}
+        with mock.patch.object(ai_limits, "get_org_plan_limits", return_value=limits):
+            self.assertTrue(ai_limits.can_use_ai(self.org)["allowed"])
+            # Another worker flushed a reply; a per-process counter would never see it.
+            AiUsageMonthly.objects.filter(organization=self.org).update(ai_replies_used=6)
+            with self.settings(AI_USAGE_FLUSH_SECONDS=3600):
+                self.assertEqual(ai_usage.record_ai_usage(self.org, "gpt-4o-mini", self.usage), 7)
+            result = ai_limits.can_use_ai(self.org)
+        self.assertEqual((result["allowed"], result["used"]), (False, 7))
+
+
+class WidgetConfigSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.org = Organization.objects.create(name="Widget Org", company_key="WIDGET-ORG")
+        self.widget = ChatWidget.objects.create(
+            organization=self.org,
+            name="Site",
+            widget_key="wk-config",
+            allowed_domains="example.com",
+        )
+        self.url = "/api/ai-chatbot/widget/config?key=wk-config"
+
+    def _get(self, **extra):
+        return self.client.get(self.url, HTTP_ORIGIN="https://shop.example.com", **extra)
+
+    def test_warm_config_and_revalidation_skip_the_database(self):
+        first = self._get()
+        self.assertEqual(first.status_code, 200)
+        self.assertIn("max-age=", first["Cache-Control"])
+        etag = first["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            warm = self._get()
+            revalidated = self._get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(warm.status_code, 200)
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(len(queries), 0)
+
+    def test_saves_refresh_the_cached_config(self):
+        etag = self._get()["ETag"]
+        self.widget.name = "Renamed"
+        self.widget.save()
+        response = self._get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["name"], "Renamed")
+
+        OrganizationSettings.objects.update_or_create(
+            organization=self.org, defaults={"ai_chatbot_user_attachments_enabled": True}
+        )
+        self.assertTrue(self._get().json()["allow_visitor_attachments"])
+
+        self.assertEqual(self.client.get("/api/ai-chatbot/widget/config?key=wk-new").status_code, 404)
+        ChatWidget.objects.create(organization=self.org, name="New", widget_key="wk-new")
+        self.assertEqual(self.client.get("/api/ai-chatbot/widget/config?key=wk-new").status_code, 200)
+
+    def test_per_process_cache_expires_snapshots_quickly(self):
+        self.assertEqual(widget_config._snapshot_ttl_seconds(), 30)
+        with mock.patch.object(widget_config, "cache_is_shared", return_value=True):
+            self.assertEqual(widget_config._snapshot_ttl_seconds(), 3600)
+
+        with self.settings(AI_CHATBOT_WIDGET_CONFIG_LOCAL_CACHE_SECONDS=0):
+            self.assertEqual(self._get().status_code, 200)
+            # Deactivated through another worker: no version bump reaches this one.
+            ChatWidget.objects.filter(id=self.widget.id).update(is_active=False)
+            self.assertEqual(self._get().status_code, 404)
+
+    def test_origin_outside_allowed_domains_is_rejected(self):
+        response = self.client.get(self.url, HTTP_ORIGIN="https://example.com.evil.test")
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()["detail"], "domain_not_allowed")
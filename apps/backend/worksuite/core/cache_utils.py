@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+_PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def cache_is_shared(alias="default"):
+    """False for per-process cache backends, where a key set in one worker is invisible to the others."""
+    return not isinstance(caches[alias], _PROCESS_LOCAL_BACKENDS)
+
+
+def local_snapshot_max_age(setting_name, default=30):
+    """
+    Lifetime of a per-process snapshot keyed by a cache version token. None with a
+    shared cache, where version bumps reach every worker. Otherwise the bump only
+    reaches the saving worker, so snapshots expire after `setting_name` seconds.
+    """
+    if cache_is_shared():
+        return None
+    return float(getattr(settings, setting_name, default))
@@ -1,16 +1,33 @@
 from django.conf import settings
 from django.apps import apps
-from django.core.mail import EmailMessage, get_connection, send_mail
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
 from django.template.loader import render_to_string
-from django.db.utils import OperationalError, ProgrammingError
+from django.db import transaction
+from django.db.models import Q
+from django.db.utils import DatabaseError, OperationalError, ProgrammingError
+from django.utils import timezone
 import logging
 import os
+import smtplib
+import threading
+from datetime import timedelta
 from email.utils import formataddr
 import boto3
 
+from core.cache_utils import cache_is_shared
+from core.models import EmailOutbox
+
 
 logger = logging.getLogger(__name__)
 
+# Rows stuck in "sending" this long (worker died mid-batch) are picked up again.
+OUTBOX_STALE_SENDING_MINUTES = 15
+OUTBOX_MAX_RETRY_DELAY_SECONDS = 6 * 3600
+OUTBOX_KICK_KEY = "email_outbox:kick"
+OUTBOX_PENDING_KEY = "email_outbox:pending"
+OUTBOX_PURGE_BATCH_SIZE = 1000
+
 
 def _get_active_ses_mail_configs():
     """
@@ -185,18 +202,19 @@ def _get_env_mail_config():
     return None
 
 
-def _send_via_smtp(config, subject, body, recipients):
-    connection = get_connection(
-        backend="django.core.mail.backends.smtp.EmailBackend",
-        host=config["host"],
-        port=config["port"],
-        username=config["username"],
-        password=config["password"],
-        use_tls=config["use_tls"],
-        use_ssl=config["use_ssl"],
-        timeout=config["timeout"],
-        fail_silently=False,
-    )
+def _send_via_smtp(config, subject, body, recipients, connection=None):
+    if connection is None:
+        connection = get_connection(
+            backend="django.core.mail.backends.smtp.EmailBackend",
+            host=config["host"],
+            port=config["port"],
+            username=config["username"],
+            password=config["password"],
+            use_tls=config["use_tls"],
+            use_ssl=config["use_ssl"],
+            timeout=config["timeout"],
+            fail_silently=False,
+        )
     message = EmailMessage(
         subject=subject,
         body=body,
@@ -209,13 +227,17 @@ def _send_via_smtp(config, subject, body, recipients):
     return bool(sent_count)
 
 
-def _send_via_ses_api(config, subject, body, recipients):
-    client = boto3.client(
+def _ses_client(config):
+    return boto3.client(
         "ses",
         region_name=config["region"],
         aws_access_key_id=config["access_key_id"],
         aws_secret_access_key=config["secret_access_key"],
     )
+
+
+def _send_via_ses_api(config, subject, body, recipients, client=None):
+    client = client or _ses_client(config)
     result = client.send_email(
         Source=config["source_email"],
         Destination={"ToAddresses": recipients},
@@ -228,29 +250,86 @@ def _send_via_ses_api(config, subject, body, recipients):
     return bool(result.get("MessageId"))
 
 
-def send_templated_email(to_email, subject, template_name, context):
-    if not to_email:
-        return False
-    recipients = to_email if isinstance(to_email, (list, tuple)) else [to_email]
-    recipients = [item for item in recipients if item]
-    if not recipients:
-        return False
-    body = render_to_string(template_name, context).strip()
-    from_email = getattr(settings, "DEFAULT_FROM_EMAIL", "no-reply@workzilla")
+def _get_mail_attempts():
+    """Mail configs in failover order: SaaS admin SES, environment, then Django's EMAIL_BACKEND."""
     mail_attempts = []
     for cfg in _get_active_ses_mail_configs():
         mail_attempts.append((cfg.get("attempt_source", "ses_db"), cfg))
     env_cfg = _get_env_mail_config()
     if env_cfg:
         mail_attempts.append(("env_auto", env_cfg))
-    for source, mail_config in mail_attempts:
-        if not mail_config:
-            continue
+    mail_attempts.append((
+        "django_backend",
+        {
+            "transport": "django",
+            "from_email": getattr(settings, "DEFAULT_FROM_EMAIL", "no-reply@workzilla"),
+            "reply_to": [],
+        },
+    ))
+    return mail_attempts
+
+
+def _is_message_error(exc):
+    """Errors about the message itself; the transport stays usable for the rest of the batch."""
+    if isinstance(exc, (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError)):
+        return True
+    response = getattr(exc, "response", None)
+    if isinstance(response, dict):
+        return (response.get("Error") or {}).get("Code") in {"MessageRejected", "InvalidParameterValue"}
+    return False
+
+
+class _MailTransport:
+    """A mail config whose SMTP connection or SES client is opened once and reused for a batch."""
+
+    def __init__(self, source, config):
+        self.source = source
+        self.config = config
+        self.connection = None
+        self.client = None
+        self.down = False
+
+    def send(self, recipients, subject, body):
+        if self.config.get("transport") == "ses_api":
+            if self.client is None:
+                self.client = _ses_client(self.config)
+            return _send_via_ses_api(self.config, subject, body, recipients, client=self.client)
+        if self.connection is None:
+            if self.config.get("transport") == "smtp":
+                connection = get_connection(
+                    backend="django.core.mail.backends.smtp.EmailBackend",
+                    host=self.config["host"],
+                    port=self.config["port"],
+                    username=self.config["username"],
+                    password=self.config["password"],
+                    use_tls=self.config["use_tls"],
+                    use_ssl=self.config["use_ssl"],
+                    timeout=self.config["timeout"],
+                    fail_silently=False,
+                )
+            else:
+                connection = get_connection(fail_silently=False)
+            connection.open()
+            self.connection = connection
+        return _send_via_smtp(self.config, subject, body, recipients, connection=self.connection)
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+        self.connection = None
+        self.client = None
+
+
+def _send_now(recipients, subject, body):
+    """Deliver one message in the calling thread, trying each mail config in turn."""
+    for source, mail_config in _get_mail_attempts():
+        transport = _MailTransport(source, mail_config)
         try:
-            if mail_config.get("transport") == "smtp":
-                return _send_via_smtp(mail_config, subject, body, recipients)
-            if mail_config.get("transport") == "ses_api":
-                return _send_via_ses_api(mail_config, subject, body, recipients)
+            if transport.send(recipients, subject, body):
+                return True
         except Exception:
             logger.exception(
                 "Email send failed via %s: subject=%s recipients=%s transport=%s",
@@ -259,21 +338,190 @@ def send_templated_email(to_email, subject, template_name, context):
                 recipients,
                 mail_config.get("transport", ""),
             )
+        finally:
+            transport.close()
+    return False
 
-    try:
-        sent_count = send_mail(
-            subject,
-            body,
-            from_email,
-            recipients,
-            fail_silently=False,
+
+def _outbox_batch_size():
+    return int(getattr(settings, "EMAIL_OUTBOX_BATCH_SIZE", 100))
+
+
+def _outbox_max_attempts():
+    return int(getattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 6))
+
+
+def _outbox_retry_base_seconds():
+    return int(getattr(settings, "EMAIL_OUTBOX_RETRY_BASE_SECONDS", 60))
+
+
+def _outbox_kick_lease_seconds():
+    return int(getattr(settings, "EMAIL_OUTBOX_KICK_LEASE_SECONDS", 300))
+
+
+def _outbox_retention_days():
+    return int(getattr(settings, "EMAIL_OUTBOX_RETENTION_DAYS", 30))
+
+
+def _run_in_background(task, *args):
+    broker_url = getattr(settings, "CELERY_BROKER_URL", "") or ""
+    if broker_url.startswith("memory://"):
+        threading.Thread(target=task, args=args, daemon=True).start()
+        return
+    task.delay(*args)
+
+
+def _kick_outbox_delivery():
+    from core.tasks import deliver_email_outbox_task
+
+    if not cache_is_shared():
+        # A per-process lease would never be released by a worker in another process,
+        # so kick every time; SKIP LOCKED claims keep overlapping runs from double-sending.
+        _run_in_background(deliver_email_outbox_task)
+        return
+    # One delivery run drains everything due, so a burst of enqueues needs only one kick.
+    # The pending flag makes a run that is already going look again before it stops.
+    cache.set(OUTBOX_PENDING_KEY, 1, _outbox_kick_lease_seconds())
+    if not cache.add(OUTBOX_KICK_KEY, 1, _outbox_kick_lease_seconds()):
+        return
+    _run_in_background(deliver_email_outbox_task, True)
+
+
+def deliver_kicked_outbox():
+    """
+    Delivery run started by a kick. It repeats while enqueues arrived during the
+    previous pass, and releases the kick before its last check, so a row committed
+    at any point either is seen here or starts a new run.
+    """
+    sent = retried = failed = 0
+    while True:
+        cache.delete(OUTBOX_PENDING_KEY)
+        try:
+            batch_sent, batch_retried, batch_failed = deliver_email_outbox()
+        finally:
+            cache.delete(OUTBOX_KICK_KEY)
+        sent += batch_sent
+        retried += batch_retried
+        failed += batch_failed
+        if not cache.get(OUTBOX_PENDING_KEY) or not cache.add(OUTBOX_KICK_KEY, 1, _outbox_kick_lease_seconds()):
+            return sent, retried, failed
+
+
+def enqueue_email(recipients, subject, body, template_name=""):
+    """Store a rendered email in the outbox; it is delivered after the surrounding transaction commits."""
+    with transaction.atomic():
+        row = EmailOutbox.objects.create(
+            recipients=list(recipients),
+            subject=str(subject or "")[:255],
+            body=body,
+            template_name=str(template_name or "")[:180],
         )
-        return bool(sent_count)
-    except Exception:
-        logger.exception(
-            "Email send failed via django backend: subject=%s recipients=%s backend=%s",
-            subject,
-            recipients,
-            getattr(settings, "EMAIL_BACKEND", ""),
+    transaction.on_commit(_kick_outbox_delivery)
+    return row
+
+
+def _claim_outbox_batch(limit):
+    now = timezone.now()
+    stale_before = now - timedelta(minutes=OUTBOX_STALE_SENDING_MINUTES)
+    with transaction.atomic():
+        ids = list(
+            EmailOutbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(status=EmailOutbox.STATUS_QUEUED, next_attempt_at__lte=now)
+                | Q(status=EmailOutbox.STATUS_SENDING, updated_at__lt=stale_before)
+            )
+            .order_by("next_attempt_at", "id")
+            .values_list("id", flat=True)[:limit]
         )
+        if ids:
+            EmailOutbox.objects.filter(id__in=ids).update(status=EmailOutbox.STATUS_SENDING, updated_at=now)
+    return list(EmailOutbox.objects.filter(id__in=ids).order_by("id")) if ids else []
+
+
+def _deliver_outbox_row(row, transports):
+    errors = []
+    for transport in transports:
+        if transport.down:
+            continue
+        try:
+            if transport.send(row.recipients, row.subject, row.body):
+                return transport.source, ""
+            errors.append(f"{transport.source}: not accepted")
+        except Exception as exc:
+            errors.append(f"{transport.source}: {exc.__class__.__name__}: {exc}")
+            if not _is_message_error(exc):
+                # Connection/auth level failure: skip this config for the rest of the batch.
+                transport.down = True
+                transport.close()
+    return "", "; ".join(errors) or "no mail transport configured"
+
+
+def deliver_email_outbox(max_batches=None):
+    """Deliver due outbox rows in batches over reused connections; returns (sent, retried, failed)."""
+    sent = retried = failed = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        rows = _claim_outbox_batch(_outbox_batch_size())
+        if not rows:
+            break
+        batches += 1
+        transports = [_MailTransport(source, config) for source, config in _get_mail_attempts()]
+        try:
+            for row in rows:
+                source, error = _deliver_outbox_row(row, transports)
+                now = timezone.now()
+                row.attempts += 1
+                if source:
+                    row.status = EmailOutbox.STATUS_SENT
+                    row.sent_via = source[:80]
+                    row.sent_at = now
+                    row.last_error = ""
+                    sent += 1
+                elif row.attempts >= _outbox_max_attempts():
+                    row.status = EmailOutbox.STATUS_FAILED
+                    row.last_error = error
+                    failed += 1
+                    logger.error("Email outbox #%s failed after %s attempts: %s", row.id, row.attempts, error)
+                else:
+                    delay = min(_outbox_retry_base_seconds() * 2 ** (row.attempts - 1), OUTBOX_MAX_RETRY_DELAY_SECONDS)
+                    row.status = EmailOutbox.STATUS_QUEUED
+                    row.next_attempt_at = now + timedelta(seconds=delay)
+                    row.last_error = error
+                    retried += 1
+                row.save(update_fields=["status", "attempts", "next_attempt_at", "last_error", "sent_via", "sent_at", "updated_at"])
+        finally:
+            for transport in transports:
+                transport.close()
+    return sent, retried, failed
+
+
+def purge_email_outbox(max_batches=None):
+    """Delete sent rows older than EMAIL_OUTBOX_RETENTION_DAYS in id batches; failed rows are kept."""
+    cutoff = timezone.now() - timedelta(days=_outbox_retention_days())
+    expired = EmailOutbox.objects.filter(status=EmailOutbox.STATUS_SENT, sent_at__lt=cutoff)
+    deleted = batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = list(expired.order_by("id").values_list("id", flat=True)[:OUTBOX_PURGE_BATCH_SIZE])
+        if not ids:
+            break
+        batches += 1
+        deleted += EmailOutbox.objects.filter(id__in=ids).delete()[0]
+    return deleted
+
+
+def send_templated_email(to_email, subject, template_name, context):
+    if not to_email:
         return False
+    recipients = to_email if isinstance(to_email, (list, tuple)) else [to_email]
+    recipients = [item for item in recipients if item]
+    if not recipients:
+        return False
+    body = render_to_string(template_name, context).strip()
+    if getattr(settings, "EMAIL_OUTBOX_ENABLED", True):
+        try:
+            enqueue_email(recipients, subject, body, template_name)
+            return True
+        except DatabaseError:
+            logger.exception("Email outbox unavailable; sending inline: subject=%s recipients=%s", subject, recipients)
+    return _send_now(recipients, subject, body)
@@ -0,0 +1,56 @@
+"""
+Timed flushing for per-process write-behind buffers.
+
+A buffer that batches writes in memory registers a PeriodicFlusher and calls
+ensure_started() whenever it takes a write. A daemon thread then flushes it
+every interval, so buffered rows reach the database a few seconds after traffic
+stops instead of waiting for the next write or for process exit. A forked worker
+starts its own thread. BUFFER_FLUSH_THREAD_ENABLED=False turns the threads off
+(the test run does); callers then flush explicitly.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+logger = logging.getLogger(__name__)
+
+MIN_INTERVAL_SECONDS = 0.5
+
+
+class PeriodicFlusher:
+    def __init__(self, name, flush, interval):
+        self.name = name
+        self.flush = flush
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.pid = None
+
+    @property
+    def running(self):
+        return self.pid == os.getpid()
+
+    def ensure_started(self):
+        if self.running or not getattr(settings, "BUFFER_FLUSH_THREAD_ENABLED", True):
+            return
+        with self.lock:
+            if self.running:
+                return
+            self.pid = os.getpid()
+            threading.Thread(target=self._run, name=self.name, daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(max(float(self.interval()), MIN_INTERVAL_SECONDS))
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Periodic flush failed name=%s", self.name)
+            finally:
+                close_old_connections()
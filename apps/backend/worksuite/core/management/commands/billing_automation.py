@@ -1,10 +1,18 @@
-from django.core.management.base import BaseCommand
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Q
 from django.utils import timezone
 
 from core.email_utils import send_templated_email
-from core.models import EmailNotificationLog, Subscription
+from core.models import BillingScanCheckpoint, EmailNotificationLog, Subscription
 from core.subscription_utils import (
-    get_effective_end_date,
     is_subscription_active,
     maybe_expire_subscription,
     normalize_subscription_end_date,
@@ -12,246 +20,312 @@ from core.subscription_utils import (
 from core.observability import log_event
 
 
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = "billing_automation"
+REMINDER_DAYS = (30, 14, 7, 3, 1)
+EXPIRED_NOTICE_DAYS = (0, 1, 7)
+
+
+def _resolve_recipient(org, sub):
+    owner = org.owner if org else None
+    if owner and owner.email:
+        return owner.email, (owner.first_name or owner.username or "User"), owner
+    if sub and sub.user and sub.user.email:
+        return sub.user.email, (sub.user.first_name or sub.user.username or "User"), sub.user
+    return "", "User", None
+
+
+def _renew_url():
+    # Keep as relative URL; frontend can resolve on same domain.
+    return "/my-account/billing/renew/"
+
+
+def _product_label(sub):
+    product = getattr(getattr(sub, "plan", None), "product", None)
+    return str(getattr(product, "name", "") or getattr(product, "slug", "") or "Work Zilla").strip() or "Work Zilla"
+
+
+def _event_priority(item):
+    kind = item.get("kind")
+    days = int(item.get("days") or 0)
+    if kind == "expired" and days == 0:
+        return 0
+    if kind == "expired" and days == 1:
+        return 1
+    if kind == "expired" and days == 7:
+        return 2
+    if kind == "expires_today":
+        return 3
+    if kind == "expiring":
+        # Smaller days_left is higher priority.
+        return 10 + max(days, 0)
+    return 99
+
+
+def _digest_item(sub, kind, days, end_date_value, status):
+    return {
+        "kind": kind,
+        "days": days,
+        "product": _product_label(sub),
+        "plan_name": sub.plan.name if sub.plan else "-",
+        "billing_cycle": sub.billing_cycle or "monthly",
+        "end_date": end_date_value.isoformat(),
+        "status": status,
+    }
+
+
+def _on_days(days):
+    # Subscriptions whose effective end falls on one of `days` (dates of the UTC timestamp).
+    window = Q(pk__in=[])
+    for day in days:
+        start = datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+        window |= Q(effective_end_at__gte=start, effective_end_at__lt=start + timedelta(days=1))
+    return window
+
+
+def due_subscriptions_filter(today, now, send_reminders=True):
+    """Subscriptions with a lifecycle event today; every branch is a range over (status, effective_end_at)."""
+    live = ("active", "trialing")
+    due = Q(status__in=live, effective_end_at__lt=now) | Q(status="trialing", effective_end_at__isnull=True)
+    if send_reminders:
+        due |= Q(status__in=live) & _on_days(today + timedelta(days=days) for days in (0, *REMINDER_DAYS))
+        due |= Q(status="expired") & _on_days(today - timedelta(days=days) for days in EXPIRED_NOTICE_DAYS)
+    return due
+
+
 class Command(BaseCommand):
     help = "Expire subscriptions and send renewal reminders."
 
     def add_arguments(self, parser):
         parser.add_argument("--dry-run", action="store_true", help="Print actions without saving.")
         parser.add_argument("--no-reminders", action="store_true", help="Skip renewal reminder emails.")
+        parser.add_argument("--workers", type=int, default=None, help="Parallel org chunks (default BILLING_AUTOMATION_WORKERS).")
+        parser.add_argument("--chunk-size", type=int, default=None, help="Orgs per chunk (default BILLING_AUTOMATION_CHUNK_SIZE).")
 
     def handle(self, *args, **options):
-        now = timezone.now()
-        today = timezone.localdate()
-        dry_run = options["dry_run"]
-        send_reminders = not options["no_reminders"]
+        self.now = timezone.now()
+        self.today = timezone.localdate()
+        self.dry_run = options["dry_run"]
+        self.send_reminders = not options["no_reminders"]
+        workers = max(1, options["workers"] or int(getattr(settings, "BILLING_AUTOMATION_WORKERS", 4)))
+        chunk_size = max(1, options["chunk_size"] or int(getattr(settings, "BILLING_AUTOMATION_CHUNK_SIZE", 100)))
 
-        expired_count = 0
-        reminder_count = 0
-        org_digest_count = 0
-
-        subs = (
+        self.due = due_subscriptions_filter(self.today, self.now, send_reminders=self.send_reminders)
+        checkpoint, _ = BillingScanCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+        if checkpoint.run_date != self.today:
+            checkpoint.run_date = self.today
+            checkpoint.last_org_id = 0
+            checkpoint.orgs_processed = 0
+        # A rerun on the same day resumes after the orgs an earlier run finished.
+        org_ids = list(
             Subscription.objects
-            .filter(status__in=("active", "trialing", "expired"))
-            .select_related("organization", "organization__owner", "user", "plan", "plan__product")
-            .order_by("organization_id", "-end_date", "-id")
+            .filter(self.due, organization_id__gt=checkpoint.last_org_id)
+            .order_by("organization_id")
+            .values_list("organization_id", flat=True)
+            .distinct()
         )
+        chunks = [org_ids[start:start + chunk_size] for start in range(0, len(org_ids), chunk_size)]
 
-        def _resolve_recipient(org, sub):
-            owner = org.owner if org else None
-            if owner and owner.email:
-                return owner.email, (owner.first_name or owner.username or "User"), owner
-            if sub and sub.user and sub.user.email:
-                return sub.user.email, (sub.user.first_name or sub.user.username or "User"), sub.user
-            return "", "User", None
-
-        def _renew_url():
-            # Keep as relative URL; frontend can resolve on same domain.
-            return "/my-account/billing/renew/"
-
-        def _product_label(sub):
-            product = getattr(getattr(sub, "plan", None), "product", None)
-            return str(getattr(product, "name", "") or getattr(product, "slug", "") or "Work Zilla").strip() or "Work Zilla"
-
-        def _event_priority(item):
-            kind = item.get("kind")
-            days = int(item.get("days") or 0)
-            if kind == "expired" and days == 0:
-                return 0
-            if kind == "expired" and days == 1:
-                return 1
-            if kind == "expired" and days == 7:
-                return 2
-            if kind == "expires_today":
-                return 3
-            if kind == "expiring":
-                # Smaller days_left is higher priority.
-                return 10 + max(days, 0)
-            return 99
-
-        by_org = {}
-        for sub in subs:
-            org = sub.organization
-            if not org:
-                continue
-            by_org.setdefault(org.id, {"org": org, "subs": []})["subs"].append(sub)
-
-        for org_id, bundle in by_org.items():
-            org = bundle["org"]
-            org_subs = bundle["subs"]
-
-            digest_items = []
-            for sub in org_subs:
-                normalize_subscription_end_date(sub, now=now)
-                effective_end = get_effective_end_date(sub, now=now) or sub.end_date
-                end_date_value = effective_end.date() if effective_end else None
-
-                if sub.status in ("active", "trialing"):
-                    if not is_subscription_active(sub, now=now):
-                        if not dry_run:
-                            maybe_expire_subscription(sub, now=now)
-                            log_event(
-                                "subscription_expired",
-                                status="expired",
-                                org=sub.organization,
-                                user=sub.user,
-                                product_slug=getattr(getattr(sub.plan, "product", None), "slug", ""),
-                                meta={
-                                    "subscription_id": sub.id,
-                                    "plan_id": sub.plan_id,
-                                    "billing_cycle": sub.billing_cycle,
-                                    "end_date": sub.end_date.isoformat() if sub.end_date else None,
-                                },
-                            )
-                        expired_count += 1
-                        end_date_value = sub.end_date.date() if sub.end_date else end_date_value
-                        if send_reminders and end_date_value:
-                            digest_items.append(
-                                {
-                                    "kind": "expired",
-                                    "days": 0,
-                                    "product": _product_label(sub),
-                                    "plan_name": sub.plan.name if sub.plan else "-",
-                                    "billing_cycle": sub.billing_cycle or "monthly",
-                                    "end_date": end_date_value.isoformat(),
-                                    "status": "Expired",
-                                }
-                            )
-                        continue
-
-                    if not send_reminders or not end_date_value:
-                        continue
-                    days_left = (end_date_value - today).days
-                    if days_left == 0:
-                        digest_items.append(
-                            {
-                                "kind": "expires_today",
-                                "days": 0,
-                                "product": _product_label(sub),
-                                "plan_name": sub.plan.name if sub.plan else "-",
-                                "billing_cycle": sub.billing_cycle or "monthly",
-                                "end_date": end_date_value.isoformat(),
-                                "status": "Active",
-                            }
-                        )
-                        continue
-                    if days_left in {30, 14, 7, 3, 1}:
-                        digest_items.append(
-                            {
-                                "kind": "expiring",
-                                "days": days_left,
-                                "product": _product_label(sub),
-                                "plan_name": sub.plan.name if sub.plan else "-",
-                                "billing_cycle": sub.billing_cycle or "monthly",
-                                "end_date": end_date_value.isoformat(),
-                                "status": "Active",
-                            }
-                        )
+        totals = Counter()
+        finished = [False] * len(chunks)
+        next_chunk = 0
+        failures = 0
+        executor = None
+        if workers > 1 and len(chunks) > 1:
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="billing-automation")
+            futures = {executor.submit(self._run_chunk, chunk): index for index, chunk in enumerate(chunks)}
+            outcomes = ((futures[future], future) for future in as_completed(futures))
+        else:
+            outcomes = ((index, self._run_chunk_inline(chunk)) for index, chunk in enumerate(chunks))
+        try:
+            for index, future in outcomes:
+                error = future.exception()
+                if error is not None:
+                    failures += 1
+                    logger.error("billing_automation chunk %s failed", index, exc_info=error)
                     continue
+                totals.update(future.result())
+                finished[index] = True
+                # Advance the checkpoint over the contiguous run of finished chunks only.
+                while next_chunk < len(chunks) and finished[next_chunk]:
+                    checkpoint.last_org_id = chunks[next_chunk][-1]
+                    checkpoint.orgs_processed += len(chunks[next_chunk])
+                    next_chunk += 1
+                    if not self.dry_run:
+                        checkpoint.save()
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        if not self.dry_run and not chunks:
+            checkpoint.save()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Expired: {totals['expired']}, reminders: {totals['reminders']}, digests: {totals['digests']}, "
+                f"dry_run={self.dry_run}, orgs: {len(org_ids)}"
+            )
+        )
+        if failures:
+            raise CommandError(f"{failures} org chunk(s) failed; rerun to resume after the last finished chunk.")
+
+    def _run_chunk_inline(self, org_ids):
+        future = Future()
+        try:
+            future.set_result(self._run_chunk(org_ids))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+    def _run_chunk(self, org_ids):
+        try:
+            subs = (
+                Subscription.objects
+                .filter(self.due, organization_id__in=org_ids)
+                .select_related("organization", "organization__owner", "user", "plan", "plan__product")
+                .order_by("organization_id", "-end_date", "-id")
+            )
+            by_org = {}
+            for sub in subs:
+                by_org.setdefault(sub.organization_id, []).append(sub)
+            counts = Counter()
+            for org_subs in by_org.values():
+                counts.update(self._process_org(org_subs[0].organization, org_subs))
+            return counts
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connections.close_all()
 
-                if sub.status == "expired":
-                    if not send_reminders or not end_date_value:
-                        continue
-                    days_since = (today - end_date_value).days
-                    if days_since in {0, 1, 7}:
-                        digest_items.append(
-                            {
-                                "kind": "expired",
-                                "days": days_since,
-                                "product": _product_label(sub),
-                                "plan_name": sub.plan.name if sub.plan else "-",
-                                "billing_cycle": sub.billing_cycle or "monthly",
-                                "end_date": end_date_value.isoformat(),
-                                "status": "Expired",
-                            }
+    def _process_org(self, org, org_subs):
+        now, today, dry_run, send_reminders = self.now, self.today, self.dry_run, self.send_reminders
+        counts = Counter()
+        digest_items = []
+        for sub in org_subs:
+            normalize_subscription_end_date(sub, now=now)
+            effective_end = sub.effective_end_at or sub.end_date
+            end_date_value = effective_end.date() if effective_end else None
+
+            if sub.status in ("active", "trialing"):
+                if not is_subscription_active(sub, now=now):
+                    if not dry_run:
+                        maybe_expire_subscription(sub, now=now)
+                        log_event(
+                            "subscription_expired",
+                            status="expired",
+                            org=sub.organization,
+                            user=sub.user,
+                            product_slug=getattr(getattr(sub.plan, "product", None), "slug", ""),
+                            meta={
+                                "subscription_id": sub.id,
+                                "plan_id": sub.plan_id,
+                                "billing_cycle": sub.billing_cycle,
+                                "end_date": sub.end_date.isoformat() if sub.end_date else None,
+                            },
                         )
+                    counts["expired"] += 1
+                    end_date_value = sub.end_date.date() if sub.end_date else end_date_value
+                    if send_reminders and end_date_value:
+                        digest_items.append(_digest_item(sub, "expired", 0, end_date_value, "Expired"))
+                    continue
 
-            if not send_reminders or not digest_items:
+                if not send_reminders or not end_date_value:
+                    continue
+                days_left = (end_date_value - today).days
+                if days_left == 0:
+                    digest_items.append(_digest_item(sub, "expires_today", 0, end_date_value, "Active"))
+                elif days_left in REMINDER_DAYS:
+                    digest_items.append(_digest_item(sub, "expiring", days_left, end_date_value, "Active"))
                 continue
 
-            already_sent = EmailNotificationLog.objects.filter(
-                organization=org,
-                category="subscription",
-                scheduled_for=today,
-                status="sent",
-            ).exists()
-            if already_sent:
-                continue
+            if sub.status == "expired":
+                if not send_reminders or not end_date_value:
+                    continue
+                days_since = (today - end_date_value).days
+                if days_since in EXPIRED_NOTICE_DAYS:
+                    digest_items.append(_digest_item(sub, "expired", days_since, end_date_value, "Expired"))
 
-            digest_items.sort(key=_event_priority)
-            top_item = digest_items[0]
-            if top_item.get("kind") == "expired":
-                subject = "Subscription Expired - Action Required" if int(top_item.get("days") or 0) == 0 else "Subscription Renewal Pending"
-                template_name = "emails/subscription_expired.txt"
-            elif top_item.get("kind") == "expires_today":
-                subject = "Subscription Expires Today"
-                template_name = "emails/subscription_expiring.txt"
-            else:
-                subject = "Subscription Expiring Soon"
-                template_name = "emails/subscription_expiring.txt"
+        if not send_reminders or not digest_items:
+            return counts
 
-            recipient, recipient_name, recipient_user = _resolve_recipient(org, org_subs[0] if org_subs else None)
-            if not recipient:
-                continue
+        already_sent = EmailNotificationLog.objects.filter(
+            organization=org,
+            category="subscription",
+            scheduled_for=today,
+            status="sent",
+        ).exists()
+        if already_sent:
+            return counts
 
-            log_row, created = EmailNotificationLog.objects.get_or_create(
-                organization=org,
-                category="subscription",
-                event_key="subscription_digest",
-                scheduled_for=today,
-                defaults={
-                    "to_email": recipient,
-                    "status": "queued",
-                    "subject": subject,
-                    "template_name": template_name,
-                    "user": recipient_user,
-                    "subscription": org_subs[0] if org_subs else None,
-                    "meta": {"items": digest_items},
-                },
-            )
-            if not created and log_row.status == "sent":
-                continue
+        digest_items.sort(key=_event_priority)
+        top_item = digest_items[0]
+        if top_item.get("kind") == "expired":
+            subject = "Subscription Expired - Action Required" if int(top_item.get("days") or 0) == 0 else "Subscription Renewal Pending"
+            template_name = "emails/subscription_expired.txt"
+        elif top_item.get("kind") == "expires_today":
+            subject = "Subscription Expires Today"
+            template_name = "emails/subscription_expiring.txt"
+        else:
+            subject = "Subscription Expiring Soon"
+            template_name = "emails/subscription_expiring.txt"
 
-            if not dry_run:
-                try:
-                    # Use existing templates, but pass extra fields so template can evolve.
-                    sent_ok = send_templated_email(
-                        recipient,
-                        subject,
-                        template_name,
-                        {
-                            "name": recipient_name or "User",
-                            "plan_name": top_item.get("plan_name") or "-",
-                            "billing_cycle": top_item.get("billing_cycle") or "monthly",
-                            "end_date": top_item.get("end_date") or "-",
-                            "days_left": int(top_item.get("days") or 0),
-                            "renew_url": _renew_url(),
-                            "items": digest_items,
-                            "org_name": org.name if getattr(org, "name", "") else "Organization",
-                        },
-                    )
-                    log_row.to_email = recipient
-                    log_row.subject = subject
-                    log_row.template_name = template_name
-                    log_row.user = recipient_user
-                    log_row.meta = {"items": digest_items}
-                    if sent_ok:
-                        log_row.status = "sent"
-                        log_row.sent_at = now
-                        org_digest_count += 1
-                        reminder_count += 1
-                    else:
-                        log_row.status = "failed"
-                        log_row.error_message = "send_failed"
-                    log_row.save(update_fields=["to_email", "subject", "template_name", "user", "meta", "status", "sent_at", "error_message"])
-                except Exception as exc:
-                    log_row.status = "failed"
-                    log_row.error_message = str(exc)[:8000]
-                    log_row.save(update_fields=["status", "error_message"])
-            else:
-                reminder_count += 1
+        recipient, recipient_name, recipient_user = _resolve_recipient(org, org_subs[0])
+        if not recipient:
+            return counts
 
-        self.stdout.write(
-            self.style.SUCCESS(
-                f"Expired: {expired_count}, reminders: {reminder_count}, digests: {org_digest_count}, dry_run={dry_run}"
-            )
+        log_row, created = EmailNotificationLog.objects.get_or_create(
+            organization=org,
+            category="subscription",
+            event_key="subscription_digest",
+            scheduled_for=today,
+            defaults={
+                "to_email": recipient,
+                "status": "queued",
+                "subject": subject,
+                "template_name": template_name,
+                "user": recipient_user,
+                "subscription": org_subs[0],
+                "meta": {"items": digest_items},
+            },
         )
+        if not created and log_row.status == "sent":
+            return counts
+
+        if dry_run:
+            counts["reminders"] += 1
+            return counts
+        try:
+            # Use existing templates, but pass extra fields so template can evolve.
+            sent_ok = send_templated_email(
+                recipient,
+                subject,
+                template_name,
+                {
+                    "name": recipient_name or "User",
+                    "plan_name": top_item.get("plan_name") or "-",
+                    "billing_cycle": top_item.get("billing_cycle") or "monthly",
+                    "end_date": top_item.get("end_date") or "-",
+                    "days_left": int(top_item.get("days") or 0),
+                    "renew_url": _renew_url(),
+                    "items": digest_items,
+                    "org_name": org.name if getattr(org, "name", "") else "Organization",
+                },
+            )
+            log_row.to_email = recipient
+            log_row.subject = subject
+            log_row.template_name = template_name
+            log_row.user = recipient_user
+            log_row.meta = {"items": digest_items}
+            if sent_ok:
+                log_row.status = "sent"
+                log_row.sent_at = now
+                counts["digests"] += 1
+                counts["reminders"] += 1
+            else:
+                log_row.status = "failed"
+                log_row.error_message = "send_failed"
+            log_row.save(update_fields=["to_email", "subject", "template_name", "user", "meta", "status", "sent_at", "error_message"])
+        except Exception as exc:
+            log_row.status = "failed"
+            log_row.error_message = str(exc)[:8000]
+            log_row.save(update_fields=["status", "error_message"])
+        return counts
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.email_utils import deliver_email_outbox
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbox emails (for setups without a Celery beat)."
+
+    def handle(self, *args, **options):
+        sent, retried, failed = deliver_email_outbox()
+        self.stdout.write(self.style.SUCCESS(f"Sent {sent}, retrying {retried}, failed {failed} email(s)."))
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.backend.core_platform.spa_assets import (
+    PRECOMPRESS_MIN_BYTES,
+    brotli,
+    precompress_dist_assets,
+)
+
+
+class Command(BaseCommand):
+    help = "Write gzip/brotli variants next to frontend_dist assets so the SPA view can serve them precompressed."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-bytes",
+            type=int,
+            default=PRECOMPRESS_MIN_BYTES,
+            help="Skip files smaller than this many bytes.",
+        )
+
+    def handle(self, *args, **options):
+        written = precompress_dist_assets(settings.FRONTEND_DIST, min_bytes=max(int(options["min_bytes"]), 0))
+        encodings = "gzip, brotli" if brotli is not None else "gzip (brotli not installed)"
+        self.stdout.write(f"Wrote {written} precompressed files ({encodings}) under {settings.FRONTEND_DIST}.")
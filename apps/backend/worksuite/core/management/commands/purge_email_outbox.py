@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.email_utils import purge_email_outbox
+
+
+class Command(BaseCommand):
+    help = "Delete delivered outbox emails past EMAIL_OUTBOX_RETENTION_DAYS (for setups without a Celery beat)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches.")
+
+    def handle(self, *args, **options):
+        deleted = purge_email_outbox(max_batches=options["max_batches"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} sent email(s)."))
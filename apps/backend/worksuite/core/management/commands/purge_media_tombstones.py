@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.media_utils import purge_media_tombstones
+
+
+class Command(BaseCommand):
+    help = "Delete files of removed screenshots queued as media tombstones (for setups without a Celery beat)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches.")
+
+    def handle(self, *args, **options):
+        deleted, failed = purge_media_tombstones(max_batches=options["max_batches"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} file(s), {failed} left for retry."))
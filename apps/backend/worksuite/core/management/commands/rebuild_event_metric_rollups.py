@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.observability import rebuild_event_metric_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily observability rollups from EventMetric for the trailing window."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=60, help="Number of trailing days to rebuild.")
+
+    def handle(self, *args, **options):
+        end_date = timezone.now().date()
+        start_date = end_date - timedelta(days=max(options["days"], 1) - 1)
+        written = rebuild_event_metric_rollups(start_date, end_date)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} rollup row(s) from {start_date} to {end_date}."))
@@ -0,0 +1,75 @@
+import logging
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+
+from .models import MediaFileTombstone, Screenshot
+
+
+logger = logging.getLogger(__name__)
+
+
+def _tombstone_batch_size():
+    return max(1, int(getattr(settings, "MEDIA_TOMBSTONE_BATCH_SIZE", 500)))
+
+
+def _tombstone_max_attempts():
+    return max(1, int(getattr(settings, "MEDIA_TOMBSTONE_MAX_ATTEMPTS", 5)))
+
+
+def _tombstone_delete_workers():
+    return max(1, int(getattr(settings, "MEDIA_TOMBSTONE_DELETE_WORKERS", 8)))
+
+
+def _delete_files(keys):
+    """Batched storage delete (S3 DeleteObjects / parallel unlink); returns the keys that failed."""
+    if not keys:
+        return set()
+    try:
+        return set(default_storage.delete_many(keys, max_workers=_tombstone_delete_workers()))
+    except Exception:
+        logger.exception("Media tombstone purge could not reach storage")
+        return set(keys)
+
+
+def purge_media_tombstones(max_batches=None):
+    """
+    Remove the files of deleted media rows, one locked batch of tombstones at a time.
+    Returns (deleted, failed); failed tombstones are retried on later runs until
+    MEDIA_TOMBSTONE_MAX_ATTEMPTS.
+    """
+    batch_size = _tombstone_batch_size()
+    max_attempts = _tombstone_max_attempts()
+    deleted = failed = 0
+    batches = 0
+    after_id = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            rows = list(
+                MediaFileTombstone.objects
+                .select_for_update(skip_locked=True)
+                .filter(id__gt=after_id, attempts__lt=max_attempts)
+                .order_by("id")[:batch_size]
+            )
+            if not rows:
+                break
+            batches += 1
+            after_id = rows[-1].id
+            keys = {row.storage_key for row in rows}
+            # A key can be shared with a screenshot that is still live (copied rows, path migrations).
+            live_keys = set(Screenshot.objects.filter(image__in=keys).values_list("image", flat=True))
+            failed_keys = _delete_files(sorted(keys - live_keys))
+            done_ids = [row.id for row in rows if row.storage_key not in failed_keys]
+            retry_ids = [row.id for row in rows if row.storage_key in failed_keys]
+            MediaFileTombstone.objects.filter(id__in=done_ids).delete()
+            if retry_ids:
+                MediaFileTombstone.objects.filter(id__in=retry_ids).update(
+                    attempts=F("attempts") + 1,
+                    last_error="storage_delete_failed",
+                )
+                logger.warning("Media tombstone purge left %s files for retry", len(retry_ids))
+            deleted += len(done_ids)
+            failed += len(retry_ids)
+    return deleted, failed
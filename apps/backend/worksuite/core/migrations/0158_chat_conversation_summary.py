@@ -0,0 +1,82 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:29
+
+from django.db import migrations, models
+
+
+BACKFILL_SUMMARY_SQL = [
+    """
+    UPDATE core_chatconversation AS c
+    SET last_message_preview = LEFT(BTRIM(REGEXP_REPLACE(m.text, '\\s+', ' ', 'g')), 255),
+        last_sender = m.sender_type,
+        last_message_at = COALESCE(c.last_message_at, m.created_at)
+    FROM (
+        SELECT DISTINCT ON (conversation_id) conversation_id, text, sender_type, created_at
+        FROM core_chatmessage
+        ORDER BY conversation_id, created_at DESC, id DESC
+    ) AS m
+    WHERE m.conversation_id = c.id
+    """,
+    """
+    UPDATE core_chatconversation AS c
+    SET last_visitor_message_at = v.last_at
+    FROM (
+        SELECT conversation_id, MAX(created_at) AS last_at
+        FROM core_chatmessage
+        WHERE sender_type = 'visitor'
+        GROUP BY conversation_id
+    ) AS v
+    WHERE v.conversation_id = c.id
+    """,
+    """
+    UPDATE core_chatconversation AS c
+    SET unread_for_agent = u.unread
+    FROM (
+        SELECT m.conversation_id, COUNT(*) AS unread
+        FROM core_chatmessage AS m
+        WHERE m.sender_type = 'visitor'
+          AND m.created_at > COALESCE(
+              (SELECT MAX(a.created_at) FROM core_chatmessage AS a
+               WHERE a.conversation_id = m.conversation_id AND a.sender_type = 'agent'),
+              '-infinity'::timestamptz
+          )
+        GROUP BY m.conversation_id
+    ) AS u
+    WHERE u.conversation_id = c.id AND c.status <> 'closed'
+    """,
+    "UPDATE core_chatconversation SET last_message_at = created_at WHERE last_message_at IS NULL",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0157_plan_actual_offer_prices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatconversation',
+            name='last_message_preview',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='chatconversation',
+            name='last_sender',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='chatconversation',
+            name='last_visitor_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatconversation',
+            name='unread_for_agent',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='chatconversation',
+            index=models.Index(fields=['organization', '-last_message_at', '-id'], name='core_chatconv_org_last_idx'),
+        ),
+        migrations.RunSQL(BACKFILL_SUMMARY_SQL, migrations.RunSQL.noop),
+    ]
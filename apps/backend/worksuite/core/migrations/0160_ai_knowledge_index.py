@@ -0,0 +1,27 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0159_ai_website_import_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AiKnowledgeIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(blank=True, default='', max_length=32)),
+                ('sources', models.JSONField(blank=True, default=dict)),
+                ('passages', models.JSONField(blank=True, default=list)),
+                ('vocabulary', models.JSONField(blank=True, default=list)),
+                ('postings', models.BinaryField(blank=True, default=b'')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('organization', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ai_knowledge_index', to='core.organization')),
+            ],
+        ),
+    ]
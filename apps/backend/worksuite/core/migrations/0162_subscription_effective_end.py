@@ -0,0 +1,66 @@
+# Generated by Django 4.2.10 on 2026-10-19 05:24
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+FREE_TRIAL_DAYS = 15
+
+
+def backfill_effective_end(apps, schema_editor):
+    # Mirrors core.subscription_utils.get_effective_end_date().
+    Subscription = apps.get_model("core", "Subscription")
+    batch = []
+    rows = Subscription.objects.select_related("plan").only(
+        "id", "status", "start_date", "end_date", "trial_end",
+        "plan__monthly_price", "plan__yearly_price", "plan__usd_monthly_price", "plan__usd_yearly_price",
+    )
+    for sub in rows.iterator(chunk_size=2000):
+        plan = sub.plan
+        prices = [plan.monthly_price or 0, plan.yearly_price or 0, plan.usd_monthly_price or 0, plan.usd_yearly_price or 0]
+        if sub.status == "trialing":
+            effective_end = sub.trial_end
+        elif not all(price <= 0 for price in prices):
+            effective_end = sub.end_date
+        else:
+            trial_end = sub.start_date + timedelta(days=FREE_TRIAL_DAYS)
+            effective_end = sub.end_date if sub.end_date and sub.end_date < trial_end else trial_end
+        sub.effective_end_at = effective_end
+        batch.append(sub)
+        if len(batch) >= 2000:
+            Subscription.objects.bulk_update(batch, ["effective_end_at"])
+            batch = []
+    if batch:
+        Subscription.objects.bulk_update(batch, ["effective_end_at"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0161_email_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BillingScanCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=60, unique=True)),
+                ('run_date', models.DateField(blank=True, null=True)),
+                ('last_org_id', models.BigIntegerField(default=0)),
+                ('orgs_processed', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='subscription',
+            name='effective_end_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['status', 'effective_end_at'], name='core_sub_status_eff_end_idx'),
+        ),
+        migrations.RunPython(backfill_effective_end, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.10 on 2026-10-19 06:09
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+# One statement-level trigger per DELETE: queryset deletes and FK cascades (employee,
+# org) stay set-based and their image keys are queued for the purge worker.
+SCREENSHOT_TOMBSTONE_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION core_screenshot_tombstone() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO core_mediafiletombstone (storage_key, source, attempts, last_error, created_at)
+        SELECT old_rows.image, 'screenshot', 0, '', NOW()
+        FROM old_rows
+        WHERE old_rows.image IS NOT NULL AND old_rows.image <> '';
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER core_screenshot_tombstone_trg
+    AFTER DELETE ON core_screenshot
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION core_screenshot_tombstone()
+    """,
+]
+
+DROP_SCREENSHOT_TOMBSTONE_SQL = [
+    "DROP TRIGGER IF EXISTS core_screenshot_tombstone_trg ON core_screenshot",
+    "DROP FUNCTION IF EXISTS core_screenshot_tombstone()",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0162_subscription_effective_end'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaFileTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('storage_key', models.CharField(max_length=500)),
+                ('source', models.CharField(blank=True, default='', max_length=40)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ('id',),
+            },
+        ),
+        migrations.RunSQL(SCREENSHOT_TOMBSTONE_SQL, DROP_SCREENSHOT_TOMBSTONE_SQL),
+    ]
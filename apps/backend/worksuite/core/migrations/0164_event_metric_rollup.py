@@ -0,0 +1,38 @@
+# Generated by Django 4.2.10 on 2026-10-19 06:27
+
+from django.db import migrations, models
+
+
+# Seed the rollup from the existing daily metrics; later flushes add to it incrementally.
+BACKFILL_ROLLUP_SQL = """
+    INSERT INTO core_eventmetricrollup (date, product_slug, event_family, count, updated_at)
+    SELECT date, product_slug, split_part(event_type, ':', 1), SUM(count), NOW()
+    FROM core_eventmetric
+    GROUP BY 1, 2, 3
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0163_media_file_tombstone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventMetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('event_family', models.CharField(max_length=120)),
+                ('product_slug', models.CharField(blank=True, max_length=60)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='eventmetricrollup',
+            constraint=models.UniqueConstraint(fields=('date', 'product_slug', 'event_family'), name='eventmetricrollup_unique_daily_product_family'),
+        ),
+        migrations.RunSQL(BACKFILL_ROLLUP_SQL, migrations.RunSQL.noop),
+    ]
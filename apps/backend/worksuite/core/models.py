@@ -4,7 +4,7 @@ import secrets
 import uuid
 
 from django.db import models
-from django.db.models import Q
+from django.db.models import F, Q
 from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from django.conf import settings
@@ -391,11 +391,17 @@ class ChatConversation(models.Model):
         related_name="active_conversations",
     )
     last_message_at = models.DateTimeField(null=True, blank=True)
+    # Inbox summary, maintained on every message insert (see chat_message_update_summary).
+    last_message_preview = models.CharField(max_length=255, blank=True, default="")
+    last_sender = models.CharField(max_length=20, blank=True, default="")
+    last_visitor_message_at = models.DateTimeField(null=True, blank=True)
+    unread_for_agent = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         indexes = [
             models.Index(fields=["widget", "visitor_id", "status"]),
+            models.Index(fields=["organization", "-last_message_at", "-id"], name="core_chatconv_org_last_idx"),
         ]
 
     def __str__(self):
@@ -476,6 +482,56 @@ class AiMediaLibraryItem(models.Model):
         return f"{self.organization_id} - {self.name}"
 
 
+class AiWebsiteImportJob(models.Model):
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_COMPLETED = "completed"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_COMPLETED, "Completed"),
+        (STATUS_FAILED, "Failed"),
+    )
+
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="ai_website_import_jobs")
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="ai_website_import_jobs",
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    source_url = models.URLField(max_length=500)
+    name = models.CharField(max_length=255, blank=True, default="")
+    page_urls = models.JSONField(default=list, blank=True)
+    # Per page: url, etag, last_modified, title, entries, word_count. Kept for
+    # conditional requests when the site is imported again.
+    pages = models.JSONField(default=list, blank=True)
+    item = models.ForeignKey(
+        AiMediaLibraryItem,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="import_jobs",
+    )
+    result = models.JSONField(default=dict, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ("-created_at", "-id")
+        indexes = [
+            models.Index(fields=["organization", "status", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.organization_id}:{self.source_url}:{self.status}"
+
+
 class AiFaq(models.Model):
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE)
     question = models.TextField()
@@ -491,6 +547,21 @@ class AiFaq(models.Model):
         return f"{self.organization_id} - {self.question[:60]}"
 
 
+class AiKnowledgeIndex(models.Model):
+    organization = models.OneToOneField(Organization, on_delete=models.CASCADE, related_name="ai_knowledge_index")
+    version = models.CharField(max_length=32, blank=True, default="")
+    # Source key (faq:<id>, text:<id>, page:<item>:<url>) -> content hash.
+    sources = models.JSONField(default=dict, blank=True)
+    passages = models.JSONField(default=list, blank=True)
+    vocabulary = models.JSONField(default=list, blank=True)
+    # npz with row_ptr / cols / tfs: one sparse term-count row per passage.
+    postings = models.BinaryField(blank=True, default=b"")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.organization_id} - {len(self.passages or [])} passages"
+
+
 class ChatTransferLog(models.Model):
     conversation = models.ForeignKey(
         ChatConversation,
@@ -882,6 +953,23 @@ def delete_org_users(sender, instance, **kwargs):
             user.delete()
 
 
+@receiver(post_save, sender=ChatMessage)
+def chat_message_update_summary(sender, instance, created, **kwargs):
+    if not created or kwargs.get("raw"):
+        return
+    updates = {
+        "last_message_at": instance.created_at,
+        "last_message_preview": " ".join(str(instance.text or "").split())[:255],
+        "last_sender": instance.sender_type,
+    }
+    if instance.sender_type == "visitor":
+        updates["last_visitor_message_at"] = instance.created_at
+        updates["unread_for_agent"] = F("unread_for_agent") + 1
+    elif instance.sender_type == "agent":
+        updates["unread_for_agent"] = 0
+    ChatConversation.objects.filter(id=instance.conversation_id).update(**updates)
+
+
 @receiver(post_delete, sender=ChatMessage)
 def chat_message_attachment_delete(sender, instance, **kwargs):
     if instance.attachment:
@@ -1088,6 +1176,25 @@ class Subscription(models.Model):
     user_type_next_cycle_counts = models.JSONField(default=dict, blank=True)
     addon_proration_amount = models.FloatField(default=0)
     addon_last_proration_at = models.DateTimeField(null=True, blank=True)
+    # get_effective_end_date() as of the last save, so lifecycle scans can range over an index.
+    effective_end_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    EFFECTIVE_END_INPUTS = frozenset({"status", "plan", "start_date", "end_date", "trial_end"})
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "effective_end_at"], name="core_sub_status_eff_end_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or self.EFFECTIVE_END_INPUTS.intersection(update_fields):
+            from .subscription_utils import get_effective_end_date
+
+            self.effective_end_at = get_effective_end_date(self)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "effective_end_at"}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.organization.name} - {self.plan.name}"
@@ -1182,6 +1289,69 @@ class EmailNotificationLog(models.Model):
         return f"EmailNotificationLog({org_name} {self.category}:{self.event_key} {self.scheduled_for or '-'})"
 
 
+class BillingScanCheckpoint(models.Model):
+    name = models.CharField(max_length=60, unique=True)
+    run_date = models.DateField(null=True, blank=True)
+    last_org_id = models.BigIntegerField(default=0)
+    orgs_processed = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} {self.run_date or '-'} @ {self.last_org_id}"
+
+
+class EmailOutbox(models.Model):
+    STATUS_QUEUED = "queued"
+    STATUS_SENDING = "sending"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_SENDING, "Sending"),
+        (STATUS_SENT, "Sent"),
+        (STATUS_FAILED, "Failed"),
+    )
+
+    recipients = models.JSONField(default=list)
+    subject = models.CharField(max_length=255, blank=True, default="")
+    body = models.TextField(blank=True, default="")
+    template_name = models.CharField(max_length=180, blank=True, default="")
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+    # Mail config that delivered it, e.g. "ses_db:smtp_username+smtp_password" or "env_auto".
+    sent_via = models.CharField(max_length=80, blank=True, default="")
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ("id",)
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="core_email_outbox_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"EmailOutbox({self.status} {self.subject[:40]} -> {', '.join(self.recipients or [])[:80]})"
+
+
+class MediaFileTombstone(models.Model):
+    """Storage key of a deleted media row, waiting for the purge worker to remove the file."""
+
+    storage_key = models.CharField(max_length=500)
+    source = models.CharField(max_length=40, blank=True, default="")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ("id",)
+
+    def __str__(self):
+        return f"MediaFileTombstone({self.source}: {self.storage_key[:80]})"
+
+
 def _receipt_upload_to(instance, filename):
     org_id = None
     if instance.organization_id:
@@ -1289,6 +1459,26 @@ class EventMetric(models.Model):
         return f"{self.date} {org_name} {product} {self.event_type}"
 
 
+class EventMetricRollup(models.Model):
+    """Platform-wide daily EventMetric totals per event family and product, kept in step by the metric flush."""
+    date = models.DateField()
+    event_family = models.CharField(max_length=120)
+    product_slug = models.CharField(max_length=60, blank=True)
+    count = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=("date", "product_slug", "event_family"),
+                name="eventmetricrollup_unique_daily_product_family",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.product_slug or '-'} {self.event_family}"
+
+
 class AlertRule(models.Model):
     name = models.CharField(max_length=160)
     is_enabled = models.BooleanField(default=True)
@@ -1,14 +1,44 @@
+"""
+Structured event logging and per-org daily event metrics.
+
+Metric hits are summed in a per-process buffer keyed by (day, org, product,
+event) instead of writing EventMetric on every event. A flush adds the buffered
+counts with one multi-row UPSERT. A background thread flushes every few seconds;
+a request only flushes once enough distinct keys pile up (or on the interval when
+the thread is off), and the buffer is flushed again at process exit. A failed
+flush merges its counts back, so nothing is dropped; the buffer only grows by
+distinct keys, not by events.
+
+The same transaction adds the counts to EventMetricRollup, the platform-wide
+daily totals per event family ("agent_activity_upload" for
+"agent_activity_upload:ok") and product that the SaaS admin report reads.
+Rows removed by org deletes are reconciled by rebuild_event_metric_rollups, one
+date at a time under a per-date advisory lock that flushes take in shared mode, so
+a recount only makes flushes for the date being recounted wait.
+"""
+
+import atexit
 import json
 import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
 from django.conf import settings
-from django.db.models import F
+from django.db import connection, transaction
 from django.utils import timezone
 
-from .models import EventMetric
+from .flush_utils import PeriodicFlusher
+from .models import EventMetric, EventMetricRollup, Organization
 
 
 _logger = logging.getLogger("workzilla.observability")
 
+STATEMENT_ROWS = 1000
+# First key of the (class, date ordinal) advisory locks guarding each rollup date.
+ROLLUP_LOCK_CLASS = 0x524F4C4C
+
 _DROP_KEYS = {
     "password",
     "pass",
@@ -93,24 +123,167 @@ def log_event(
         )
 
 
+def _flush_interval_seconds():
+    return float(getattr(settings, "OBS_METRICS_FLUSH_SECONDS", 5))
+
+
+def _flush_max_keys():
+    return int(getattr(settings, "OBS_METRICS_FLUSH_MAX_KEYS", 500))
+
+
+class _MetricBuffer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = defaultdict(int)
+        self.last_seen = {}
+        self.last_flush = time.monotonic()
+
+    def add(self, key, count, seen_at):
+        with self.lock:
+            self.counts[key] += count
+            if key not in self.last_seen or seen_at > self.last_seen[key]:
+                self.last_seen[key] = seen_at
+            return len(self.counts)
+
+    def drain(self):
+        with self.lock:
+            counts, self.counts = self.counts, defaultdict(int)
+            last_seen, self.last_seen = self.last_seen, {}
+            self.last_flush = time.monotonic()
+        return counts, last_seen
+
+    def restore(self, counts, last_seen):
+        for key, count in counts.items():
+            self.add(key, count, last_seen[key])
+
+
+_buffer = _MetricBuffer()
+
+
 def _increment_metric(event_type, *, status=None, org=None, product_slug=None):
     if org is None:
         return
     now = timezone.now()
     metric_event = event_type if not status else f"{event_type}:{status}"
-    product_slug = product_slug or ""
+    key = (now.date(), org.id, (product_slug or "")[:60], metric_event[:120])
+    size = _buffer.add(key, 1, now)
+    _flusher.ensure_started()
+    if size >= _flush_max_keys() or (
+        not _flusher.running and time.monotonic() - _buffer.last_flush >= _flush_interval_seconds()
+    ):
+        # Never flush inside the caller's transaction: a rollback there would take the counts with it.
+        if not connection.in_atomic_block:
+            flush_event_metrics()
+
+
+def _upsert_metrics(counts, last_seen):
+    table = EventMetric._meta.db_table
+    keys = sorted(counts)
+    with connection.cursor() as cursor:
+        for start in range(0, len(keys), STATEMENT_ROWS):
+            chunk = keys[start:start + STATEMENT_ROWS]
+            params = []
+            for key in chunk:
+                params.extend([key[0], key[1], key[2], key[3], counts[key], last_seen[key]])
+            cursor.execute(
+                f"INSERT INTO {table} (date, organization_id, product_slug, event_type, count, last_seen_at) "
+                f"VALUES {', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(chunk))} "
+                f"ON CONFLICT (date, organization_id, product_slug, event_type) DO UPDATE SET "
+                f"count = {table}.count + EXCLUDED.count, "
+                f"last_seen_at = GREATEST({table}.last_seen_at, EXCLUDED.last_seen_at)",
+                params,
+            )
+
+
+def event_family(event_type):
+    return event_type.split(":", 1)[0]
+
+
+def _upsert_rollups(counts):
+    deltas = defaultdict(int)
+    for (date, _org_id, product_slug, event_type), count in counts.items():
+        deltas[(date, product_slug, event_family(event_type))] += count
+    table = EventMetricRollup._meta.db_table
+    keys = sorted(deltas)
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        # Held until the flush commits; in date order so concurrent flushes cannot deadlock.
+        for date in sorted({key[0] for key in keys}):
+            cursor.execute("SELECT pg_advisory_xact_lock_shared(%s, %s)", [ROLLUP_LOCK_CLASS, date.toordinal()])
+        for start in range(0, len(keys), STATEMENT_ROWS):
+            chunk = keys[start:start + STATEMENT_ROWS]
+            params = []
+            for key in chunk:
+                params.extend([key[0], key[1], key[2], deltas[key], now])
+            cursor.execute(
+                f"INSERT INTO {table} (date, product_slug, event_family, count, updated_at) "
+                f"VALUES {', '.join(['(%s, %s, %s, %s, %s)'] * len(chunk))} "
+                f"ON CONFLICT (date, product_slug, event_family) DO UPDATE SET "
+                f"count = {table}.count + EXCLUDED.count, updated_at = EXCLUDED.updated_at",
+                params,
+            )
+
+
+def rebuild_event_metric_rollups(start_date, end_date):
+    """Recompute the rollups of [start_date, end_date] from EventMetric; returns the rows written."""
+    table = EventMetricRollup._meta.db_table
+    source = EventMetric._meta.db_table
+    written = 0
+    date = start_date
+    while date <= end_date:
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Waits for flushes of this date to commit and holds off new ones, so their
+            # deltas land either in the recount or on top of it.
+            cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", [ROLLUP_LOCK_CLASS, date.toordinal()])
+            cursor.execute(
+                f"INSERT INTO {table} (date, product_slug, event_family, count, updated_at) "
+                f"SELECT date, product_slug, split_part(event_type, ':', 1), SUM(count), NOW() "
+                f"FROM {source} WHERE date = %s GROUP BY 1, 2, 3 "
+                f"ON CONFLICT (date, product_slug, event_family) DO UPDATE SET "
+                f"count = EXCLUDED.count, updated_at = EXCLUDED.updated_at",
+                [date],
+            )
+            written += cursor.rowcount
+            cursor.execute(
+                f"DELETE FROM {table} AS rollup WHERE rollup.date = %s AND NOT EXISTS ("
+                f"SELECT 1 FROM {source} AS metric WHERE metric.date = rollup.date "
+                f"AND metric.product_slug = rollup.product_slug "
+                f"AND split_part(metric.event_type, ':', 1) = rollup.event_family)",
+                [date],
+            )
+        date += timedelta(days=1)
+    return written
+
+
+def flush_event_metrics():
+    """Write buffered metric counts; on failure they are merged back into the buffer."""
+    counts, last_seen = _buffer.drain()
+    if not counts:
+        return 0
     try:
-        metric, created = EventMetric.objects.update_or_create(
-            date=now.date(),
-            organization=org,
-            product_slug=product_slug,
-            event_type=metric_event,
-            defaults={"count": 1, "last_seen_at": now},
+        # Orgs deleted since the events were logged would fail the whole statement.
+        live_orgs = set(
+            Organization.objects.filter(id__in={key[1] for key in counts}).values_list("id", flat=True)
         )
-        if not created:
-            EventMetric.objects.filter(pk=metric.pk).update(
-                count=F("count") + 1,
-                last_seen_at=now,
-            )
+        counts = {key: count for key, count in counts.items() if key[1] in live_orgs}
+        with transaction.atomic():
+            _upsert_metrics(counts, last_seen)
+            _upsert_rollups(counts)
+    except Exception:
+        _logger.exception("observability_metric_flush_failed")
+        _buffer.restore(counts, last_seen)
+        return 0
+    return len(counts)
+
+
+_flusher = PeriodicFlusher("event-metrics-flush", flush_event_metrics, _flush_interval_seconds)
+
+
+def _flush_at_exit():
+    try:
+        flush_event_metrics()
     except Exception:
-        _logger.exception("observability_metric_failed")
+        pass
+
+
+atexit.register(_flush_at_exit)
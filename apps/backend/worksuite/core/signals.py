@@ -1,9 +1,32 @@
-from django.db.models.signals import pre_delete
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import Screenshot
+from apps.backend.ai_chatbot.services.knowledge_index import invalidate_knowledge_index
+from apps.backend.ai_chatbot.services.widget_config import invalidate_widget_configs
+from .models import AiFaq, AiMediaLibraryItem, AiWebsiteImportJob, ChatWidget, OrganizationSettings, Plan
+from .subscription_utils import sync_plan_effective_end_dates
 
 
-@receiver(pre_delete, sender=Screenshot)
-def delete_screenshot_file(sender, instance, **kwargs):
-    if instance.image:
-        instance.image.delete(save=False)
+@receiver(post_save, sender=AiFaq, dispatch_uid="core.ai_faq.invalidate_knowledge_on_save")
+@receiver(post_delete, sender=AiFaq, dispatch_uid="core.ai_faq.invalidate_knowledge_on_delete")
+@receiver(post_save, sender=AiMediaLibraryItem, dispatch_uid="core.ai_media.invalidate_knowledge_on_save")
+@receiver(post_delete, sender=AiMediaLibraryItem, dispatch_uid="core.ai_media.invalidate_knowledge_on_delete")
+@receiver(post_save, sender=AiWebsiteImportJob, dispatch_uid="core.ai_website_import.invalidate_knowledge_on_save")
+def invalidate_chatbot_knowledge(sender, instance, **kwargs):
+    invalidate_knowledge_index(instance.organization_id)
+
+
+@receiver(post_save, sender=Plan, dispatch_uid="core.plan.sync_effective_end_on_save")
+def sync_subscription_effective_end(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        sync_plan_effective_end_dates(instance)
+
+
+@receiver(post_save, sender=ChatWidget, dispatch_uid="core.chat_widget.invalidate_config_on_save")
+@receiver(post_delete, sender=ChatWidget, dispatch_uid="core.chat_widget.invalidate_config_on_delete")
+def invalidate_chat_widget_config(sender, instance, **kwargs):
+    invalidate_widget_configs(instance.organization_id, keys_changed=True)
+
+
+@receiver(post_save, sender=OrganizationSettings, dispatch_uid="core.org_settings.invalidate_widget_config_on_save")
+def invalidate_org_widget_configs(sender, instance, **kwargs):
+    invalidate_widget_configs(instance.organization_id)
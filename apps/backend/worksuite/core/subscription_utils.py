@@ -3,7 +3,8 @@ from functools import wraps
 
 from django.utils import timezone
 
-from django.db.models import Q
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce, Least
 from django.http import JsonResponse
 
 from .models import PendingTransfer, Subscription, SubscriptionHistory, Organization, UserProfile
@@ -48,6 +49,15 @@ def get_effective_end_date(subscription, now=None):
     return trial_end
 
 
+def sync_plan_effective_end_dates(plan):
+    """Recompute Subscription.effective_end_at for a plan whose prices may have moved it across free/paid."""
+    subs = Subscription.objects.filter(plan=plan).exclude(status="trialing")
+    if not is_free_plan(plan):
+        return subs.update(effective_end_at=F("end_date"))
+    trial_end = F("start_date") + timedelta(days=FREE_TRIAL_DAYS)
+    return subs.update(effective_end_at=Least(Coalesce(F("end_date"), trial_end), trial_end))
+
+
 def is_subscription_active(subscription, now=None):
     if not subscription:
         return False
@@ -0,0 +1,59 @@
+try:
+    from celery import shared_task
+except Exception:  # pragma: no cover
+    def shared_task(*args, **kwargs):
+        def decorator(fn):
+            return fn
+        return decorator
+
+
+@shared_task(name="ai_chatbot.run_website_import")
+def run_website_import_task(job_id):
+    from ai_chatbot.api_views import run_website_import_job
+
+    job = run_website_import_job(job_id)
+    return {"status": job.status if job else "not_claimed", "job_id": job_id}
+
+
+@shared_task(name="ai_chatbot.refresh_knowledge_index")
+def refresh_knowledge_index_task(org_id):
+    from apps.backend.ai_chatbot.services.knowledge_index import refresh_knowledge_index
+
+    record = refresh_knowledge_index(org_id)
+    return {"org_id": org_id, "version": record.version}
+
+
+@shared_task(name="core.deliver_email_outbox")
+def deliver_email_outbox_task(kicked=False):
+    from core.email_utils import deliver_email_outbox, deliver_kicked_outbox
+
+    sent, retried, failed = deliver_kicked_outbox() if kicked else deliver_email_outbox()
+    return {"sent": sent, "retried": retried, "failed": failed}
+
+
+@shared_task(name="core.purge_email_outbox")
+def purge_email_outbox_task():
+    from core.email_utils import purge_email_outbox
+
+    return {"deleted": purge_email_outbox()}
+
+
+@shared_task(name="core.purge_media_tombstones")
+def purge_media_tombstones_task():
+    from core.media_utils import purge_media_tombstones
+
+    deleted, failed = purge_media_tombstones()
+    return {"deleted": deleted, "failed": failed}
+
+
+@shared_task(name="core.rebuild_event_metric_rollups")
+def rebuild_event_metric_rollups_task(days=60):
+    from datetime import timedelta
+
+    from django.utils import timezone
+
+    from core.observability import rebuild_event_metric_rollups
+
+    end_date = timezone.now().date()
+    written = rebuild_event_metric_rollups(end_date - timedelta(days=max(int(days), 1) - 1), end_date)
+    return {"rows": written}
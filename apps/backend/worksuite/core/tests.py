@@ -1,12 +1,26 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
-from django.test.utils import override_settings
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from unittest import mock
+from datetime import timedelta
+import io
 import os
+import socket
+import socketserver
 import tempfile
+import threading
 
 from apps.backend.products.models import Product
-from core.models import Organization, OrganizationProduct, Plan, Subscription, UserProductAccess, UserProfile
+from core import email_utils, observability
+from core.flush_utils import PeriodicFlusher
+from core.media_utils import purge_media_tombstones
+from saas_admin.observability import build_observability_summary, search_observability_orgs
+from core.models import BillingScanCheckpoint, EmailNotificationLog, EmailOutbox, Employee, EventMetric, EventMetricRollup, MediaFileTombstone, Organization, OrganizationProduct, Plan, Screenshot, Subscription, UserProductAccess, UserProfile
 
 
 User = get_user_model()
@@ -248,3 +262,451 @@ class UserProfilePhotoCleanupTests(TestCase):
         user.delete()
 
         self.assertFalse(os.path.exists(file_path))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix="wz-screenshot-tombstone-tests-"))
+class ScreenshotTombstoneTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name="Shots Org", company_key="SHOTSKEY")
+        self.employee = Employee.objects.create(org=self.org, name="Ann", device_id="dev-ann")
+        self.other = Employee.objects.create(org=self.org, name="Bob", device_id="dev-bob")
+
+    def _shot(self, employee, name):
+        return Screenshot.objects.create(
+            employee=employee,
+            image=SimpleUploadedFile(name, b"png-bytes", content_type="image/png"),
+        )
+
+    def test_deletes_queue_tombstones_and_purge_removes_files(self):
+        shots = [self._shot(self.employee, "a.png"), self._shot(self.employee, "b.png"), self._shot(self.other, "c.png")]
+        paths = [shot.image.path for shot in shots]
+
+        # One DELETE for the queryset; the files are left for the purge worker.
+        with self.assertNumQueries(1):
+            Screenshot.objects.filter(employee=self.employee).delete()
+        self.other.delete()
+
+        self.assertEqual(
+            sorted(MediaFileTombstone.objects.values_list("storage_key", flat=True)),
+            sorted(shot.image.name for shot in shots),
+        )
+        self.assertTrue(all(os.path.exists(path) for path in paths))
+
+        deleted, failed = purge_media_tombstones()
+
+        self.assertEqual((deleted, failed), (3, 0))
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+        self.assertFalse(MediaFileTombstone.objects.exists())
+
+    def test_failed_deletes_are_retried_and_live_keys_kept(self):
+        gone = self._shot(self.employee, "gone.png")
+        kept = self._shot(self.other, "kept.png")
+        MediaFileTombstone.objects.create(storage_key=kept.image.name, source="screenshot")
+        Screenshot.objects.filter(id=gone.id).delete()
+
+        storage = mock.Mock()
+        storage.delete_many.return_value = [gone.image.name]
+        with mock.patch("core.media_utils.default_storage", storage):
+            deleted, failed = purge_media_tombstones()
+
+        storage.delete_many.assert_called_once_with([gone.image.name], max_workers=8)
+        self.assertEqual((deleted, failed), (1, 1))
+        self.assertTrue(os.path.exists(kept.image.path))
+        retry = MediaFileTombstone.objects.get()
+        self.assertEqual((retry.storage_key, retry.attempts), (gone.image.name, 1))
+
+
+@override_settings(OBS_METRICS_ENABLED=True, OBS_METRICS_FLUSH_SECONDS=3600, OBS_METRICS_FLUSH_MAX_KEYS=1000)
+class EventMetricBufferTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name="Metrics Org", company_key="METRICSKEY")
+        observability.flush_event_metrics()
+
+    def _metric(self):
+        return EventMetric.objects.get(organization=self.org, event_type="agent_upload:success")
+
+    def test_events_are_counted_in_memory_and_upserted_per_flush(self):
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                observability.log_event("agent_upload", status="success", org=self.org, product_slug="worksuite")
+        self.assertFalse(EventMetric.objects.filter(organization=self.org).exists())
+
+        self.assertEqual(observability.flush_event_metrics(), 1)
+        self.assertEqual(self._metric().count, 3)
+
+        observability.log_event("agent_upload", status="success", org=self.org, product_slug="worksuite")
+        observability.log_event("agent_upload", status="success", org=self.org, product_slug="worksuite")
+        observability.flush_event_metrics()
+        self.assertEqual(self._metric().count, 5)
+
+    def test_failed_flush_keeps_counts_buffered(self):
+        observability.log_event("agent_upload", status="success", org=self.org, product_slug="worksuite")
+        with mock.patch.object(observability, "_upsert_metrics", side_effect=RuntimeError("db down")):
+            self.assertEqual(observability.flush_event_metrics(), 0)
+        observability.log_event("agent_upload", status="success", org=self.org, product_slug="worksuite")
+
+        observability.flush_event_metrics()
+        self.assertEqual(self._metric().count, 2)
+
+    @override_settings(OBS_METRICS_FLUSH_SECONDS=0)
+    def test_requests_leave_interval_flushes_to_the_flusher_thread(self):
+        outside_transaction = mock.Mock(in_atomic_block=False)
+        with mock.patch.object(observability, "connection", outside_transaction), \
+                mock.patch.object(observability, "flush_event_metrics") as flush:
+            with mock.patch.object(observability._flusher, "pid", os.getpid()):
+                observability.log_event("agent_upload", status="success", org=self.org, product_slug="worksuite")
+            flush.assert_not_called()
+            observability.log_event("agent_upload", status="success", org=self.org, product_slug="worksuite")
+            flush.assert_called_once_with()
+
+
+class ObservabilityRollupTests(TestCase):
+    def setUp(self):
+        observability.flush_event_metrics()
+        self.org = Organization.objects.create(name="Rollup Org", company_key="ROLLUPKEY")
+        self.other = Organization.objects.create(name="Other Org", company_key="ROLLUPKEY2")
+
+    def _log(self, org, status, times=1):
+        for _ in range(times):
+            observability.log_event("agent_upload", status=status, org=org, product_slug="worksuite")
+
+    def test_flush_feeds_the_rollup_the_summary_reads(self):
+        with override_settings(OBS_METRICS_ENABLED=True, OBS_METRICS_FLUSH_SECONDS=3600):
+            self._log(self.org, "success", times=2)
+            self._log(self.org, "failed")
+            self._log(self.other, "success", times=4)
+        observability.flush_event_metrics()
+
+        rollup = EventMetricRollup.objects.get(product_slug="worksuite", event_family="agent_upload")
+        self.assertEqual(rollup.count, 7)
+        summary = build_observability_summary(days=1)
+        self.assertEqual(summary["totals"], {"agent_upload": 7})
+        self.assertIsNone(summary["selected_org"])
+        org_summary = build_observability_summary(days=1, org_id=self.org.id, product_slug="worksuite")
+        self.assertEqual(org_summary["totals"], {"agent_upload": 3})
+        self.assertEqual(org_summary["selected_org"], {"id": self.org.id, "name": "Rollup Org"})
+
+        self.other.delete()
+        today = timezone.now().date()
+        observability.rebuild_event_metric_rollups(today, today)
+        self.assertEqual(build_observability_summary(days=1)["totals"], {"agent_upload": 3})
+
+    def test_rebuild_locks_one_date_at_a_time(self):
+        today = timezone.now().date()
+        with CaptureQueriesContext(connection) as queries:
+            observability.rebuild_event_metric_rollups(today - timedelta(days=2), today)
+        statements = " ".join(query["sql"] for query in queries.captured_queries)
+        self.assertNotIn("LOCK TABLE", statements)
+        self.assertEqual(statements.count("pg_advisory_xact_lock("), 3)
+
+    def test_org_picker_is_searchable_and_paginated(self):
+        Organization.objects.bulk_create(
+            [Organization(name=f"Picker {index:02d}", company_key=f"PICKER{index:02d}") for index in range(5)]
+        )
+        first = search_observability_orgs("picker", page=1, page_size=2)
+        self.assertEqual([org["name"] for org in first["results"]], ["Picker 00", "Picker 01"])
+        self.assertTrue(first["has_more"])
+        last = search_observability_orgs("picker", page=3, page_size=2)
+        self.assertEqual([org["name"] for org in last["results"]], ["Picker 04"])
+        self.assertFalse(last["has_more"])
+
+
+class PeriodicFlusherTests(TestCase):
+    @override_settings(BUFFER_FLUSH_THREAD_ENABLED=True)
+    def test_flushes_on_a_timer_without_further_writes(self):
+        flushed = threading.Event()
+        flusher = PeriodicFlusher("test-flush", flushed.set, lambda: 0)
+        flusher.ensure_started()
+        flusher.ensure_started()
+        self.assertTrue(flusher.running)
+        self.assertTrue(flushed.wait(5))
+
+    def test_disabled_flusher_leaves_flushing_to_the_caller(self):
+        flusher = PeriodicFlusher("test-flush-off", lambda: None, lambda: 0)
+        with override_settings(BUFFER_FLUSH_THREAD_ENABLED=False):
+            flusher.ensure_started()
+        self.assertFalse(flusher.running)
+
+
+class _SmtpSinkHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.server.connections += 1
+        self.wfile.write(b"220 sink\r\n")
+        data = None
+        for line in self.rfile:
+            if data is not None:
+                if line.rstrip(b"\r\n") == b".":
+                    self.server.messages.append(b"".join(data))
+                    data = None
+                    self.wfile.write(b"250 queued\r\n")
+                else:
+                    data.append(line)
+                continue
+            command = line[:4].upper()
+            if command == b"DATA":
+                data = []
+                self.wfile.write(b"354 go ahead\r\n")
+            elif command == b"QUIT":
+                self.wfile.write(b"221 bye\r\n")
+                return
+            else:
+                self.wfile.write(b"250 ok\r\n")
+
+
+def _smtp_config(port):
+    return {
+        "transport": "smtp",
+        "host": "127.0.0.1",
+        "port": port,
+        "username": "",
+        "password": "",
+        "use_tls": False,
+        "use_ssl": False,
+        "timeout": 5,
+        "from_email": "no-reply@workzilla.test",
+        "reply_to": [],
+    }
+
+
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        self.sink = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SmtpSinkHandler)
+        self.sink.daemon_threads = True
+        self.sink.connections = 0
+        self.sink.messages = []
+        threading.Thread(target=self.sink.serve_forever, daemon=True).start()
+        self.addCleanup(self.sink.server_close)
+        self.addCleanup(self.sink.shutdown)
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            self.dead_port = probe.getsockname()[1]
+        patcher = mock.patch.object(email_utils, "_get_active_ses_mail_configs", return_value=[])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _queue(self, count):
+        for index in range(count):
+            self.assertTrue(email_utils.send_templated_email(
+                f"user{index}@example.com", f"Report {index}", "emails/saas_weekly_report.txt", {"name": "User"},
+            ))
+
+    def test_emails_are_queued_and_delivered_in_one_batch_over_one_connection(self):
+        with mock.patch.object(email_utils, "_get_env_mail_config", return_value=_smtp_config(self.sink.server_address[1])):
+            # Savepoint + INSERT + release: no mail config lookups or delivery on the request path.
+            with self.assertNumQueries(3):
+                self._queue(1)
+            self._queue(2)
+            self.assertEqual(self.sink.messages, [])
+            self.assertEqual(email_utils.deliver_email_outbox(), (3, 0, 0))
+        self.assertEqual(self.sink.connections, 1)
+        self.assertEqual(len(self.sink.messages), 3)
+        self.assertEqual(
+            set(EmailOutbox.objects.values_list("status", "sent_via")),
+            {(EmailOutbox.STATUS_SENT, "env_auto")},
+        )
+        self.assertEqual(email_utils.deliver_email_outbox(), (0, 0, 0))
+
+    def test_failover_to_next_config_and_backoff_when_all_fail(self):
+        self._queue(2)
+        attempts = [("primary", _smtp_config(self.dead_port)), ("secondary", _smtp_config(self.sink.server_address[1]))]
+        with mock.patch.object(email_utils, "_get_mail_attempts", return_value=attempts):
+            self.assertEqual(email_utils.deliver_email_outbox(), (2, 0, 0))
+        self.assertEqual(set(EmailOutbox.objects.values_list("sent_via", flat=True)), {"secondary"})
+        self.assertEqual(self.sink.connections, 1)
+
+        self._queue(1)
+        with mock.patch.object(email_utils, "_get_mail_attempts", return_value=attempts[:1]):
+            self.assertEqual(email_utils.deliver_email_outbox(), (0, 1, 0))
+            row = EmailOutbox.objects.get(status=EmailOutbox.STATUS_QUEUED)
+            self.assertEqual(row.attempts, 1)
+            self.assertGreater(row.next_attempt_at, timezone.now())
+            self.assertIn("primary", row.last_error)
+            # Not due yet, so the next run leaves it alone.
+            self.assertEqual(email_utils.deliver_email_outbox(), (0, 0, 0))
+
+    def test_enqueue_while_a_kicked_run_finishes_is_not_stranded(self):
+        cache.clear()
+        deliver = email_utils.deliver_email_outbox
+        passes = []
+
+        def deliver_with_late_enqueue():
+            passes.append(1)
+            if len(passes) == 1:
+                # Committed after this pass's last claim came back empty.
+                with self.captureOnCommitCallbacks(execute=True):
+                    self._queue(1)
+                return 0, 0, 0
+            return deliver()
+
+        with mock.patch.object(email_utils, "_get_env_mail_config", return_value=_smtp_config(self.sink.server_address[1])), \
+                mock.patch.object(email_utils, "deliver_email_outbox", side_effect=deliver_with_late_enqueue), \
+                mock.patch.object(email_utils, "_run_in_background") as start, \
+                mock.patch.object(email_utils, "cache_is_shared", return_value=True):
+            self.assertTrue(cache.add(email_utils.OUTBOX_KICK_KEY, 1, 60))
+            self.assertEqual(email_utils.deliver_kicked_outbox(), (1, 0, 0))
+
+        start.assert_not_called()
+        self.assertEqual(len(passes), 2)
+        self.assertEqual(len(self.sink.messages), 1)
+        self.assertIsNone(cache.get(email_utils.OUTBOX_KICK_KEY))
+
+    def test_kicks_are_debounced_only_through_a_shared_cache(self):
+        cache.clear()
+        from core.tasks import deliver_email_outbox_task
+
+        with mock.patch.object(email_utils, "_run_in_background") as start:
+            with mock.patch.object(email_utils, "cache_is_shared", return_value=True):
+                email_utils._kick_outbox_delivery()
+                email_utils._kick_outbox_delivery()
+            self.assertEqual(start.call_args_list, [mock.call(deliver_email_outbox_task, True)])
+            start.reset_mock()
+            with mock.patch.object(email_utils, "cache_is_shared", return_value=False):
+                email_utils._kick_outbox_delivery()
+                email_utils._kick_outbox_delivery()
+            self.assertEqual(start.call_args_list, [mock.call(deliver_email_outbox_task)] * 2)
+
+    @override_settings(EMAIL_OUTBOX_RETENTION_DAYS=30)
+    def test_purge_drops_old_sent_rows_only(self):
+        now = timezone.now()
+        old_sent = EmailOutbox.objects.create(status=EmailOutbox.STATUS_SENT, sent_at=now - timedelta(days=31))
+        recent_sent = EmailOutbox.objects.create(status=EmailOutbox.STATUS_SENT, sent_at=now - timedelta(days=1))
+        old_failed = EmailOutbox.objects.create(status=EmailOutbox.STATUS_FAILED)
+        EmailOutbox.objects.filter(id=old_failed.id).update(updated_at=now - timedelta(days=60))
+
+        self.assertEqual(email_utils.purge_email_outbox(), 1)
+        self.assertFalse(EmailOutbox.objects.filter(id=old_sent.id).exists())
+        self.assertEqual(
+            set(EmailOutbox.objects.values_list("id", flat=True)), {recent_sent.id, old_failed.id},
+        )
+
+
+class BillingAutomationScannerTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.paid_plan = Plan.objects.create(name="Pro", monthly_price=499, yearly_price=4990)
+        self.free_plan = Plan.objects.create(name="Free")
+
+    def _subscription(self, name, plan, status="active", end_in_days=None, started_days_ago=0):
+        owner = User.objects.create_user(username=f"{name}@example.com", email=f"{name}@example.com", password="pw123456")
+        org = Organization.objects.create(name=name, company_key=f"KEY-{name}", owner=owner)
+        sub = Subscription.objects.create(
+            user=owner,
+            organization=org,
+            plan=plan,
+            status=status,
+            end_date=self.now + timedelta(days=end_in_days) if end_in_days is not None else None,
+        )
+        if started_days_ago:
+            Subscription.objects.filter(pk=sub.pk).update(start_date=self.now - timedelta(days=started_days_ago))
+            sub.refresh_from_db()
+            sub.save()
+        return sub
+
+    def _run(self, **options):
+        out = io.StringIO()
+        with mock.patch("core.management.commands.billing_automation.send_templated_email", return_value=True) as send:
+            call_command("billing_automation", workers=1, chunk_size=1, stdout=out, **options)
+        return out.getvalue(), send
+
+    def test_effective_end_is_kept_on_save_and_plan_price_changes(self):
+        sub = self._subscription("free-org", self.free_plan, started_days_ago=3)
+        self.assertEqual(sub.effective_end_at, sub.start_date + timedelta(days=15))
+        self.free_plan.monthly_price = 99
+        self.free_plan.save()
+        sub.refresh_from_db()
+        self.assertIsNone(sub.effective_end_at)
+        sub.end_date = self.now + timedelta(days=40)
+        sub.save(update_fields=["end_date"])
+        sub.refresh_from_db()
+        self.assertEqual(sub.effective_end_at, sub.end_date)
+
+    def test_only_due_subscriptions_are_processed_and_reruns_resume_from_checkpoint(self):
+        expiring = self._subscription("expiring-org", self.paid_plan, end_in_days=7)
+        lapsed = self._subscription("lapsed-org", self.paid_plan, end_in_days=-1)
+        free_trial = self._subscription("free-org", self.free_plan, started_days_ago=20)
+        historical = self._subscription("old-org", self.paid_plan, status="expired", end_in_days=-400)
+        self._subscription("future-org", self.paid_plan, end_in_days=45)
+
+        output, send = self._run()
+
+        self.assertIn("Expired: 2, reminders: 3, digests: 3", output)
+        self.assertIn("orgs: 3", output)
+        lapsed.refresh_from_db()
+        free_trial.refresh_from_db()
+        self.assertEqual((lapsed.status, free_trial.status), ("expired", "expired"))
+        self.assertEqual(
+            set(EmailNotificationLog.objects.values_list("organization_id", "subject")),
+            {
+                (expiring.organization_id, "Subscription Expiring Soon"),
+                (lapsed.organization_id, "Subscription Expired - Action Required"),
+                (free_trial.organization_id, "Subscription Expired - Action Required"),
+            },
+        )
+        self.assertFalse(EmailNotificationLog.objects.filter(organization_id=historical.organization_id).exists())
+        self.assertEqual(send.call_count, 3)
+        checkpoint = BillingScanCheckpoint.objects.get()
+        self.assertEqual((checkpoint.last_org_id, checkpoint.orgs_processed), (free_trial.organization_id, 3))
+
+        output, send = self._run()
+        self.assertIn("orgs: 0", output)
+        send.assert_not_called()
+
+
+class SpaAssetServingTests(TestCase):
+    def setUp(self):
+        from apps.backend.core_platform.spa_assets import precompress_dist_assets, reset_asset_manifest
+
+        self.dist = tempfile.mkdtemp(prefix="wz-spa-dist-")
+        os.makedirs(os.path.join(self.dist, "assets"))
+        with open(os.path.join(self.dist, "index.html"), "w", encoding="utf-8") as handle:
+            handle.write("<!doctype html><script src=\"/app/assets/index-AyTPA-y1.js\"></script>")
+        with open(os.path.join(self.dist, "assets", "index-AyTPA-y1.js"), "w", encoding="utf-8") as handle:
+            handle.write("console.log('bundle');\n" * 200)
+        with open(os.path.join(self.dist, "favicon.svg"), "w", encoding="utf-8") as handle:
+            handle.write("<svg></svg>")
+        precompress_dist_assets(self.dist)
+        settings_override = override_settings(FRONTEND_DIST=self.dist)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        reset_asset_manifest()
+        self.addCleanup(reset_asset_manifest)
+
+    def test_hashed_asset_is_immutable_and_served_precompressed(self):
+        response = self.client.get("/app/assets/index-AyTPA-y1.js", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertIn("javascript", response["Content-Type"])
+        self.assertNotIn("csrftoken", response.cookies)
+        body = b"".join(response.streaming_content)
+        self.assertEqual(int(response["Content-Length"]), len(body))
+
+        identity = self.client.get("/app/assets/index-AyTPA-y1.js", HTTP_ACCEPT_ENCODING="gzip;q=0")
+        self.assertFalse(identity.has_header("Content-Encoding"))
+        self.assertEqual(b"".join(identity.streaming_content), b"console.log('bundle');\n" * 200)
+
+        # Legacy /app/app/assets/* URLs resolve through the manifest as well.
+        legacy = self.client.get("/app/app/assets/index-AyTPA-y1.js")
+        self.assertEqual(legacy.status_code, 200)
+
+    def test_conditional_requests_get_304(self):
+        first = self.client.get("/app/favicon.svg")
+        self.assertEqual(first["Cache-Control"], "public, max-age=0, must-revalidate")
+        etag = first["ETag"]
+        self.assertTrue(etag)
+
+        cached = self.client.get("/app/favicon.svg", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        cached = self.client.get("/app/assets/index-AyTPA-y1.js", HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached["Cache-Control"], "public, max-age=31536000, immutable")
+
+    def test_html_shell_stays_no_store_and_missing_assets_404(self):
+        user = User.objects.create_user(username="spa@example.com", email="spa@example.com", password="pw123456")
+        self.client.force_login(user)
+        response = self.client.get("/app/index.html", HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Cache-Control"].startswith("no-store"))
+
+        self.assertEqual(self.client.get("/app/assets/missing-AAAAAAAA.js").status_code, 404)
@@ -1391,17 +1391,11 @@ def upload_screenshot(request):
             retention_days = 30
         if retention_days > 0:
             cutoff = timezone.now() - datetime.timedelta(days=retention_days)
-            old_shots = Screenshot.objects.filter(
+            # Set-based delete; the image files are queued as media tombstones.
+            Screenshot.objects.filter(
                 employee__org=employee.org,
                 captured_at__lt=cutoff
-            )
-            for s in old_shots.iterator():
-                try:
-                    if s.image:
-                        s.image.delete(save=False)
-                except Exception:
-                    pass
-            old_shots.delete()
+            ).delete()
 
         log_event(
             "agent_screenshot_upload",
@@ -1687,20 +1681,8 @@ def delete_all_screenshots(request):
         messages.error(request, "Select organization first!")
         return redirect("/select-organization/")
 
-    shots = Screenshot.objects.filter(employee__org=org)
-
-    deleted_count = 0
-
-    for s in shots:
-        try:
-            if s.image:
-                s.image.delete(save=False)
-                deleted_count += 1
-        except Exception as e:
-            print("File delete failed:", e)
-
-    # delete db records
-    shots.delete()
+    # Image files are removed by the media tombstone purge after the rows are gone.
+    deleted_count, _ = Screenshot.objects.filter(employee__org=org).delete()
 
     log_admin_activity(request.user, "Delete All Screenshots", f"Deleted {deleted_count} screenshots for org {org.name}")
     messages.success(request, f"Deleted {deleted_count} screenshots successfully!")
@@ -8,7 +8,6 @@ import logging
 import math
 import os
 import re
-import threading
 import urllib.error
 import urllib.request
 from types import SimpleNamespace
@@ -18,7 +17,6 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.password_validation import validate_password
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.core.files.storage import default_storage
 from django.core.paginator import Paginator
 from django.db import models, transaction
 from django.db.models import Max, Value, Q
@@ -162,69 +160,20 @@ def _normalize_text(value):
     return " ".join(str(value or "").strip().split())
 
 
-def _start_screenshot_storage_cleanup(image_names, action_label):
-    names = [str(name or "").strip() for name in image_names or [] if str(name or "").strip()]
-    if not names:
-        return
-
-    def _worker():
-        seen = set()
-        deleted = 0
-        for name in names:
-            if name in seen:
-                continue
-            seen.add(name)
-            try:
-                default_storage.delete(name)
-                deleted += 1
-            except Exception as exc:
-                logger.warning(
-                    "Screenshot storage cleanup failed for %s during %s: %s",
-                    name,
-                    action_label,
-                    exc,
-                )
-        logger.info(
-            "Screenshot storage cleanup finished for %s (deleted=%s, queued=%s)",
-            action_label,
-            deleted,
-            len(seen),
-        )
-
-    threading.Thread(target=_worker, daemon=True).start()
-
-
 def _fast_delete_screenshots(queryset, action_label):
-    records = list(
-        queryset.values_list("id", "image", "employee__name")
-    )
-    if not records:
-        return {
-            "count": 0,
-            "employee_names": set(),
-            "cleanup_queued": False,
-        }
-
-    ids = []
-    image_names = []
-    employee_names = set()
-    for shot_id, image_name, employee_name in records:
-        ids.append(shot_id)
-        if image_name:
-            image_names.append(image_name)
-        if employee_name:
-            employee_names.add(employee_name)
-
-    # Clear image path before delete so Screenshot pre_delete signal does not
-    # synchronously hit object storage for each row.
-    Screenshot.objects.filter(id__in=ids).update(image="")
-    Screenshot.objects.filter(id__in=ids).delete()
-    _start_screenshot_storage_cleanup(image_names, action_label)
-
+    # One set-based DELETE; a database trigger queues each image key as a
+    # MediaFileTombstone and core.media_utils removes the files in batches.
+    employee_names = {
+        name for name in queryset.values_list("employee__name", flat=True).distinct() if name
+    }
+    _, deleted_by_model = queryset.delete()
+    count = deleted_by_model.get(Screenshot._meta.label, 0)
+    if count:
+        logger.info("Deleted %s screenshots for %s; storage cleanup queued", count, action_label)
     return {
-        "count": len(ids),
+        "count": count,
         "employee_names": employee_names,
-        "cleanup_queued": bool(image_names),
+        "cleanup_queued": bool(count),
     }
 
 
@@ -3618,10 +3567,7 @@ def employees_delete(request, emp_id):
     stop_event_count = stop_event_qs.count()
 
     with transaction.atomic():
-        # Explicitly remove screenshot files from local/object storage before row deletion.
-        for shot in screenshot_qs.only("id", "image").iterator():
-            if shot.image:
-                shot.image.delete(save=False)
+        # Screenshot files are queued as media tombstones by the row delete and purged in batches.
         screenshot_qs.delete()
         activity_qs.delete()
         stop_event_qs.delete()
@@ -1562,9 +1562,6 @@ def delete_screenshot(request, shot_id):
         return redirect("/select-organization/")
 
     shot = get_object_or_404(Screenshot, id=shot_id, employee__org=org)
-
-    if shot.image:
-        shot.image.delete(save=False)
     shot.delete()
 
     log_admin_activity(request.user, "Delete Screenshot", f"Screenshot ID {shot_id}", request=request)
@@ -1579,18 +1576,8 @@ def delete_employee_screenshots(request, emp_id):
         return redirect("/select-organization/")
 
     employee = get_object_or_404(Employee, id=emp_id, org=org)
-    shots = Screenshot.objects.filter(employee=employee)
-
-    deleted_count = 0
-    for s in shots:
-        try:
-            if s.image:
-                s.image.delete(save=False)
-                deleted_count += 1
-        except Exception:
-            pass
-
-    shots.delete()
+    # Image files are removed by the media tombstone purge after the rows are gone.
+    deleted_count, _ = Screenshot.objects.filter(employee=employee).delete()
 
     log_admin_activity(request.user, "Delete Employee Screenshots", f"{deleted_count} screenshots deleted for {employee.name}", request=request)
     messages.success(request, f"Deleted {deleted_count} screenshots for {employee.name}.")
@@ -1755,9 +1742,6 @@ def employee_delete(request, emp_id):
         activity_count = activity_qs.count()
         stop_event_count = stop_event_qs.count()
 
-        for shot in screenshot_qs.only("id", "image").iterator():
-            if shot.image:
-                shot.image.delete(save=False)
         screenshot_qs.delete()
         activity_qs.delete()
         stop_event_qs.delete()
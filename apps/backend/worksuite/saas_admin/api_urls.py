@@ -6,6 +6,7 @@ urlpatterns = [
     path("overview", api_views.overview, name="saas_admin_overview"),
     path("metrics/summary", api_views.metrics_summary, name="saas_admin_metrics_summary"),
     path("observability/summary", api_views.observability_summary, name="saas_admin_observability_summary"),
+    path("observability/orgs", api_views.observability_orgs, name="saas_admin_observability_orgs"),
     path("ai-chatbot/usage/summary", api_views.ai_chatbot_usage_summary, name="saas_admin_ai_chatbot_usage_summary"),
     path("ai-chatbot/usage/trend", api_views.ai_chatbot_usage_trend, name="saas_admin_ai_chatbot_usage_trend"),
     path("ai-chatbot/openai/settings", api_views.ai_chatbot_openai_settings, name="saas_admin_ai_chatbot_openai_settings"),
@@ -73,7 +73,7 @@ from apps.backend.brand.models import SiteBrandSettings
 from apps.backend.retention.models import GlobalRetentionPolicy
 from apps.backend.retention.serializers import GlobalRetentionPolicySerializer
 from apps.backend.website import application_downloads
-from .observability import build_observability_summary
+from .observability import build_observability_summary, search_observability_orgs
 from .serializers import serialize_notification
 from .whatsapp_notification_catalog import (
     WHATSAPP_NOTIFICATION_CATALOG,
@@ -5138,6 +5138,28 @@ def observability_summary(request):
     return JsonResponse(payload)
 
 
+@login_required
+@require_http_methods(["GET"])
+def observability_orgs(request):
+    if not _is_saas_admin_user(request.user):
+        return HttpResponseForbidden("Access denied.")
+
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+    except (TypeError, ValueError):
+        page = 1
+    try:
+        page_size = int(request.GET.get("page_size", 20))
+    except (TypeError, ValueError):
+        page_size = 20
+
+    return JsonResponse(search_observability_orgs(
+        query=request.GET.get("q", ""),
+        page=page,
+        page_size=page_size,
+    ))
+
+
 @login_required
 @require_http_methods(["GET"])
 def metrics_summary(request):
@@ -1,46 +1,73 @@
 from collections import defaultdict
 from datetime import timedelta
 
-from django.db.models import Sum, Count
+from django.db.models import CharField, Count, F, Func, Sum, Value
 from django.utils import timezone
 
-from core.models import EventMetric, Organization, PendingTransfer
+from core.models import EventMetric, EventMetricRollup, Organization, PendingTransfer
 from .models import Product
 
 
-def build_observability_summary(days=7, org_id=None, product_slug=None):
-    days = max(1, min(int(days or 7), 60))
-    end_date = timezone.now().date()
-    start_date = end_date - timedelta(days=days - 1)
+ORG_PICKER_PAGE_SIZE = 20
+ORG_PICKER_MAX_PAGE_SIZE = 50
+
 
-    metrics = EventMetric.objects.filter(date__gte=start_date, date__lte=end_date)
+def _event_counts(start_date, end_date, org_id=None, product_slug=None):
+    """(date, event family, count) rows: the platform-wide rollup, or one org's own metrics."""
     if org_id:
-        metrics = metrics.filter(organization_id=org_id)
+        metrics = EventMetric.objects.filter(
+            organization_id=org_id,
+            date__gte=start_date,
+            date__lte=end_date,
+        ).annotate(
+            event_family=Func(F("event_type"), Value(":"), Value(1), function="split_part", output_field=CharField()),
+        )
+    else:
+        metrics = EventMetricRollup.objects.filter(date__gte=start_date, date__lte=end_date)
     if product_slug:
         metrics = metrics.filter(product_slug=product_slug)
-
-    series_qs = (
-        metrics.values("date", "event_type")
+    return (
+        metrics.values("date", "event_family")
         .annotate(count=Sum("count"))
-        .order_by("date", "event_type")
+        .order_by("date", "event_family")
     )
+
+
+def search_observability_orgs(query="", page=1, page_size=ORG_PICKER_PAGE_SIZE):
+    """One page of the report's organization picker; has_more replaces a full COUNT."""
+    page = max(int(page or 1), 1)
+    page_size = min(max(int(page_size or ORG_PICKER_PAGE_SIZE), 1), ORG_PICKER_MAX_PAGE_SIZE)
+    orgs = Organization.objects.order_by("name", "id")
+    query = (query or "").strip()
+    if query:
+        orgs = orgs.filter(name__icontains=query)
+    start = (page - 1) * page_size
+    rows = list(orgs.values("id", "name")[start:start + page_size + 1])
+    return {
+        "results": rows[:page_size],
+        "page": page,
+        "page_size": page_size,
+        "has_more": len(rows) > page_size,
+    }
+
+
+def build_observability_summary(days=7, org_id=None, product_slug=None):
+    days = max(1, min(int(days or 7), 60))
+    end_date = timezone.now().date()
+    start_date = end_date - timedelta(days=days - 1)
+
     totals = defaultdict(int)
     by_day_map = {}
-    series_map = defaultdict(int)
-    for row in series_qs:
+    series = []
+    for row in _event_counts(start_date, end_date, org_id=org_id, product_slug=product_slug):
         date_str = row["date"].strftime("%Y-%m-%d")
-        event_key = row["event_type"].split(":", 1)[0]
+        event_key = row["event_family"]
         count = int(row["count"] or 0)
         totals[event_key] += count
-        series_map[(date_str, event_key)] += count
-        day_counts = by_day_map.setdefault(date_str, {})
-        day_counts[event_key] = day_counts.get(event_key, 0) + count
+        series.append({"date": date_str, "event_type": event_key, "count": count})
+        by_day_map.setdefault(date_str, {})[event_key] = count
 
     event_types = sorted(totals.keys())
-    series = [
-        {"date": date_str, "event_type": event_type, "count": count}
-        for (date_str, event_type), count in sorted(series_map.items())
-    ]
     by_day = []
     for offset in range(days):
         current_date = start_date + timedelta(days=offset)
@@ -71,11 +98,10 @@ def build_observability_summary(days=7, org_id=None, product_slug=None):
         for row in pending_transfers
     ]
 
-    orgs = list(
-        Organization.objects
-        .order_by("name")
-        .values("id", "name")
-    )
+    # The full org list comes from the paginated picker; only the selection is echoed here.
+    selected_org = None
+    if org_id:
+        selected_org = Organization.objects.filter(id=org_id).values("id", "name").first()
     products = list(
         Product.objects.filter(status="active").values_list("slug", flat=True)
     )
@@ -86,7 +112,7 @@ def build_observability_summary(days=7, org_id=None, product_slug=None):
             "org_id": org_id,
             "product": product_slug,
         },
-        "orgs": orgs,
+        "selected_org": selected_org,
         "products": products,
         "totals": dict(totals),
         "series": series,
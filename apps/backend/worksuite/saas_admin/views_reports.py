@@ -2,9 +2,8 @@ from django.contrib.auth.decorators import login_required
 from django.http import HttpResponseForbidden
 from django.shortcuts import render
 
-from core.models import Organization
 from .models import Product
-from .observability import build_observability_summary
+from .observability import build_observability_summary, search_observability_orgs
 from .api_views import _is_saas_admin_user
 
 
@@ -22,6 +21,7 @@ def observability_report(request):
 
     days = request.GET.get("days") or 7
     org_id = request.GET.get("org_id") or ""
+    org_query = (request.GET.get("org_q") or "").strip()
     product = _normalize_product_slug(request.GET.get("product"))
 
     try:
@@ -40,7 +40,11 @@ def observability_report(request):
         product_slug=product,
     )
 
-    orgs = Organization.objects.order_by("name")
+    # Only one page of matches is rendered; the search box narrows it down.
+    orgs = search_observability_orgs(query=org_query)["results"]
+    selected_org = summary["selected_org"]
+    if selected_org and all(org["id"] != selected_org["id"] for org in orgs):
+        orgs.insert(0, selected_org)
     products = Product.objects.order_by("name")
 
     context = {
@@ -49,6 +53,7 @@ def observability_report(request):
         "products": products,
         "selected_days": days,
         "selected_org_id": str(org_id or ""),
+        "org_query": org_query,
         "selected_product": product,
         "seo_title": "SaaS Admin Observability",
     }
@@ -10,7 +10,21 @@ export async function fetchObservabilitySummary({ days = 7, org_id = null, produ
     params.set("product", product);
   }
 
-  const response = await fetch(`/api/saas-admin/observability/summary?${params.toString()}`, {
+  return fetchObservabilityJson(`/api/saas-admin/observability/summary?${params.toString()}`);
+}
+
+export async function fetchObservabilityOrgs({ q = "", page = 1, page_size = 20 } = {}) {
+  const params = new URLSearchParams();
+  if (q) {
+    params.set("q", q);
+  }
+  params.set("page", String(page));
+  params.set("page_size", String(page_size));
+  return fetchObservabilityJson(`/api/saas-admin/observability/orgs?${params.toString()}`);
+}
+
+async function fetchObservabilityJson(url) {
+  const response = await fetch(url, {
     credentials: "include"
   });
 
@@ -58,6 +58,9 @@ export const waApi = {
       body: JSON.stringify(payload),
     });
   },
+  getMarketingContactImport(importId) {
+    return apiFetch(`/api/whatsapp-automation/marketing/contacts/imports/${importId}`);
+  },
   optOutMarketingContact(payload) {
     return apiFetch("/api/whatsapp-automation/marketing/contacts/opt-out", {
       method: "POST",
@@ -4,6 +4,9 @@ import { useConfirm } from "../components/ConfirmDialog.jsx";
 import { formatDeviceDateTime } from "../lib/datetime.js";
 import { showUploadAlert } from "../lib/uploadAlert.js";
 
+// The server fails imports still queued or running after 30 minutes; stop polling just after.
+const WEBSITE_IMPORT_TIMEOUT_MS = 31 * 60 * 1000;
+
 const emptySettings = {
   loading: true,
   saving: false,
@@ -164,7 +167,8 @@ export default function AiChatbotChatSettingsPage() {
       ACCESS_BLOCKED: "Website Access Restricted",
       JS_RENDER_REQUIRED: "Website needs JavaScript",
       LOGIN_REQUIRED: "Login required",
-      NO_READABLE_CONTENT: "No readable content"
+      NO_READABLE_CONTENT: "No readable content",
+      IMPORT_TIMED_OUT: "Import timed out"
     };
     return {
       title: titleMap[data.error_code] || "Website import failed",
@@ -310,6 +314,35 @@ export default function AiChatbotChatSettingsPage() {
     }
   }
 
+  async function waitForWebsiteImport(job) {
+    let current = job;
+    const deadline = Date.now() + WEBSITE_IMPORT_TIMEOUT_MS;
+    while (current && (current.status === "queued" || current.status === "running")) {
+      if (Date.now() >= deadline) {
+        const error = new Error("The website import did not finish in time.");
+        error.status = 408;
+        error.data = {
+          status: "failed",
+          error_code: "IMPORT_TIMED_OUT",
+          reason: "The website import did not finish in time.",
+          suggestion: "Try the import again."
+        };
+        throw error;
+      }
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+      const data = await apiFetch(`/api/ai-chatbot/media-library/website-import/${current.id}`);
+      current = data?.job;
+    }
+    const result = current?.result || {};
+    if (current?.status !== "completed") {
+      const error = new Error(result.reason || result.message || "Unable to import website content.");
+      error.status = 400;
+      error.data = result;
+      throw error;
+    }
+    return result;
+  }
+
   async function handleWebsiteImport() {
     if (!websiteUrl.trim() || websiteUploading) {
       return;
@@ -317,13 +350,14 @@ export default function AiChatbotChatSettingsPage() {
     setWebsiteUploading(true);
     setMedia((prev) => ({ ...prev, error: "" }));
     try {
-      const data = await apiFetch("/api/ai-chatbot/media-library/website-import", {
+      const queued = await apiFetch("/api/ai-chatbot/media-library/website-import", {
         method: "POST",
         body: JSON.stringify({
           source_url: websiteUrl.trim(),
           name: websiteName.trim()
         })
       });
+      const data = await waitForWebsiteImport(queued?.job);
       setWebsiteUrl("");
       setWebsiteName("");
       if (data?.status === "warning" && (data?.code === "LIMITED_CONTENT" || data?.code === "ONLY_HOMEPAGE_IMPORTED")) {
@@ -376,7 +410,7 @@ export default function AiChatbotChatSettingsPage() {
     setWebsiteUploading(true);
     setMedia((prev) => ({ ...prev, error: "" }));
     try {
-      const data = await apiFetch("/api/ai-chatbot/media-library/website-import", {
+      const queued = await apiFetch("/api/ai-chatbot/media-library/website-import", {
         method: "POST",
         body: JSON.stringify({
           source_url: websiteUrl.trim(),
@@ -384,6 +418,7 @@ export default function AiChatbotChatSettingsPage() {
           selected_pages: websiteScan.selected
         })
       });
+      const data = await waitForWebsiteImport(queued?.job);
       setWebsiteUrl("");
       setWebsiteName("");
       setWebsiteScan({ open: false, pages: [], total: 0, allowed: 0, selected: [] });
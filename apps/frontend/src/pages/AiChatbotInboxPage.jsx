@@ -7,6 +7,8 @@ const emptyState = {
   loading: true,
   error: "",
   conversations: [],
+  nextBefore: "",
+  loadingMore: false,
   selectedId: null,
   messages: [],
   loadingMessages: false,
@@ -93,6 +95,9 @@ export default function AiChatbotInboxPage() {
   const knownConversationIdsRef = useRef(new Set());
   const hasLoadedConversationsRef = useRef(false);
   const pollingRef = useRef({ conversations: null, messages: null });
+  const inboxCursorRef = useRef(null);
+  const streamHandlerRef = useRef(null);
+  const [streamLive, setStreamLive] = useState(false);
   const fileInputRef = useRef(null);
 
   useEffect(() => {
@@ -108,11 +113,13 @@ export default function AiChatbotInboxPage() {
         if (!active) {
           return;
         }
+        inboxCursorRef.current = data.cursor || null;
         setState((prev) => ({
           ...prev,
           loading: false,
           error: "",
           conversations: data.conversations || [],
+          nextBefore: data.next_before || "",
           selectedId: data.conversations?.[0]?.id || null
         }));
       } catch (error) {
@@ -210,16 +217,17 @@ export default function AiChatbotInboxPage() {
     if (pollingRef.current.conversations) {
       window.clearInterval(pollingRef.current.conversations);
     }
+    // While the realtime stream is live, polling is only a safety net.
     pollingRef.current.conversations = window.setInterval(() => {
       refreshConversations();
-    }, 5000);
+    }, streamLive ? 30000 : 5000);
     return () => {
       if (pollingRef.current.conversations) {
         window.clearInterval(pollingRef.current.conversations);
         pollingRef.current.conversations = null;
       }
     };
-  }, [state.filterStatus, categoryFilter]);
+  }, [state.filterStatus, categoryFilter, streamLive]);
 
   useEffect(() => {
     if (pollingRef.current.messages) {
@@ -230,14 +238,46 @@ export default function AiChatbotInboxPage() {
     }
     pollingRef.current.messages = window.setInterval(() => {
       loadMessages(state.selectedId, { silent: true });
-    }, 4000);
+    }, streamLive ? 30000 : 4000);
     return () => {
       if (pollingRef.current.messages) {
         window.clearInterval(pollingRef.current.messages);
         pollingRef.current.messages = null;
       }
     };
-  }, [state.selectedId]);
+  }, [state.selectedId, streamLive]);
+
+  streamHandlerRef.current = (event) => {
+    refreshConversations();
+    if (event?.conversation_id && event.conversation_id === state.selectedId) {
+      loadMessages(state.selectedId, { silent: true });
+    }
+  };
+
+  useEffect(() => {
+    if (typeof window.EventSource === "undefined") {
+      return () => {};
+    }
+    const source = new window.EventSource("/api/ai-chatbot/inbox/stream", { withCredentials: true });
+    const onChange = (message) => {
+      let payload = null;
+      try {
+        payload = JSON.parse(message.data);
+      } catch (error) {
+        payload = null;
+      }
+      streamHandlerRef.current?.(payload);
+    };
+    source.addEventListener("ready", () => setStreamLive(true));
+    source.addEventListener("message", onChange);
+    source.addEventListener("conversation", onChange);
+    source.onerror = () => {
+      setStreamLive(false);
+    };
+    return () => {
+      source.close();
+    };
+  }, []);
 
   function playRing() {
     if (!soundEnabled) {
@@ -350,7 +390,11 @@ export default function AiChatbotInboxPage() {
       if (categoryFilter !== "all") {
         params.set("category", categoryFilter);
       }
+      if (inboxCursorRef.current) {
+        params.set("since", inboxCursorRef.current);
+      }
       const data = await apiFetch(`/api/ai-chatbot/inbox/conversations?${params.toString()}`);
+      inboxCursorRef.current = data.cursor || null;
       setState((prev) => {
         const conversations = data.conversations || [];
         const keepSelected = conversations.some((item) => item.id === prev.selectedId);
@@ -358,13 +402,50 @@ export default function AiChatbotInboxPage() {
           ...prev,
           loading: false,
           conversations,
+          nextBefore: data.next_before || "",
           selectedId: keepSelected ? prev.selectedId : conversations[0]?.id || null
         };
       });
     } catch (error) {
+      if (error?.status === 304) {
+        setState((prev) => ({ ...prev, loading: false }));
+        return;
+      }
       setState((prev) => ({
         ...prev,
         loading: false,
+        error: error?.message || "Unable to load conversations."
+      }));
+    }
+  }
+
+  async function loadMoreConversations() {
+    if (!state.nextBefore || state.loadingMore) {
+      return;
+    }
+    setState((prev) => ({ ...prev, loadingMore: true, error: "" }));
+    try {
+      const params = new URLSearchParams();
+      params.set("status", state.filterStatus);
+      if (categoryFilter !== "all") {
+        params.set("category", categoryFilter);
+      }
+      params.set("before", state.nextBefore);
+      const data = await apiFetch(`/api/ai-chatbot/inbox/conversations?${params.toString()}`);
+      setState((prev) => {
+        const knownIds = new Set(prev.conversations.map((item) => item.id));
+        const older = (data.conversations || []).filter((item) => !knownIds.has(item.id));
+        return {
+          ...prev,
+          loadingMore: false,
+          conversations: [...prev.conversations, ...older],
+          nextBefore: data.next_before || ""
+        };
+      });
+    } catch (error) {
+      setState((prev) => ({
+        ...prev,
+        loadingMore: false,
         error: error?.message || "Unable to load conversations."
       }));
     }
@@ -584,7 +665,10 @@ export default function AiChatbotInboxPage() {
         >
           <td>
             <div className="ai-chatbot-visitor">
-              <div>{visitorLabel}</div>
+              <div>
+                {visitorLabel}
+                {item.unread_count ? <span className="badge bg-danger ms-2">{item.unread_count}</span> : null}
+              </div>
             </div>
           </td>
           <td>{item.widget_name}</td>
@@ -715,6 +799,18 @@ export default function AiChatbotInboxPage() {
                   {renderConversationRows(olderConversations)}
                 </tbody>
               </table>
+              {state.nextBefore ? (
+                <div className="text-center mt-2">
+                  <button
+                    type="button"
+                    className="btn btn-outline-light btn-sm"
+                    onClick={loadMoreConversations}
+                    disabled={state.loadingMore}
+                  >
+                    {state.loadingMore ? "Loading..." : "Load older conversations"}
+                  </button>
+                </div>
+              ) : null}
             </div>
           </div>
         </div>
@@ -2963,6 +2963,50 @@ function buildPayrollSlipNumber(month, row, fallbackIndex = 1) {
   return `PS-${monthPart}-${employeePart.toUpperCase()}`;
 }
 
+const PAYROLL_SYNC_COLLECTIONS = [
+  ["salary_structure", "salaryStructures", "salary_structures"],
+  ["salary_history", "salaryHistory", "salary_history"],
+  ["payroll_entry", "payrollEntries", "payroll_entries"],
+  ["payslip", "payslips", "payslips"],
+];
+
+function buildPayrollSyncOps(previous, next) {
+  const ops = [];
+  PAYROLL_SYNC_COLLECTIONS.forEach(([type, key]) => {
+    const before = new Map((previous?.[key] || []).map((row) => [String(row.id), row]));
+    const kept = new Set();
+    (next?.[key] || []).forEach((row) => {
+      const rowId = String(row.id || "");
+      const previousRow = before.get(rowId);
+      kept.add(rowId);
+      if (!previousRow || JSON.stringify(previousRow) !== JSON.stringify(row)) {
+        ops.push({ type, op: "upsert", id: row.id, version: previousRow?.rowVersion, data: row });
+      }
+    });
+    before.forEach((row, rowId) => {
+      if (!kept.has(rowId)) {
+        ops.push({ type, op: "delete", id: row.id, version: row.rowVersion });
+      }
+    });
+  });
+  return ops;
+}
+
+function mergePayrollSyncResult(nextWorkspace, data) {
+  const merged = { ...nextWorkspace };
+  PAYROLL_SYNC_COLLECTIONS.forEach(([type, key, responseKey]) => {
+    const refs = data?.refs?.[type] || {};
+    const savedRows = new Map((data?.rows?.[responseKey] || []).map((row) => [String(row.id), row]));
+    const deletedIds = new Set((data?.deleted?.[responseKey] || []).map(String));
+    const rows = (nextWorkspace[key] || [])
+      .map((row) => savedRows.get(String(refs[String(row.id)] ?? row.id)) || row)
+      .filter((row) => !deletedIds.has(String(row.id)));
+    const knownIds = new Set(rows.map((row) => String(row.id)));
+    merged[key] = [...rows, ...[...savedRows.values()].filter((row) => !knownIds.has(String(row.id)))];
+  });
+  return merged;
+}
+
 function calculatePayrollFromStructure({
   employeeName,
   sourceUserId,
@@ -5988,26 +6032,20 @@ function HrPayrollWorkspacePanel({ activeTab, hrEmployees = [] }) {
     setSaveError("");
     setSaveMessage("");
     try {
+      const body = { ops: buildPayrollSyncOps(workspace, nextWorkspace) };
+      if (JSON.stringify(workspace.organizationProfile) !== JSON.stringify(nextWorkspace.organizationProfile)
+        || JSON.stringify(workspace.payrollSettings) !== JSON.stringify(nextWorkspace.payrollSettings)) {
+        body.organization_profile = nextWorkspace.organizationProfile;
+        body.payroll_settings = nextWorkspace.payrollSettings;
+      }
       const data = await apiFetch("/api/business-autopilot/payroll/workspace", {
-        method: "PUT",
-        body: JSON.stringify({
-          organization_profile: nextWorkspace.organizationProfile,
-          payroll_settings: nextWorkspace.payrollSettings,
-          salary_structures: nextWorkspace.salaryStructures,
-          salary_history: nextWorkspace.salaryHistory,
-          payroll_entries: nextWorkspace.payrollEntries,
-          payslips: nextWorkspace.payslips,
-        }),
+        method: "PATCH",
+        body: JSON.stringify(body),
       });
       const normalized = {
-        organizationProfile: data?.organization_profile || createEmptyPayrollOrganizationProfile(),
-        payrollSettings: data?.payroll_settings || createEmptyPayrollSettingsForm(),
-        salaryStructures: Array.isArray(data?.salary_structures) ? data.salary_structures : [],
-        salaryHistory: Array.isArray(data?.salary_history) ? data.salary_history : [],
-        payrollEntries: Array.isArray(data?.payroll_entries) ? data.payroll_entries : [],
-        payslips: Array.isArray(data?.payslips) ? data.payslips : [],
-        employeeDirectory: Array.isArray(data?.employee_directory) ? data.employee_directory : [],
-        permissions: data?.permissions || nextWorkspace.permissions || { can_manage_payroll: false, can_view_all_payroll: false, can_view_salary_history: false },
+        ...mergePayrollSyncResult(nextWorkspace, data),
+        organizationProfile: data?.organization_profile || nextWorkspace.organizationProfile || createEmptyPayrollOrganizationProfile(),
+        payrollSettings: data?.payroll_settings || nextWorkspace.payrollSettings || createEmptyPayrollSettingsForm(),
       };
       setWorkspace(normalized);
       setOrganizationProfileForm(normalized.organizationProfile);
@@ -1,6 +1,6 @@
 import { useEffect, useMemo, useState } from "react";
 import { Link } from "react-router-dom";
-import { fetchObservabilitySummary } from "../api/saasAdminObservability.js";
+import { fetchObservabilityOrgs, fetchObservabilitySummary } from "../api/saasAdminObservability.js";
 
 const emptyState = {
   loading: true,
@@ -19,6 +19,7 @@ const KPI_DEFINITIONS = [
 ];
 
 const DAY_OPTIONS = [7, 14, 30];
+const ORG_SEARCH_DELAY_MS = 300;
 
 function formatCount(value) {
   if (value === null || value === undefined) {
@@ -41,6 +42,33 @@ export default function SaasAdminObservabilityPage({
   });
   const [refreshKey, setRefreshKey] = useState(0);
   const [autoRefresh, setAutoRefresh] = useState(false);
+  const [orgSearch, setOrgSearch] = useState("");
+  const [orgPage, setOrgPage] = useState(1);
+  const [orgOptions, setOrgOptions] = useState({ results: [], hasMore: false });
+
+  useEffect(() => {
+    let active = true;
+    const handle = setTimeout(async () => {
+      try {
+        const data = await fetchObservabilityOrgs({ q: orgSearch.trim(), page: orgPage });
+        if (!active) {
+          return;
+        }
+        setOrgOptions((prev) => ({
+          results: orgPage === 1 ? data.results || [] : [...prev.results, ...(data.results || [])],
+          hasMore: Boolean(data.has_more)
+        }));
+      } catch (error) {
+        if (active) {
+          setOrgOptions({ results: [], hasMore: false });
+        }
+      }
+    }, orgPage === 1 ? ORG_SEARCH_DELAY_MS : 0);
+    return () => {
+      active = false;
+      clearTimeout(handle);
+    };
+  }, [orgSearch, orgPage]);
 
   useEffect(() => {
     let active = true;
@@ -87,7 +115,14 @@ export default function SaasAdminObservabilityPage({
 
   const data = state.data || {};
   const totals = data.totals || {};
-  const orgs = data.orgs || [];
+  const selectedOrg = data.selected_org;
+  const orgs = useMemo(() => {
+    const results = orgOptions.results;
+    if (selectedOrg && !results.some((org) => org.id === selectedOrg.id)) {
+      return [selectedOrg, ...results];
+    }
+    return results;
+  }, [orgOptions.results, selectedOrg]);
   const products = data.products || [];
   const byDay = data.by_day || [];
   const pendingTransfers = data.pending_transfers || [];
@@ -134,6 +169,18 @@ export default function SaasAdminObservabilityPage({
       {showTitle ? <h3 className="page-title">Observability</h3> : null}
 
       <div className="observability-filters mt-3">
+        <label className="filter-field">
+          <span>Find organization</span>
+          <input
+            type="search"
+            value={orgSearch}
+            placeholder="Name contains..."
+            onChange={(event) => {
+              setOrgSearch(event.target.value);
+              setOrgPage(1);
+            }}
+          />
+        </label>
         <label className="filter-field">
           <span>Organization</span>
           <select
@@ -149,6 +196,15 @@ export default function SaasAdminObservabilityPage({
               </option>
             ))}
           </select>
+          {orgOptions.hasMore ? (
+            <button
+              type="button"
+              className="btn btn-link btn-sm p-0"
+              onClick={() => setOrgPage((prev) => prev + 1)}
+            >
+              More organizations
+            </button>
+          ) : null}
         </label>
         <label className="filter-field">
           <span>Product</span>
@@ -60,7 +60,7 @@ export default function WhatsappAutomationDashboardPage() {
   const [settings, setSettings] = useState({ auto_reply_enabled: true, welcome_message: "" });
   const [rules, setRules] = useState([]);
   const [keywordRulesLimit, setKeywordRulesLimit] = useState(10);
-  const [ruleForm, setRuleForm] = useState({ id: null, keyword: "", reply_message: "", is_default: false });
+  const [ruleForm, setRuleForm] = useState({ id: null, keyword: "", match_mode: "contains", reply_message: "", is_default: false });
   const [previewInput, setPreviewInput] = useState("Hi");
   const [previewReply, setPreviewReply] = useState("");
 
@@ -187,7 +187,7 @@ export default function WhatsappAutomationDashboardPage() {
         // Let backend handle HTML -> WhatsApp text conversion to preserve line breaks reliably.
         reply_message: rawReplyHtml,
       });
-      setRuleForm({ id: null, keyword: "", reply_message: "", is_default: false });
+      setRuleForm({ id: null, keyword: "", match_mode: "contains", reply_message: "", is_default: false });
       const data = await waApi.getRules();
       setRules(data?.rules || []);
       setKeywordRulesLimit(Number(data?.keyword_rules_limit || keywordRulesLimit || 10));
@@ -266,7 +266,17 @@ export default function WhatsappAutomationDashboardPage() {
     setError("");
     setSuccess("");
     try {
-      const data = await waApi.importMarketingContactsCsv({ csv_text: csvText });
+      let data = await waApi.importMarketingContactsCsv({ csv_text: csvText });
+      let job = data?.job;
+      while (job && (job.status === "queued" || job.status === "running")) {
+        setSuccess(`Importing CSV... ${job.processed_rows || 0} rows processed.`);
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        job = (await waApi.getMarketingContactImport(job.id))?.job;
+        data = job || data;
+      }
+      if (job?.status === "failed") {
+        throw new Error(job.error_message || "CSV import failed.");
+      }
       await reloadMarketingData();
       setSuccess(`CSV imported. Created ${data?.created || 0}, updated ${data?.updated || 0}, skipped ${data?.skipped || 0}.`);
     } catch (err) {
@@ -559,6 +569,16 @@ export default function WhatsappAutomationDashboardPage() {
               }}
               placeholder="price / support / hello"
             />
+            <label className="form-label">Match</label>
+            <select
+              className="form-select"
+              value={ruleForm.match_mode || "contains"}
+              onChange={(e) => setRuleForm((p) => ({ ...p, match_mode: e.target.value }))}
+            >
+              <option value="contains">Message contains keyword</option>
+              <option value="starts_with">Message starts with keyword</option>
+              <option value="exact">Message is exactly the keyword</option>
+            </select>
             <label className="form-label">Reply Message</label>
             <TinyHtmlEditor
               label=""
@@ -580,7 +600,7 @@ export default function WhatsappAutomationDashboardPage() {
               <button type="button" className="btn btn-primary btn-sm" onClick={saveRule} disabled={savingRule || ruleLimitReached}>
                 {savingRule ? "Saving..." : ruleForm.id ? "Update Rule" : "Add Rule"}
               </button>
-              {ruleForm.id ? <button type="button" className="btn btn-outline-light btn-sm" onClick={() => setRuleForm({ id: null, keyword: "", reply_message: "", is_default: false })}>Cancel Edit</button> : null}
+              {ruleForm.id ? <button type="button" className="btn btn-outline-light btn-sm" onClick={() => setRuleForm({ id: null, keyword: "", match_mode: "contains", reply_message: "", is_default: false })}>Cancel Edit</button> : null}
             </div>
           </div>
         </div>
@@ -621,6 +641,7 @@ export default function WhatsappAutomationDashboardPage() {
                           onClick={() => setRuleForm({
                             id: row.id,
                             keyword: row.keyword || "",
+                            match_mode: row.match_mode || "contains",
                             reply_message: plainTextToHtml(row.reply_message || ""),
                             is_default: toStrictBoolean(row.is_default),
                           })}
@@ -272,6 +272,7 @@ fi
 . venv/bin/activate
 venv/bin/python apps/backend/manage.py migrate --skip-checks
 venv/bin/python apps/backend/manage.py collectstatic --noinput --skip-checks
+venv/bin/python apps/backend/manage.py precompress_spa_assets --skip-checks
 cleanup_server_installers
 
 if systemctl list-unit-files | grep -q '^workzilla-gunicorn.service'; then